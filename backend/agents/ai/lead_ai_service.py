@@ -62,3 +62,57 @@ Focus on actionable intelligence for B2B outreach."""
                 "pain_points": ["Market competition", "Operational efficiency", "Growth scaling"],
                 "value_propositions": ["Increased efficiency", "Competitive advantage", "Measurable ROI"]
             }
+
+    async def generate_company_insights(self, company_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate insights about a company, shareable by every lead that works there.
+
+        The prompt carries only company-level fields, so the result holds nothing
+        about any one contact.
+        """
+        company = company_data.get('company') or 'the company'
+        domain = company_data.get('domain') or 'unknown'
+        industry = company_data.get('industry') or 'their industry'
+
+        prompt = f"""Analyze this company as a B2B sales prospect and provide actionable insights:
+
+Company: {company}
+Website: {domain}
+Industry: {industry}
+
+Please provide response in JSON format:
+{{
+  "insights": ["Insight 1", "Insight 2", "Insight 3"],
+  "talking_points": ["Point 1", "Point 2", "Point 3"],
+  "recommended_approach": "Suggested outreach strategy",
+  "pain_points": ["Likely challenge 1", "Likely challenge 2"],
+  "value_propositions": ["How we can help 1", "How we can help 2"]
+}}
+
+Focus on actionable intelligence for B2B outreach to anyone at this company."""
+
+        messages = [
+            {"role": "system", "content": "You are a sales intelligence expert. Provide actionable insights for B2B outreach. Always respond with valid JSON."},
+            {"role": "user", "content": prompt}
+        ]
+
+        data = self._create_chat_completion_data(messages, temperature=0.6, max_tokens=600)
+        response = await self._make_request("chat/completions", data)
+        content = response["choices"][0]["message"]["content"]
+
+        try:
+            return json.loads(content)
+        except json.JSONDecodeError:
+            return {
+                "insights": [
+                    f"Focus on {industry}-specific challenges",
+                    f"Reference {company} growth opportunities"
+                ],
+                "talking_points": [
+                    f"Industry expertise in {industry}",
+                    "Proven ROI for similar companies",
+                    "Quick implementation timeline"
+                ],
+                "recommended_approach": f"Professional, consultative approach emphasizing {industry} expertise",
+                "pain_points": ["Market competition", "Operational efficiency", "Growth scaling"],
+                "value_propositions": ["Increased efficiency", "Competitive advantage", "Measurable ROI"]
+            }
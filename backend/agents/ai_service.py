@@ -36,6 +36,10 @@ class AIService:
     async def generate_lead_enrichment_insights(self, lead_data: Dict[str, Any]) -> Dict[str, Any]:
         """Generate personalized insights for lead enrichment"""
         return await self.lead_service.generate_lead_enrichment_insights(lead_data)
+
+    async def generate_company_insights(self, company_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate company-level insights shared by every lead at the company"""
+        return await self.lead_service.generate_company_insights(company_data)
     
     # Campaign optimization methods
     async def optimize_campaign_copy(self, campaign_data: Dict[str, Any]) -> Dict[str, Any]:
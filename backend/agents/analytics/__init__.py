@@ -0,0 +1,35 @@
+# Analytics engines package
+#
+# Exports are resolved on first access (PEP 562) so importing one engine, e.g.
+# the anomaly detector from campaign_agent, does not load pandas and pyarrow
+# for the Parquet store and aggregators.
+
+import importlib
+
+_EXPORTS = {
+    "MetricRingBuffer": "metric_history",
+    "MetricHistory": "metric_history",
+    "InsightCache": "insight_cache",
+    "StreamingAnomalyDetector": "anomaly_detector",
+    "seasonal_residual_zscores": "anomaly_detector",
+    "RankedStore": "ranked_store",
+    "ForecastEngine": "forecasting",
+    "FittedModel": "forecasting",
+    "ParquetMetricStore": "metric_store",
+    "PeriodAggregate": "period_aggregates",
+    "PeriodAggregator": "period_aggregates",
+    "metrics_frame": "campaign_health",
+    "summarize_campaign_health": "campaign_health"
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,156 @@
+from typing import Dict, Any, List, Optional, Sequence, Hashable
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class StreamingAnomalyDetector:
+    """Online anomaly detection over many series with O(1) updates.
+
+    Each series (a metric name, or a campaign/metric pair) owns a slot in
+    parallel NumPy arrays holding Welford running mean/M2 for lifetime
+    statistics and an exponentially weighted mean/variance as the recency-
+    weighted baseline. Every new value is scored against the EWMA baseline
+    *before* it is folded in, and the score is kept, so ``scan`` can flag
+    anomalies across thousands of series with a single vectorized mask.
+    """
+
+    _FIELDS = ("count", "mean", "m2", "ewma", "ewm_var", "last_value", "last_z", "last_baseline")
+
+    def __init__(self,
+                 z_threshold: float = 2.0,
+                 min_samples: int = 10,
+                 alpha: float = 0.2,
+                 initial_capacity: int = 64):
+        self.z_threshold = z_threshold
+        self.min_samples = min_samples
+        self.alpha = alpha
+        self._slots: Dict[Hashable, int] = {}
+        self._keys: List[Hashable] = []
+        self._allocate(initial_capacity)
+
+    def _allocate(self, capacity: int) -> None:
+        for name in self._FIELDS:
+            array = np.zeros(capacity, dtype=np.float64)
+            previous = getattr(self, name, None)
+            if previous is not None:
+                array[:len(previous)] = previous
+            setattr(self, name, array)
+
+    def _slot(self, key: Hashable) -> int:
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = len(self._keys)
+            if slot >= len(self.count):
+                self._allocate(len(self.count) * 2)
+            self._slots[key] = slot
+            self._keys.append(key)
+        return slot
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._slots
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def update(self, key: Hashable, value: float) -> float:
+        """Fold a new value into a series; returns its z-score against the prior baseline"""
+        return float(self.update_many([key], [value])[0])
+
+    def update_many(self, keys: Sequence[Hashable], values: Sequence[float]) -> np.ndarray:
+        """Vectorized update of many series at once (keys must be unique within a batch)"""
+        slots = np.fromiter((self._slot(key) for key in keys), dtype=np.int64, count=len(keys))
+        x = np.asarray(values, dtype=np.float64)
+        first = self.count[slots] == 0
+
+        # Score against the EWMA baseline before the new point is included
+        baseline = np.where(first, x, self.ewma[slots])
+        diff = x - baseline
+        std = np.sqrt(self.ewm_var[slots])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = np.where(std > 0, diff / std, np.where(diff == 0, 0.0, np.inf))
+        z[first] = 0.0
+
+        # Welford running mean / M2
+        count = self.count[slots] + 1
+        delta = x - self.mean[slots]
+        mean = self.mean[slots] + delta / count
+        self.m2[slots] += delta * (x - mean)
+        self.mean[slots] = mean
+        self.count[slots] = count
+
+        # Exponentially weighted mean / variance
+        increment = self.alpha * diff
+        self.ewma[slots] = baseline + increment
+        self.ewm_var[slots] = np.where(first, 0.0, (1 - self.alpha) * (self.ewm_var[slots] + diff * increment))
+
+        self.last_value[slots] = x
+        self.last_z[slots] = z
+        self.last_baseline[slots] = baseline
+        return z
+
+    def zscore(self, key: Hashable) -> Optional[float]:
+        slot = self._slots.get(key)
+        return None if slot is None else float(self.last_z[slot])
+
+    def stats(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        slot = self._slots.get(key)
+        if slot is None:
+            return None
+        count = self.count[slot]
+        return {
+            "count": int(count),
+            "mean": float(self.mean[slot]),
+            "std": float(np.sqrt(self.m2[slot] / count)) if count else 0.0,
+            "ewma": float(self.ewma[slot]),
+            "ewm_std": float(np.sqrt(self.ewm_var[slot])),
+            "last_value": float(self.last_value[slot]),
+            "last_z": float(self.last_z[slot])
+        }
+
+    def scan(self, z_threshold: float = None) -> List[Dict[str, Any]]:
+        """Series whose latest value deviates beyond the threshold, most extreme first"""
+        threshold = self.z_threshold if z_threshold is None else z_threshold
+        size = len(self._keys)
+        z = self.last_z[:size]
+        mask = (self.count[:size] >= self.min_samples) & (np.abs(z) > threshold)
+        flagged = np.flatnonzero(mask)
+        flagged = flagged[np.argsort(-np.abs(z[flagged]))]
+
+        return [
+            {
+                "key": self._keys[slot],
+                "value": float(self.last_value[slot]),
+                "baseline": float(self.last_baseline[slot]),
+                "z_score": float(z[slot]) if np.isfinite(z[slot]) else None
+            }
+            for slot in flagged
+        ]
+
+def seasonal_residual_zscores(values: np.ndarray, period: int) -> np.ndarray:
+    """Z-score of the latest point of each series after removing seasonality.
+
+    ``values`` is a 2-D array (series x time, oldest first) with at least two
+    full seasons. The expected latest value is the mean of the same phase in
+    earlier seasons; residuals of the earlier points against their own phase
+    means give the spread. All series are scored in one vectorized pass.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[np.newaxis, :]
+    seasons = values.shape[1] // period
+    if seasons < 2:
+        raise ValueError("need at least two full seasons of data")
+
+    # Align on the most recent full seasons: shape (series, seasons, period)
+    cube = values[:, -seasons * period:].reshape(values.shape[0], seasons, period)
+    history = cube[:, :-1, :]
+    phase_means = history.mean(axis=1)
+
+    residuals = history - phase_means[:, np.newaxis, :]
+    spread = residuals.reshape(values.shape[0], -1).std(axis=1)
+    latest_residual = values[:, -1] - phase_means[:, -1]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(spread > 0, latest_residual / spread, np.where(latest_residual == 0, 0.0, np.inf))
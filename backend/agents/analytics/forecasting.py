@@ -0,0 +1,179 @@
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+import logging
+
+import numpy as np
+
+from .metric_history import MetricHistory
+
+logger = logging.getLogger(__name__)
+
+FORECAST_METHODS = ("linear", "holt")
+
+@dataclass
+class FittedModel:
+    """Fitted trend parameters for one metric: value(h) = level + slope * h"""
+    level: float
+    slope: float
+    residual_std: float
+    n_points: int
+    version: int
+
+    def predict(self, days_ahead: int) -> np.ndarray:
+        return self.level + self.slope * np.arange(1, days_ahead + 1)
+
+def _stack_right_aligned(series: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Pad series of different lengths into a matrix aligned on their latest point"""
+    width = max(len(values) for values in series)
+    matrix = np.zeros((len(series), width), dtype=np.float64)
+    mask = np.zeros((len(series), width), dtype=bool)
+    for row, values in enumerate(series):
+        matrix[row, width - len(values):] = values
+        mask[row, width - len(values):] = True
+    return matrix, mask
+
+def fit_linear(series: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Ordinary least squares trend for many series at once.
+
+    Returns (level at the last point, slope, residual std) per series; padding
+    is masked out of every sum so series of different lengths share one pass.
+    """
+    y, mask = _stack_right_aligned(series)
+    n = mask.sum(axis=1).astype(np.float64)
+    # x counts 0..n-1 within each series, ending at the last column
+    x = np.where(mask, np.arange(y.shape[1]) - (y.shape[1] - n)[:, np.newaxis], 0.0)
+
+    sum_x = x.sum(axis=1)
+    sum_y = y.sum(axis=1)
+    sum_xx = (x * x).sum(axis=1)
+    sum_xy = (x * y).sum(axis=1)
+    denominator = n * sum_xx - sum_x ** 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(denominator != 0, (n * sum_xy - sum_x * sum_y) / denominator, 0.0)
+    intercept = (sum_y - slope * sum_x) / n
+
+    residuals = np.where(mask, y - (intercept[:, np.newaxis] + slope[:, np.newaxis] * x), 0.0)
+    residual_std = np.sqrt((residuals ** 2).sum(axis=1) / n)
+    return intercept + slope * (n - 1), slope, residual_std
+
+def fit_holt(series: List[np.ndarray], alpha: float = 0.5, beta: float = 0.3) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Holt's linear (double exponential) smoothing for many series at once.
+
+    Steps through time once, updating every series' level and trend with
+    vector operations; each series starts at its own first point.
+    """
+    y, mask = _stack_right_aligned(series)
+    rows, width = y.shape
+    level = np.zeros(rows)
+    trend = np.zeros(rows)
+    sq_errors = np.zeros(rows)
+    steps = np.zeros(rows)
+    started = np.zeros(rows, dtype=bool)
+
+    for t in range(width):
+        active = mask[:, t]
+        first = active & ~started
+        second = active & started & (steps == 0)
+        ongoing = active & started & (steps > 0)
+        value = y[:, t]
+
+        level[first] = value[first]
+
+        # Second point seeds the trend
+        trend[second] = value[second] - level[second]
+        level[second] = value[second]
+        steps[second] = 1
+
+        forecast = level + trend
+        error = value - forecast
+        new_level = alpha * value + (1 - alpha) * forecast
+        new_trend = beta * (new_level - level) + (1 - beta) * trend
+        level = np.where(ongoing, new_level, level)
+        trend = np.where(ongoing, new_trend, trend)
+        sq_errors[ongoing] += error[ongoing] ** 2
+        steps[ongoing] += 1
+        started |= first
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        residual_std = np.where(steps > 1, np.sqrt(sq_errors / np.maximum(steps - 1, 1)), 0.0)
+    return level, trend, residual_std
+
+class ForecastEngine:
+    """Batch forecaster over MetricHistory ring buffers.
+
+    Fitted parameters are cached per metric together with the buffer version
+    they were fitted on; a refresh refits only metrics whose buffers received
+    new points since, all in one vectorized batch.
+    """
+
+    def __init__(self,
+                 metric_history: MetricHistory,
+                 method: str = "linear",
+                 min_points: int = 7,
+                 alpha: float = 0.5,
+                 beta: float = 0.3):
+        if method not in FORECAST_METHODS:
+            raise ValueError(f"Unknown forecast method: {method}")
+        self.metric_history = metric_history
+        self.method = method
+        self.min_points = min_points
+        self.alpha = alpha
+        self.beta = beta
+        self._models: Dict[str, FittedModel] = {}
+        self.fits = 0
+
+    def refresh(self, metric_names: Iterable[str] = None) -> int:
+        """Refit stale metrics in one batch; returns how many were refitted"""
+        names = list(self.metric_history) if metric_names is None else list(metric_names)
+        stale = []
+        for name in names:
+            buffer = self.metric_history.get(name)
+            if buffer is None or len(buffer) < self.min_points:
+                self._models.pop(name, None)
+                continue
+            model = self._models.get(name)
+            if model is None or model.version != buffer.version:
+                stale.append((name, buffer))
+
+        if not stale:
+            return 0
+
+        series = [buffer.values() for _, buffer in stale]
+        if self.method == "holt":
+            levels, slopes, residual_stds = fit_holt(series, self.alpha, self.beta)
+        else:
+            levels, slopes, residual_stds = fit_linear(series)
+
+        for (name, buffer), values, level, slope, residual_std in zip(stale, series, levels, slopes, residual_stds):
+            self._models[name] = FittedModel(
+                level=float(level),
+                slope=float(slope),
+                residual_std=float(residual_std),
+                n_points=len(values),
+                version=buffer.version
+            )
+        self.fits += len(stale)
+        return len(stale)
+
+    def model(self, metric_name: str) -> Optional[FittedModel]:
+        self.refresh([metric_name])
+        return self._models.get(metric_name)
+
+    def forecast(self, metric_name: str, days_ahead: int = 30) -> Optional[Dict[str, Any]]:
+        model = self.model(metric_name)
+        return None if model is None else self._describe(metric_name, model, days_ahead)
+
+    def forecast_all(self, days_ahead: int = 30) -> Dict[str, Dict[str, Any]]:
+        """Forecasts for every metric with enough history"""
+        self.refresh()
+        return {name: self._describe(name, model, days_ahead) for name, model in self._models.items()}
+
+    def _describe(self, metric_name: str, model: FittedModel, days_ahead: int) -> Dict[str, Any]:
+        return {
+            "metric_name": metric_name,
+            "predictions": model.predict(days_ahead).tolist(),
+            "confidence_interval": 1.96 * model.residual_std,  # 95% confidence
+            "trend_slope": model.slope,
+            "method": self.method,
+            "data_points": model.n_points
+        }
@@ -0,0 +1,91 @@
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class MetricRingBuffer:
+    """Fixed-capacity history for one metric, stored as parallel NumPy arrays.
+
+    Values and timestamps (epoch seconds) live in preallocated arrays written
+    in a circular fashion, so memory stays constant once the buffer is full and
+    the oldest points are overwritten.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self._values = np.zeros(capacity, dtype=np.float64)
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._next = 0
+        self._size = 0
+        self.version = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, value: float, timestamp: datetime) -> None:
+        self._values[self._next] = value
+        self._timestamps[self._next] = timestamp.timestamp()
+        self._next = (self._next + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        self.version += 1
+
+    def _order(self, last: Optional[int]) -> np.ndarray:
+        count = self._size if last is None else min(last, self._size)
+        start = self._next - count
+        return np.arange(start, self._next) % self.capacity
+
+    def values(self, last: int = None) -> np.ndarray:
+        """Values in chronological order (optionally only the most recent ``last``)"""
+        return self._values[self._order(last)]
+
+    def timestamps(self, last: int = None) -> np.ndarray:
+        """Epoch-second timestamps in chronological order"""
+        return self._timestamps[self._order(last)]
+
+    def latest(self) -> Optional[Tuple[float, datetime]]:
+        if not self._size:
+            return None
+        index = (self._next - 1) % self.capacity
+        return float(self._values[index]), datetime.fromtimestamp(self._timestamps[index])
+
+    def points(self, last: int = None) -> List[Dict[str, Any]]:
+        """History as a list of {timestamp, value} dicts"""
+        return [
+            {"timestamp": datetime.fromtimestamp(ts).isoformat(), "value": float(value)}
+            for ts, value in zip(self.timestamps(last), self.values(last))
+        ]
+
+class MetricHistory:
+    """Per-metric ring buffers keyed by metric name"""
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self._buffers: Dict[str, MetricRingBuffer] = {}
+
+    def buffer(self, metric_name: str) -> MetricRingBuffer:
+        buffer = self._buffers.get(metric_name)
+        if buffer is None:
+            buffer = MetricRingBuffer(self.capacity)
+            self._buffers[metric_name] = buffer
+        return buffer
+
+    def record(self, metric_name: str, value: float, timestamp: datetime) -> None:
+        self.buffer(metric_name).append(value, timestamp)
+
+    def get(self, metric_name: str) -> Optional[MetricRingBuffer]:
+        return self._buffers.get(metric_name)
+
+    def __contains__(self, metric_name: str) -> bool:
+        return metric_name in self._buffers
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._buffers)
+
+    def __len__(self) -> int:
+        return len(self._buffers)
+
+    def items(self):
+        return self._buffers.items()
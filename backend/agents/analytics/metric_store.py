@@ -0,0 +1,190 @@
+import os
+import threading
+import uuid
+from datetime import datetime, date, time
+from typing import Dict, Any, List, Optional, Iterable, Union
+import logging
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+METRIC_SCHEMA = pa.schema([
+    ("metric_name", pa.string()),
+    ("campaign_id", pa.string()),
+    ("timestamp", pa.timestamp("us")),
+    ("value", pa.float64()),
+    ("date", pa.string())
+])
+
+PARTITION_COLUMNS = ["metric_name", "date"]
+
+PARTITIONING = ds.partitioning(
+    pa.schema([(name, pa.string()) for name in PARTITION_COLUMNS]),
+    flavor="hive"
+)
+
+def _day(value: Union[datetime, date, str]) -> str:
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return value[:10]
+
+class ParquetMetricStore:
+    """Append-only columnar store for metric time series.
+
+    Points are buffered and written as Parquet files under a hive layout
+    (``metric_name=<m>/date=<YYYY-MM-DD>/part-*.parquet``). Queries filter on
+    the partition columns, so a report over one quarter for a few metrics
+    only opens the directories for those metrics and days; campaign and exact
+    timestamp predicates are pushed down to the Parquet row groups. ``root``
+    may be a local path or any filesystem URI pyarrow understands.
+    """
+
+    def __init__(self, root: str, flush_rows: int = 1000):
+        self.root = root
+        self.flush_rows = flush_rows
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self.rows_written = 0
+        self.files_written = 0
+        if "://" not in root:
+            os.makedirs(root, exist_ok=True)
+
+    def append(self,
+               metric_name: str,
+               value: float,
+               timestamp: datetime,
+               campaign_id: str = None,
+               auto_flush: bool = True) -> None:
+        """Buffer one point; flushes automatically once ``flush_rows`` are pending.
+
+        Callers on an event loop pass ``auto_flush=False`` and run ``flush``
+        in a worker thread themselves (see ``needs_flush``).
+        """
+        with self._lock:
+            self._buffer.append({
+                "metric_name": metric_name,
+                "campaign_id": campaign_id,
+                "timestamp": timestamp,
+                "value": float(value),
+                "date": _day(timestamp)
+            })
+            should_flush = auto_flush and len(self._buffer) >= self.flush_rows
+        if should_flush:
+            self.flush()
+
+    def append_many(self, points: Iterable[Dict[str, Any]]) -> None:
+        """Buffer points given as dicts with metric_name, value, timestamp and optional campaign_id"""
+        for point in points:
+            self.append(point["metric_name"], point["value"], point["timestamp"], point.get("campaign_id"))
+
+    def flush(self) -> int:
+        """Write buffered points as new Parquet files; returns the number of rows written"""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+
+        table = pa.Table.from_pylist(rows, schema=METRIC_SCHEMA)
+        partitions = len({(row["metric_name"], row["date"]) for row in rows})
+        files_before = self.files_written
+
+        def visitor(written_file):
+            self.files_written += 1
+
+        pq.write_to_dataset(
+            table,
+            self.root,
+            partitioning=PARTITION_COLUMNS,
+            partitioning_flavor="hive",
+            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+            file_visitor=visitor,
+            max_partitions=max(1024, partitions)
+        )
+        self.rows_written += len(rows)
+        logger.info(f"Flushed {len(rows)} metric point(s) into {self.files_written - files_before} file(s)")
+        return len(rows)
+
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def needs_flush(self) -> bool:
+        return len(self._buffer) >= self.flush_rows
+
+    def _dataset(self) -> Optional[ds.Dataset]:
+        try:
+            return ds.dataset(self.root, format="parquet", partitioning=PARTITIONING)
+        except (FileNotFoundError, pa.ArrowInvalid):
+            return None
+
+    @staticmethod
+    def build_filter(metric_names: Iterable[str] = None,
+                     campaign_ids: Iterable[str] = None,
+                     start: datetime = None,
+                     end: datetime = None) -> Optional[ds.Expression]:
+        """Dataset expression for the given predicates (partition columns first)"""
+        predicates = []
+        if metric_names is not None:
+            predicates.append(ds.field("metric_name").isin(list(metric_names)))
+        if start is not None:
+            predicates.append(ds.field("date") >= _day(start))
+        if end is not None:
+            predicates.append(ds.field("date") <= _day(end))
+        if campaign_ids is not None:
+            predicates.append(ds.field("campaign_id").isin(list(campaign_ids)))
+        if isinstance(start, datetime):
+            predicates.append(ds.field("timestamp") >= pa.scalar(start, pa.timestamp("us")))
+        if isinstance(end, datetime):
+            predicates.append(ds.field("timestamp") <= pa.scalar(end, pa.timestamp("us")))
+        elif isinstance(end, date):
+            predicates.append(ds.field("timestamp") <= pa.scalar(datetime.combine(end, time.max), pa.timestamp("us")))
+
+        expression = None
+        for predicate in predicates:
+            expression = predicate if expression is None else expression & predicate
+        return expression
+
+    def query(self,
+              metric_names: Iterable[str] = None,
+              campaign_ids: Iterable[str] = None,
+              start: Union[datetime, date] = None,
+              end: Union[datetime, date] = None,
+              columns: List[str] = None) -> pd.DataFrame:
+        """Points matching the predicates, ordered by metric and timestamp"""
+        self.flush()
+        dataset = self._dataset()
+        columns = columns or ["metric_name", "campaign_id", "timestamp", "value"]
+        if dataset is None:
+            return pd.DataFrame(columns=columns)
+
+        table = dataset.to_table(
+            columns=columns,
+            filter=self.build_filter(metric_names, campaign_ids, start, end)
+        )
+        frame = table.to_pandas()
+        sort_columns = [name for name in ("metric_name", "timestamp") if name in frame.columns]
+        return frame.sort_values(sort_columns, ignore_index=True) if sort_columns else frame
+
+    def files_for(self,
+                  metric_names: Iterable[str] = None,
+                  start: Union[datetime, date] = None,
+                  end: Union[datetime, date] = None) -> List[str]:
+        """Files a query with these partition predicates would open"""
+        dataset = self._dataset()
+        if dataset is None:
+            return []
+        expression = self.build_filter(metric_names, None, start, end)
+        return [fragment.path for fragment in dataset.get_fragments(filter=expression)]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "root": self.root,
+            "rows_written": self.rows_written,
+            "files_written": self.files_written,
+            "pending": self.pending()
+        }
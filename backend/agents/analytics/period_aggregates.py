@@ -0,0 +1,176 @@
+from dataclasses import dataclass
+from datetime import datetime, date, timedelta
+from typing import Dict, Any, List, Optional, Callable, Iterable, Tuple, TYPE_CHECKING
+import logging
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class PeriodAggregate:
+    """Mergeable summary of the points of one metric over a period"""
+    count: int
+    total: float
+    minimum: float
+    maximum: float
+    first_value: float
+    first_at: datetime
+    last_value: float
+    last_at: datetime
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def merge(self, other: "PeriodAggregate") -> "PeriodAggregate":
+        first = self if self.first_at <= other.first_at else other
+        last = self if self.last_at >= other.last_at else other
+        return PeriodAggregate(
+            count=self.count + other.count,
+            total=self.total + other.total,
+            minimum=min(self.minimum, other.minimum),
+            maximum=max(self.maximum, other.maximum),
+            first_value=first.first_value,
+            first_at=first.first_at,
+            last_value=last.last_value,
+            last_at=last.last_at
+        )
+
+    @staticmethod
+    def combine(aggregates: Iterable[Optional["PeriodAggregate"]]) -> Optional["PeriodAggregate"]:
+        combined = None
+        for aggregate in aggregates:
+            if aggregate is not None:
+                combined = aggregate if combined is None else combined.merge(aggregate)
+        return combined
+
+class PeriodAggregator:
+    """Incremental daily/weekly rollups of metric points for period reports.
+
+    Raw points are only ever read once per closed day: a watermark records the
+    last day before today that has been aggregated, and each refresh loads
+    points after it (today stays open and is re-aggregated). Complete ISO weeks
+    of closed days are rolled up once and cached, so a weekly report combines
+    daily aggregates and monthly/quarterly reports combine cached weeks plus the
+    partial days at either edge.
+    """
+
+    def __init__(self, load_points: Callable[[datetime, datetime], "pd.DataFrame"]):
+        self.load_points = load_points
+        self._daily: Dict[str, Dict[date, PeriodAggregate]] = {}
+        self._weekly: Dict[Tuple[str, date], PeriodAggregate] = {}
+        self._loaded_from: Optional[date] = None
+        self._closed_through: Optional[date] = None
+        self.rows_aggregated = 0
+
+    def refresh(self, start: date, end: date, today: date = None) -> int:
+        """Aggregate raw points in [start, end] not seen yet; returns rows read"""
+        today = today or date.today()
+        ranges = []
+        if self._loaded_from is None:
+            ranges.append((start, end))
+        else:
+            if start < self._loaded_from:
+                ranges.append((start, self._loaded_from - timedelta(days=1)))
+            resume = self._closed_through + timedelta(days=1)
+            if resume <= end:
+                ranges.append((resume, end))
+
+        rows = 0
+        for range_start, range_end in ranges:
+            frame = self.load_points(
+                datetime.combine(range_start, datetime.min.time()),
+                datetime.combine(range_end, datetime.max.time())
+            )
+            rows += self._aggregate_days(frame)
+
+        self._loaded_from = start if self._loaded_from is None else min(self._loaded_from, start)
+        closed = min(end, today - timedelta(days=1))
+        if self._closed_through is None or closed > self._closed_through:
+            self._closed_through = closed
+        self.rows_aggregated += rows
+        return rows
+
+    def _aggregate_days(self, frame: "pd.DataFrame") -> int:
+        if frame is None or frame.empty:
+            return 0
+
+        import pandas as pd
+
+        frame = frame.sort_values("timestamp")
+        frame = frame.assign(day=frame["timestamp"].dt.date)
+        grouped = frame.groupby(["metric_name", "day"], observed=True, sort=False).agg(
+            count=("value", "size"),
+            total=("value", "sum"),
+            minimum=("value", "min"),
+            maximum=("value", "max"),
+            first_value=("value", "first"),
+            first_at=("timestamp", "first"),
+            last_value=("value", "last"),
+            last_at=("timestamp", "last")
+        )
+        for (metric_name, day), row in zip(grouped.index, grouped.itertuples(index=False)):
+            # Days are loaded whole, so an aggregate replaces any earlier one for that day
+            self._daily.setdefault(metric_name, {})[day] = PeriodAggregate(
+                count=int(row.count),
+                total=float(row.total),
+                minimum=float(row.minimum),
+                maximum=float(row.maximum),
+                first_value=float(row.first_value),
+                first_at=pd.Timestamp(row.first_at).to_pydatetime(),
+                last_value=float(row.last_value),
+                last_at=pd.Timestamp(row.last_at).to_pydatetime()
+            )
+        return len(frame)
+
+    def _week(self, metric_name: str, monday: date) -> Optional[PeriodAggregate]:
+        key = (metric_name, monday)
+        if key in self._weekly:
+            return self._weekly[key]
+
+        days = self._daily.get(metric_name, {})
+        week = PeriodAggregate.combine(days.get(monday + timedelta(days=offset)) for offset in range(7))
+        # Only weeks made entirely of closed days are final
+        if self._closed_through is not None and monday + timedelta(days=6) <= self._closed_through:
+            self._weekly[key] = week
+        return week
+
+    def aggregate(self, metric_name: str, start: date, end: date) -> Optional[PeriodAggregate]:
+        """Combine cached weeks and edge days covering [start, end]"""
+        days = self._daily.get(metric_name, {})
+        parts: List[Optional[PeriodAggregate]] = []
+        day = start
+        while day <= end:
+            if day.weekday() == 0 and day + timedelta(days=6) <= end:
+                parts.append(self._week(metric_name, day))
+                day += timedelta(days=7)
+            else:
+                parts.append(days.get(day))
+                day += timedelta(days=1)
+        return PeriodAggregate.combine(parts)
+
+    def period_aggregates(self,
+                          start: date,
+                          end: date,
+                          metric_names: Iterable[str] = None,
+                          today: date = None) -> Dict[str, PeriodAggregate]:
+        """Refresh with any new points, then aggregate each metric over the period"""
+        self.refresh(start, end, today)
+        names = self._daily.keys() if metric_names is None else metric_names
+        aggregates = {}
+        for metric_name in names:
+            aggregate = self.aggregate(metric_name, start, end)
+            if aggregate is not None:
+                aggregates[metric_name] = aggregate
+        return aggregates
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "metrics": len(self._daily),
+            "daily_aggregates": sum(len(days) for days in self._daily.values()),
+            "weekly_aggregates": len(self._weekly),
+            "rows_aggregated": self.rows_aggregated,
+            "closed_through": self._closed_through.isoformat() if self._closed_through else None
+        }
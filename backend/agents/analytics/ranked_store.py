@@ -0,0 +1,107 @@
+from bisect import bisect_left, insort
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Callable, Hashable, Iterator, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+class RankedStore(MutableMapping):
+    """Dict-like store that keeps sorted indexes for top-K reads.
+
+    Each named index maps items to a sort key and is kept as a sorted list of
+    (key, item_id), both across the whole store and per partition (e.g. per
+    insight level), so "newest 10" or "highest impact 20 at level X" is a
+    slice instead of a full sort. The ``retention_index`` (a timestamp key)
+    drives the retention policy: items beyond ``max_items`` or older than
+    ``max_age`` are evicted oldest-first on every write.
+    """
+
+    def __init__(self,
+                 indexes: Dict[str, Callable[[Any], Any]],
+                 retention_index: str,
+                 partition: Callable[[Any], Hashable] = None,
+                 max_items: int = None,
+                 max_age: timedelta = None):
+        self.index_keys = indexes
+        self.retention_index = retention_index
+        self.partition = partition
+        self.max_items = max_items
+        self.max_age = max_age
+        self.version = 0
+        self.evictions = 0
+        self._items: Dict[str, Any] = {}
+        self._sort_keys: Dict[str, Dict[str, Any]] = {}
+        self._partitions: Dict[str, Hashable] = {}
+        self._indexes: Dict[str, Dict[Hashable, List[Tuple[Any, str]]]] = {name: {None: []} for name in indexes}
+
+    def __getitem__(self, item_id: str) -> Any:
+        return self._items[item_id]
+
+    def __setitem__(self, item_id: str, item: Any) -> None:
+        if item_id in self._items:
+            self._unindex(item_id)
+
+        self._items[item_id] = item
+        self._sort_keys[item_id] = {name: key(item) for name, key in self.index_keys.items()}
+        group = self.partition(item) if self.partition else None
+        self._partitions[item_id] = group
+        for name, sort_key in self._sort_keys[item_id].items():
+            entry = (sort_key, item_id)
+            insort(self._indexes[name][None], entry)
+            if group is not None:
+                insort(self._indexes[name].setdefault(group, []), entry)
+
+        self.version += 1
+        self._apply_retention()
+
+    def __delitem__(self, item_id: str) -> None:
+        self._unindex(item_id)
+        del self._items[item_id]
+        self.version += 1
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _unindex(self, item_id: str) -> None:
+        group = self._partitions.pop(item_id)
+        for name, sort_key in self._sort_keys.pop(item_id).items():
+            entry = (sort_key, item_id)
+            indexes = [self._indexes[name][None]]
+            if group is not None:
+                indexes.append(self._indexes[name][group])
+            for index in indexes:
+                position = bisect_left(index, entry)
+                if position < len(index) and index[position] == entry:
+                    del index[position]
+
+    def _apply_retention(self) -> None:
+        oldest = self._indexes[self.retention_index][None]
+        cutoff = datetime.now() - self.max_age if self.max_age else None
+        while oldest and (
+            (self.max_items is not None and len(self._items) > self.max_items)
+            or (cutoff is not None and oldest[0][0] < cutoff)
+        ):
+            del self[oldest[0][1]]
+            self.evictions += 1
+
+    def top(self, index: str, k: int, partition: Hashable = None) -> List[Any]:
+        """Items with the largest keys in ``index``, optionally within one partition"""
+        entries = self._indexes[index].get(partition, [])
+        return [self._items[item_id] for _, item_id in reversed(entries[-k:])] if k > 0 else []
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "items": len(self._items),
+            "max_items": self.max_items,
+            "max_age_seconds": self.max_age.total_seconds() if self.max_age else None,
+            "evictions": self.evictions,
+            "partitions": {
+                str(group): len(entries)
+                for group, entries in self._indexes[self.retention_index].items()
+                if group is not None
+            }
+        }
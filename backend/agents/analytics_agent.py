@@ -1,13 +1,22 @@
 import asyncio
 import json
 import logging
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Tuple, TYPE_CHECKING
 from dataclasses import dataclass, asdict
 from enum import Enum
-import pandas as pd
 import numpy as np
 from openai import AsyncOpenAI
+from .analytics.metric_history import MetricHistory
+from .analytics.insight_cache import InsightCache
+from .analytics.anomaly_detector import StreamingAnomalyDetector
+from .analytics.ranked_store import RankedStore
+from .analytics.forecasting import ForecastEngine
+from .analytics.period_aggregates import PeriodAggregator
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +36,14 @@ class ReportType(Enum):
     QUARTERLY = "quarterly"
     CUSTOM = "custom"
 
+# Look-back window for each scheduled report type
+REPORT_PERIODS = {
+    ReportType.DAILY: timedelta(days=1),
+    ReportType.WEEKLY: timedelta(days=7),
+    ReportType.MONTHLY: timedelta(days=30),
+    ReportType.QUARTERLY: timedelta(days=90)
+}
+
 class InsightLevel(Enum):
     CRITICAL = "critical"
     HIGH = "high"
@@ -66,52 +83,221 @@ class Report:
     recommendations: List[str]
     created_at: datetime
     executive_summary: str = ""
+    generation_stats: Dict[str, Any] = None
 
 class AnalyticsAgent:
-    def __init__(self, openai_api_key: str, supabase_client=None):
+    def __init__(self,
+                 openai_api_key: str,
+                 supabase_client=None,
+                 history_capacity: int = 1000,
+                 max_concurrent_llm_calls: int = 5,
+                 max_insights: int = 5000,
+                 insight_retention_days: int = 90,
+                 max_reports: int = 500,
+                 dashboard_ttl_seconds: float = 60,
+                 forecast_method: str = "linear",
+                 metric_store=None):
         self.openai_client = AsyncOpenAI(api_key=openai_api_key)
         self.supabase = supabase_client
-        self.reports_store: Dict[str, Report] = {}
-        self.insights_store: Dict[str, Insight] = {}
-        self.metric_history: Dict[str, List[MetricData]] = {}
+        # Stores keep sorted indexes so dashboard/list reads are top-K slices,
+        # and evict oldest-first under the retention policy
+        self.reports_store = RankedStore(
+            indexes={"created_at": lambda r: r.created_at},
+            retention_index="created_at",
+            partition=lambda r: r.report_type,
+            max_items=max_reports
+        )
+        self.insights_store = RankedStore(
+            indexes={
+                "timestamp": lambda i: i.timestamp,
+                "impact": lambda i: (i.impact_score, i.timestamp)
+            },
+            retention_index="timestamp",
+            partition=lambda i: i.level,
+            max_items=max_insights,
+            max_age=timedelta(days=insight_retention_days)
+        )
+        self.dashboard_ttl_seconds = dashboard_ttl_seconds
+        self._dashboard_cache: Optional[Tuple[Tuple[int, int, int], float, Dict[str, Any]]] = None
+        self._metrics_version = 0
+        # Fixed-capacity ring buffers (values + timestamps) per metric
+        self.metric_history = MetricHistory(capacity=history_capacity)
+        
+        # Bounded LLM fan-out and reuse of insights for unchanged inputs
+        self.llm_semaphore = asyncio.Semaphore(max_concurrent_llm_calls)
+        self.insight_cache = InsightCache()
+        self.last_insight_stats: Dict[str, Any] = {}
+        
+        # Online mean/variance per metric, updated as each point is recorded
+        self.anomaly_detector = StreamingAnomalyDetector()
+        
+        # Batch forecaster over the ring buffers; fits are cached per buffer version
+        self.forecast_engine = ForecastEngine(self.metric_history, method=forecast_method)
+        self.prediction_analyses: Dict[str, asyncio.Task] = {}
+        
+        # Optional durable columnar history (ParquetMetricStore)
+        self.metric_store = metric_store
+        self.period_aggregator = PeriodAggregator(self._load_metric_points)
+        self._aggregation_lock = asyncio.Lock()
         
     async def collect_all_metrics(self, 
                                 campaign_agent=None,
                                 lead_agent=None,
                                 content_agent=None,
                                 social_agent=None) -> Dict[str, MetricData]:
-        """Collect metrics from all agents"""
-        
-        all_metrics = {}
+        """Collect metrics from all agents concurrently"""
         
-        # Campaign metrics
+        collectors = []
         if campaign_agent:
-            campaign_metrics = await self._collect_campaign_metrics(campaign_agent)
-            all_metrics.update(campaign_metrics)
-        
-        # Lead generation metrics
+            collectors.append(("campaign", self._collect_campaign_metrics(campaign_agent)))
         if lead_agent:
-            lead_metrics = await self._collect_lead_metrics(lead_agent)
-            all_metrics.update(lead_metrics)
-        
-        # Content metrics
+            collectors.append(("lead", self._collect_lead_metrics(lead_agent)))
         if content_agent:
-            content_metrics = await self._collect_content_metrics(content_agent)
-            all_metrics.update(content_metrics)
-        
-        # Social media metrics
+            collectors.append(("content", self._collect_content_metrics(content_agent)))
         if social_agent:
-            social_metrics = await self._collect_social_metrics(social_agent)
-            all_metrics.update(social_metrics)
+            collectors.append(("social", self._collect_social_metrics(social_agent)))
         
-        # Store metric history
-        for metric_name, metric_data in all_metrics.items():
-            if metric_name not in self.metric_history:
-                self.metric_history[metric_name] = []
-            self.metric_history[metric_name].append(metric_data)
+        results = await asyncio.gather(*(coro for _, coro in collectors), return_exceptions=True)
+        
+        all_metrics = {}
+        for (source, _), result in zip(collectors, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error collecting {source} metrics: {str(result)}")
+                continue
+            all_metrics.update(result)
+        
+        # Compare against the previous point, then store in metric history
+        self._apply_history(all_metrics)
+        if self.metric_store is not None and self.metric_store.needs_flush():
+            # Parquet writes are blocking file I/O; keep them off the event loop
+            await asyncio.to_thread(self.metric_store.flush)
         
         return all_metrics
 
+    def _apply_history(self, metrics: Dict[str, MetricData]) -> None:
+        """Fill previous_value/change_percent from history and record the new points"""
+        for metric_name, metric_data in metrics.items():
+            buffer = self.metric_history.get(metric_name)
+            latest = buffer.latest() if buffer is not None else None
+            if latest is not None:
+                previous_value = latest[0]
+                metric_data.previous_value = previous_value
+                metric_data.change_percent = (
+                    (metric_data.value - previous_value) / abs(previous_value) * 100
+                    if previous_value else 0
+                )
+            
+            self.metric_history.record(metric_name, metric_data.value, metric_data.timestamp)
+            self.anomaly_detector.update(metric_name, metric_data.value)
+            if self.metric_store is not None:
+                self.metric_store.append(
+                    metric_name,
+                    metric_data.value,
+                    metric_data.timestamp,
+                    campaign_id=(metric_data.metadata or {}).get("campaign_id"),
+                    auto_flush=False
+                )
+        self._metrics_version += 1
+
+    async def query_metric_history(self,
+                                   period_start: datetime,
+                                   period_end: datetime,
+                                   metric_names: List[str] = None,
+                                   campaign_ids: List[str] = None) -> "pd.DataFrame":
+        """Read stored metric points for a period, scanning only the matching partitions"""
+        if self.metric_store is None:
+            import pandas as pd
+            return pd.DataFrame(columns=["metric_name", "campaign_id", "timestamp", "value"])
+        
+        return await asyncio.to_thread(
+            self.metric_store.query,
+            metric_names=metric_names,
+            campaign_ids=campaign_ids,
+            start=period_start,
+            end=period_end
+        )
+
+    def _load_metric_points(self, start: datetime, end: datetime) -> "pd.DataFrame":
+        """Raw points in [start, end] from the columnar store, or the ring buffers without one"""
+        if self.metric_store is not None:
+            return self.metric_store.query(start=start, end=end)
+        
+        import pandas as pd
+        frames = []
+        start_ts, end_ts = start.timestamp(), end.timestamp()
+        for metric_name, history in self.metric_history.items():
+            timestamps = history.timestamps()
+            in_range = (timestamps >= start_ts) & (timestamps <= end_ts)
+            if in_range.any():
+                frames.append(pd.DataFrame({
+                    "metric_name": metric_name,
+                    "timestamp": pd.to_datetime([datetime.fromtimestamp(ts) for ts in timestamps[in_range]]),
+                    "value": history.values()[in_range]
+                }))
+        if not frames:
+            return pd.DataFrame(columns=["metric_name", "timestamp", "value"])
+        return pd.concat(frames, ignore_index=True)
+
+    async def metrics_for_period(self,
+                                 report_type: ReportType,
+                                 period_end: datetime = None,
+                                 metric_names: List[str] = None,
+                                 campaign_ids: List[str] = None) -> Dict[str, MetricData]:
+        """Build report metrics (latest value vs first value) for the whole days of a report period
+        
+        Periods are assembled from incremental daily/weekly aggregates; filtering
+        by campaign reads the matching raw points instead.
+        """
+        period_end = period_end or datetime.now()
+        period_start = period_end - REPORT_PERIODS.get(report_type, timedelta(days=30))
+        
+        if campaign_ids is not None:
+            frame = await self.query_metric_history(period_start, period_end, metric_names, campaign_ids)
+            aggregates = PeriodAggregator(lambda start, end: frame).period_aggregates(
+                period_start.date(), period_end.date(), metric_names
+            )
+        else:
+            async with self._aggregation_lock:
+                aggregates = await asyncio.to_thread(
+                    self.period_aggregator.period_aggregates,
+                    period_start.date(),
+                    period_end.date(),
+                    metric_names
+                )
+        
+        metrics = {}
+        for metric_name, aggregate in aggregates.items():
+            previous_value = aggregate.first_value
+            metrics[metric_name] = MetricData(
+                metric_name=metric_name,
+                value=aggregate.last_value,
+                previous_value=previous_value,
+                change_percent=(aggregate.last_value - previous_value) / abs(previous_value) * 100 if previous_value else 0,
+                timestamp=aggregate.last_at,
+                metadata={
+                    "period_start": period_start.isoformat(),
+                    "data_points": aggregate.count,
+                    "mean": aggregate.mean,
+                    "min": aggregate.minimum,
+                    "max": aggregate.maximum
+                }
+            )
+        return metrics
+
+    async def create_period_report(self,
+                                   report_type: ReportType,
+                                   period_end: datetime = None,
+                                   metric_names: List[str] = None) -> Report:
+        """Create a scheduled report from incremental period aggregates
+        
+        Only sections whose inputs changed since an earlier report go back to
+        the LLM; the rest are served from the insight cache.
+        """
+        period_end = period_end or datetime.now()
+        period_start = period_end - REPORT_PERIODS.get(report_type, timedelta(days=30))
+        metrics = await self.metrics_for_period(report_type, period_end, metric_names)
+        return await self.create_report(report_type, period_start, period_end, metrics)
+
     async def _collect_campaign_metrics(self, campaign_agent) -> Dict[str, MetricData]:
         """Collect metrics from campaign agent"""
         metrics = {}
@@ -128,7 +314,7 @@ class AnalyticsAgent:
             metrics["active_campaigns"] = MetricData(
                 metric_name="active_campaigns",
                 value=len(active_campaigns),
-                previous_value=0,  # Would calculate from history
+                previous_value=0,  # Filled from history by collect_all_metrics
                 change_percent=0,
                 timestamp=datetime.now()
             )
@@ -338,34 +524,77 @@ class AnalyticsAgent:
     async def generate_insights(self, metrics: Dict[str, MetricData]) -> List[Insight]:
         """Generate AI-powered insights from metrics"""
         
-        insights = []
+        started = time.perf_counter()
+        hits_before, misses_before = self.insight_cache.hits, self.insight_cache.misses
         
-        # Analyze each metric for trends and anomalies
-        for metric_name, metric_data in metrics.items():
-            insight = await self._analyze_metric_for_insights(metric_name, metric_data)
+        # Analyze each metric and the cross-metric relationships concurrently;
+        # the semaphore bounds how many LLM calls are in flight
+        metric_tasks = [
+            self._analyze_metric_for_insights(metric_name, metric_data)
+            for metric_name, metric_data in metrics.items()
+        ]
+        *metric_insights, cross_insights = await asyncio.gather(
+            *metric_tasks, self._generate_cross_metric_insights(metrics)
+        )
+        
+        insights = []
+        for insight in metric_insights:
             if insight:
                 insights.append(insight)
                 self.insights_store[insight.id] = insight
-        
-        # Generate cross-metric insights
-        cross_insights = await self._generate_cross_metric_insights(metrics)
         insights.extend(cross_insights)
         
         # Sort by impact score
         insights.sort(key=lambda x: x.impact_score, reverse=True)
         
+        cache_hits = self.insight_cache.hits - hits_before
+        cache_misses = self.insight_cache.misses - misses_before
+        self.last_insight_stats = {
+            "metrics_analyzed": len(metrics),
+            "insights_generated": len(insights),
+            "cache_hits": cache_hits,
+            "cache_misses": cache_misses,
+            "cache_hit_rate": round(cache_hits / (cache_hits + cache_misses), 4) if cache_hits + cache_misses else 0.0,
+            "wall_time_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+        logger.info(f"Generated {len(insights)} insights: {self.last_insight_stats}")
+        
         return insights
 
+    async def _cached_llm_response(self,
+                                   cache_key: str,
+                                   messages: List[Dict[str, str]],
+                                   temperature: float,
+                                   max_tokens: int,
+                                   parse_json: bool = True) -> Any:
+        """Return a cached response, or call the LLM under the semaphore and cache it"""
+        cached = self.insight_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        async with self.llm_semaphore:
+            response = await self.openai_client.chat.completions.create(
+                model="gpt-4",
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+        
+        content = response.choices[0].message.content
+        parsed = json.loads(content) if parse_json else content.strip()
+        self.insight_cache.put(cache_key, parsed)
+        return parsed
+
     async def _analyze_metric_for_insights(self, metric_name: str, metric_data: MetricData) -> Optional[Insight]:
         """Analyze individual metric for insights"""
         
         # Get historical data for trend analysis
-        history = self.metric_history.get(metric_name, [])
-        if len(history) < 2:
+        history = self.metric_history.get(metric_name)
+        if history is None or len(history) < 2:
             return None  # Need at least 2 data points for comparison
         
         # Calculate trend
-        recent_values = [h.value for h in history[-5:]]  # Last 5 data points
+        recent_values = history.values(5)  # Last 5 data points
         trend = np.polyfit(range(len(recent_values)), recent_values, 1)[0]
         
         # Determine significance
@@ -395,10 +624,19 @@ class AnalyticsAgent:
         }}
         """
         
+        cache_key = self.insight_cache.make_key(
+            "metric",
+            metric_name,
+            round(float(metric_data.value), 2),
+            round(float(metric_data.previous_value), 2),
+            round(float(metric_data.change_percent), 1),
+            "increasing" if trend > 0 else "decreasing"
+        )
+        
         try:
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[
+            insight_data = await self._cached_llm_response(
+                cache_key,
+                [
                     {"role": "system", "content": "You are a marketing analytics expert. Always respond with valid JSON."},
                     {"role": "user", "content": insight_prompt}
                 ],
@@ -406,8 +644,6 @@ class AnalyticsAgent:
                 max_tokens=500
             )
             
-            insight_data = json.loads(response.choices[0].message.content)
-            
             insight = Insight(
                 id=f"insight_{metric_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
                 level=InsightLevel(insight_data["level"]),
@@ -457,10 +693,15 @@ class AnalyticsAgent:
         ]
         """
         
+        cache_key = self.insight_cache.make_key(
+            "cross_metric",
+            sorted((name, round(float(m.value), 2), round(float(m.change_percent), 1)) for name, m in metrics.items())
+        )
+        
         try:
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[
+            insights_data = await self._cached_llm_response(
+                cache_key,
+                [
                     {"role": "system", "content": "You are a marketing analytics expert specializing in cross-metric analysis."},
                     {"role": "user", "content": correlation_prompt}
                 ],
@@ -468,8 +709,6 @@ class AnalyticsAgent:
                 max_tokens=1000
             )
             
-            insights_data = json.loads(response.choices[0].message.content)
-            
             for insight_data in insights_data:
                 insight = Insight(
                     id=f"cross_insight_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{len(insights)}",
@@ -498,9 +737,13 @@ class AnalyticsAgent:
         """Create comprehensive analytics report"""
         
         report_id = f"report_{report_type.value}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        started = time.perf_counter()
+        hits_before, misses_before = self.insight_cache.hits, self.insight_cache.misses
         
+        insight_stats = None
         if insights is None:
             insights = await self.generate_insights(metrics)
+            insight_stats = dict(self.last_insight_stats)
         
         # Generate executive summary
         executive_summary = await self._generate_executive_summary(metrics, insights, report_type)
@@ -518,7 +761,13 @@ class AnalyticsAgent:
             insights=insights,
             recommendations=recommendations,
             created_at=datetime.now(),
-            executive_summary=executive_summary
+            executive_summary=executive_summary,
+            generation_stats={
+                "insights": insight_stats,
+                "llm_sections_reused": self.insight_cache.hits - hits_before,
+                "llm_sections_generated": self.insight_cache.misses - misses_before,
+                "wall_time_ms": round((time.perf_counter() - started) * 1000, 2)
+            }
         )
         
         self.reports_store[report_id] = report
@@ -562,23 +811,38 @@ class AnalyticsAgent:
         Keep it professional, data-driven, and actionable.
         """
         
+        # Unchanged key metrics and insights reuse the earlier summary
+        cache_key = self.insight_cache.make_key(
+            "executive_summary",
+            report_type.value,
+            self._rounded_metrics(key_metrics),
+            top_insights
+        )
+        
         try:
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[
+            return await self._cached_llm_response(
+                cache_key,
+                [
                     {"role": "system", "content": "You are a marketing analytics executive reporting to senior leadership."},
                     {"role": "user", "content": summary_prompt}
                 ],
                 temperature=0.5,
-                max_tokens=500
+                max_tokens=500,
+                parse_json=False
             )
             
-            return response.choices[0].message.content.strip()
-            
         except Exception as e:
             logger.error(f"Error generating executive summary: {str(e)}")
             return "Executive summary generation failed. Please review metrics and insights manually."
 
+    @staticmethod
+    def _rounded_metrics(metrics: Dict[str, Dict[str, float]]) -> List[Any]:
+        """Stable, rounded view of metric values for LLM cache keys"""
+        return sorted(
+            (name, round(float(m["value"]), 2), round(float(m["change"]), 1))
+            for name, m in metrics.items()
+        )
+
     async def _generate_recommendations(self, 
                                       metrics: Dict[str, MetricData], 
                                       insights: List[Insight]) -> List[str]:
@@ -608,10 +872,16 @@ class AnalyticsAgent:
         Format as JSON array: ["recommendation1", "recommendation2", ...]
         """
         
+        cache_key = self.insight_cache.make_key(
+            "recommendations",
+            self._rounded_metrics({name: {"value": m.value, "change": m.change_percent} for name, m in metrics.items()}),
+            all_recommendations
+        )
+        
         try:
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[
+            return await self._cached_llm_response(
+                cache_key,
+                [
                     {"role": "system", "content": "You are a senior marketing strategist providing executive recommendations."},
                     {"role": "user", "content": strategic_prompt}
                 ],
@@ -619,47 +889,60 @@ class AnalyticsAgent:
                 max_tokens=800
             )
             
-            recommendations = json.loads(response.choices[0].message.content)
-            return recommendations
-            
         except Exception as e:
             logger.error(f"Error generating recommendations: {str(e)}")
             return ["Review performance metrics and develop improvement strategies"]
 
     async def predict_performance(self, 
                                 metric_name: str, 
-                                days_ahead: int = 30) -> Dict[str, Any]:
-        """Predict future performance using historical data"""
+                                days_ahead: int = 30,
+                                include_analysis: bool = False) -> Dict[str, Any]:
+        """Predict future performance using historical data
+        
+        The forecast comes from the batch forecasting engine. LLM commentary is
+        opt-in and runs in the background; fetch it with get_prediction_analysis.
+        """
         
-        history = self.metric_history.get(metric_name, [])
-        if len(history) < 7:  # Need at least a week of data
+        forecast = self.forecast_engine.forecast(metric_name, days_ahead)
+        if forecast is None:  # Need at least a week of data
             return {"error": "Insufficient historical data for prediction"}
         
-        # Prepare time series data
-        values = [h.value for h in history]
-        timestamps = [h.timestamp for h in history]
+        forecast["prediction_dates"] = [(datetime.now() + timedelta(days=i)).isoformat() 
+                                        for i in range(1, days_ahead + 1)]
         
-        # Simple linear regression for trend prediction
-        x = np.arange(len(values))
-        coefficients = np.polyfit(x, values, 1)
-        trend_line = np.poly1d(coefficients)
+        if include_analysis:
+            task = self.prediction_analyses.get(metric_name)
+            if task is None or task.done():
+                self.prediction_analyses[metric_name] = asyncio.create_task(
+                    self._generate_prediction_analysis(metric_name, forecast)
+                )
+            forecast["analysis_status"] = "pending"
         
-        # Predict future values
-        future_x = np.arange(len(values), len(values) + days_ahead)
-        predictions = trend_line(future_x)
+        return forecast
+
+    async def predict_all_metrics(self, days_ahead: int = 30) -> Dict[str, Dict[str, Any]]:
+        """Forecast every metric with enough history in one batch"""
+        return self.forecast_engine.forecast_all(days_ahead)
+
+    async def get_prediction_analysis(self, metric_name: str) -> Optional[Dict[str, Any]]:
+        """Wait for and return the background commentary for a metric's latest forecast"""
+        task = self.prediction_analyses.get(metric_name)
+        if task is None:
+            return None
+        return await task
+
+    async def _generate_prediction_analysis(self, metric_name: str, forecast: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Generate LLM commentary for a forecast"""
         
-        # Calculate confidence intervals (simplified)
-        residuals = values - trend_line(x)
-        std_error = np.std(residuals)
-        confidence_interval = 1.96 * std_error  # 95% confidence
+        values = self.metric_history.get(metric_name).values(10)
+        predictions = forecast["predictions"][:7]
         
-        # Generate prediction insights
         prediction_prompt = f"""
         Analyze this performance prediction for {metric_name}:
         
-        Historical Values: {values[-10:]}  # Last 10 values
-        Predicted Values: {predictions[:7].tolist()}  # Next 7 days
-        Trend: {'increasing' if coefficients[0] > 0 else 'decreasing'}
+        Historical Values: {values.tolist()}  # Last 10 values
+        Predicted Values: {predictions}  # Next 7 days
+        Trend: {'increasing' if forecast["trend_slope"] > 0 else 'decreasing'}
         
         Provide insights about:
         1. Prediction confidence
@@ -674,62 +957,50 @@ class AnalyticsAgent:
         }}
         """
         
+        cache_key = self.insight_cache.make_key(
+            "prediction",
+            metric_name,
+            [round(float(v), 2) for v in values],
+            [round(float(v), 2) for v in predictions]
+        )
+        
         try:
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[
+            return await self._cached_llm_response(
+                cache_key,
+                [
                     {"role": "system", "content": "You are a predictive analytics expert."},
                     {"role": "user", "content": prediction_prompt}
                 ],
                 temperature=0.3,
                 max_tokens=400
             )
-            
-            analysis = json.loads(response.choices[0].message.content)
-            
-            return {
-                "metric_name": metric_name,
-                "predictions": predictions.tolist(),
-                "confidence_interval": confidence_interval,
-                "trend_slope": coefficients[0],
-                "analysis": analysis,
-                "prediction_dates": [(datetime.now() + timedelta(days=i)).isoformat() 
-                                   for i in range(1, days_ahead + 1)]
-            }
-            
         except Exception as e:
             logger.error(f"Error generating prediction analysis: {str(e)}")
-            return {
-                "metric_name": metric_name,
-                "predictions": predictions.tolist(),
-                "confidence_interval": confidence_interval,
-                "trend_slope": coefficients[0]
-            }
+            return None
 
     async def create_dashboard_data(self) -> Dict[str, Any]:
         """Create comprehensive dashboard data"""
         
+        # Reuse the assembled payload until insights, reports or metrics change
+        cache_token = (self.insights_store.version, self.reports_store.version, self._metrics_version)
+        if self._dashboard_cache is not None:
+            token, built_at, payload = self._dashboard_cache
+            if token == cache_token and time.monotonic() - built_at < self.dashboard_ttl_seconds:
+                return payload
+        
         # Collect latest metrics from all agents (would need agent references)
         current_metrics = {}  # Placeholder
         
         # Get recent insights
-        recent_insights = sorted(
-            [i for i in self.insights_store.values()],
-            key=lambda x: x.timestamp,
-            reverse=True
-        )[:10]
+        recent_insights = self.insights_store.top("timestamp", 10)
         
         # Get latest reports
-        recent_reports = sorted(
-            [r for r in self.reports_store.values()],
-            key=lambda x: x.created_at,
-            reverse=True
-        )[:5]
+        recent_reports = self.reports_store.top("created_at", 5)
         
         # Calculate KPI summaries
         kpi_summary = await self._calculate_kpi_summary(current_metrics)
         
-        return {
+        payload = {
             "kpi_summary": kpi_summary,
             "recent_insights": [
                 {
@@ -753,6 +1024,9 @@ class AnalyticsAgent:
             "metric_trends": await self._get_metric_trends(),
             "alerts": await self._get_performance_alerts()
         }
+        self._dashboard_cache = (cache_token, time.monotonic(), payload)
+        
+        return payload
 
     async def _calculate_kpi_summary(self, metrics: Dict[str, MetricData]) -> Dict[str, Any]:
         """Calculate high-level KPI summary"""
@@ -791,14 +1065,7 @@ class AnalyticsAgent:
         
         for metric_name, history in self.metric_history.items():
             if len(history) >= 7:  # At least a week of data
-                recent_history = history[-30:]  # Last 30 data points
-                trends[metric_name] = [
-                    {
-                        "timestamp": h.timestamp.isoformat(),
-                        "value": h.value
-                    }
-                    for h in recent_history
-                ]
+                trends[metric_name] = history.points(30)  # Last 30 data points
         
         return trends
 
@@ -807,9 +1074,8 @@ class AnalyticsAgent:
         
         alerts = []
         
-        # Check for critical insights
-        critical_insights = [i for i in self.insights_store.values() 
-                           if i.level == InsightLevel.CRITICAL]
+        # Check for critical insights (newest first)
+        critical_insights = self.insights_store.top("timestamp", 10, partition=InsightLevel.CRITICAL)
         
         for insight in critical_insights:
             alerts.append({
@@ -819,22 +1085,16 @@ class AnalyticsAgent:
                 "timestamp": insight.timestamp.isoformat()
             })
         
-        # Check for metric anomalies
-        for metric_name, history in self.metric_history.items():
-            if len(history) >= 10:
-                recent_values = [h.value for h in history[-10:]]
-                latest_value = recent_values[-1]
-                avg_value = np.mean(recent_values[:-1])
-                std_value = np.std(recent_values[:-1])
-                
-                # Check for anomalies (value beyond 2 standard deviations)
-                if abs(latest_value - avg_value) > 2 * std_value:
-                    alerts.append({
-                        "type": "anomaly",
-                        "title": f"Anomaly detected in {metric_name}",
-                        "description": f"Latest value ({latest_value:.2f}) significantly differs from recent average ({avg_value:.2f})",
-                        "timestamp": datetime.now().isoformat()
-                    })
+        # Check for metric anomalies (latest value beyond 2 standard deviations
+        # of the running baseline)
+        for anomaly in self.anomaly_detector.scan():
+            alerts.append({
+                "type": "anomaly",
+                "title": f"Anomaly detected in {anomaly['key']}",
+                "description": f"Latest value ({anomaly['value']:.2f}) significantly differs from recent average ({anomaly['baseline']:.2f})",
+                "z_score": anomaly["z_score"],
+                "timestamp": datetime.now().isoformat()
+            })
         
         return alerts[:10]  # Limit to 10 most recent alerts
 
@@ -877,14 +1137,8 @@ class AnalyticsAgent:
 
     def list_reports(self, report_type: ReportType = None, limit: int = 10) -> List[Report]:
         """List reports with optional filtering"""
-        reports = list(self.reports_store.values())
-        
-        if report_type:
-            reports = [r for r in reports if r.report_type == report_type]
-        
-        # Sort by creation date, newest first
-        reports.sort(key=lambda x: x.created_at, reverse=True)
-        return reports[:limit]
+        # Newest first, read straight from the creation-date index
+        return self.reports_store.top("created_at", limit, partition=report_type)
 
     def get_insight(self, insight_id: str) -> Optional[Insight]:
         """Get specific insight by ID"""
@@ -892,11 +1146,5 @@ class AnalyticsAgent:
 
     def list_insights(self, level: InsightLevel = None, limit: int = 20) -> List[Insight]:
         """List insights with optional filtering"""
-        insights = list(self.insights_store.values())
-        
-        if level:
-            insights = [i for i in insights if i.level == level]
-        
-        # Sort by impact score and timestamp
-        insights.sort(key=lambda x: (x.impact_score, x.timestamp), reverse=True)
-        return insights[:limit]
+        # Highest impact first (ties broken by recency), read from the impact index
+        return self.insights_store.top("impact", limit, partition=level)
@@ -2,8 +2,10 @@ from datetime import datetime, timedelta
 from typing import Dict, Any, List
 import json
 import logging
+import numpy as np
 from .base_agent import BaseAgent
 from .ai_service import AIService
+from .analytics.anomaly_detector import StreamingAnomalyDetector
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +15,9 @@ class CampaignAgent(BaseAgent):
     def __init__(self, agent_id: int, supabase_client, config: Dict[str, Any] = None):
         super().__init__(agent_id, supabase_client, config)
         self.ai_service = None
+        # Online per (campaign, metric type) statistics fed by health checks
+        self.anomaly_detector = StreamingAnomalyDetector(min_samples=7)
+        self._health_cursors: Dict[str, str] = {}
     
     async def _initialize_ai_service(self):
         """Initialize AI service with OpenAI API key from secrets"""
@@ -327,14 +332,15 @@ class CampaignAgent(BaseAgent):
             
             campaigns = active_campaigns.data if active_campaigns.data else []
             
+            # One sweep over all active campaigns instead of a query per campaign
+            health_by_campaign = await self._sweep_campaign_health(campaigns)
+            
             monitoring_results = []
             alerts = []
             
             for campaign in campaigns:
                 campaign_id = campaign["id"]
-                
-                # Check campaign health
-                health_status = await self._check_campaign_health(campaign)
+                health_status = health_by_campaign[campaign_id]
                 
                 monitoring_results.append({
                     "campaign_id": campaign_id,
@@ -426,24 +432,15 @@ class CampaignAgent(BaseAgent):
         if len(metrics) < 2:
             return {"trend": "insufficient_data"}
         
-        # Simple trend analysis
-        recent_metrics = sorted(metrics, key=lambda x: x.get("metric_date", ""))
-        first_half = recent_metrics[:len(recent_metrics)//2]
-        second_half = recent_metrics[len(recent_metrics)//2:]
-        
-        first_avg = sum(m.get("metric_value", 0) for m in first_half) / len(first_half) if first_half else 0
-        second_avg = sum(m.get("metric_value", 0) for m in second_half) / len(second_half) if second_half else 0
-        
-        if second_avg > first_avg * 1.1:
-            trend = "improving"
-        elif second_avg < first_avg * 0.9:
-            trend = "declining"
-        else:
-            trend = "stable"
+        # Deferred: campaign_health pulls in pandas, which most requests never need
+        from .analytics.campaign_health import metrics_frame, summarize_campaign_health
+        frame = metrics_frame(metrics)
+        frame["campaign_id"] = "campaign"
+        summary = summarize_campaign_health(frame, ["campaign"]).iloc[0]
         
         return {
-            "trend": trend,
-            "change_percentage": ((second_avg - first_avg) / first_avg * 100) if first_avg > 0 else 0
+            "trend": summary["trend"],
+            "change_percentage": float(summary["change_percentage"])
         }
     
     def _calculate_optimal_send_time(self, target_audience: Dict[str, Any], preferences: Dict[str, Any]) -> str:
@@ -473,43 +470,104 @@ class CampaignAgent(BaseAgent):
     
     async def _check_campaign_health(self, campaign: Dict[str, Any]) -> Dict[str, Any]:
         """Check campaign health and performance"""
-        campaign_id = campaign["id"]
-        
-        # Get recent metrics
-        metrics_result = self.supabase.table("campaign_metrics")\
-            .select("*")\
-            .eq("campaign_id", campaign_id)\
-            .gte("metric_date", (datetime.utcnow() - timedelta(days=7)).date().isoformat())\
-            .execute()
+        return (await self._sweep_campaign_health([campaign]))[campaign["id"]]
+    
+    async def _sweep_campaign_health(self, campaigns: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Check health of many campaigns from one paged metrics fetch and vectorized aggregation"""
+        campaign_ids = [campaign["id"] for campaign in campaigns]
+        if not campaign_ids:
+            return {}
         
-        metrics = metrics_result.data if metrics_result.data else []
+        from .analytics.campaign_health import metrics_frame, summarize_campaign_health, HEALTH_RECOMMENDATIONS
         
-        if not metrics:
-            return {
-                "status": "warning",
-                "message": "No recent performance data",
-                "metrics": {},
-                "recommendations": ["Check data collection", "Verify campaign is active"]
+        # Get recent metrics
+        since = (datetime.utcnow() - timedelta(days=7)).date().isoformat()
+        frame = metrics_frame(await self._fetch_campaign_metrics(campaign_ids, since))
+        summary = summarize_campaign_health(frame, campaign_ids)
+        anomalies = self._update_metric_anomalies(frame)
+        
+        results = {}
+        for campaign_id, row in zip(summary.index, summary.itertuples(index=False)):
+            if row.status == "no_data":
+                results[campaign_id] = {
+                    "status": "warning",
+                    "message": row.message,
+                    "metrics": {},
+                    "recommendations": list(HEALTH_RECOMMENDATIONS["no_data"])
+                }
+                continue
+            
+            status = row.status
+            message = row.message
+            recommendations = list(HEALTH_RECOMMENDATIONS[status])
+            campaign_anomalies = anomalies.get(campaign_id, [])
+            
+            if campaign_anomalies and status == "healthy":
+                status = "warning"
+                message = f"Unusual movement in {', '.join(a['metric_type'] for a in campaign_anomalies)}"
+                recommendations = ["Investigate recent changes", "Check tracking", "Continue monitoring"]
+            
+            results[campaign_id] = {
+                "status": status,
+                "message": message,
+                "metrics": {
+                    "average_performance": float(row.average_performance),
+                    "data_points": int(row.data_points),
+                    "trend": row.trend,
+                    "change_percentage": float(row.change_percentage),
+                    "anomalies": campaign_anomalies
+                },
+                "recommendations": recommendations
             }
-        
-        avg_performance = sum(m.get("metric_value", 0) for m in metrics) / len(metrics)
-        
-        if avg_performance < 20:
-            status = "critical"
-            message = "Campaign performance below threshold"
-            recommendations = ["Review targeting", "Update creative", "Consider pausing"]
-        elif avg_performance < 50:
-            status = "warning" 
-            message = "Campaign performance needs improvement"
-            recommendations = ["Optimize content", "Test new audiences", "Adjust timing"]
-        else:
-            status = "healthy"
-            message = "Campaign performing well"
-            recommendations = ["Continue monitoring", "Consider scaling", "Test variations"]
-        
-        return {
-            "status": status,
-            "message": message,
-            "metrics": {"average_performance": avg_performance, "data_points": len(metrics)},
-            "recommendations": recommendations
-        }
+        return results
+    
+    async def _fetch_campaign_metrics(self,
+                                      campaign_ids: List[str],
+                                      since: str,
+                                      page_size: int = 1000,
+                                      ids_per_request: int = 200) -> List[Dict[str, Any]]:
+        """Fetch recent campaign_metrics rows for many campaigns, paging through the results"""
+        rows = []
+        for start in range(0, len(campaign_ids), ids_per_request):
+            chunk = campaign_ids[start:start + ids_per_request]
+            offset = 0
+            while True:
+                result = self.supabase.table("campaign_metrics")\
+                    .select("campaign_id,metric_type,metric_value,metric_date")\
+                    .in_("campaign_id", chunk)\
+                    .gte("metric_date", since)\
+                    .order("id")\
+                    .range(offset, offset + page_size - 1)\
+                    .execute()
+                page = result.data or []
+                rows.extend(page)
+                if len(page) < page_size:
+                    break
+                offset += page_size
+        return rows
+    
+    def _update_metric_anomalies(self, frame) -> Dict[str, List[Dict[str, Any]]]:
+        """Feed completed days not seen before into the detector; returns anomalous metric types per campaign"""
+        today = datetime.utcnow().date().isoformat()
+        cursors = frame["campaign_id"].map(self._health_cursors).fillna("")
+        new_rows = frame[(frame["metric_date"] > cursors) & (frame["metric_date"] < today)]
+        
+        if not new_rows.empty:
+            daily = new_rows.groupby(["metric_date", "campaign_id", "metric_type"], sort=True)["metric_value"].mean()
+            # One vectorized update per day, in date order, across every (campaign, metric type) series
+            for _, day in daily.groupby(level="metric_date", sort=True):
+                keys = [(campaign_id, metric_type) for _, campaign_id, metric_type in day.index]
+                self.anomaly_detector.update_many(keys, day.to_numpy())
+            self._health_cursors.update(new_rows.groupby("campaign_id")["metric_date"].max().to_dict())
+        
+        monitored = set(frame["campaign_id"])
+        anomalies: Dict[str, List[Dict[str, Any]]] = {}
+        for anomaly in self.anomaly_detector.scan():
+            campaign_id, metric_type = anomaly["key"]
+            if campaign_id in monitored:
+                anomalies.setdefault(campaign_id, []).append({
+                    "metric_type": metric_type,
+                    "value": anomaly["value"],
+                    "z_score": anomaly["z_score"]
+                })
+        return anomalies
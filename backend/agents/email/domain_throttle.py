@@ -0,0 +1,182 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict, Any, Callable, Awaitable, Deque, Iterable
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Mailbox providers that share receiving infrastructure are throttled together
+DEFAULT_DOMAIN_GROUPS = {
+    "gmail.com": "gmail",
+    "googlemail.com": "gmail",
+    "outlook.com": "microsoft",
+    "hotmail.com": "microsoft",
+    "live.com": "microsoft",
+    "msn.com": "microsoft",
+    "yahoo.com": "yahoo",
+    "ymail.com": "yahoo",
+    "aol.com": "yahoo",
+    "icloud.com": "apple",
+    "me.com": "apple",
+    "mac.com": "apple"
+}
+
+# Sends per second for each provider group; other domains use the default rate
+DEFAULT_DOMAIN_RATES = {
+    "gmail": 20.0,
+    "microsoft": 10.0,
+    "yahoo": 10.0,
+    "apple": 10.0
+}
+
+def email_domain(email: str) -> str:
+    return (email or "").rsplit("@", 1)[-1].strip().lower()
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate`` tokens per second"""
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def is_full(self, now: float = None) -> bool:
+        self._refill(time.monotonic() if now is None else now)
+        return self.tokens >= self.capacity
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated_at:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+
+    def try_acquire(self, now: float = None) -> bool:
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def time_until_available(self, now: float = None) -> float:
+        self._refill(time.monotonic() if now is None else now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+class DomainSendScheduler:
+    """Paces sends per destination mailbox provider.
+
+    Recipients are queued by provider group (see DEFAULT_DOMAIN_GROUPS) and each
+    group draws from its own token bucket. Draining visits the groups round-robin
+    and dispatches one send per group per pass, so a large Gmail segment is
+    spread out while other providers keep the overall send rate up. A group's
+    queue is dropped once drained, and its bucket once it has refilled, so a
+    long-running worker only keeps state for groups it is currently sending to.
+    """
+
+    def __init__(self,
+                 default_rate: float = 10.0,
+                 domain_rates: Dict[str, float] = None,
+                 domain_groups: Dict[str, str] = None,
+                 max_in_flight: int = 50):
+        self.default_rate = default_rate
+        self.domain_rates = {**DEFAULT_DOMAIN_RATES, **(domain_rates or {})}
+        self.domain_groups = {**DEFAULT_DOMAIN_GROUPS, **(domain_groups or {})}
+        self.max_in_flight = max_in_flight
+        self._queues: Dict[str, Deque[Any]] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self.dispatched: Dict[str, int] = {}
+        self.throttle_waits = 0
+
+    def group_for(self, email: str) -> str:
+        domain = email_domain(email)
+        return self.domain_groups.get(domain, domain)
+
+    def set_rate(self, group: str, rate: float) -> None:
+        """Change the send rate for a provider group or domain"""
+        self.domain_rates[group] = rate
+        self._buckets.pop(group, None)
+
+    def _bucket(self, group: str) -> TokenBucket:
+        bucket = self._buckets.get(group)
+        if bucket is None:
+            bucket = TokenBucket(self.domain_rates.get(group, self.default_rate))
+            self._buckets[group] = bucket
+        return bucket
+
+    def enqueue(self, item: Any, email: str) -> None:
+        self._queues.setdefault(self.group_for(email), deque()).append(item)
+
+    def enqueue_many(self, items: Iterable[Any], email_of: Callable[[Any], str]) -> None:
+        for item in items:
+            self.enqueue(item, email_of(item))
+
+    def pending(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def get_queue_depths(self) -> Dict[str, int]:
+        """Queued sends per provider group"""
+        return {group: len(queue) for group, queue in self._queues.items() if queue}
+
+    async def drain(self, send: Callable[[Any], Awaitable[Any]]) -> int:
+        """Send everything queued, respecting per-group rates; returns the number dispatched"""
+        in_flight = set()
+        dispatched = 0
+
+        while self.pending():
+            in_flight = {task for task in in_flight if not task.done()}
+            now = time.monotonic()
+            self._prune(now)
+            dispatched_this_pass = False
+
+            for group, queue in list(self._queues.items()):
+                if not queue or len(in_flight) >= self.max_in_flight:
+                    continue
+                if self._bucket(group).try_acquire(now):
+                    item = queue.popleft()
+                    in_flight.add(asyncio.ensure_future(self._send_one(send, item)))
+                    self.dispatched[group] = self.dispatched.get(group, 0) + 1
+                    dispatched += 1
+                    dispatched_this_pass = True
+
+            if len(in_flight) >= self.max_in_flight:
+                _, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            elif not dispatched_this_pass and self.pending():
+                self.throttle_waits += 1
+                await asyncio.sleep(self._next_token_delay())
+            else:
+                # Let in-flight sends progress between passes
+                await asyncio.sleep(0)
+
+        if in_flight:
+            await asyncio.wait(in_flight)
+        self._prune(time.monotonic())
+        return dispatched
+
+    def _prune(self, now: float) -> None:
+        """Drop drained queues, and buckets of groups with nothing queued once they are full again"""
+        for group in [group for group, queue in self._queues.items() if not queue]:
+            del self._queues[group]
+        for group in [group for group in self._buckets if group not in self._queues]:
+            # A bucket still refilling keeps pacing the group if it is sent to again soon
+            if self._buckets[group].is_full(now):
+                del self._buckets[group]
+
+    def _next_token_delay(self) -> float:
+        now = time.monotonic()
+        delays = [self._bucket(group).time_until_available(now) for group, queue in self._queues.items() if queue]
+        return min(delays) if delays else 0.0
+
+    async def _send_one(self, send: Callable[[Any], Awaitable[Any]], item: Any) -> None:
+        try:
+            await send(item)
+        except Exception as e:
+            logger.error(f"Throttled send failed: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depths": self.get_queue_depths(),
+            "pending": self.pending(),
+            "dispatched": dict(self.dispatched),
+            "rates": {group: self.domain_rates.get(group, self.default_rate) for group in set(self._queues) | set(self.dispatched)},
+            "throttle_waits": self.throttle_waits
+        }
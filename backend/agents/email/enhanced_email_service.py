@@ -1,30 +1,42 @@
 
 from typing import Dict, Any, List, Optional
 import logging
+import time
 from datetime import datetime
 from .template_versioning_service import TemplateVersioningService
+from .template_cache import CachedTemplate
 from .personalization_service import PersonalizationService
 from .metrics_service import RealTimeMetricsService
 from .webhook_service import WebhookService
+from .provider_router import ESPProviderRouter
+from .suppression_service import SendGuard, get_send_guard
+from .supabase_database_service import SupabaseDatabaseService
 
 logger = logging.getLogger(__name__)
 
 class EnhancedEmailService:
     """Enhanced email service with versioning, personalization, metrics, and webhooks"""
     
-    def __init__(self, database_service=None):
+    def __init__(self, database_service=None, send_guard: SendGuard = None, events_database=None):
         self.database_service = database_service
         self.logger = logger
         
+        # Suppression list and frequency cap checked before every send
+        self.send_guard = send_guard or get_send_guard()
+        
+        # Delivery events (email_events) may live in a different store than templates
+        self.events_database = events_database or database_service
+        
         # Initialize services
         self.template_service = TemplateVersioningService(database_service)
         self.personalization_service = PersonalizationService()
-        self.metrics_service = RealTimeMetricsService(database_service)
+        self.metrics_service = RealTimeMetricsService(self.events_database)
         self.webhook_service = WebhookService(database_service)
         
-        # ESP providers for fallback
+        # ESP providers for fallback, ordered by live health at send time
         self.esp_providers = ["sendgrid", "mailchimp", "amazonses"]
         self.current_provider = 0
+        self.provider_router = ESPProviderRouter(self.esp_providers)
     
     async def send_personalized_email(self, 
                                     template_id: str, 
@@ -32,78 +44,150 @@ class EnhancedEmailService:
                                     campaign_id: str = None) -> Dict[str, Any]:
         """Send personalized email with metrics tracking and webhook notifications"""
         try:
-            # Get template
-            template = await self.template_service.get_template(template_id)
-            if not template:
+            # Get template with compiled render plans (cached per template version)
+            compiled = await self.template_service.get_compiled_template(template_id)
+            if not compiled:
                 raise Exception(f"Template {template_id} not found")
             
-            # Personalize content
-            personalized_subject = self.personalization_service.personalize_content(
-                template["subject_line"], 
-                recipient_data
-            )
-            personalized_html = self.personalization_service.personalize_content(
-                template["html_content"], 
-                recipient_data
-            )
-            personalized_text = self.personalization_service.personalize_content(
-                template["text_content"], 
-                recipient_data
-            )
-            
-            # Send email with fallback
-            email_result = await self.send_with_fallback({
-                "to": recipient_data["email"],
-                "subject": personalized_subject,
-                "html_content": personalized_html,
-                "text_content": personalized_text,
-                "campaign_id": campaign_id
-            })
-            
-            if email_result["success"]:
-                # Track sent event
-                await self.metrics_service.track_email_event(
-                    email_result["email_id"], 
-                    "sent",
-                    {"recipient": recipient_data["email"], "campaign_id": campaign_id}
-                )
-                
-                # Send webhook notification
-                await self.webhook_service.send_webhook("sent", {
-                    "email_id": email_result["email_id"],
-                    "recipient": recipient_data["email"],
-                    "campaign_id": campaign_id,
-                    "template_id": template_id
-                })
-            
-            return email_result
+            return await self._send_compiled_email(compiled, template_id, recipient_data, campaign_id)
             
         except Exception as e:
             self.logger.error(f"Failed to send personalized email: {str(e)}")
             return {"success": False, "error": str(e)}
     
+    async def send_bulk_personalized_emails(self,
+                                            template_id: str,
+                                            recipients: List[Dict[str, Any]],
+                                            campaign_id: str = None) -> Dict[str, Any]:
+        """Send one template to many recipients, resolving and compiling the template once"""
+        compiled = await self.template_service.get_compiled_template(template_id)
+        if not compiled:
+            return {"success": False, "error": f"Template {template_id} not found"}
+        
+        # Each recipient is checked once, right before rendering and sending, so
+        # the frequency cap also sees earlier sends of this batch
+        blocked: Dict[str, int] = {}
+        results = []
+        for recipient_data in recipients:
+            try:
+                result = await self._send_compiled_email(compiled, template_id, recipient_data, campaign_id)
+            except Exception as e:
+                self.logger.error(f"Failed to send personalized email: {str(e)}")
+                result = {"success": False, "error": str(e)}
+            if result.get("skipped"):
+                blocked[result["reason"]] = blocked.get(result["reason"], 0) + 1
+            else:
+                results.append(result)
+        
+        sent = sum(1 for result in results if result.get("success"))
+        return {
+            "success": sent > 0 or not results,
+            "total": len(recipients),
+            "sent": sent,
+            "failed": len(results) - sent,
+            "blocked": blocked,
+            "results": results
+        }
+    
+    async def _send_compiled_email(self,
+                                   compiled: CachedTemplate,
+                                   template_id: str,
+                                   recipient_data: Dict[str, Any],
+                                   campaign_id: str = None) -> Dict[str, Any]:
+        """Render a compiled template for one recipient and send it"""
+        blocked_reason = self.send_guard.check(recipient_data["email"])
+        if blocked_reason:
+            return {"success": False, "skipped": True, "reason": blocked_reason}
+        
+        render = self.personalization_service.render_plan
+        
+        # Send email with fallback
+        email_result = await self.send_with_fallback({
+            "to": recipient_data["email"],
+            "subject": render(compiled.plans["subject_line"], recipient_data),
+            "html_content": render(compiled.plans["html_content"], recipient_data),
+            "text_content": render(compiled.plans["text_content"], recipient_data),
+            "campaign_id": campaign_id
+        })
+        
+        if email_result["success"]:
+            self.send_guard.record_send(recipient_data["email"])
+            
+            # Track sent event
+            await self.metrics_service.track_email_event(
+                email_result["email_id"], 
+                "sent",
+                {"recipient": recipient_data["email"], "campaign_id": campaign_id}
+            )
+            
+            # Send webhook notification
+            await self.webhook_service.send_webhook("sent", {
+                "email_id": email_result["email_id"],
+                "recipient": recipient_data["email"],
+                "campaign_id": campaign_id,
+                "template_id": template_id
+            })
+        
+        return email_result
+    
     async def send_with_fallback(self, email_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Send email with ESP provider fallback"""
-        for attempt, provider in enumerate(self.esp_providers):
+        """Send email through the healthiest ESP provider, falling back down the ranking"""
+        attempted_providers = []
+        
+        for provider in self.provider_router.ranked_providers():
+            if not self.provider_router.allow_request(provider):
+                continue
+            
+            attempted_providers.append(provider)
+            started = time.monotonic()
             try:
                 result = await self.send_via_provider(email_data, provider)
                 if result["success"]:
+                    self.provider_router.record_success(provider, time.monotonic() - started)
                     return result
+                
+                self.provider_router.record_failure(
+                    provider, time.monotonic() - started, result.get("error")
+                )
                     
             except Exception as e:
+                self.provider_router.record_failure(provider, time.monotonic() - started, str(e))
                 self.logger.warning(f"Provider {provider} failed: {str(e)}")
-                
-                if attempt < len(self.esp_providers) - 1:
-                    self.logger.info(f"Falling back to next provider...")
-                    continue
+            finally:
+                # A half-open probe cancelled before it recorded must not block the provider
+                self.provider_router.release_probe(provider)
+            
+            self.logger.info(f"Falling back to next provider...")
         
-        # All providers failed
+        # All providers failed or have open circuits
         return {
             "success": False,
             "error": "All email providers failed",
-            "attempted_providers": self.esp_providers
+            "attempted_providers": attempted_providers
         }
     
+    async def record_delivery_event(self,
+                                    email_id: str,
+                                    event_type: str,
+                                    recipient: str,
+                                    metadata: Dict[str, Any] = None) -> bool:
+        """Track a delivery event and feed bounces/unsubscribes into the suppression list"""
+        metadata = {**(metadata or {}), "recipient": recipient}
+        tracked = await self.metrics_service.track_email_event(email_id, event_type, metadata)
+        
+        if not (event_type == "bounced" and metadata.get("bounce_type") == "soft"):
+            self.send_guard.apply_event(event_type, recipient)
+        
+        return tracked
+    
+    async def refresh_suppression_list(self) -> int:
+        """Load bounce and unsubscribe events recorded since the last refresh"""
+        return await self.send_guard.refresh_from_database(self.events_database)
+    
+    def get_provider_metrics(self) -> Dict[str, Any]:
+        """Get per-provider routing health and circuit breaker state"""
+        return self.provider_router.get_stats()
+    
     async def send_via_provider(self, email_data: Dict[str, Any], provider: str) -> Dict[str, Any]:
         """Send email via specific ESP provider"""
         # Mock implementation - replace with actual ESP integration
@@ -211,3 +295,15 @@ class EnhancedEmailService:
                 "engagement_score": 1.9
             }
         }
+
+
+# Global enhanced email service instance
+_enhanced_email_service = None
+
+def get_enhanced_email_service() -> EnhancedEmailService:
+    """Get the global enhanced email service instance"""
+    global _enhanced_email_service
+    if _enhanced_email_service is None:
+        # Events are persisted to Supabase so suppressions survive restarts
+        _enhanced_email_service = EnhancedEmailService(events_database=SupabaseDatabaseService())
+    return _enhanced_email_service
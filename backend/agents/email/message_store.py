@@ -0,0 +1,112 @@
+import sys
+from collections.abc import MutableMapping
+from datetime import datetime
+from typing import Dict, Any, Callable, Iterator, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Renders {"subject": ..., "html": ...} for a (template_id, contact_id) pair
+MessageRenderer = Callable[[str, str], Dict[str, str]]
+
+class CompactEmailMessage:
+    """Slot-based email message record that stores references instead of bodies.
+
+    Campaign and template ids are interned so every record of a campaign points
+    at the same string objects, status holds a shared enum member, and the
+    personalized subject/body are rendered from the template and contact on
+    access instead of being kept per recipient. Edits to a template after
+    scheduling are therefore reflected in messages that have not been sent.
+    """
+
+    __slots__ = (
+        "campaign_id", "contact_id", "template_id", "scheduled_at",
+        "sent_at", "status", "tracking_data", "_renderer"
+    )
+
+    def __init__(self,
+                 campaign_id: str,
+                 contact_id: str,
+                 template_id: str,
+                 scheduled_at: datetime,
+                 status: Any,
+                 renderer: MessageRenderer,
+                 sent_at: Optional[datetime] = None):
+        self.campaign_id = sys.intern(campaign_id)
+        self.contact_id = contact_id
+        self.template_id = sys.intern(template_id)
+        self.scheduled_at = scheduled_at
+        self.sent_at = sent_at
+        self.status = status
+        self.tracking_data = None
+        self._renderer = renderer
+
+    @property
+    def id(self) -> str:
+        return message_id_for(self.campaign_id, self.contact_id)
+
+    def render(self) -> Dict[str, str]:
+        """Render the personalized subject and HTML body"""
+        return self._renderer(self.template_id, self.contact_id)
+
+    @property
+    def subject_line(self) -> str:
+        return self.render()["subject"]
+
+    @property
+    def content(self) -> str:
+        return self.render()["html"]
+
+    def track(self, key: str, value: Any) -> None:
+        """Record tracking data, allocating the dict only when first needed"""
+        if self.tracking_data is None:
+            self.tracking_data = {}
+        self.tracking_data[key] = value
+
+def message_id_for(campaign_id: str, contact_id: str) -> str:
+    return f"msg_{campaign_id}_{contact_id}"
+
+class CompactMessageStore(MutableMapping):
+    """Dict-compatible message store holding CompactEmailMessage records.
+
+    Drop-in replacement for the ``Dict[str, EmailMessage]`` messages store:
+    lookups, iteration and assignment behave like a dict, while ``add`` builds
+    compact records that share the store's renderer.
+    """
+
+    def __init__(self, renderer: MessageRenderer):
+        self.renderer = renderer
+        self._messages: Dict[str, Any] = {}
+
+    def add(self,
+            campaign_id: str,
+            contact_id: str,
+            template_id: str,
+            scheduled_at: datetime,
+            status: Any) -> CompactEmailMessage:
+        """Create and store a compact message record"""
+        message = CompactEmailMessage(
+            campaign_id=campaign_id,
+            contact_id=contact_id,
+            template_id=template_id,
+            scheduled_at=scheduled_at,
+            status=status,
+            renderer=self.renderer
+        )
+        self._messages[message.id] = message
+        return message
+
+    def __getitem__(self, message_id: str) -> Any:
+        return self._messages[message_id]
+
+    def __setitem__(self, message_id: str, message: Any) -> None:
+        self._messages[message_id] = message
+
+    def __delitem__(self, message_id: str) -> None:
+        del self._messages[message_id]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._messages)
+
+    def __len__(self) -> int:
+        return len(self._messages)
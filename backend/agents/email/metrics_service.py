@@ -42,6 +42,10 @@ class RealTimeMetricsService:
             self.logger.error(f"Failed to track email event: {str(e)}")
             return False
     
+    async def update_campaign_metrics(self, email_id: str, event_type: str) -> None:
+        """Keep running totals per event type for the real-time view"""
+        self.metrics_cache[event_type] = self.metrics_cache.get(event_type, 0) + 1
+    
     async def get_real_time_metrics(self, campaign_id: str, time_range: str = "24h") -> Dict[str, Any]:
         """Get real-time metrics for a campaign"""
         try:
@@ -1,10 +1,34 @@
 
 import re
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+MERGE_TAG_PATTERN = re.compile(r'\{\{(\w+)\}\}')
+
+class RenderPlan:
+    """Pre-parsed template content: literal segments interleaved with merge tags.
+
+    Rendering joins the segments with tag values in a single pass, so bulk sends
+    skip re-scanning the template for every recipient.
+    """
+
+    __slots__ = ("literals", "tags")
+
+    def __init__(self, content: str):
+        parts = MERGE_TAG_PATTERN.split(content or "")
+        # re.split with one group alternates literal, tag, literal, ...
+        self.literals = parts[0::2]
+        self.tags = parts[1::2]
+
+    def render(self, contact_data: Dict[str, Any], defaults: Dict[str, Any]) -> str:
+        pieces = [self.literals[0]]
+        for tag, literal in zip(self.tags, self.literals[1:]):
+            pieces.append(str(contact_data.get(tag, defaults.get(tag, f"[{tag}]"))))
+            pieces.append(literal)
+        return "".join(pieces)
+
 class PersonalizationService:
     """Service for dynamic email personalization with merge tags"""
     
@@ -23,10 +47,21 @@ class PersonalizationService:
     
     def extract_merge_tags(self, content: str) -> List[str]:
         """Extract all merge tags from content"""
-        pattern = r'\{\{(\w+)\}\}'
-        tags = re.findall(pattern, content)
+        tags = MERGE_TAG_PATTERN.findall(content)
         return list(set(tags))
     
+    def compile_content(self, content: Optional[str]) -> RenderPlan:
+        """Compile content into a reusable render plan"""
+        return RenderPlan(content)
+    
+    def render_plan(self, plan: RenderPlan, contact_data: Dict[str, Any]) -> str:
+        """Render a compiled plan with contact data, falling back to default merge tags"""
+        try:
+            return plan.render(contact_data, self.default_merge_tags)
+        except Exception as e:
+            self.logger.error(f"Personalization failed: {str(e)}")
+            return "".join(plan.literals)
+    
     def personalize_content(self, content: str, contact_data: Dict[str, Any]) -> str:
         """Replace merge tags with actual contact data"""
         try:
@@ -0,0 +1,202 @@
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Dict, Any, List, Optional, Deque, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+@dataclass
+class ProviderHealth:
+    """Rolling health window and circuit breaker state for a single ESP provider"""
+    name: str
+    window: Deque[Tuple[bool, float]] = field(default_factory=deque)
+    state: CircuitState = CircuitState.CLOSED
+    consecutive_failures: int = 0
+    opened_at: Optional[float] = None
+    probe_started_at: Optional[float] = None
+    total_requests: int = 0
+    total_failures: int = 0
+    times_opened: int = 0
+    last_error: Optional[str] = None
+
+    @property
+    def error_rate(self) -> float:
+        if not self.window:
+            return 0.0
+        failures = sum(1 for success, _ in self.window if not success)
+        return failures / len(self.window)
+
+    @property
+    def avg_latency_ms(self) -> float:
+        if not self.window:
+            return 0.0
+        return sum(latency for _, latency in self.window) / len(self.window) * 1000
+
+class ESPProviderRouter:
+    """Health-weighted ESP selection with per-provider circuit breakers.
+
+    Each provider keeps a rolling window of (success, latency) samples. A provider
+    whose error rate crosses the threshold (or that fails too many times in a row)
+    has its circuit opened and is skipped until the cooldown expires, after which a
+    single half-open probe decides whether it goes back into rotation. A probe that
+    never reports back (cancelled, or lost to an error before recording) stops
+    blocking the next one after ``probe_timeout_seconds``.
+    """
+
+    def __init__(self,
+                 providers: List[str],
+                 window_size: int = 50,
+                 min_samples: int = 5,
+                 error_rate_threshold: float = 0.5,
+                 consecutive_failure_limit: int = 5,
+                 cooldown_seconds: float = 30.0,
+                 latency_reference_ms: float = 500.0,
+                 probe_timeout_seconds: float = 60.0):
+        self.logger = logger
+        self.window_size = window_size
+        self.min_samples = min_samples
+        self.error_rate_threshold = error_rate_threshold
+        self.consecutive_failure_limit = consecutive_failure_limit
+        self.cooldown_seconds = cooldown_seconds
+        self.latency_reference_ms = latency_reference_ms
+        self.probe_timeout_seconds = probe_timeout_seconds
+        self.providers: Dict[str, ProviderHealth] = {}
+        for name in providers:
+            self.add_provider(name)
+
+    def add_provider(self, name: str) -> None:
+        """Register a provider (no-op if it is already tracked)"""
+        if name not in self.providers:
+            self.providers[name] = ProviderHealth(name=name, window=deque(maxlen=self.window_size))
+
+    def health_score(self, name: str) -> float:
+        """Score in [0, 1]; higher is healthier. Unknown providers score optimistically."""
+        health = self.providers.get(name)
+        if health is None:
+            return 1.0
+        latency_factor = 1.0 / (1.0 + health.avg_latency_ms / self.latency_reference_ms)
+        return (1.0 - health.error_rate) * latency_factor
+
+    def ranked_providers(self) -> List[str]:
+        """Providers that may take traffic right now, healthiest first.
+
+        Open circuits whose cooldown has elapsed move to half-open and are tried
+        last, so a probe never delays a send that a healthy provider can take.
+        Ties keep the configured order.
+        """
+        now = time.monotonic()
+        closed = []
+        half_open = []
+        for name, health in self.providers.items():
+            if health.state == CircuitState.OPEN and now - health.opened_at >= self.cooldown_seconds:
+                health.state = CircuitState.HALF_OPEN
+                health.probe_started_at = None
+                self.logger.info(f"Circuit for provider {name} is half-open, allowing a probe")
+
+            if health.state == CircuitState.CLOSED:
+                closed.append(name)
+            elif health.state == CircuitState.HALF_OPEN and not self._probe_pending(health, now):
+                half_open.append(name)
+
+        closed.sort(key=self.health_score, reverse=True)
+        return closed + half_open
+
+    def allow_request(self, name: str) -> bool:
+        """Claim the right to send through a provider; half-open circuits admit one probe"""
+        health = self.providers.get(name)
+        if health is None:
+            return False
+        if health.state == CircuitState.CLOSED:
+            return True
+        now = time.monotonic()
+        if health.state == CircuitState.HALF_OPEN and not self._probe_pending(health, now):
+            health.probe_started_at = now
+            return True
+        return False
+
+    def release_probe(self, name: str) -> None:
+        """Let another probe through if this provider's probe ended without recording a result"""
+        health = self.providers.get(name)
+        if health is not None and health.state == CircuitState.HALF_OPEN:
+            health.probe_started_at = None
+
+    def _probe_pending(self, health: ProviderHealth, now: float) -> bool:
+        return health.probe_started_at is not None and now - health.probe_started_at < self.probe_timeout_seconds
+
+    def record_success(self, name: str, latency_seconds: float) -> None:
+        health = self.providers[name]
+        health.window.append((True, latency_seconds))
+        health.total_requests += 1
+        health.consecutive_failures = 0
+
+        if health.state == CircuitState.HALF_OPEN:
+            health.state = CircuitState.CLOSED
+            health.probe_started_at = None
+            health.opened_at = None
+            health.window.clear()
+            health.window.append((True, latency_seconds))
+            self.logger.info(f"Probe succeeded, circuit for provider {name} closed")
+
+    def record_failure(self, name: str, latency_seconds: float, error: str = None) -> None:
+        health = self.providers[name]
+        health.window.append((False, latency_seconds))
+        health.total_requests += 1
+        health.total_failures += 1
+        health.consecutive_failures += 1
+        health.last_error = error
+
+        if health.state == CircuitState.HALF_OPEN:
+            self._open_circuit(health)
+        elif health.state == CircuitState.CLOSED and self._should_trip(health):
+            self._open_circuit(health)
+
+    def _should_trip(self, health: ProviderHealth) -> bool:
+        if health.consecutive_failures >= self.consecutive_failure_limit:
+            return True
+        return len(health.window) >= self.min_samples and health.error_rate >= self.error_rate_threshold
+
+    def _open_circuit(self, health: ProviderHealth) -> None:
+        health.state = CircuitState.OPEN
+        health.opened_at = time.monotonic()
+        health.probe_started_at = None
+        health.times_opened += 1
+        self.logger.warning(
+            f"Circuit opened for provider {health.name} "
+            f"(error rate {health.error_rate:.0%}, {health.consecutive_failures} consecutive failures)"
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-provider health snapshot for the metrics endpoint"""
+        ranking = self.ranked_providers()
+        now = time.monotonic()
+        providers = {}
+        for name, health in self.providers.items():
+            retry_in = None
+            if health.state == CircuitState.OPEN:
+                retry_in = round(max(0.0, self.cooldown_seconds - (now - health.opened_at)), 2)
+
+            providers[name] = {
+                "state": health.state.value,
+                "health_score": round(self.health_score(name), 4),
+                "error_rate": round(health.error_rate, 4),
+                "avg_latency_ms": round(health.avg_latency_ms, 2),
+                "window_samples": len(health.window),
+                "consecutive_failures": health.consecutive_failures,
+                "total_requests": health.total_requests,
+                "total_failures": health.total_failures,
+                "times_opened": health.times_opened,
+                "retry_in_seconds": retry_in,
+                "last_error": health.last_error
+            }
+
+        return {
+            "ranking": ranking,
+            "providers": providers
+        }
@@ -0,0 +1,208 @@
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DAYS_PER_WEEK = 7
+HOURS_PER_DAY = 24
+SLOTS_PER_WEEK = DAYS_PER_WEEK * HOURS_PER_DAY
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Relative weight of each engagement event in the histograms
+EVENT_WEIGHTS = {
+    "opened": 1.0,
+    "clicked": 2.0
+}
+
+def format_slot(slot: int) -> Dict[str, Any]:
+    """Describe a weekly slot index (weekday * 24 + hour)"""
+    weekday, hour = divmod(int(slot), HOURS_PER_DAY)
+    display_hour = hour % 12 or 12
+    return {
+        "day": DAY_NAMES[weekday],
+        "weekday": weekday,
+        "hour": hour,
+        "time": f"{display_hour}:00 {'AM' if hour < 12 else 'PM'}"
+    }
+
+class SendTimeOptimizer:
+    """Local send-time optimization from historical engagement.
+
+    Keeps a 7x24 engagement histogram per contact (rows of one matrix), per
+    segment and globally, updated incrementally as open/click events arrive.
+    A contact's best slot is the argmax of its own histogram blended with its
+    segment's (or the global) normalized histogram, so contacts with little
+    history inherit the behaviour of their segment.
+    """
+
+    def __init__(self, prior_weight: float = 1.0, initial_capacity: int = 1024):
+        self.logger = logger
+        self.prior_weight = prior_weight
+        self.contact_index: Dict[str, int] = {}
+        self.contact_segments: Dict[str, str] = {}
+        self.contact_histograms = np.zeros((initial_capacity, SLOTS_PER_WEEK), dtype=np.float32)
+        self.segment_histograms: Dict[str, np.ndarray] = {}
+        self.global_histogram = np.zeros(SLOTS_PER_WEEK, dtype=np.float64)
+        self.total_events = 0
+
+    def _contact_row(self, contact_id: str) -> int:
+        row = self.contact_index.get(contact_id)
+        if row is None:
+            row = len(self.contact_index)
+            if row >= self.contact_histograms.shape[0]:
+                grown = np.zeros((self.contact_histograms.shape[0] * 2, SLOTS_PER_WEEK), dtype=np.float32)
+                grown[:row] = self.contact_histograms
+                self.contact_histograms = grown
+            self.contact_index[contact_id] = row
+        return row
+
+    def _segment_histogram(self, segment: str) -> np.ndarray:
+        histogram = self.segment_histograms.get(segment)
+        if histogram is None:
+            histogram = np.zeros(SLOTS_PER_WEEK, dtype=np.float64)
+            self.segment_histograms[segment] = histogram
+        return histogram
+
+    def record_event(self,
+                     contact_id: str,
+                     occurred_at: datetime,
+                     event_type: str = "opened",
+                     segment: str = None) -> None:
+        """Add a single engagement event to the histograms"""
+        self.record_events([(contact_id, occurred_at, event_type, segment)])
+
+    def record_events(self, events: Iterable[Tuple[str, datetime, str, Optional[str]]]) -> int:
+        """Add a batch of (contact_id, occurred_at, event_type, segment) events.
+
+        Events with types that carry no engagement weight are ignored. Returns
+        the number of events applied.
+        """
+        rows, slots, weights = [], [], []
+        segment_updates: Dict[str, List[Tuple[int, float]]] = {}
+
+        for contact_id, occurred_at, event_type, segment in events:
+            weight = EVENT_WEIGHTS.get(event_type)
+            if weight is None or occurred_at is None:
+                continue
+
+            slot = occurred_at.weekday() * HOURS_PER_DAY + occurred_at.hour
+            rows.append(self._contact_row(contact_id))
+            slots.append(slot)
+            weights.append(weight)
+
+            if segment:
+                self.contact_segments[contact_id] = segment
+            segment = self.contact_segments.get(contact_id)
+            if segment:
+                segment_updates.setdefault(segment, []).append((slot, weight))
+
+        if not rows:
+            return 0
+
+        slot_array = np.asarray(slots, dtype=np.intp)
+        weight_array = np.asarray(weights, dtype=np.float32)
+        np.add.at(self.contact_histograms, (np.asarray(rows, dtype=np.intp), slot_array), weight_array)
+        np.add.at(self.global_histogram, slot_array, weight_array)
+
+        for segment, updates in segment_updates.items():
+            segment_slots, segment_weights = zip(*updates)
+            np.add.at(self._segment_histogram(segment), np.asarray(segment_slots, dtype=np.intp), segment_weights)
+
+        self.total_events += len(rows)
+        return len(rows)
+
+    def set_contact_segment(self, contact_id: str, segment: str) -> None:
+        """Assign the segment whose histogram is used as a prior for a contact"""
+        if segment:
+            self.contact_segments[contact_id] = segment
+
+    def _normalized_prior(self, segment: Optional[str]) -> np.ndarray:
+        histogram = self.segment_histograms.get(segment) if segment else None
+        if histogram is None or not histogram.any():
+            histogram = self.global_histogram
+        total = histogram.sum()
+        if total == 0:
+            return np.zeros(SLOTS_PER_WEEK, dtype=np.float64)
+        return histogram / total
+
+    def score_matrix(self, contact_ids: List[str]) -> np.ndarray:
+        """Blended (contacts x 168) score matrix for a list of contacts"""
+        scores = np.zeros((len(contact_ids), SLOTS_PER_WEEK), dtype=np.float32)
+        known_positions = [i for i, cid in enumerate(contact_ids) if cid in self.contact_index]
+        if known_positions:
+            rows = np.fromiter((self.contact_index[contact_ids[i]] for i in known_positions),
+                               dtype=np.intp, count=len(known_positions))
+            scores[known_positions] = self.contact_histograms[rows]
+
+        # Contacts sharing a segment share one prior vector, added by broadcasting
+        positions_by_segment: Dict[Optional[str], List[int]] = {}
+        for i, contact_id in enumerate(contact_ids):
+            positions_by_segment.setdefault(self.contact_segments.get(contact_id), []).append(i)
+        for segment, positions in positions_by_segment.items():
+            scores[positions] += (self._normalized_prior(segment) * self.prior_weight).astype(np.float32)
+        return scores
+
+    def best_slots(self,
+                   contact_ids: List[str],
+                   default_slot: int = 1 * HOURS_PER_DAY + 10,
+                   chunk_size: int = 50000) -> np.ndarray:
+        """Best weekly slot index for every contact; contacts with no signal get default_slot.
+
+        Scores are built in chunks so memory stays bounded for very large audiences.
+        """
+        best = np.empty(len(contact_ids), dtype=np.intp)
+        for start in range(0, len(contact_ids), chunk_size):
+            scores = self.score_matrix(contact_ids[start:start + chunk_size])
+            chunk_best = scores.argmax(axis=1)
+            chunk_best[scores.max(axis=1) <= 0] = default_slot
+            best[start:start + len(chunk_best)] = chunk_best
+        return best
+
+    def next_send_times(self, contact_ids: List[str], after: datetime = None) -> Dict[str, datetime]:
+        """Next occurrence of each contact's best slot at or after the given time"""
+        after = after or datetime.now()
+        best = self.best_slots(contact_ids)
+        after_slot = after.weekday() * HOURS_PER_DAY + after.hour
+        delta_hours = (best - after_slot) % SLOTS_PER_WEEK
+        base = after.replace(minute=0, second=0, microsecond=0)
+
+        send_times = {}
+        for contact_id, delta in zip(contact_ids, delta_hours.tolist()):
+            send_times[contact_id] = after if delta == 0 else base + timedelta(hours=delta)
+        return send_times
+
+    def aggregate_histogram(self, contact_ids: List[str] = None) -> np.ndarray:
+        """7x24 engagement histogram summed over contacts (all engagement when None)"""
+        if contact_ids is None:
+            return self.global_histogram.reshape(DAYS_PER_WEEK, HOURS_PER_DAY)
+        rows = [self.contact_index[cid] for cid in contact_ids if cid in self.contact_index]
+        if not rows:
+            return np.zeros((DAYS_PER_WEEK, HOURS_PER_DAY), dtype=np.float64)
+        summed = self.contact_histograms[np.asarray(rows, dtype=np.intp)].sum(axis=0, dtype=np.float64)
+        return summed.reshape(DAYS_PER_WEEK, HOURS_PER_DAY)
+
+    def recommend(self, contact_ids: List[str] = None, top_n: int = 3) -> Dict[str, Any]:
+        """Audience-level recommendation built from the aggregate histogram"""
+        histogram = self.aggregate_histogram(contact_ids)
+        by_day = histogram.sum(axis=1)
+        by_hour = histogram.sum(axis=0)
+        top_slots = np.argsort(histogram.ravel())[::-1][:top_n]
+
+        segments = {}
+        for segment, segment_histogram in self.segment_histograms.items():
+            if segment_histogram.any():
+                segments[segment] = {
+                    "best_time": format_slot(int(segment_histogram.argmax()))["time"],
+                    "best_day": format_slot(int(segment_histogram.argmax()))["day"],
+                    "events": float(segment_histogram.sum())
+                }
+
+        return {
+            "best_days": [DAY_NAMES[i] for i in np.argsort(by_day)[::-1][:top_n] if by_day[i] > 0],
+            "optimal_times": [format_slot(int(h))["time"] for h in np.argsort(by_hour)[::-1][:top_n] if by_hour[h] > 0],
+            "top_slots": [format_slot(int(s)) for s in top_slots if histogram.ravel()[s] > 0],
+            "audience_segments": segments
+        }
@@ -0,0 +1,58 @@
+import asyncio
+from typing import Dict, Any, List, Optional
+
+class SupabaseDatabaseService:
+    """``database_service`` for the email services backed by Supabase tables.
+
+    Implements the ``save`` and ``query`` calls the metrics service and the
+    send guard make. Query filters are column equality or ``{"$in": [...]}``,
+    ``{"$gt": v}`` and ``{"$gte": v}``. The client is resolved on first use,
+    and the blocking client calls run in a worker thread.
+    """
+
+    def __init__(self, client=None, page_size: int = 1000):
+        self._client = client
+        self.page_size = page_size
+
+    @property
+    def client(self):
+        if self._client is None:
+            from backend.database import get_supabase
+            self._client = get_supabase()
+        return self._client
+
+    async def save(self, table: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert one row and return it as stored"""
+        def insert():
+            rows = self.client.table(table).insert(data).execute().data or []
+            return rows[0] if rows else data
+        return await asyncio.to_thread(insert)
+
+    async def query(self, table: str, filters: Dict[str, Any] = None, order_by: Optional[str] = "id") -> List[Dict[str, Any]]:
+        """All rows matching the filters, read page by page"""
+        def select():
+            rows: List[Dict[str, Any]] = []
+            offset = 0
+            while True:
+                query = self.client.table(table).select("*")
+                for column, condition in (filters or {}).items():
+                    if not isinstance(condition, dict):
+                        query = query.eq(column, condition)
+                        continue
+                    for operator, value in condition.items():
+                        if operator == "$in":
+                            query = query.in_(column, list(value))
+                        elif operator == "$gt":
+                            query = query.gt(column, value)
+                        elif operator == "$gte":
+                            query = query.gte(column, value)
+                        else:
+                            raise ValueError(f"Unsupported filter operator {operator}")
+                if order_by:
+                    query = query.order(order_by)
+                page = query.range(offset, offset + self.page_size - 1).execute().data or []
+                rows.extend(page)
+                if len(page) < self.page_size:
+                    return rows
+                offset += self.page_size
+        return await asyncio.to_thread(select)
@@ -0,0 +1,225 @@
+import hashlib
+import math
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterable, Tuple, Deque
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Delivery events that permanently suppress an address
+SUPPRESSING_EVENTS = {"unsubscribed", "hard_bounced", "bounced", "complained"}
+
+def normalize_email(email: str) -> str:
+    return (email or "").strip().lower()
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing"""
+
+    def __init__(self, expected_items: int = 1_000_000, false_positive_rate: float = 0.001):
+        expected_items = max(1, expected_items)
+        self.size = max(8, int(-expected_items * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / expected_items * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+class SuppressionList:
+    """In-memory suppression list: an exact hash set with an optional Bloom filter front.
+
+    The set is authoritative. When the Bloom filter is enabled a negative answer
+    from it short-circuits the lookup; positives (including false positives) are
+    confirmed against the set, so removals stay exact even though the filter
+    cannot forget entries.
+    """
+
+    def __init__(self, use_bloom_filter: bool = False, expected_items: int = 1_000_000):
+        self.suppressed: Dict[str, str] = {}
+        self.bloom = BloomFilter(expected_items) if use_bloom_filter else None
+        self.last_event_at: Optional[str] = None
+
+    def add(self, email: str, reason: str = "manual") -> None:
+        email = normalize_email(email)
+        if not email:
+            return
+        self.suppressed[email] = reason
+        if self.bloom is not None:
+            self.bloom.add(email)
+
+    def remove(self, email: str) -> bool:
+        return self.suppressed.pop(normalize_email(email), None) is not None
+
+    def reason(self, email: str) -> Optional[str]:
+        email = normalize_email(email)
+        if self.bloom is not None and email not in self.bloom:
+            return None
+        return self.suppressed.get(email)
+
+    def __contains__(self, email: str) -> bool:
+        return self.reason(email) is not None
+
+    def __len__(self) -> int:
+        return len(self.suppressed)
+
+    def apply_event(self, event_type: str, email: str, occurred_at: str = None) -> bool:
+        """Update the list from a delivery event; returns True if the address became suppressed"""
+        if occurred_at and (self.last_event_at is None or occurred_at > self.last_event_at):
+            self.last_event_at = occurred_at
+
+        if event_type == "resubscribed":
+            self.remove(email)
+            return False
+        if event_type not in SUPPRESSING_EVENTS:
+            return False
+
+        self.add(email, event_type)
+        return True
+
+    def apply_events(self, events: Iterable[Dict[str, Any]]) -> int:
+        """Apply a batch of event rows with event_type, email/recipient and timestamp"""
+        applied = 0
+        for event in events:
+            metadata = event.get("metadata") or {}
+            email = event.get("email") or event.get("recipient") or metadata.get("recipient")
+            if not email:
+                continue
+            # Soft bounces are transient and must not suppress the address
+            event_type = event.get("event_type")
+            if event_type == "bounced" and metadata.get("bounce_type") == "soft":
+                continue
+            if self.apply_event(event_type, email, event.get("timestamp")):
+                applied += 1
+        return applied
+
+class FrequencyCap:
+    """Per-contact sliding-window send cap.
+
+    Each contact keeps at most ``max_sends`` timestamps, so checking and
+    recording are O(1) amortized regardless of how many contacts are tracked.
+    """
+
+    def __init__(self, max_sends: int = 3, window_seconds: float = 24 * 3600):
+        self.max_sends = max_sends
+        self.window_seconds = window_seconds
+        self._sends: Dict[str, Deque[float]] = {}
+
+    def _window(self, key: str, now: float) -> Deque[float]:
+        sends = self._sends.get(key)
+        if sends is None:
+            sends = deque(maxlen=self.max_sends)
+            self._sends[key] = sends
+        while sends and now - sends[0] >= self.window_seconds:
+            sends.popleft()
+        return sends
+
+    def allow(self, key: str, now: float = None) -> bool:
+        sends = self._sends.get(key)
+        if not sends:
+            return True
+        return len(self._window(key, time.time() if now is None else now)) < self.max_sends
+
+    def record(self, key: str, now: float = None) -> None:
+        now = time.time() if now is None else now
+        self._window(key, now).append(now)
+
+    def prune(self, now: float = None) -> int:
+        """Drop contacts with no sends inside the window; returns how many were removed"""
+        now = time.time() if now is None else now
+        stale = [key for key, sends in self._sends.items() if not sends or now - sends[-1] >= self.window_seconds]
+        for key in stale:
+            del self._sends[key]
+        return len(stale)
+
+class SendGuard:
+    """Pre-send checks for the bulk pipeline: suppression list plus frequency cap"""
+
+    def __init__(self,
+                 suppression_list: SuppressionList = None,
+                 frequency_cap: FrequencyCap = None):
+        self.suppression_list = suppression_list or SuppressionList()
+        self.frequency_cap = frequency_cap or FrequencyCap()
+        self.blocked_counts: Dict[str, int] = {}
+
+    def check(self, email: str, now: float = None) -> Optional[str]:
+        """Reason the address must not be sent to right now, or None if it may be"""
+        reason = self.suppression_list.reason(email)
+        if reason is None and not self.frequency_cap.allow(normalize_email(email), now):
+            reason = "frequency_cap"
+        if reason is not None:
+            self.blocked_counts[reason] = self.blocked_counts.get(reason, 0) + 1
+        return reason
+
+    def record_send(self, email: str, now: float = None) -> None:
+        self.frequency_cap.record(normalize_email(email), now)
+
+    def filter_recipients(self, recipients: List[Any], email_of=lambda r: r) -> Tuple[List[Any], Dict[str, int]]:
+        """Split recipients into sendable ones and counts of blocked ones per reason"""
+        allowed = []
+        blocked: Dict[str, int] = {}
+        now = time.time()
+        for recipient in recipients:
+            reason = self.check(email_of(recipient), now)
+            if reason is None:
+                allowed.append(recipient)
+            else:
+                blocked[reason] = blocked.get(reason, 0) + 1
+        return allowed, blocked
+
+    def apply_event(self, event_type: str, email: str, occurred_at: str = None) -> bool:
+        return self.suppression_list.apply_event(event_type, email, occurred_at)
+
+    async def refresh_from_database(self, database_service) -> int:
+        """Incrementally load suppressing events recorded since the last refresh"""
+        if not database_service:
+            return 0
+
+        filters: Dict[str, Any] = {"event_type": {"$in": sorted(SUPPRESSING_EVENTS | {"resubscribed"})}}
+        if self.suppression_list.last_event_at:
+            filters["timestamp"] = {"$gt": self.suppression_list.last_event_at}
+
+        try:
+            events = await database_service.query("email_events", filters)
+            events = sorted(events, key=lambda e: e.get("timestamp") or "")
+            applied = self.suppression_list.apply_events(events)
+            if applied:
+                logger.info(f"Suppression list refreshed with {applied} new event(s)")
+            return applied
+        except Exception as e:
+            logger.error(f"Failed to refresh suppression list: {str(e)}")
+            return 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "suppressed_addresses": len(self.suppression_list),
+            "bloom_filter": self.suppression_list.bloom is not None,
+            "frequency_cap": {
+                "max_sends": self.frequency_cap.max_sends,
+                "window_seconds": self.frequency_cap.window_seconds
+            },
+            "blocked": dict(self.blocked_counts),
+            "last_event_at": self.suppression_list.last_event_at,
+            "updated_at": datetime.utcnow().isoformat()
+        }
+
+
+# Global send guard instance shared by the email send paths
+_send_guard = None
+
+def get_send_guard() -> SendGuard:
+    """Get the global send guard instance"""
+    global _send_guard
+    if _send_guard is None:
+        _send_guard = SendGuard()
+    return _send_guard
@@ -0,0 +1,100 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, Tuple
+import logging
+
+from .personalization_service import RenderPlan
+
+logger = logging.getLogger(__name__)
+
+# Template fields that are personalized per recipient
+RENDERED_FIELDS = ("subject_line", "html_content", "text_content")
+
+@dataclass
+class CachedTemplate:
+    """A template row together with its compiled render plans"""
+    template: Dict[str, Any]
+    plans: Dict[str, RenderPlan] = field(default_factory=dict)
+
+    @classmethod
+    def compile(cls, template: Dict[str, Any]) -> "CachedTemplate":
+        return cls(
+            template=template,
+            plans={name: RenderPlan(template.get(name) or "") for name in RENDERED_FIELDS}
+        )
+
+class TemplateCache:
+    """LRU cache of compiled templates keyed by (template_id, version).
+
+    The active version of each template is tracked separately so a lookup by
+    template id resolves to the right (template_id, version) entry without a
+    database read. Invalidating a template drops its active pointer and every
+    cached version.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int], CachedTemplate]" = OrderedDict()
+        self._active_versions: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, template_id: str, version: int = None) -> Optional[CachedTemplate]:
+        """Get a cached template; without a version the active version is used"""
+        if version is None:
+            version = self._active_versions.get(template_id)
+        key = (template_id, version)
+        entry = self._entries.get(key) if version is not None else None
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, template: Dict[str, Any], active: bool = True) -> CachedTemplate:
+        """Compile and cache a template row"""
+        template_id = template.get("template_id") or template["id"]
+        version = template.get("version", 0)
+        key = (template_id, version)
+
+        entry = CachedTemplate.compile(template)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if active:
+            self._active_versions[template_id] = version
+
+        while len(self._entries) > self.max_entries:
+            (evicted_id, evicted_version), _ = self._entries.popitem(last=False)
+            if self._active_versions.get(evicted_id) == evicted_version:
+                del self._active_versions[evicted_id]
+            self.evictions += 1
+
+        return entry
+
+    def invalidate(self, template_id: str) -> int:
+        """Drop every cached version of a template; returns the number of entries removed"""
+        self._active_versions.pop(template_id, None)
+        stale = [key for key in self._entries if key[0] == template_id]
+        for key in stale:
+            del self._entries[key]
+        if stale:
+            logger.info(f"Invalidated {len(stale)} cached version(s) of template {template_id}")
+        return len(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._active_versions.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
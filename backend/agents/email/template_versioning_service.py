@@ -4,6 +4,7 @@ from datetime import datetime
 from typing import Dict, Any, List, Optional
 import json
 import logging
+from .template_cache import TemplateCache, CachedTemplate
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +14,7 @@ class TemplateVersioningService:
     def __init__(self, database_service=None):
         self.database_service = database_service
         self.logger = logger
+        self.template_cache = TemplateCache()
     
     async def create_template_version(self, template_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new version of an existing template"""
@@ -42,6 +44,8 @@ class TemplateVersioningService:
             if self.database_service:
                 await self.database_service.save("email_template_versions", version_data)
             
+            self.template_cache.invalidate(template_id)
+            
             self.logger.info(f"Created template version {version_data['version']} for template {template_id}")
             return version_data
             
@@ -86,6 +90,22 @@ class TemplateVersioningService:
     
     async def get_template(self, template_id: str) -> Optional[Dict[str, Any]]:
         """Get current active template"""
+        cached = await self.get_compiled_template(template_id)
+        return cached.template if cached else None
+    
+    async def get_compiled_template(self, template_id: str) -> Optional[CachedTemplate]:
+        """Get current active template with its compiled render plans, served from cache when possible"""
+        cached = self.template_cache.get(template_id)
+        if cached:
+            return cached
+        
+        template = await self._fetch_template(template_id)
+        if not template:
+            return None
+        return self.template_cache.put(template)
+    
+    async def _fetch_template(self, template_id: str) -> Optional[Dict[str, Any]]:
+        """Load the current active template from the database"""
         try:
             if self.database_service:
                 template = await self.database_service.get("email_templates", template_id)
@@ -105,3 +125,26 @@ class TemplateVersioningService:
         except Exception as e:
             self.logger.error(f"Failed to get template: {str(e)}")
             return None
+    
+    async def update_version_status(self, template_id: str, version: int, status: str) -> bool:
+        """Change a template version's status (draft, active, archived) and invalidate cached copies"""
+        try:
+            if self.database_service:
+                versions = await self.database_service.query(
+                    "email_template_versions",
+                    {"template_id": template_id, "version": version}
+                )
+                for version_row in versions:
+                    await self.database_service.update(
+                        "email_template_versions",
+                        version_row["id"],
+                        {"status": status}
+                    )
+            
+            self.template_cache.invalidate(template_id)
+            self.logger.info(f"Set template {template_id} version {version} status to {status}")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Failed to update template version status: {str(e)}")
+            return False
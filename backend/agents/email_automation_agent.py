@@ -9,9 +9,30 @@ from dataclasses import dataclass, asdict
 from enum import Enum
 import httpx
 from openai import AsyncOpenAI
+from .email.send_time_optimizer import SendTimeOptimizer, format_slot, DAY_NAMES, EVENT_WEIGHTS
+from .email.message_store import CompactMessageStore
+# Imported by its backend path so this agent (loaded as ``agents...`` by config)
+# and the email routes share one send guard instead of one per module copy
+from backend.agents.email.suppression_service import get_send_guard, normalize_email
+from .email.domain_throttle import DomainSendScheduler
 
 logger = logging.getLogger(__name__)
 
+def _event_time(value: Any) -> Optional[datetime]:
+    """Local naive datetime from an event timestamp (datetime, ISO string or epoch seconds)"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value)
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    return parsed.astimezone().replace(tzinfo=None) if parsed.tzinfo else parsed
+
 class EmailType(Enum):
     WELCOME = "welcome"
     NURTURE = "nurture"
@@ -118,9 +139,27 @@ class EmailAutomationAgent:
         self.templates_store: Dict[str, EmailTemplate] = {}
         self.contacts_store: Dict[str, Contact] = {}
         self.campaigns_store: Dict[str, EmailCampaign] = {}
-        self.messages_store: Dict[str, EmailMessage] = {}
+        # Compact records; personalized bodies are rendered on demand
+        self.messages_store = CompactMessageStore(self._render_message_content)
         self.sequences_store: Dict[str, AutomationSequence] = {}
         
+        # Suppression list and per-contact frequency cap shared with the other send paths
+        self.send_guard = get_send_guard()
+        
+        # Per-mailbox-provider pacing for campaign sends
+        throttle_config = email_service_credentials or {}
+        self.domain_scheduler = DomainSendScheduler(
+            default_rate=float(throttle_config.get("default_domain_rate", 10.0)),
+            domain_rates=throttle_config.get("domain_rates")
+        )
+        # Pending per-slot send tasks, kept so they are not garbage collected
+        self._scheduled_sends = set()
+        
+        # Engagement histograms for local send-time optimization, keyed by
+        # normalized address so stored history applies to contacts added later
+        self.send_time_optimizer = SendTimeOptimizer()
+        self._engagement_history_loaded = False
+        
         # Email service API endpoints
         self.email_apis = {
             "sendgrid": "https://api.sendgrid.com/v3",
@@ -464,7 +503,8 @@ class EmailAutomationAgent:
                           campaign_name: str,
                           template_id: str,
                           audience_filter: Dict[str, Any],
-                          send_time: datetime = None) -> EmailCampaign:
+                          send_time: datetime = None,
+                          optimize_send_time: bool = False) -> EmailCampaign:
         """Send email campaign to filtered audience"""
         
         campaign_id = f"campaign_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
@@ -497,8 +537,16 @@ class EmailAutomationAgent:
         
         self.campaigns_store[campaign_id] = campaign
         
+        # Pick each contact's best engagement slot at or after the campaign send time
+        contact_send_times = None
+        if optimize_send_time:
+            contact_send_times = self.get_optimal_send_times(
+                [c.id for c in target_contacts], after=send_time
+            )
+            campaign.schedule["optimized_per_contact"] = True
+        
         # Send emails
-        await self._send_campaign_emails(campaign, target_contacts, template, send_time)
+        await self._send_campaign_emails(campaign, target_contacts, template, send_time, contact_send_times)
         
         # Save to database
         if self.supabase:
@@ -543,42 +591,59 @@ class EmailAutomationAgent:
                                   campaign: EmailCampaign,
                                   contacts: List[Contact],
                                   template: EmailTemplate,
-                                  send_time: datetime):
+                                  send_time: datetime,
+                                  contact_send_times: Dict[str, datetime] = None):
         """Send emails for campaign"""
         
+        due_now = []
+        # Future sends are bucketed by send slot; each slot wakes once
+        scheduled: Dict[datetime, List[Tuple[Any, str]]] = {}
         for contact in contacts:
             try:
-                # Personalize content
-                personalized_content = await self._personalize_email(template, contact)
+                # The full guard (suppression plus frequency cap) runs once, at send time
+                if contact.email in self.send_guard.suppression_list:
+                    campaign.metrics["suppressed"] = campaign.metrics.get("suppressed", 0) + 1
+                    continue
                 
-                # Create email message
-                message = EmailMessage(
-                    id=f"msg_{campaign.id}_{contact.id}",
+                contact_send_time = (contact_send_times or {}).get(contact.id, send_time)
+                
+                # Create email message; content is rendered from the template when sent
+                message = self.messages_store.add(
                     campaign_id=campaign.id,
                     contact_id=contact.id,
                     template_id=template.id,
-                    subject_line=personalized_content["subject"],
-                    content=personalized_content["html"],
-                    scheduled_at=send_time,
-                    sent_at=None,
-                    status=EmailStatus.SCHEDULED,
-                    tracking_data={}
+                    scheduled_at=contact_send_time,
+                    status=EmailStatus.SCHEDULED
                 )
                 
-                self.messages_store[message.id] = message
-                
                 # Send email
-                if send_time <= datetime.now():
-                    await self._send_email_message(message)
+                if contact_send_time <= datetime.now():
+                    due_now.append((message, contact.email))
                 else:
                     # Schedule for later
-                    asyncio.create_task(self._schedule_email_send(message, send_time))
+                    scheduled.setdefault(contact_send_time, []).append((message, contact.email))
                 
             except Exception as e:
                 logger.error(f"Error sending email to {contact.email}: {str(e)}")
+        
+        for slot_time, entries in scheduled.items():
+            task = asyncio.create_task(self._schedule_email_send(entries, slot_time))
+            self._scheduled_sends.add(task)
+            task.add_done_callback(self._scheduled_sends.discard)
+        
+        await self._dispatch_throttled(due_now)
+
+    async def _dispatch_throttled(self, entries: List[Tuple[Any, str]]):
+        """Interleave (message, email) entries across mailbox providers within their rate limits"""
+        self.domain_scheduler.enqueue_many(entries, lambda entry: entry[1])
+        await self.domain_scheduler.drain(lambda entry: self._send_email_message(entry[0]))
 
     async def _personalize_email(self, template: EmailTemplate, contact: Contact) -> Dict[str, str]:
         """Personalize email content for contact"""
+        return self._render_personalized(template, contact)
+
+    def _render_personalized(self, template: EmailTemplate, contact: Contact) -> Dict[str, str]:
+        """Replace template variables with contact data"""
         
         # Create personalization map
         personalization = {
@@ -606,11 +671,33 @@ class EmailAutomationAgent:
             "html": personalized_html
         }
 
+    def _render_message_content(self, template_id: str, contact_id: str) -> Dict[str, str]:
+        """Render a stored message's subject and body from its template and contact"""
+        template = self.templates_store.get(template_id)
+        contact = self.contacts_store.get(contact_id)
+        if not template or not contact:
+            logger.warning(f"Cannot render message for template {template_id} and contact {contact_id}")
+            return {"subject": "", "html": ""}
+        
+        return self._render_personalized(template, contact)
+
     async def _send_email_message(self, message: EmailMessage):
         """Send individual email message"""
         
         service = self.credentials.get("email_service", "sendgrid")
         
+        # Checked at send time: scheduled messages may outlive an unsubscribe or
+        # bounce, and the frequency cap depends on what was sent meanwhile
+        contact = self.contacts_store.get(message.contact_id)
+        blocked_reason = self.send_guard.check(contact.email) if contact else None
+        if blocked_reason:
+            logger.info(f"Skipping message {message.id}: {blocked_reason}")
+            campaign = self.campaigns_store.get(message.campaign_id)
+            if campaign:
+                metric = "frequency_capped" if blocked_reason == "frequency_cap" else "suppressed"
+                campaign.metrics[metric] = campaign.metrics.get(metric, 0) + 1
+            return
+        
         try:
             if service == "sendgrid":
                 success = await self._send_via_sendgrid(message)
@@ -623,6 +710,8 @@ class EmailAutomationAgent:
             if success:
                 message.status = EmailStatus.SENT
                 message.sent_at = datetime.now()
+                if contact:
+                    self.send_guard.record_send(contact.email)
                 
                 # Update campaign metrics
                 campaign = self.campaigns_store.get(message.campaign_id)
@@ -647,11 +736,14 @@ class EmailAutomationAgent:
                 "Content-Type": "application/json"
             }
             
+            rendered = {"subject": message.subject_line, "html": message.content} \
+                if isinstance(message, EmailMessage) else message.render()
+            
             payload = {
                 "personalizations": [
                     {
                         "to": [{"email": contact.email, "name": f"{contact.first_name} {contact.last_name}".strip()}],
-                        "subject": message.subject_line
+                        "subject": rendered["subject"]
                     }
                 ],
                 "from": {
@@ -661,7 +753,7 @@ class EmailAutomationAgent:
                 "content": [
                     {
                         "type": "text/html",
-                        "value": message.content
+                        "value": rendered["html"]
                     }
                 ],
                 "tracking_settings": {
@@ -694,13 +786,13 @@ class EmailAutomationAgent:
             logger.error(f"Mailchimp send error: {str(e)}")
             return False
 
-    async def _schedule_email_send(self, message: EmailMessage, send_time: datetime):
-        """Schedule email for future sending"""
+    async def _schedule_email_send(self, entries: List[Tuple[Any, str]], send_time: datetime):
+        """Wait for a send slot, then pace its messages through the domain scheduler"""
         delay = (send_time - datetime.now()).total_seconds()
         
         if delay > 0:
             await asyncio.sleep(delay)
-            await self._send_email_message(message)
+        await self._dispatch_throttled(entries)
 
     async def get_campaign_analytics(self, campaign_id: str = None) -> Dict[str, Any]:
         """Get email campaign analytics"""
@@ -774,8 +866,178 @@ class EmailAutomationAgent:
         scored_campaigns.sort(key=lambda x: x['performance_score'], reverse=True)
         return scored_campaigns[:limit]
 
-    async def optimize_send_times(self, contact_ids: List[str] = None) -> Dict[str, Any]:
-        """Analyze and recommend optimal send times"""
+    def get_send_queue_status(self) -> Dict[str, Any]:
+        """Per-domain queue depth, dispatch counts and rates of the send scheduler"""
+        return self.domain_scheduler.get_stats()
+
+    def _contact_segment(self, contact: Contact) -> Optional[str]:
+        """Segment used as the send-time prior for a contact (its first tag)"""
+        return contact.tags[0] if contact.tags else None
+
+    def _engagement_key(self, contact_id: str) -> str:
+        """Histogram key for a contact: its normalized address, or the id if unknown"""
+        contact = self.contacts_store.get(contact_id)
+        return normalize_email(contact.email) if contact and contact.email else contact_id
+
+    def record_engagement_event(self,
+                                message_id: str,
+                                event_type: str,
+                                occurred_at: datetime = None,
+                                bounce_type: str = None) -> bool:
+        """Record an open/click/bounce/unsubscribe for a sent message.
+        
+        Opens and clicks update the engagement histograms; hard bounces and
+        unsubscribes add the contact to the suppression list. Soft bounces
+        are transient and only mark the message.
+        """
+        message = self.messages_store.get(message_id)
+        if not message:
+            return False
+        
+        occurred_at = occurred_at or datetime.now()
+        contact = self.contacts_store.get(message.contact_id)
+        if event_type == "opened":
+            message.status = EmailStatus.OPENED
+        elif event_type == "clicked":
+            message.status = EmailStatus.CLICKED
+        elif event_type in ("bounced", "unsubscribed"):
+            message.status = EmailStatus(event_type)
+            if contact and not (event_type == "bounced" and bounce_type == "soft"):
+                self.send_guard.apply_event(event_type, contact.email)
+                if event_type == "unsubscribed":
+                    contact.subscribed = False
+            return True
+        
+        campaign = self.campaigns_store.get(message.campaign_id)
+        if campaign and event_type in ("opened", "clicked"):
+            campaign.metrics[event_type] = campaign.metrics.get(event_type, 0) + 1
+        
+        segment = self._contact_segment(contact) if contact else None
+        self.send_time_optimizer.record_event(self._engagement_key(message.contact_id), occurred_at, event_type, segment)
+        return True
+
+    def _contacts_by_email(self) -> Dict[str, Contact]:
+        return {normalize_email(c.email): c for c in self.contacts_store.values() if c.email}
+
+    def ingest_email_events(self, events: List[Dict[str, Any]]) -> int:
+        """Apply delivery event rows shaped like ``email_events`` (email_id, event_type, timestamp, metadata).
+        
+        Bounces, unsubscribes and resubscribes update the suppression list by
+        recipient address whatever the message. Events for messages this agent
+        sent go through record_engagement_event; opens and clicks for other
+        mail still update the histograms under the recipient address. Returns
+        the number of events applied.
+        """
+        contacts_by_email = None
+        applied = 0
+        for event in events:
+            event_type = event.get("event_type")
+            occurred_at = _event_time(event.get("timestamp"))
+            metadata = event.get("metadata") or {}
+            bounce_type = event.get("bounce_type") or metadata.get("bounce_type")
+            recipient = event.get("email") or event.get("recipient") or metadata.get("recipient")
+            
+            suppressed = False
+            if recipient and not (event_type == "bounced" and bounce_type == "soft"):
+                suppressed = self.send_guard.apply_event(event_type, recipient)
+                if event_type in ("unsubscribed", "resubscribed"):
+                    if contacts_by_email is None:
+                        contacts_by_email = self._contacts_by_email()
+                    contact = contacts_by_email.get(normalize_email(recipient))
+                    if contact:
+                        contact.subscribed = event_type == "resubscribed"
+            
+            if self.record_engagement_event(event.get("email_id") or "", event_type, occurred_at, bounce_type):
+                applied += 1
+                continue
+            if suppressed:
+                applied += 1
+                continue
+            
+            if event_type not in EVENT_WEIGHTS or not recipient:
+                continue
+            if contacts_by_email is None:
+                contacts_by_email = self._contacts_by_email()
+            contact = contacts_by_email.get(normalize_email(recipient))
+            segment = self._contact_segment(contact) if contact else None
+            self.send_time_optimizer.record_event(normalize_email(recipient), occurred_at or datetime.now(), event_type, segment)
+            applied += 1
+        return applied
+
+    def load_engagement_history(self, supabase_client=None, page_size: int = 1000) -> int:
+        """Seed the engagement histograms from stored history (blocking; runs once at startup).
+        
+        Opens and clicks stored in ``email_events`` are replayed by recipient
+        address, and stored messages whose status shows engagement but have no
+        stored event count at their send time. Returns the number of events applied.
+        """
+        if self._engagement_history_loaded:
+            return 0
+        self._engagement_history_loaded = True
+        
+        supabase = supabase_client or self.supabase
+        contacts_by_email = self._contacts_by_email()
+        events = []
+        seen_messages = set()
+        if supabase is not None and hasattr(supabase, "table"):
+            offset = 0
+            while True:
+                try:
+                    rows = supabase.table("email_events") \
+                        .select("id, email_id, event_type, timestamp, metadata") \
+                        .in_("event_type", sorted(EVENT_WEIGHTS)) \
+                        .order("id") \
+                        .range(offset, offset + page_size - 1) \
+                        .execute().data or []
+                except Exception as e:
+                    logger.warning(f"Could not load stored email events for send-time history: {str(e)}")
+                    break
+                for row in rows:
+                    message = self.messages_store.get(row.get("email_id") or "")
+                    recipient = (row.get("metadata") or {}).get("recipient")
+                    if message:
+                        seen_messages.add(message.id)
+                        key = self._engagement_key(message.contact_id)
+                    elif recipient:
+                        key = normalize_email(recipient)
+                    else:
+                        continue
+                    contact = contacts_by_email.get(key)
+                    segment = self._contact_segment(contact) if contact else None
+                    events.append((key, _event_time(row.get("timestamp")), row.get("event_type"), segment))
+                if len(rows) < page_size:
+                    break
+                offset += page_size
+        
+        for message in self.messages_store.values():
+            if message.id in seen_messages or not message.sent_at:
+                continue
+            if message.status in (EmailStatus.OPENED, EmailStatus.CLICKED):
+                contact = self.contacts_store.get(message.contact_id)
+                segment = self._contact_segment(contact) if contact else None
+                events.append((self._engagement_key(message.contact_id), message.sent_at, message.status.value, segment))
+        
+        applied = self.send_time_optimizer.record_events(events)
+        logger.info(f"Loaded {applied} engagement event(s) into the send-time histograms")
+        return applied
+
+    def get_optimal_send_times(self, contact_ids: List[str], after: datetime = None) -> Dict[str, datetime]:
+        """Best upcoming send time for each contact, computed in bulk from engagement histograms"""
+        keys = [self._engagement_key(contact_id) for contact_id in contact_ids]
+        for contact_id, key in zip(contact_ids, keys):
+            contact = self.contacts_store.get(contact_id)
+            if contact:
+                self.send_time_optimizer.set_contact_segment(key, self._contact_segment(contact))
+        
+        send_times = self.send_time_optimizer.next_send_times(keys, after=after)
+        return {contact_id: send_times[key] for contact_id, key in zip(contact_ids, keys)}
+
+    async def optimize_send_times(self, contact_ids: List[str] = None, use_ai: bool = False) -> Dict[str, Any]:
+        """Analyze and recommend optimal send times.
+        
+        Recommendations come from the local engagement histograms; set use_ai
+        to additionally request narrative commentary from the LLM.
+        """
         
         if contact_ids:
             contacts = [self.contacts_store.get(cid) for cid in contact_ids if cid in self.contacts_store]
@@ -788,28 +1050,44 @@ class EmailAutomationAgent:
         # Analyze email engagement patterns
         engagement_analysis = await self._analyze_engagement_patterns(contacts)
         
-        # Generate AI recommendations
-        optimization_prompt = f"""
-        Analyze email engagement patterns and recommend optimal send times:
+        recommendations = self.send_time_optimizer.recommend([self._engagement_key(c.id) for c in contacts])
+        if not recommendations["optimal_times"]:
+            recommendations["optimal_times"] = [format_slot(1 * 24 + 10)["time"]]
+        recommendations["ab_test_recommendations"] = [
+            "Test morning vs afternoon sends",
+            "Compare per-contact optimized sends against a single batch send"
+        ]
+        
+        result = {
+            "analysis": engagement_analysis,
+            "recommendations": recommendations,
+            "analysis_date": datetime.now().isoformat()
+        }
+        
+        if use_ai:
+            result["ai_commentary"] = await self._generate_send_time_commentary(engagement_analysis, recommendations)
+        
+        return result
+
+    async def _generate_send_time_commentary(self,
+                                             engagement_analysis: Dict[str, Any],
+                                             recommendations: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Ask the LLM to explain locally computed send-time recommendations"""
+        
+        commentary_prompt = f"""
+        Review these email engagement patterns and the send-time recommendations derived from them:
         
         Engagement Data:
         {json.dumps(engagement_analysis, indent=2)}
         
-        Provide recommendations for:
-        1. Best days of week for sending
-        2. Optimal time ranges
-        3. Audience-specific recommendations
-        4. A/B testing suggestions
+        Recommendations:
+        {json.dumps(recommendations, indent=2)}
         
         Format as JSON:
         {{
-            "best_days": ["Monday", "Tuesday", "Wednesday"],
-            "optimal_times": ["9:00 AM", "2:00 PM", "6:00 PM"],
-            "audience_segments": {{
-                "high_engagement": {{"best_time": "9:00 AM", "reasoning": "Active morning readers"}},
-                "business_users": {{"best_time": "2:00 PM", "reasoning": "Lunch break engagement"}}
-            }},
-            "ab_test_recommendations": ["Test morning vs afternoon sends", "Compare weekday vs weekend performance"]
+            "summary": "short explanation of the recommended send times",
+            "audience_notes": ["note about a segment"],
+            "ab_test_recommendations": ["Test morning vs afternoon sends"]
         }}
         """
         
@@ -818,50 +1096,37 @@ class EmailAutomationAgent:
                 model="gpt-4",
                 messages=[
                     {"role": "system", "content": "You are an email marketing optimization expert. Always respond with valid JSON."},
-                    {"role": "user", "content": optimization_prompt}
+                    {"role": "user", "content": commentary_prompt}
                 ],
                 temperature=0.3,
                 max_tokens=800
             )
             
-            recommendations = json.loads(response.choices[0].message.content)
-            return {
-                "analysis": engagement_analysis,
-                "recommendations": recommendations,
-                "analysis_date": datetime.now().isoformat()
-            }
+            return json.loads(response.choices[0].message.content)
             
         except Exception as e:
-            logger.error(f"Error optimizing send times: {str(e)}")
-            return {
-                "analysis": engagement_analysis,
-                "error": "Failed to generate AI recommendations"
-            }
+            logger.error(f"Error generating send time commentary: {str(e)}")
+            return None
 
     async def _analyze_engagement_patterns(self, contacts: List[Contact]) -> Dict[str, Any]:
-        """Analyze engagement patterns from email messages"""
+        """Analyze engagement patterns from the engagement histograms"""
         
-        # Get all messages for these contacts
         contact_ids = {c.id for c in contacts}
-        messages = [m for m in self.messages_store.values() if m.contact_id in contact_ids]
+        total_messages = sum(1 for m in self.messages_store.values() if m.contact_id in contact_ids)
+        histogram = self.send_time_optimizer.aggregate_histogram([self._engagement_key(c.id) for c in contacts])
         
-        if not messages:
+        if not total_messages and not histogram.any():
             return {"message": "No email data available for analysis"}
         
-        # Analyze by day of week
-        day_engagement = {}
-        time_engagement = {}
-        
-        for message in messages:
-            if message.sent_at and message.status in [EmailStatus.OPENED, EmailStatus.CLICKED]:
-                day = message.sent_at.strftime("%A")
-                hour = message.sent_at.hour
-                
-                day_engagement[day] = day_engagement.get(day, 0) + 1
-                time_engagement[hour] = time_engagement.get(hour, 0) + 1
+        by_day = histogram.sum(axis=1)
+        by_hour = histogram.sum(axis=0)
+        day_engagement = {DAY_NAMES[i]: float(by_day[i]) for i in range(len(by_day)) if by_day[i] > 0}
+        time_engagement = {hour: float(by_hour[hour]) for hour in range(len(by_hour)) if by_hour[hour] > 0}
         
         return {
-            "total_messages": len(messages),
+            "total_contacts": len(contact_ids),
+            "total_messages": total_messages,
+            "total_engagement": float(histogram.sum()),
             "engagement_by_day": day_engagement,
             "engagement_by_hour": time_engagement,
             "top_performing_days": sorted(day_engagement.items(), key=lambda x: x[1], reverse=True)[:3],
@@ -36,6 +36,18 @@ class BaseLeadService(ABC):
             self.logger.error(f"Failed to get lead data: {str(e)}")
             return []
     
+    async def get_leads_by_ids(self, lead_ids: List[str], chunk_size: int = 200) -> List[Dict[str, Any]]:
+        """Fetch many leads with one ``in`` query per chunk of ids"""
+        leads = []
+        for start in range(0, len(lead_ids), chunk_size):
+            chunk = lead_ids[start:start + chunk_size]
+            try:
+                result = self.supabase.table("leads").select("*").in_("id", chunk).execute()
+                leads.extend(result.data or [])
+            except Exception as e:
+                self.logger.error(f"Failed to get lead data for {len(chunk)} leads: {str(e)}")
+        return leads
+    
     def validate_input_data(self, required_fields: List[str], input_data: Dict[str, Any]) -> bool:
         """Validate that required fields are present in input data"""
         missing_fields = [field for field in required_fields if field not in input_data]
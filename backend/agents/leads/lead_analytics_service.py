@@ -1,60 +1,146 @@
 
-from datetime import datetime
-from typing import Dict, Any
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
 from .base_lead_service import BaseLeadService
 
+PATTERN_DIMENSIONS = ("industry", "company_size", "source")
+
 class LeadAnalyticsService(BaseLeadService):
-    """Service for analyzing lead patterns and trends"""
-    
+    """Service for analyzing lead patterns and trends.
+
+    Counts come from the ``lead_pattern_summary`` database function, which
+    reads a trigger-maintained daily rollup instead of the leads themselves.
+    Without it, only the grouped columns of the matching leads are read and
+    tallied here.
+    """
+
     async def analyze_lead_patterns(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze patterns in lead data"""
         try:
-            # Get recent leads for pattern analysis
-            leads = await self.get_lead_data(filters={"status": "new"})
-            
-            if not leads:
+            status = input_data.get("status", "new")
+            window_days = int(input_data.get("window_days", 30))
+            user_id = input_data.get("user_id")
+
+            try:
+                rows = await asyncio.to_thread(self._summary_from_rollup, status, window_days, user_id)
+                aggregation = "rollup"
+            except Exception as e:
+                self.logger.warning(f"lead_pattern_summary unavailable, grouping lead columns instead: {str(e)}")
+                rows = await asyncio.to_thread(self._summary_from_leads, status, window_days, user_id)
+                aggregation = "scan"
+
+            counts = {dimension: {} for dimension in PATTERN_DIMENSIONS}
+            for row in rows:
+                if row["dimension"] in counts:
+                    counts[row["dimension"]][row["value"]] = row
+            total = sum(int(row["total"]) for row in counts["source"].values())
+
+            if not total:
                 return {
                     "patterns": [],
                     "insights": ["No recent leads found for analysis"],
                     "timestamp": datetime.utcnow().isoformat(),
                     "status": "success"
                 }
-            
-            # Simple pattern analysis
-            industries = {}
-            company_sizes = {}
-            sources = {}
-            
-            for lead in leads:
-                industry = lead.get("industry", "unknown")
-                industries[industry] = industries.get(industry, 0) + 1
-                
-                size = lead.get("company_size", "unknown") 
-                company_sizes[size] = company_sizes.get(size, 0) + 1
-                
-                source = lead.get("source", "unknown")
-                sources[source] = sources.get(source, 0) + 1
-            
+
+            def totals(dimension: str) -> Dict[str, int]:
+                return {value: int(row["total"]) for value, row in counts[dimension].items()}
+
+            industries = totals("industry")
+            sources = totals("source")
+            trends = {dimension: self._trends(counts[dimension]) for dimension in PATTERN_DIMENSIONS}
+
             patterns = {
                 "top_industries": sorted(industries.items(), key=lambda x: x[1], reverse=True)[:5],
-                "company_size_distribution": company_sizes,
+                "company_size_distribution": totals("company_size"),
                 "lead_sources": sources,
-                "total_analyzed": len(leads)
+                "total_analyzed": total,
+                "window_days": window_days,
+                "trends": trends
             }
-            
+
             insights = [
                 f"Most common industry: {patterns['top_industries'][0][0] if patterns['top_industries'] else 'N/A'}",
                 f"Primary lead source: {max(sources.items(), key=lambda x: x[1])[0] if sources else 'N/A'}",
-                f"Total leads analyzed: {len(leads)}"
+                f"Total leads analyzed: {total}"
             ]
-            
+            current = sum(trend["current"] for trend in trends["source"])
+            previous = sum(trend["previous"] for trend in trends["source"])
+            insights.append(f"Leads in the last {window_days} days: {current} (previous {window_days} days: {previous})")
+            growing = [trend for trend in trends["source"] if trend["change_percent"] is not None and trend["current"]]
+            if growing:
+                fastest = max(growing, key=lambda trend: trend["change_percent"])
+                insights.append(f"Fastest growing source: {fastest['value']} ({fastest['change_percent']:+.0f}%)")
+
             return {
                 "patterns": patterns,
                 "insights": insights,
+                "aggregation": aggregation,
                 "timestamp": datetime.utcnow().isoformat(),
                 "status": "success"
             }
-            
+
         except Exception as e:
             self.logger.error(f"Failed to analyze lead patterns: {str(e)}")
             raise Exception(f"Lead pattern analysis failed: {str(e)}")
+
+    @staticmethod
+    def _trends(rows: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Current vs previous window per value, largest current window first"""
+        trends = []
+        for value, row in rows.items():
+            current, previous = int(row["current_window"]), int(row["previous_window"])
+            trends.append({
+                "value": value,
+                "current": current,
+                "previous": previous,
+                "change_percent": round((current - previous) / previous * 100, 1) if previous else None
+            })
+        return sorted(trends, key=lambda trend: (-trend["current"], -trend["previous"], trend["value"]))
+
+    def _summary_from_rollup(self, status: str, window_days: int, user_id: Optional[str]) -> List[Dict[str, Any]]:
+        result = self.supabase.rpc("lead_pattern_summary", {
+            "p_status": status,
+            "p_window_days": window_days,
+            "p_user_id": user_id
+        }).execute()
+        if result.data is None:
+            raise ValueError("lead_pattern_summary returned no data")
+        return result.data
+
+    def _summary_from_leads(self,
+                            status: str,
+                            window_days: int,
+                            user_id: Optional[str],
+                            page_size: int = 1000) -> List[Dict[str, Any]]:
+        """Same rows as the rollup, from the grouped columns of matching leads"""
+        today = datetime.utcnow().date()
+        current_start = (today - timedelta(days=window_days - 1)).isoformat()
+        previous_start = (today - timedelta(days=2 * window_days - 1)).isoformat()
+
+        counts: Dict[tuple, List[int]] = {}
+        offset = 0
+        while True:
+            query = self.supabase.table("leads").select("id, industry, company_size, source, created_at") \
+                .eq("status", status)
+            if user_id:
+                query = query.eq("created_by", user_id)
+            rows = query.order("id").range(offset, offset + page_size - 1).execute().data or []
+            for lead in rows:
+                # ISO timestamps compare correctly by their date prefix
+                day = str(lead.get("created_at") or today.isoformat())[:10]
+                window = 1 if day >= current_start else 2 if day >= previous_start else None
+                for dimension in PATTERN_DIMENSIONS:
+                    tally = counts.setdefault((dimension, lead.get(dimension) or "unknown"), [0, 0, 0])
+                    tally[0] += 1
+                    if window is not None:
+                        tally[window] += 1
+            if len(rows) < page_size:
+                break
+            offset += page_size
+
+        return [
+            {"dimension": dimension, "value": value, "total": total, "current_window": current, "previous_window": previous}
+            for (dimension, value), (total, current, previous) in counts.items()
+        ]
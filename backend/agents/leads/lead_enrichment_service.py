@@ -1,73 +1,211 @@
 
+import asyncio
+import re
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import json
+from backend.singleflight import SingleFlight
 from .base_lead_service import BaseLeadService
+from ..analytics.insight_cache import InsightCache
+
+# Mailbox providers say nothing about the lead's company
+FREE_EMAIL_DOMAINS = frozenset({
+    "gmail.com", "googlemail.com", "yahoo.com", "hotmail.com", "outlook.com",
+    "live.com", "msn.com", "aol.com", "icloud.com", "me.com", "proton.me",
+    "protonmail.com", "gmx.com", "mail.com", "yandex.com", "zoho.com"
+})
+
+COMPANY_SUFFIXES = re.compile(r"\b(inc|llc|ltd|limited|corp|corporation|co|gmbh|plc|pty|sa|ag)\b\.?")
+
+def normalize_domain(value: str) -> str:
+    """Bare lowercase host from a URL, host or email address"""
+    value = (value or "").strip().lower()
+    if "@" in value:
+        value = value.rsplit("@", 1)[1]
+    value = re.sub(r"^[a-z]+://", "", value).split("/", 1)[0].split(":", 1)[0]
+    return value[4:] if value.startswith("www.") else value
+
+def company_identity(lead: Dict[str, Any]) -> Optional[str]:
+    """Normalized company domain, or ``name:<company>`` without one; None when the company is unknown"""
+    domain = normalize_domain(lead.get("website") or lead.get("company_domain") or "")
+    if not domain:
+        email_domain = normalize_domain(lead.get("email") or "")
+        if email_domain and email_domain not in FREE_EMAIL_DOMAINS:
+            domain = email_domain
+    if domain:
+        return domain
+    company = COMPANY_SUFFIXES.sub("", (lead.get("company") or "").lower())
+    company = re.sub(r"[^a-z0-9]+", " ", company).strip()
+    return f"name:{company}" if company else None
+
+def company_cache_key(lead: Dict[str, Any]) -> Optional[str]:
+    """Normalized company domain (or name) plus industry; None when the company is unknown"""
+    identity = company_identity(lead)
+    if identity is None:
+        return None
+    industry = (lead.get("industry") or "").strip().lower()
+    return InsightCache.make_key("lead_enrichment", identity, industry)
 
 class LeadEnrichmentService(BaseLeadService):
-    """Service for enriching leads with AI-generated insights"""
-    
+    """Service for enriching leads with AI-generated insights.
+
+    Insights are generated from company-level fields only, once per company
+    (keyed by normalized domain + industry), and shared by every lead from it
+    across batches until the TTL expires; each lead's job title is layered on
+    afterwards. Leads are enriched concurrently up to ``max_concurrency`` LLM
+    calls, and only their ``enriched_data`` and ``updated_at`` are written back.
+    """
+
+    def __init__(self,
+                 supabase_client,
+                 agent_id: int,
+                 ai_service,
+                 max_concurrency: int = 10,
+                 cache_ttl_seconds: float = 7 * 24 * 3600,
+                 cache_max_entries: int = 5000,
+                 write_batch_size: int = 500):
+        super().__init__(supabase_client, agent_id, ai_service)
+        self.llm_semaphore = asyncio.Semaphore(max_concurrency)
+        self.insight_cache = InsightCache(max_entries=cache_max_entries, ttl_seconds=cache_ttl_seconds)
+        self.write_batch_size = write_batch_size
+        self._inflight = SingleFlight()
+        self._use_rpc = True
+        self.llm_calls = 0
+
     async def enrich_leads(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """Enrich leads with AI-generated insights"""
         lead_ids = input_data.get("lead_ids", [])
-        enriched_count = 0
-        failed_count = 0
-        
+        llm_calls_before = self.llm_calls
+        cache_hits_before = self.insight_cache.hits
+
         self.logger.info(f"Starting AI enrichment for {len(lead_ids)} leads")
-        
-        for lead_id in lead_ids:
-            try:
-                lead_data = await self.get_lead_data(lead_id=lead_id)
-                if not lead_data:
-                    failed_count += 1
-                    continue
-                
-                lead = lead_data[0]
-                
-                # Generate AI insights
-                ai_insights = await self.ai_service.generate_lead_enrichment_insights(lead)
-                
-                # Structure enrichment data
-                enrichment_data = {
-                    "enriched_at": datetime.utcnow().isoformat(),
-                    "ai_insights": ai_insights.get("insights", []),
-                    "talking_points": ai_insights.get("talking_points", []),
-                    "recommended_approach": ai_insights.get("recommended_approach", ""),
-                    "pain_points": ai_insights.get("pain_points", []),
-                    "value_propositions": ai_insights.get("value_propositions", []),
-                    "enrichment_source": "ai_analysis"
-                }
-                
-                # Merge with existing enriched data
-                existing_data = lead.get("enriched_data", {})
-                if isinstance(existing_data, str):
-                    try:
-                        existing_data = json.loads(existing_data)
-                    except:
-                        existing_data = {}
-                
-                merged_data = {**existing_data, **enrichment_data}
-                
-                # Update lead in database
-                self.supabase.table("leads")\
-                    .update({
-                        "enriched_data": merged_data,
-                        "updated_at": datetime.utcnow().isoformat()
-                    })\
-                    .eq("id", lead_id)\
-                    .execute()
-                
-                enriched_count += 1
-                self.logger.info(f"Successfully enriched lead {lead_id}")
-                
-            except Exception as e:
-                self.logger.error(f"Failed to enrich lead {lead_id}: {str(e)}")
-                failed_count += 1
-        
+
+        leads = await self.get_leads_by_ids(lead_ids)
+        results = await asyncio.gather(*(self._enrich_lead(lead) for lead in leads))
+        updates = [row for row in results if row is not None]
+        enriched_count = await self._write_enriched(updates)
+
         return {
             "enriched_count": enriched_count,
-            "failed_count": failed_count,
+            "failed_count": len(lead_ids) - enriched_count,
             "total_processed": len(lead_ids),
+            "llm_calls": self.llm_calls - llm_calls_before,
+            "cache_hits": self.insight_cache.hits - cache_hits_before,
             "timestamp": datetime.utcnow().isoformat(),
             "status": "success"
         }
+
+    async def _enrich_lead(self, lead: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Id and merged enrichment data for the lead, or None if insight generation failed"""
+        try:
+            ai_insights = await self._company_insights(lead)
+        except Exception as e:
+            self.logger.error(f"Failed to enrich lead {lead.get('id')}: {str(e)}")
+            return None
+
+        # Structure enrichment data
+        enrichment_data = {
+            "enriched_at": datetime.utcnow().isoformat(),
+            "ai_insights": ai_insights.get("insights", []),
+            "talking_points": ai_insights.get("talking_points", []),
+            "recommended_approach": ai_insights.get("recommended_approach", ""),
+            "pain_points": ai_insights.get("pain_points", []),
+            "value_propositions": ai_insights.get("value_propositions", []),
+            "enrichment_source": "ai_analysis"
+        }
+
+        # Company insights are shared, so the contact's role is added per lead
+        job_title = lead.get("job_title")
+        if job_title and company_cache_key(lead) is not None:
+            enrichment_data["talking_points"] = [
+                f"Relate each point to the priorities of a {job_title}",
+                *enrichment_data["talking_points"]
+            ]
+
+        # Merge with existing enriched data
+        existing_data = lead.get("enriched_data") or {}
+        if isinstance(existing_data, str):
+            try:
+                existing_data = json.loads(existing_data)
+            except:
+                existing_data = {}
+
+        return {"id": lead["id"], "enriched_data": {**existing_data, **enrichment_data}}
+
+    async def _company_insights(self, lead: Dict[str, Any]) -> Dict[str, Any]:
+        """Insights for the lead's company, shared across leads and concurrent callers"""
+        key = company_cache_key(lead)
+        if key is None:
+            # No company to share insights with, so the lead's own profile is used
+            async with self.llm_semaphore:
+                self.llm_calls += 1
+                return await self.ai_service.generate_lead_enrichment_insights(lead)
+
+        cached = self.insight_cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Another lead from the same company may already be being enriched
+        insights, _ = await self._inflight.run(key, lambda: self._load_company_insights(key, lead))
+        return insights
+
+    async def _load_company_insights(self, key: str, lead: Dict[str, Any]) -> Dict[str, Any]:
+        insights = await self._generate_company_insights(lead)
+        self.insight_cache.put(key, insights)
+        return insights
+
+    async def _generate_company_insights(self, lead: Dict[str, Any]) -> Dict[str, Any]:
+        """Insights from the company fields alone, so the cached result names no contact"""
+        identity = company_identity(lead) or ""
+        company_data = {
+            "company": lead.get("company") or "",
+            "domain": "" if identity.startswith("name:") else identity,
+            "industry": lead.get("industry") or ""
+        }
+        async with self.llm_semaphore:
+            self.llm_calls += 1
+            return await self.ai_service.generate_company_insights(company_data)
+
+    async def _write_enriched(self, rows: List[Dict[str, Any]]) -> int:
+        """Write enriched_data back in chunks; returns the number of leads updated.
+
+        Only ``enriched_data`` and ``updated_at`` are written, so columns changed
+        meanwhile are kept and leads deleted meanwhile stay deleted.
+        """
+        written = 0
+        for start in range(0, len(rows), self.write_batch_size):
+            chunk = rows[start:start + self.write_batch_size]
+            if self._use_rpc:
+                try:
+                    written += self._update_chunk(chunk)
+                    self.logger.info(f"Successfully enriched {len(chunk)} leads")
+                    continue
+                except Exception as e:
+                    self.logger.warning(f"⚠️ update_lead_enrichment function unavailable, updating leads one by one: {e}")
+                    self._use_rpc = False
+            written += self._update_rows(chunk)
+        return written
+
+    def _update_chunk(self, chunk: List[Dict[str, Any]]) -> int:
+        result = self.supabase.rpc("update_lead_enrichment", {"p_rows": chunk}).execute()
+        if result.data is None:
+            raise ValueError("update_lead_enrichment returned no data")
+        return int(result.data)
+
+    def _update_rows(self, chunk: List[Dict[str, Any]]) -> int:
+        """Fallback without the database function: one update per lead"""
+        updated_at = datetime.utcnow().isoformat()
+        written = 0
+        for row in chunk:
+            try:
+                result = self.supabase.table("leads").update({
+                    "enriched_data": row["enriched_data"],
+                    "updated_at": updated_at
+                }).eq("id", row["id"]).execute()
+                written += 1 if result.data else 0
+            except Exception as e:
+                self.logger.error(f"Failed to save enrichment for lead {row['id']}: {str(e)}")
+        return written
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        return {**self.insight_cache.get_stats(), "llm_calls": self.llm_calls}
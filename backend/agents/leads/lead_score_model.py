@@ -0,0 +1,393 @@
+"""
+Learned lead scoring.
+
+A logistic regression over lead attributes, trained offline from resolved
+lead outcomes (``status``) and stored as a versioned ``.npz`` artifact. The
+serving process loads the latest artifact once and scores whole batches with
+one matrix product, instead of walking the rule table lead by lead.
+
+Usage:
+    python -m backend.agents.leads.lead_score_model train --input leads.ndjson
+    python -m backend.agents.leads.lead_score_model train --from-supabase
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_DIR = os.getenv(
+    "LEAD_SCORING_MODEL_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data", "lead_scoring")
+)
+
+# Outcomes used as training labels; "new" and "contacted" leads are unresolved
+POSITIVE_STATUSES = ("qualified", "opportunity", "customer")
+NEGATIVE_STATUSES = ("lost",)
+
+# Both the database enum and the labels used by the rule scorer
+COMPANY_SIZE_BUCKETS = {
+    "1-10": "startup", "startup": "startup",
+    "11-50": "small", "small": "small",
+    "51-200": "medium", "medium": "medium",
+    "201-1000": "large", "large": "large",
+    "1000+": "enterprise", "enterprise": "enterprise"
+}
+SIZE_LEVELS = ("startup", "small", "medium", "large", "enterprise")
+
+TITLE_LEVELS = (
+    ("executive", re.compile(r"\b(ceo|cto|cfo|coo|cmo|chief|founder|owner|president)\b")),
+    ("vp_director", re.compile(r"\b(vp|vice president|director|head)\b")),
+    ("manager", re.compile(r"\b(manager|lead)\b"))
+)
+
+FREE_MAIL_DOMAINS = frozenset({
+    "gmail.com", "yahoo.com", "hotmail.com", "outlook.com", "aol.com", "icloud.com",
+    "live.com", "msn.com", "proton.me", "protonmail.com", "gmx.com", "mail.com"
+})
+
+def label_for_status(status: Optional[str]) -> Optional[int]:
+    """1 for won/qualified outcomes, 0 for lost, None while unresolved"""
+    if status in POSITIVE_STATUSES:
+        return 1
+    if status in NEGATIVE_STATUSES:
+        return 0
+    return None
+
+def _text(value: Any) -> str:
+    return str(value).strip().lower() if value else ""
+
+@dataclass
+class LeadFeaturizer:
+    """Maps lead rows to a fixed-width feature matrix.
+
+    Industry and source vocabularies are learned from the training data, so the
+    same featurizer must be used for training and inference (it is stored in
+    the model artifact).
+    """
+    industries: List[str] = field(default_factory=list)
+    sources: List[str] = field(default_factory=list)
+
+    @classmethod
+    def fit(cls, leads: List[Dict[str, Any]], max_categories: int = 20, min_count: int = 5) -> "LeadFeaturizer":
+        def vocabulary(key: str) -> List[str]:
+            counts: Dict[str, int] = {}
+            for lead in leads:
+                value = _text(lead.get(key))
+                if value:
+                    counts[value] = counts.get(value, 0) + 1
+            frequent = [value for value, count in counts.items() if count >= min_count]
+            return sorted(frequent, key=lambda value: (-counts[value], value))[:max_categories]
+        return cls(industries=vocabulary("industry"), sources=vocabulary("source"))
+
+    @property
+    def feature_names(self) -> List[str]:
+        return (
+            [f"size:{level}" for level in SIZE_LEVELS]
+            + [f"title:{name}" for name, _ in TITLE_LEVELS]
+            + [f"industry:{name}" for name in self.industries]
+            + [f"source:{name}" for name in self.sources]
+            + ["has_company", "corporate_email", "has_enrichment", "log_annual_revenue"]
+        )
+
+    def transform(self, leads: List[Dict[str, Any]]) -> np.ndarray:
+        """(n_leads, n_features) float matrix"""
+        names = self.feature_names
+        column_of = {name: i for i, name in enumerate(names)}
+        matrix = np.zeros((len(leads), len(names)), dtype=np.float64)
+        if not leads:
+            return matrix
+        rows = np.arange(len(leads))
+
+        def one_hot(key: str, resolve) -> None:
+            # Categorical values repeat heavily, so each distinct value is resolved once
+            values = [lead.get(key) for lead in leads]
+            mapping = {value: column_of.get(resolve(_text(value)), -1) for value in set(values)}
+            columns = np.fromiter((mapping[value] for value in values), dtype=np.int64, count=len(values))
+            hit = columns >= 0
+            matrix[rows[hit], columns[hit]] = 1.0
+
+        def title_level(title: str) -> Optional[str]:
+            for name, pattern in TITLE_LEVELS:
+                if title and pattern.search(title):
+                    return f"title:{name}"
+            return None
+
+        one_hot("company_size", lambda size: f"size:{COMPANY_SIZE_BUCKETS[size]}" if size in COMPANY_SIZE_BUCKETS else None)
+        one_hot("job_title", title_level)
+        one_hot("industry", lambda industry: f"industry:{industry}")
+        one_hot("source", lambda source: f"source:{source}")
+
+        domains = (str(lead.get("email") or "").rpartition("@")[2].lower() for lead in leads)
+        revenue = np.array([lead.get("annual_revenue") if isinstance(lead.get("annual_revenue"), (int, float)) else 0.0
+                            for lead in leads], dtype=np.float64)
+        matrix[:, column_of["has_company"]] = [1.0 if lead.get("company") else 0.0 for lead in leads]
+        matrix[:, column_of["corporate_email"]] = [1.0 if domain and domain not in FREE_MAIL_DOMAINS else 0.0
+                                                   for domain in domains]
+        matrix[:, column_of["has_enrichment"]] = [
+            1.0 if isinstance(lead.get("enriched_data"), dict) and lead["enriched_data"].get("ai_insights") else 0.0
+            for lead in leads
+        ]
+        matrix[:, column_of["log_annual_revenue"]] = np.log1p(np.maximum(revenue, 0.0)) / 10.0
+        return matrix
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"industries": self.industries, "sources": self.sources}
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -35.0, 35.0)))
+
+def roc_auc(labels: np.ndarray, scores: np.ndarray) -> Optional[float]:
+    """Area under the ROC curve via the rank-sum statistic (ties get average ranks)"""
+    labels = np.asarray(labels, dtype=bool)
+    positives = int(labels.sum())
+    negatives = len(labels) - positives
+    if positives == 0 or negatives == 0:
+        return None
+    order = np.argsort(scores, kind="mergesort")
+    sorted_scores = np.asarray(scores, dtype=np.float64)[order]
+    ranks = np.empty(len(scores), dtype=np.float64)
+    # Average rank for each run of tied scores
+    boundaries = np.flatnonzero(np.diff(sorted_scores)) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [len(scores)]))
+    ranks[order] = np.repeat((starts + ends + 1) / 2.0, ends - starts)
+    return float((ranks[labels].sum() - positives * (positives + 1) / 2) / (positives * negatives))
+
+@dataclass
+class LeadScoreModel:
+    """Trained logistic lead scorer; scores are P(positive outcome) * 100"""
+    featurizer: LeadFeaturizer
+    weights: np.ndarray
+    bias: float
+    version: str
+    trained_at: str
+    metrics: Dict[str, Any] = field(default_factory=dict)
+
+    def predict_proba(self, leads: List[Dict[str, Any]]) -> np.ndarray:
+        return _sigmoid(self.featurizer.transform(leads) @ self.weights + self.bias)
+
+    def score(self, leads: List[Dict[str, Any]]) -> np.ndarray:
+        """Integer scores 0-100 for a batch of leads"""
+        if not leads:
+            return np.zeros(0, dtype=np.int64)
+        return np.rint(self.predict_proba(leads) * 100).astype(np.int64)
+
+    def explain(self, top: int = 10) -> List[Tuple[str, float]]:
+        """Features with the largest absolute weights"""
+        order = np.argsort(-np.abs(self.weights))[:top]
+        return [(self.featurizer.feature_names[i], float(self.weights[i])) for i in order]
+
+    def save(self, directory: str = DEFAULT_MODEL_DIR) -> str:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"lead_score_model_{self.version}.npz")
+        metadata = {
+            "version": self.version,
+            "trained_at": self.trained_at,
+            "featurizer": self.featurizer.to_dict(),
+            "feature_names": self.featurizer.feature_names,
+            "metrics": self.metrics
+        }
+        # Written under a temporary name first so a reader never sees half a file
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as f:
+            np.savez(f, weights=self.weights, bias=np.array([self.bias]), metadata=np.array(json.dumps(metadata)))
+        os.replace(temporary, path)
+        logger.info(f"✅ Saved lead score model {self.version} to {path}")
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "LeadScoreModel":
+        with np.load(path, allow_pickle=False) as artifact:
+            metadata = json.loads(str(artifact["metadata"]))
+            featurizer = LeadFeaturizer(**metadata["featurizer"])
+            if featurizer.feature_names != metadata["feature_names"]:
+                raise ValueError(f"Feature layout of {path} does not match this version of the featurizer")
+            return cls(
+                featurizer=featurizer,
+                weights=artifact["weights"],
+                bias=float(artifact["bias"][0]),
+                version=metadata["version"],
+                trained_at=metadata["trained_at"],
+                metrics=metadata.get("metrics", {})
+            )
+
+def latest_model_path(directory: str = DEFAULT_MODEL_DIR) -> Optional[str]:
+    """Path of the newest artifact (versions are sortable timestamps)"""
+    if not os.path.isdir(directory):
+        return None
+    artifacts = sorted(name for name in os.listdir(directory)
+                       if name.startswith("lead_score_model_") and name.endswith(".npz"))
+    return os.path.join(directory, artifacts[-1]) if artifacts else None
+
+def train_lead_score_model(leads: Iterable[Dict[str, Any]],
+                           l2: float = 1.0,
+                           max_iterations: int = 25,
+                           tolerance: float = 1e-6,
+                           validation_fraction: float = 0.2,
+                           seed: int = 0) -> LeadScoreModel:
+    """Fit an L2-regularized logistic regression on resolved leads.
+
+    Uses Newton's method (iteratively reweighted least squares): with a few
+    dozen features each step is one small linear solve, and it converges in
+    well under ``max_iterations`` steps.
+    """
+    labeled = [(lead, label_for_status(lead.get("status"))) for lead in leads]
+    labeled = [(lead, label) for lead, label in labeled if label is not None]
+    if len(labeled) < 20:
+        raise ValueError(f"Need at least 20 resolved leads to train, got {len(labeled)}")
+
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(labeled))
+    validation_size = int(len(labeled) * validation_fraction)
+    validation_rows, training_rows = order[:validation_size], order[validation_size:]
+
+    training_leads = [labeled[i][0] for i in training_rows]
+    featurizer = LeadFeaturizer.fit(training_leads)
+    X = featurizer.transform(training_leads)
+    y = np.array([labeled[i][1] for i in training_rows], dtype=np.float64)
+
+    # Intercept as an unregularized extra column
+    X1 = np.hstack([X, np.ones((len(X), 1))])
+    penalty = np.full(X1.shape[1], l2)
+    penalty[-1] = 0.0
+    theta = np.zeros(X1.shape[1])
+    started = time.perf_counter()
+    iterations = 0
+    for iterations in range(1, max_iterations + 1):
+        p = _sigmoid(X1 @ theta)
+        gradient = X1.T @ (p - y) + penalty * theta
+        hessian = (X1 * (p * (1 - p))[:, np.newaxis]).T @ X1 + np.diag(penalty) + 1e-9 * np.eye(len(theta))
+        step = np.linalg.solve(hessian, gradient)
+        theta -= step
+        if np.max(np.abs(step)) < tolerance:
+            break
+    training_seconds = time.perf_counter() - started
+
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    model = LeadScoreModel(featurizer, theta[:-1].copy(), float(theta[-1]), version,
+                           datetime.now(timezone.utc).isoformat())
+
+    metrics: Dict[str, Any] = {
+        "training_rows": len(training_rows),
+        "positive_rate": float(y.mean()),
+        "iterations": iterations,
+        "training_seconds": round(training_seconds, 4),
+        "l2": l2
+    }
+    if validation_size:
+        validation_leads = [labeled[i][0] for i in validation_rows]
+        validation_labels = np.array([labeled[i][1] for i in validation_rows])
+        probabilities = np.clip(model.predict_proba(validation_leads), 1e-12, 1 - 1e-12)
+        metrics.update({
+            "validation_rows": validation_size,
+            "validation_auc": roc_auc(validation_labels, probabilities),
+            "validation_log_loss": float(-np.mean(
+                validation_labels * np.log(probabilities) + (1 - validation_labels) * np.log(1 - probabilities)
+            ))
+        })
+    model.metrics = metrics
+    return model
+
+def shadow_compare(model_scores: np.ndarray,
+                   rule_scores: np.ndarray,
+                   threshold: int = 50,
+                   labels: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """How far the model's scores are from the rule scores on the same leads"""
+    model_scores = np.asarray(model_scores, dtype=np.float64)
+    rule_scores = np.asarray(rule_scores, dtype=np.float64)
+    if len(model_scores) == 0:
+        return {"leads": 0}
+    comparison = {
+        "leads": int(len(model_scores)),
+        "mean_model_score": round(float(model_scores.mean()), 2),
+        "mean_rule_score": round(float(rule_scores.mean()), 2),
+        "mean_absolute_difference": round(float(np.abs(model_scores - rule_scores).mean()), 2),
+        # Share of leads on the same side of the qualification threshold
+        "threshold_agreement": round(float(((model_scores >= threshold) == (rule_scores >= threshold)).mean()), 4),
+        "correlation": None
+    }
+    if len(model_scores) > 1 and model_scores.std() > 0 and rule_scores.std() > 0:
+        comparison["correlation"] = round(float(np.corrcoef(model_scores, rule_scores)[0, 1]), 4)
+    if labels is not None:
+        comparison["model_auc"] = roc_auc(labels, model_scores)
+        comparison["rule_auc"] = roc_auc(labels, rule_scores)
+    return comparison
+
+# Global model, loaded once per process
+_model: Optional[LeadScoreModel] = None
+_model_loaded = False
+_model_lock = threading.Lock()
+
+def get_lead_score_model(directory: str = DEFAULT_MODEL_DIR) -> Optional[LeadScoreModel]:
+    """Latest trained model, or None if none has been trained yet"""
+    global _model, _model_loaded
+    if not _model_loaded:
+        with _model_lock:
+            if not _model_loaded:
+                path = latest_model_path(directory)
+                if path is not None:
+                    try:
+                        _model = LeadScoreModel.load(path)
+                        logger.info(f"✅ Loaded lead score model {_model.version}")
+                    except Exception as e:
+                        logger.error(f"❌ Failed to load lead score model {path}: {e}")
+                _model_loaded = True
+    return _model
+
+def reset_lead_score_model() -> None:
+    """Forget the loaded model so the next call picks up a newer artifact"""
+    global _model, _model_loaded
+    with _model_lock:
+        _model, _model_loaded = None, False
+
+def _fetch_resolved_leads(page_size: int = 1000) -> List[Dict[str, Any]]:
+    from backend.database import get_supabase
+
+    supabase = get_supabase()
+    statuses = list(POSITIVE_STATUSES + NEGATIVE_STATUSES)
+    leads, offset = [], 0
+    while True:
+        result = supabase.table("leads").select("*").in_("status", statuses) \
+            .order("id").range(offset, offset + page_size - 1).execute()
+        rows = result.data or []
+        leads.extend(rows)
+        if len(rows) < page_size:
+            return leads
+        offset += page_size
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the learned lead scoring model")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    train = subcommands.add_parser("train", help="Train from resolved leads and save a new artifact")
+    source = train.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="NDJSON file of lead rows")
+    source.add_argument("--from-supabase", action="store_true", help="Read resolved leads from the leads table")
+    train.add_argument("--output", default=DEFAULT_MODEL_DIR)
+    train.add_argument("--l2", type=float, default=1.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.input:
+        with open(args.input, encoding="utf-8") as f:
+            leads = [json.loads(line) for line in f if line.strip()]
+    else:
+        leads = _fetch_resolved_leads()
+
+    model = train_lead_score_model(leads, l2=args.l2)
+    path = model.save(args.output)
+    print(json.dumps({"path": path, "version": model.version, "metrics": model.metrics,
+                      "top_features": model.explain()}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,56 +1,119 @@
 
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 from .base_lead_service import BaseLeadService
+from .lead_score_model import LeadScoreModel, get_lead_score_model, shadow_compare
+
+SCORING_MODES = ("rules", "model", "shadow")
 
 class LeadScoringService(BaseLeadService):
-    """Service for scoring leads using AI analysis"""
-    
+    """Service for scoring leads using AI analysis.
+
+    ``scoring_mode`` selects the scorer: ``rules`` (the weighted rule table),
+    ``model`` (the trained logistic model, scored as one batch) or ``shadow``
+    (rule scores are written, model scores are computed alongside and the
+    two are compared in the result).
+    """
+
+    def __init__(self,
+                 supabase_client,
+                 agent_id: int,
+                 ai_service,
+                 model: Optional[LeadScoreModel] = None,
+                 write_batch_size: int = 500):
+        super().__init__(supabase_client, agent_id, ai_service)
+        self._model = model
+        self.write_batch_size = write_batch_size
+        self._use_rpc = True
+
+    @property
+    def model(self) -> Optional[LeadScoreModel]:
+        return self._model if self._model is not None else get_lead_score_model()
+
     async def score_leads(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """Score leads using AI analysis"""
         lead_ids = input_data.get("lead_ids", [])
-        scored_count = 0
-        
+        scoring_mode = input_data.get("scoring_mode", "rules")
+        if scoring_mode not in SCORING_MODES:
+            raise ValueError(f"Unsupported scoring mode '{scoring_mode}'. Use one of {SCORING_MODES}.")
+
         scoring_criteria = input_data.get("criteria", {
             "company_size": 30,
             "industry_fit": 25,
             "job_title_relevance": 25,
             "engagement_potential": 20
         })
-        
-        for lead_id in lead_ids:
-            try:
-                lead_data = await self.get_lead_data(lead_id=lead_id)
-                if not lead_data:
-                    continue
-                
-                lead = lead_data[0]
-                
-                # Calculate AI-enhanced score
-                score = await self._calculate_ai_lead_score(lead, scoring_criteria)
-                
-                # Update lead score
-                self.supabase.table("leads")\
-                    .update({
-                        "lead_score": score,
-                        "updated_at": datetime.utcnow().isoformat()
-                    })\
-                    .eq("id", lead_id)\
-                    .execute()
-                
-                scored_count += 1
-                
-            except Exception as e:
-                self.logger.error(f"Failed to score lead {lead_id}: {str(e)}")
-        
-        return {
+
+        leads = await self.get_leads_by_ids(lead_ids)
+        model = self.model if scoring_mode != "rules" else None
+        if scoring_mode != "rules" and model is None:
+            self.logger.warning(f"No trained lead score model found, '{scoring_mode}' falls back to rule scores")
+
+        rule_scores = []
+        if model is None or scoring_mode == "shadow":
+            rule_scores = [await self._calculate_ai_lead_score(lead, scoring_criteria) for lead in leads]
+        model_scores = model.score(leads).tolist() if model is not None else []
+
+        scores = model_scores if model is not None and scoring_mode == "model" else rule_scores
+        scored_count = await self._write_scores([(lead["id"], int(score)) for lead, score in zip(leads, scores)])
+
+        result = {
             "scored_count": scored_count,
             "total_processed": len(lead_ids),
             "criteria_used": scoring_criteria,
+            "scoring_mode": scoring_mode if model is not None else "rules",
+            "model_version": model.version if model is not None else None,
             "timestamp": datetime.utcnow().isoformat(),
             "status": "success"
         }
-    
+        if model is not None and scoring_mode == "shadow":
+            result["shadow_comparison"] = shadow_compare(model_scores, rule_scores)
+            self.logger.info(f"Lead score shadow comparison ({model.version}): {result['shadow_comparison']}")
+        return result
+
+    async def _write_scores(self, scores: List[Tuple[str, int]]) -> int:
+        """Write (lead id, score) pairs back in chunks; returns the number of leads updated.
+
+        Only ``lead_score`` and ``updated_at`` are written, so columns changed
+        meanwhile are kept and leads deleted meanwhile stay deleted.
+        """
+        written = 0
+        for start in range(0, len(scores), self.write_batch_size):
+            chunk = scores[start:start + self.write_batch_size]
+            if self._use_rpc:
+                try:
+                    written += self._update_chunk(chunk)
+                    continue
+                except Exception as e:
+                    self.logger.warning(f"⚠️ update_lead_scores function unavailable, updating leads one by one: {e}")
+                    self._use_rpc = False
+            written += self._update_rows(chunk)
+        return written
+
+    def _update_chunk(self, chunk: List[Tuple[str, int]]) -> int:
+        result = self.supabase.rpc("update_lead_scores", {
+            "p_ids": [lead_id for lead_id, _ in chunk],
+            "p_scores": [score for _, score in chunk]
+        }).execute()
+        if result.data is None:
+            raise ValueError("update_lead_scores returned no data")
+        return int(result.data)
+
+    def _update_rows(self, chunk: List[Tuple[str, int]]) -> int:
+        """Fallback without the database function: one update per lead"""
+        updated_at = datetime.utcnow().isoformat()
+        written = 0
+        for lead_id, score in chunk:
+            try:
+                result = self.supabase.table("leads").update({
+                    "lead_score": score,
+                    "updated_at": updated_at
+                }).eq("id", lead_id).execute()
+                written += 1 if result.data else 0
+            except Exception as e:
+                self.logger.error(f"Failed to save score for lead {lead_id}: {str(e)}")
+        return written
+
     async def _calculate_ai_lead_score(self, lead: Dict[str, Any], criteria: Dict[str, Any]) -> int:
         """Calculate lead score using AI insights"""
         base_score = lead.get("lead_score", 0)
@@ -66,17 +129,17 @@ class LeadScoringService(BaseLeadService):
         }.get(company_size, 10)
         
         # Industry relevance (could be enhanced with AI)
-        industry = lead.get("industry", "").lower()
+        industry = (lead.get("industry") or "").lower()
         high_value_industries = ["technology", "healthcare", "finance", "manufacturing"]
         industry_score = 25 if any(ind in industry for ind in high_value_industries) else 15
         
         # Job title relevance
-        job_title = lead.get("job_title", "").lower()
+        job_title = (lead.get("job_title") or "").lower()
         decision_maker_titles = ["ceo", "cto", "director", "manager", "head", "vp"]
         title_score = 25 if any(title in job_title for title in decision_maker_titles) else 10
         
         # Engagement potential (based on enrichment data)
-        enriched_data = lead.get("enriched_data", {})
+        enriched_data = lead.get("enriched_data") or {}
         engagement_score = 20 if enriched_data.get("ai_insights") else 10
         
         total_score = min(100, size_score + industry_score + title_score + engagement_score)
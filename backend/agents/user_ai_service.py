@@ -92,6 +92,13 @@ class UserAIService:
             raise ValueError(f"User {self.user_id} has not configured an OpenAI API key")
         
         return await self.lead_service.generate_lead_enrichment_insights(lead_data)
+
+    async def generate_company_insights(self, company_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate company-level insights shared by every lead at the company using user's API key"""
+        if not await self._initialize_services():
+            raise ValueError(f"User {self.user_id} has not configured an OpenAI API key")
+
+        return await self.lead_service.generate_company_insights(company_data)
     
     # Campaign optimization methods
     async def optimize_campaign_copy(self, campaign_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -0,0 +1,6 @@
+"""
+Backend Benchmarks Package
+
+Standalone scripts that measure memory and runtime of backend components.
+Run one with ``python -m backend.benchmarks.<module>`` from the repository root.
+"""
@@ -0,0 +1,104 @@
+"""
+Runtime benchmark: assessment scoring, dict walk and category scan vs the compiled plan.
+
+The walk scores a submission the way the route used to, through the nested
+``scoring_logic`` dicts, and then scans ``result_categories`` for the first
+matching range. The compiled plan uses its flattened points table and a
+bisect over the category boundaries. Both run against the same template and
+submissions; the template read the cache saves is not measured here.
+
+Usage:
+    python -m backend.benchmarks.assessment_scoring --questions 20 --categories 8 --submissions 100000
+"""
+import argparse
+import random
+import time
+
+from backend.services.assessment_templates import ScoringPlan
+
+def make_template(questions: int, categories: int):
+    rng = random.Random(0)
+    scoring_logic = {
+        f"q{q}": {f"option-{o}": rng.randint(0, 100 // questions) for o in range(5)}
+        for q in range(questions)
+    }
+    width = 101 // categories
+    result_categories = [
+        {"name": f"band-{c}", "min_score": c * width, "max_score": 100 if c == categories - 1 else (c + 1) * width - 1}
+        for c in range(categories)
+    ]
+    return scoring_logic, result_categories
+
+def make_submissions(questions: int, count: int):
+    rng = random.Random(1)
+    return [
+        {
+            f"q{q}": [f"option-{rng.randrange(5)}", f"option-{rng.randrange(5)}"] if q % 4 == 0
+            else f"option-{rng.randrange(6)}"
+            for q in range(questions)
+        }
+        for _ in range(count)
+    ]
+
+def walk(answers, scoring_logic, result_categories):
+    total_score = 0
+    for question_id, answer_value in answers.items():
+        if question_id in scoring_logic:
+            if isinstance(answer_value, str):
+                points = scoring_logic[question_id].get(answer_value, 0)
+            elif isinstance(answer_value, list):
+                points = sum(scoring_logic[question_id].get(val, 0) for val in answer_value)
+            else:
+                points = 0
+            total_score += points
+    score = max(0, min(100, total_score))
+    for category in result_categories:
+        if category['min_score'] <= score <= category['max_score']:
+            return score, category
+    return score, result_categories[0]
+
+def run(questions: int, categories: int, submissions: int) -> dict:
+    scoring_logic, result_categories = make_template(questions, categories)
+    answers = make_submissions(questions, submissions)
+
+    started = time.perf_counter()
+    plan = ScoringPlan(scoring_logic, result_categories)
+    compile_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    walked = [walk(submission, scoring_logic, result_categories) for submission in answers]
+    walk_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    compiled = []
+    for submission in answers:
+        score = plan.score(submission)
+        compiled.append((score, plan.category(score)))
+    plan_seconds = time.perf_counter() - started
+
+    assert compiled == walked
+    return {
+        "questions": questions,
+        "categories": categories,
+        "submissions": submissions,
+        "compile_seconds": compile_seconds,
+        "walk_seconds": walk_seconds,
+        "plan_seconds": plan_seconds
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=20, help="Questions per assessment")
+    parser.add_argument("--categories", type=int, default=8, help="Result categories")
+    parser.add_argument("--submissions", type=int, default=100000, help="Submissions to score")
+    args = parser.parse_args()
+
+    result = run(args.questions, args.categories, args.submissions)
+    count = result["submissions"]
+    print(f"Compile:         {result['compile_seconds'] * 1e6:.0f} µs "
+          f"({result['questions']} questions, {result['categories']} categories)")
+    print(f"Dict walk:       {result['walk_seconds'] / count * 1e6:.2f} µs per submission")
+    print(f"Compiled plan:   {result['plan_seconds'] / count * 1e6:.2f} µs per submission")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Runtime benchmark: streaming bulk lead import.
+
+Generates a CSV upload on the fly and feeds it to LeadImport in network-sized
+chunks, the way the import endpoint receives it. The import_leads database
+function is a stub with fixed latency per chunk, so the numbers show parsing,
+validation and deduplication cost plus how well chunk writes overlap parsing.
+Peak RSS shows that memory does not grow with the upload.
+
+Usage:
+    python -m backend.benchmarks.lead_import --rows 1000000
+"""
+import argparse
+import asyncio
+import time
+import resource
+from types import SimpleNamespace
+
+from backend.services.lead_import import LeadImport
+
+class StubClient:
+    """rpc('import_leads') stand-in that sleeps for a fixed latency per chunk"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    def rpc(self, name, params):
+        def execute():
+            self.calls += 1
+            time.sleep(self.latency)
+            return SimpleNamespace(data=[{"inserted": len(params["p_leads"]), "updated": 0}])
+        return SimpleNamespace(execute=execute)
+
+def _upload_chunks(rows: int, duplicate_every: int, invalid_every: int, chunk_bytes: int):
+    buffer = ["email,first_name,last_name,company,job_title,tags\n"]
+    size = len(buffer[0])
+    for i in range(rows):
+        if invalid_every and i % invalid_every == 0:
+            email = f"broken{i}@"
+        elif duplicate_every and i % duplicate_every == 0:
+            email = f"person{i - 1}@company{(i - 1) % 500}.com"
+        else:
+            email = f"person{i}@company{i % 500}.com"
+        line = f'{email},Person,Number{i},"Company {i % 500}, Inc",Buyer,"enterprise;webinar"\n'
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_bytes:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+async def run_async(rows: int, chunk_size: int, latency: float) -> dict:
+    client = StubClient(latency)
+    lead_import = LeadImport(lambda: client, "benchmark-user", "csv", chunk_size=chunk_size)
+
+    started = time.perf_counter()
+    for data in _upload_chunks(rows, duplicate_every=50, invalid_every=1000, chunk_bytes=64 * 1024):
+        await lead_import.feed(data)
+    report = await lead_import.finish()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "rows": rows,
+        "seconds": elapsed,
+        "rows_per_second": rows / elapsed,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "chunks_written": client.calls,
+        "report": report
+    }
+
+def run(rows: int, chunk_size: int, latency: float) -> dict:
+    return asyncio.run(run_async(rows, chunk_size, latency))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--db-latency", type=float, default=0.05, help="Seconds per stubbed chunk write")
+    args = parser.parse_args()
+
+    result = run(args.rows, args.chunk_size, args.db_latency)
+    report = result["report"]
+    print(f"Rows:                {result['rows']:,}")
+    print(f"Elapsed:             {result['seconds']:.1f} s ({result['rows_per_second']:,.0f} rows/s)")
+    print(f"Chunks written:      {result['chunks_written']:,}")
+    print(f"Inserted / invalid / duplicates: "
+          f"{report['inserted']:,} / {report['invalid']:,} / {report['duplicates']:,}")
+    print(f"Peak RSS:            {result['peak_rss_mb']:.0f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Runtime benchmark: lead search, linear scan vs the in-process inverted index.
+
+The scan checks every lead's name, email, company and tags for the query
+words, the way an unindexed search has to. The index answers the same query
+from its postings and returns one ranked page. The Postgres path uses GIN
+indexes and is not measured here.
+
+Usage:
+    python -m backend.benchmarks.lead_search --leads 200000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from backend.services.lead_search import LeadSearchIndex, tokenize
+
+FIRST_NAMES = ["jane", "john", "maria", "wei", "aisha", "carlos", "olga", "tom", "priya", "kenji"]
+WORDS = ["acme", "globex", "initech", "umbrella", "stark", "wayne", "tyrell", "cyberdyne", "soylent", "hooli"]
+TAGS = ["enterprise", "smb", "webinar", "trial", "partner", "churned"]
+
+QUERIES = ["jane acme", "glob", "initeck", "priya enterprise", "wayne"]
+
+def _make_leads(count: int):
+    rng = random.Random(0)
+    for i in range(count):
+        company = f"{rng.choice(WORDS)} {rng.choice(WORDS)}{i % 997}"
+        yield {
+            "id": f"{i:08d}",
+            "first_name": rng.choice(FIRST_NAMES),
+            "last_name": f"person{i}",
+            "email": f"contact{i}@{company.split()[0]}.com",
+            "company": company,
+            "tags": rng.sample(TAGS, 2)
+        }
+
+def _scan(leads, query: str, limit: int):
+    terms = tokenize(query)
+    matches = []
+    for lead in leads:
+        words = tokenize(" ".join([
+            lead["first_name"], lead["last_name"], lead["email"], lead["company"], " ".join(lead["tags"])
+        ]))
+        if all(any(word.startswith(term) for word in words) for term in terms):
+            matches.append(lead["id"])
+    return matches[:limit]
+
+def _time(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+def run(leads: int, limit: int, repeat: int) -> dict:
+    rows = list(_make_leads(leads))
+
+    started = time.perf_counter()
+    index = LeadSearchIndex()
+    for row in rows:
+        index.add(row)
+    build_seconds = time.perf_counter() - started
+
+    queries = {}
+    for query in QUERIES:
+        page = index.search(query, limit)
+        after = (page[-1][1], page[-1][0]) if len(page) == limit else None
+        queries[query] = {
+            "scan_ms": _time(lambda: _scan(rows, query, limit), 1) * 1000,
+            "index_ms": _time(lambda: index.search(query, limit), repeat) * 1000,
+            "next_page_ms": _time(lambda: index.search(query, limit, after), repeat) * 1000 if after else None,
+            "first_page": len(page)
+        }
+    return {"leads": leads, "build_seconds": build_seconds, "queries": queries}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--leads", type=int, default=200000)
+    parser.add_argument("--limit", type=int, default=25)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    result = run(args.leads, args.limit, args.repeat)
+    print(f"Leads indexed:  {result['leads']:,} in {result['build_seconds']:.1f} s")
+    for query, timing in result["queries"].items():
+        next_page = f"{timing['next_page_ms']:8.1f} ms" if timing["next_page_ms"] is not None else "       -   "
+        print(f"{query!r:20} scan {timing['scan_ms']:8.1f} ms   index {timing['index_ms']:8.1f} ms   "
+              f"next page {next_page}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Memory benchmark: full EmailMessage dataclasses vs CompactMessageStore records.
+
+Usage:
+    python -m backend.benchmarks.message_store_memory --recipients 100000
+"""
+import argparse
+import gc
+import tracemalloc
+from datetime import datetime
+from unittest.mock import patch
+
+import backend.agents.email_automation_agent as email_module
+from backend.agents.email_automation_agent import (
+    EmailAutomationAgent, EmailTemplate, EmailType, EmailMessage, EmailStatus, Contact
+)
+from backend.agents.email.message_store import CompactMessageStore
+
+def _build_agent(recipients: int) -> EmailAutomationAgent:
+    with patch.object(email_module, "AsyncOpenAI"):
+        agent = EmailAutomationAgent("benchmark", {})
+
+    html = agent._create_fallback_html("promotional", "Our biggest sale of the year starts today. " * 20)
+    agent.templates_store["template_bench"] = EmailTemplate(
+        id="template_bench",
+        name="Benchmark",
+        email_type=EmailType.PROMOTIONAL,
+        subject_line="Hi {{first_name}}, a deal for {{company}}",
+        html_content=html,
+        text_content="",
+        variables=["first_name", "company"],
+        created_at=datetime.now(),
+        updated_at=datetime.now()
+    )
+    for i in range(recipients):
+        contact_id = f"contact_{i}"
+        agent.contacts_store[contact_id] = Contact(
+            id=contact_id,
+            email=f"user{i}@example.com",
+            first_name=f"User{i}",
+            company=f"Company {i % 500}"
+        )
+    return agent
+
+def _measure(fill) -> int:
+    gc.collect()
+    tracemalloc.start()
+    store = fill()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del store
+    gc.collect()
+    return current
+
+def run(recipients: int) -> dict:
+    agent = _build_agent(recipients)
+    template = agent.templates_store["template_bench"]
+    contacts = list(agent.contacts_store.values())
+    send_time = datetime.now()
+    campaign_id = "campaign_bench"
+
+    def fill_dataclasses():
+        store = {}
+        for contact in contacts:
+            rendered = agent._render_personalized(template, contact)
+            message = EmailMessage(
+                id=f"msg_{campaign_id}_{contact.id}",
+                campaign_id=campaign_id,
+                contact_id=contact.id,
+                template_id=template.id,
+                subject_line=rendered["subject"],
+                content=rendered["html"],
+                scheduled_at=send_time,
+                sent_at=None,
+                status=EmailStatus.SCHEDULED,
+                tracking_data={}
+            )
+            store[message.id] = message
+        return store
+
+    def fill_compact():
+        store = CompactMessageStore(agent._render_message_content)
+        for contact in contacts:
+            store.add(campaign_id, contact.id, template.id, send_time, EmailStatus.SCHEDULED)
+        return store
+
+    dataclass_bytes = _measure(fill_dataclasses)
+    compact_bytes = _measure(fill_compact)
+    return {
+        "recipients": recipients,
+        "dataclass_bytes": dataclass_bytes,
+        "compact_bytes": compact_bytes,
+        "dataclass_bytes_per_message": dataclass_bytes / recipients,
+        "compact_bytes_per_message": compact_bytes / recipients,
+        "reduction": 1 - compact_bytes / dataclass_bytes
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--recipients", type=int, default=50000)
+    args = parser.parse_args()
+
+    result = run(args.recipients)
+    print(f"Recipients:           {result['recipients']:,}")
+    print(f"EmailMessage layout:  {result['dataclass_bytes'] / 2**20:8.1f} MiB "
+          f"({result['dataclass_bytes_per_message']:,.0f} B/message)")
+    print(f"Compact layout:       {result['compact_bytes'] / 2**20:8.1f} MiB "
+          f"({result['compact_bytes_per_message']:,.0f} B/message)")
+    print(f"Reduction:            {result['reduction']:.1%}")
+
+if __name__ == "__main__":
+    main()
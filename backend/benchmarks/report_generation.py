@@ -0,0 +1,169 @@
+"""
+Runtime benchmark: quarterly report generation, full recomputation vs incremental aggregates.
+
+The current path scans every raw point of the quarter and sends every report
+section to the LLM. The incremental path combines cached daily/weekly
+aggregates and reuses LLM sections whose inputs did not change. The LLM is a
+stub with fixed latency so runs are repeatable and offline.
+
+Usage:
+    python -m backend.benchmarks.report_generation --metrics 20 --points-per-day 24
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from datetime import datetime, date, timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+
+import backend.agents.analytics_agent as analytics_module
+from backend.agents.analytics_agent import AnalyticsAgent, MetricData, ReportType, REPORT_PERIODS
+from backend.agents.analytics.metric_store import ParquetMetricStore
+
+class StubLLM:
+    """Chat-completions stand-in that sleeps for a fixed latency and counts calls"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        system = kwargs["messages"][0]["content"]
+        if "cross-metric" in system:
+            content = "[]"
+        elif "senior marketing strategist" in system:
+            content = json.dumps(["Rebalance budget toward top channels"])
+        elif "executive" in system:
+            content = "Performance improved across the quarter."
+        else:
+            content = json.dumps({
+                "level": "medium",
+                "title": "Metric moved",
+                "description": "Notable change over the period",
+                "impact_score": 0.5,
+                "recommendations": ["Review drivers"]
+            })
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+def _build_agent(store: ParquetMetricStore, latency: float):
+    with patch.object(analytics_module, "AsyncOpenAI"):
+        agent = AnalyticsAgent("benchmark", metric_store=store)
+    llm = StubLLM(latency)
+    agent.openai_client.chat.completions.create = llm.create
+    return agent, llm
+
+def _seed_history(agent: AnalyticsAgent, metric_names, today: date) -> None:
+    # Insight generation compares against the in-memory ring buffers
+    for metric_name in metric_names:
+        agent.metric_history.record(metric_name, 100.0, datetime.combine(today, datetime.min.time()))
+        agent.metric_history.record(metric_name, 150.0, datetime.combine(today, datetime.min.time()) + timedelta(hours=1))
+
+def _fill_store(store: ParquetMetricStore, metric_names, today: date, days: int, points_per_day: int) -> None:
+    rng = np.random.default_rng(0)
+    for offset in range(days, -1, -1):
+        day_start = datetime.combine(today - timedelta(days=offset), datetime.min.time())
+        for metric_index, metric_name in enumerate(metric_names):
+            base = 100 + metric_index * 10 + (days - offset) * (1 + metric_index % 3)
+            for point in range(points_per_day):
+                store.append(metric_name, base + rng.normal(0, 2), day_start + timedelta(hours=24 * point / points_per_day))
+    store.flush()
+
+async def _current_path(agent: AnalyticsAgent, period_end: datetime) -> float:
+    """Full recomputation: scan every raw point of the quarter and regenerate every section"""
+    started = time.perf_counter()
+    period_start = period_end - REPORT_PERIODS[ReportType.QUARTERLY]
+    frame = await agent.query_metric_history(period_start, period_end)
+    summary = frame.groupby("metric_name", observed=True).agg(
+        first_value=("value", "first"),
+        value=("value", "last"),
+        timestamp=("timestamp", "last")
+    )
+    metrics = {
+        name: MetricData(
+            metric_name=name,
+            value=float(row["value"]),
+            previous_value=float(row["first_value"]),
+            change_percent=(row["value"] - row["first_value"]) / abs(row["first_value"]) * 100,
+            timestamp=row["timestamp"].to_pydatetime()
+        )
+        for name, row in summary.iterrows()
+    }
+    await agent.create_report(ReportType.QUARTERLY, period_start, period_end, metrics)
+    return time.perf_counter() - started
+
+async def _incremental_path(agent: AnalyticsAgent, period_end: datetime) -> float:
+    started = time.perf_counter()
+    await agent.create_period_report(ReportType.QUARTERLY, period_end)
+    return time.perf_counter() - started
+
+async def run_async(metrics: int, points_per_day: int, changed_metrics: int, latency: float) -> dict:
+    today = date.today()
+    period_end = datetime.combine(today, datetime.max.time())
+    metric_names = [f"metric_{i}" for i in range(metrics)]
+
+    with tempfile.TemporaryDirectory() as root:
+        store = ParquetMetricStore(root, flush_rows=50000)
+        _fill_store(store, metric_names, today, REPORT_PERIODS[ReportType.QUARTERLY].days + 1, points_per_day)
+
+        incremental, incremental_llm = _build_agent(store, latency)
+        _seed_history(incremental, metric_names, today)
+        cold = await _incremental_path(incremental, period_end)
+        cold_calls = incremental_llm.calls
+
+        # New points land today for a few metrics, then the report is regenerated
+        for metric_name in metric_names[:changed_metrics]:
+            store.append(metric_name, 10_000.0, period_end - timedelta(minutes=1))
+        store.flush()
+
+        rows_before = incremental.period_aggregator.rows_aggregated
+        warm = await _incremental_path(incremental, period_end)
+        warm_calls = incremental_llm.calls - cold_calls
+        warm_rows = incremental.period_aggregator.rows_aggregated - rows_before
+
+        current, current_llm = _build_agent(store, latency)
+        _seed_history(current, metric_names, today)
+        baseline = await _current_path(current, period_end)
+        baseline_calls = current_llm.calls
+
+    return {
+        "metrics": metrics,
+        "raw_points": metrics * points_per_day * (REPORT_PERIODS[ReportType.QUARTERLY].days + 2),
+        "current_seconds": baseline,
+        "current_llm_calls": baseline_calls,
+        "incremental_cold_seconds": cold,
+        "incremental_cold_llm_calls": cold_calls,
+        "incremental_warm_seconds": warm,
+        "incremental_warm_llm_calls": warm_calls,
+        "incremental_warm_rows_read": warm_rows
+    }
+
+def run(metrics: int, points_per_day: int, changed_metrics: int, latency: float) -> dict:
+    return asyncio.run(run_async(metrics, points_per_day, changed_metrics, latency))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--metrics", type=int, default=20)
+    parser.add_argument("--points-per-day", type=int, default=24)
+    parser.add_argument("--changed-metrics", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds per stubbed LLM call")
+    args = parser.parse_args()
+
+    result = run(args.metrics, args.points_per_day, args.changed_metrics, args.llm_latency)
+    print(f"Metrics / raw points:       {result['metrics']} / {result['raw_points']:,}")
+    print(f"Current path:               {result['current_seconds']:7.2f} s "
+          f"({result['current_llm_calls']} LLM calls)")
+    print(f"Incremental, first report:  {result['incremental_cold_seconds']:7.2f} s "
+          f"({result['incremental_cold_llm_calls']} LLM calls)")
+    print(f"Incremental, regenerated:   {result['incremental_warm_seconds']:7.2f} s "
+          f"({result['incremental_warm_llm_calls']} LLM calls, "
+          f"{result['incremental_warm_rows_read']:,} raw rows read)")
+    print(f"Speedup (regenerated):      {result['current_seconds'] / result['incremental_warm_seconds']:7.1f}x")
+
+if __name__ == "__main__":
+    main()
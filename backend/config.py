@@ -4,6 +4,7 @@ from dotenv import load_dotenv
 from typing import Dict, Any, Optional
 import importlib
 import sys
+import threading
 
 # Load environment variables
 load_dotenv()
@@ -12,6 +13,46 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Agents built on first use in development (see AgentManager._load_agent)
+AGENT_CONFIGS = [
+    {
+        'name': 'campaign_agent',
+        'module': 'agents.campaign_agent',
+        'class': 'CampaignAgent',
+        'description': 'Campaign planning and optimization'
+    },
+    {
+        'name': 'social_media_agent',
+        'module': 'agents.social_media_agent',
+        'class': 'SocialMediaAgent',
+        'description': 'Social media content creation and management'
+    },
+    {
+        'name': 'lead_generation_agent',
+        'module': 'agents.lead_generation_agent',
+        'class': 'LeadGenerationAgent',
+        'description': 'Lead scoring and qualification'
+    },
+    {
+        'name': 'content_agent',
+        'module': 'agents.content_agent',
+        'class': 'ContentAgent',
+        'description': 'AI-powered content creation'
+    },
+    {
+        'name': 'email_agent',
+        'module': 'agents.email_automation_agent',
+        'class': 'EmailAutomationAgent',
+        'description': 'Email campaign automation'
+    },
+    {
+        'name': 'analytics_agent',
+        'module': 'agents.analytics_agent',
+        'class': 'AnalyticsAgent',
+        'description': 'Performance analytics and insights'
+    }
+]
+
 class AgentManager:
     """
     Centralized agent manager with graceful error handling and clear API key validation.
@@ -22,6 +63,8 @@ class AgentManager:
         self.missing_dependencies = []
         self.missing_api_keys = []
         self.initialized_agents = {}
+        self._lazy_agents: Dict[str, Dict[str, str]] = {}
+        self._load_lock = threading.RLock()
         
         # Validate API keys first
         self._validate_api_keys()
@@ -83,81 +126,53 @@ class AgentManager:
             logger.info(f"✅ Initialized {len(mock_agents)} mock agents for production")
             return
         
-        # Full agent initialization for development
-        agent_configs = [
-            {
-                'name': 'campaign_agent',
-                'module': 'agents.campaign_agent',
-                'class': 'CampaignAgent',
-                'description': 'Campaign planning and optimization'
-            },
-            {
-                'name': 'social_media_agent',
-                'module': 'agents.social_media_agent',
-                'class': 'SocialMediaAgent',
-                'description': 'Social media content creation and management'
-            },
-            {
-                'name': 'lead_generation_agent',
-                'module': 'agents.lead_generation_agent',
-                'class': 'LeadGenerationAgent',
-                'description': 'Lead scoring and qualification'
-            },
-            {
-                'name': 'content_agent',
-                'module': 'agents.content_agent',
-                'class': 'ContentAgent',
-                'description': 'AI-powered content creation'
-            },
-            {
-                'name': 'email_agent',
-                'module': 'agents.email_automation_agent',
-                'class': 'EmailAutomationAgent',
-                'description': 'Email campaign automation'
-            },
-            {
-                'name': 'analytics_agent',
-                'module': 'agents.analytics_agent',
-                'class': 'AnalyticsAgent',
-                'description': 'Performance analytics and insights'
-            }
-        ]
-        
         # For development, try to load agents but don't fail startup
         anthropic_key = os.getenv("ANTHROPIC_API_KEY", "")
         if not anthropic_key:
             logger.warning("⚠️ Anthropic Claude API key not configured - using mock agents")
-            for config in agent_configs:
+            for config in AGENT_CONFIGS:
                 mock_agent = MockAgent(config['name'])
                 self.initialized_agents[config['name']] = mock_agent
                 setattr(self, config['name'], mock_agent)
             return
         
-        integrations = self._get_integrations_config()
-        
-        for config in agent_configs:
+        # Importing agent modules pulls in pandas/numpy/LLM SDKs, so each agent is
+        # only constructed when it is first requested rather than at startup
+        self._lazy_agents = {config['name']: config for config in AGENT_CONFIGS}
+        logger.info(f"✅ Agent system ready with {len(self._lazy_agents)} agents (loaded on first use)")
+    
+    def __getattr__(self, name: str):
+        # Only called when normal lookup fails, i.e. for agents not built yet
+        lazy_agents = self.__dict__.get('_lazy_agents')
+        if lazy_agents and name in lazy_agents:
+            return self._load_agent(name)
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+    
+    def _load_agent(self, agent_name: str):
+        """Import and construct a deferred agent, falling back to a mock on failure"""
+        with self._load_lock:
+            if agent_name in self.initialized_agents:
+                return self.initialized_agents[agent_name]
+            config = self._lazy_agents[agent_name]
             try:
                 # Try to import the module
                 module = importlib.import_module(config['module'])
                 agent_class = getattr(module, config['class'])
                 
                 # Initialize agent with basic parameters
-                agent_instance = agent_class(1, None, integrations)  # Simplified initialization
-                
-                # Store initialized agent
-                self.initialized_agents[config['name']] = agent_instance
-                setattr(self, config['name'], agent_instance)
-                
+                agent_instance = agent_class(1, None, self._get_integrations_config())  # Simplified initialization
                 logger.info(f"✅ Initialized {config['name']}: {config['description']}")
                 
             except Exception as e:
                 logger.warning(f"⚠️ Could not load {config['name']}: {str(e)}")
                 # Use mock agent as fallback
-                mock_agent = MockAgent(config['name'])
-                self.initialized_agents[config['name']] = mock_agent
-                setattr(self, config['name'], mock_agent)
-        
-        logger.info(f"✅ Agent system initialized with {len(self.initialized_agents)} agents")
+                agent_instance = MockAgent(config['name'])
+            
+            # Store initialized agent
+            self.initialized_agents[agent_name] = agent_instance
+            setattr(self, agent_name, agent_instance)
+            del self._lazy_agents[agent_name]
+            return agent_instance
     
     def _get_integrations_config(self) -> Dict[str, Any]:
         """Get integrations configuration with available API keys"""
@@ -185,23 +200,27 @@ class AgentManager:
     def get_agent(self, agent_name: str):
         """Get an agent by name with proper error handling"""
         agent = self.initialized_agents.get(agent_name)
+        if not agent and agent_name in self._lazy_agents:
+            agent = self._load_agent(agent_name)
         if not agent:
-            available_agents = list(self.initialized_agents.keys())
+            available_agents = list(self.initialized_agents.keys()) + list(self._lazy_agents.keys())
             raise ValueError(f"Agent '{agent_name}' not available. Available agents: {available_agents}")
         return agent
     
     def is_agent_available(self, agent_name: str) -> bool:
         """Check if a specific agent is available"""
-        return agent_name in self.initialized_agents
+        return agent_name in self.initialized_agents or agent_name in self._lazy_agents
     
     def get_system_status(self) -> Dict[str, Any]:
         """Get comprehensive system status for debugging"""
         return {
             'agents_available': self.agents_available,
             'initialized_agents': list(self.initialized_agents.keys()),
+            'pending_agents': list(self._lazy_agents.keys()),
             'missing_dependencies': self.missing_dependencies,
             'missing_api_keys': self.missing_api_keys,
-            'total_agents_loaded': len(self.initialized_agents)
+            'total_agents_loaded': len(self.initialized_agents),
+            'total_agents_available': len(self.initialized_agents) + len(self._lazy_agents)
         }
 
 class MockAgent:
@@ -1,11 +1,11 @@
 import os
 import sys
+import asyncio
+import importlib
 import logging
 from datetime import datetime
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
 from dotenv import load_dotenv
 
 # Fix Python path for Render deployment (rootDir: backend)
@@ -15,6 +15,9 @@ parent_dir = os.path.dirname(current_dir)
 if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
+from backend.services.lazy_routers import LazyRouterMounter
+from backend.services.static_assets import StaticAssetCache
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -66,70 +69,66 @@ for module_path, router_name in essential_routers:
     except Exception as e:
         logger.error(f"❌ Failed to load essential router {module_path}: {str(e)}")
 
-# Try to load other routers with better error handling
+# Other routers are registered by prefix. With LAZY_ROUTERS enabled (default)
+# each one is imported on the first request under its prefix, so /health does
+# not wait for google-generativeai, pandas and the agent stack to import.
 optional_routers = [
-    ("backend.routes.unified_agents", "router"),
-    ("backend.routes.agents", "router"),  # OpenClaw integration
-    ("backend.routes.campaigns", "router"),
-    ("backend.routes.leads", "router"),
-    ("backend.routes.lead_capture", "router"),
-    ("backend.routes.email", "router"),
-    ("backend.routes.workflows", "router"),
-    ("backend.routes.brand", "router"),
-    ("backend.routes.keyword_research", "router"),
-    ("backend.routes.research", "router"),
-    ("backend.routes.ai_video", "router"),
-    ("backend.routes.user", "router"),
-    ("backend.routes.support", "router"),
-    ("backend.routes.assessments", "router"),
-    ("backend.routes.scraper", "router"),  # Web scraper agent
+    ("backend.routes.unified_agents", "/api/agents"),
+    ("backend.routes.agents", "/api/agents"),  # OpenClaw integration
+    ("backend.routes.campaigns", "/api/campaigns"),
+    ("backend.routes.leads", "/api/leads"),
+    ("backend.routes.lead_capture", "/api/lead-capture"),
+    ("backend.routes.email", "/api/email"),
+    ("backend.routes.workflows", "/api/workflows"),
+    ("backend.routes.brand", "/api/brand"),
+    ("backend.routes.keyword_research", "/api/keywords"),
+    ("backend.routes.research", "/api/research"),
+    ("backend.routes.ai_video", "/ai-video"),
+    ("backend.routes.user", "/api/user"),
+    ("backend.routes.support", "/api/support"),
+    ("backend.routes.assessments", "/api/assessments"),
+    ("backend.routes.scraper", "/api/scraper"),  # Web scraper agent
 ]
 
-for module_path, router_name in optional_routers:
-    try:
-        # Test import first
-        module = __import__(module_path, fromlist=[router_name])
-        if hasattr(module, "router"):
-            router = getattr(module, "router")
-            app.include_router(router)
-            loaded_routers.append(module_path)
-            logger.info(f"✅ Loaded optional router: {module_path}")
-        else:
-            logger.warning(f"⚠️ Router {module_path} exists but has no 'router' attribute")
-    except ImportError as e:
-        logger.warning(f"⚠️ Could not import router {module_path} (missing dependency): {str(e)}")
-    except AttributeError as e:
-        logger.warning(f"⚠️ Router {module_path} missing expected attributes: {str(e)}")
-    except Exception as e:
-        logger.error(f"❌ Failed to load optional router {module_path}: {str(e)}")
-
-logger.info(f"📋 Loaded {len(loaded_routers)} out of {len(essential_routers) + len(optional_routers)} routers")
+lazy_routers_enabled = os.getenv("LAZY_ROUTERS", "true").lower() in ("1", "true", "yes")
 
 # ───────────────────────────── STATIC FILES & FORM ROUTES ───────────────────────── #
 
-# Mount static files for form widget
+# Static files for the form widget are served from memory with strong ETags
+# and precompressed variants (loaded on first request)
 static_path = os.path.join(os.path.dirname(__file__), "static")
-if os.path.exists(static_path):
-    app.mount("/static", StaticFiles(directory=static_path), name="static")
-    logger.info("✅ Static files mounted at /static")
-else:
+static_assets = StaticAssetCache(static_path)
+app.state.static_assets = static_assets
+if not os.path.exists(static_path):
     logger.warning("⚠️ Static directory not found")
 
+@app.get("/static/{asset_path:path}")
+async def serve_static_asset(asset_path: str, request: Request):
+    """Serve a cached static asset"""
+    response = static_assets.response(request, asset_path)
+    if response is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return response
+
 # ───────────────────────────── FALLBACK ROUTERS FOR TESTS ───────────────────────── #
 
 # If certain routers failed to load (due to optional dependencies), provide
 # minimal fallbacks to satisfy health and auth behavior expected by tests.
 # Enabled when running under pytest or when ENABLE_TEST_FALLBACK_ROUTERS=1/true.
-try:
-    enable_fallbacks = (
-        os.getenv("ENABLE_TEST_FALLBACK_ROUTERS", "").lower() in ("1", "true", "yes")
-        or "PYTEST_CURRENT_TEST" in os.environ
-    )
-    if enable_fallbacks:
+enable_fallbacks = (
+    os.getenv("ENABLE_TEST_FALLBACK_ROUTERS", "").lower() in ("1", "true", "yes")
+    or "PYTEST_CURRENT_TEST" in os.environ
+)
+
+def register_fallback_router(module_path: str, error: Exception = None):
+    """Register the minimal fallback for a router that could not be loaded"""
+    if not enable_fallbacks:
+        return
+    try:
         from fastapi import APIRouter, Depends
         from backend.auth import verify_token as auth_verify_token
 
-        if "backend.routes.campaigns" not in loaded_routers:
+        if module_path == "backend.routes.campaigns":
             fallback_campaigns = APIRouter(prefix="/api/campaigns", tags=["campaigns-fallback"])
 
             @fallback_campaigns.get("")
@@ -143,7 +142,7 @@ try:
             app.include_router(fallback_campaigns)
             logger.info("✅ Registered fallback campaigns router")
 
-        if "backend.routes.leads" not in loaded_routers:
+        elif module_path == "backend.routes.leads":
             fallback_leads = APIRouter(prefix="/api/leads", tags=["leads-fallback"])
 
             @fallback_leads.get("")
@@ -156,18 +155,33 @@ try:
 
             app.include_router(fallback_leads)
             logger.info("✅ Registered fallback leads router")
-    else:
-        logger.info("ℹ️ Test fallback routers disabled (production mode)")
-except Exception as e:
-    logger.warning(f"⚠️ Could not register fallback routers: {e}")
+    except Exception as e:
+        logger.warning(f"⚠️ Could not register fallback routers: {e}")
+
+if not enable_fallbacks:
+    logger.info("ℹ️ Test fallback routers disabled (production mode)")
+
+router_mounter = LazyRouterMounter(app, on_failure=register_fallback_router)
+app.state.router_mounter = router_mounter
+
+if lazy_routers_enabled:
+    for module_path, prefix in optional_routers:
+        router_mounter.register(module_path, prefix)
+    app.middleware("http")(router_mounter.dispatch)
+    logger.info(f"📋 Loaded {len(loaded_routers)} essential router(s); {len(optional_routers)} deferred until first request")
+else:
+    for module_path, prefix in optional_routers:
+        router_mounter.mount_now(module_path)
+    loaded_routers.extend(router_mounter.loaded)
+    logger.info(f"📋 Loaded {len(loaded_routers)} out of {len(essential_routers) + len(optional_routers)} routers")
 
 # Serve standalone form page for iframe embedding
 @app.get("/form/{form_id}")
-async def serve_form(form_id: str):
+async def serve_form(form_id: str, request: Request):
     """Serve standalone form page for iframe embedding"""
-    form_path = os.path.join(static_path, "form.html")
-    if os.path.exists(form_path):
-        return FileResponse(form_path)
+    response = static_assets.response(request, "form.html")
+    if response is not None:
+        return response
     else:
         return {"error": "Form not found"}
 
@@ -175,9 +189,8 @@ async def serve_form(form_id: str):
 
 task_scheduler = None
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize services on application startup"""
+def _initialize_task_scheduler():
+    """Build agents and the task scheduler (blocking; runs in a worker thread)"""
     global task_scheduler
     try:
         from database import get_supabase
@@ -191,13 +204,54 @@ async def startup_event():
             social_agent=getattr(agent_manager, 'social_agent', None) if hasattr(agent_manager, 'agents_available') and agent_manager.agents_available else None,
             content_agent=getattr(agent_manager, 'content_agent', None) if hasattr(agent_manager, 'agents_available') and agent_manager.agents_available else None
         )
+
+        # Seed send-time histograms from stored opens and clicks
+        email_agent = getattr(task_scheduler, 'email_agent', None)
+        if hasattr(email_agent, 'load_engagement_history'):
+            email_agent.load_engagement_history(get_supabase())
         logger.info("✅ Task scheduler initialized successfully")
     except Exception as e:
         logger.error(f"❌ Failed to initialize task scheduler: {e}")
 
+async def _load_suppression_list():
+    """Seed the shared send guard from stored bounces and unsubscribes"""
+    try:
+        # The email package pulls in the agents stack, so import it off the event loop
+        email_service = await asyncio.to_thread(
+            importlib.import_module, "backend.agents.email.enhanced_email_service"
+        )
+        loaded = await email_service.get_enhanced_email_service().refresh_suppression_list()
+        logger.info(f"✅ Suppression list loaded with {loaded} stored event(s)")
+    except Exception as e:
+        logger.error(f"❌ Failed to load suppression list: {e}")
+
+@app.on_event("startup")
+async def startup_event():
+    """Initialize services on application startup"""
+    # Agent construction imports the heavy AI stack; do it off the event loop so
+    # the server starts accepting requests (and answering /health) immediately
+    app.state.startup_task = asyncio.create_task(asyncio.to_thread(_initialize_task_scheduler))
+    app.state.suppression_task = asyncio.create_task(_load_suppression_list())
+
+    # Optionally import every deferred router in the background once serving
+    if lazy_routers_enabled and os.getenv("WARM_ROUTERS_ON_STARTUP", "").lower() in ("1", "true", "yes"):
+        app.state.router_warmup_task = asyncio.create_task(router_mounter.mount_all())
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup services on application shutdown"""
+    try:
+        from services.lead_ingestion import shutdown_lead_ingestion
+        await shutdown_lead_ingestion()
+    except Exception as e:
+        logger.error(f"❌ Failed to flush queued leads: {e}")
+
+    try:
+        from services.assessment_templates import shutdown_assessment_views
+        await shutdown_assessment_views()
+    except Exception as e:
+        logger.error(f"❌ Failed to flush assessment views: {e}")
+
     try:
         from services.task_scheduler import shutdown_task_scheduler
         shutdown_task_scheduler()
@@ -12,7 +12,6 @@ from uuid import UUID, uuid4
 
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
 from pydantic import BaseModel, Field
-import google.generativeai as genai
 from database import get_supabase
 from auth import get_current_user
 
@@ -22,6 +21,11 @@ logger = logging.getLogger(__name__)
 # Initialize router
 router = APIRouter(prefix="/ai-video", tags=["ai-video"])
 
+def _load_genai():
+    """Import the Gemini SDK on first use; it adds most of this module's import time"""
+    import google.generativeai as genai
+    return genai
+
 # ============================================================================
 # PYDANTIC MODELS
 # ============================================================================
@@ -124,6 +128,7 @@ async def validate_gemini_key(api_key: str) -> bool:
     Validate Gemini API key with a test request
     """
     try:
+        genai = _load_genai()
         genai.configure(api_key=api_key)
         model = genai.GenerativeModel('gemini-2.0-flash-exp')
         response = model.generate_content("Hello")
@@ -177,6 +182,7 @@ async def generate_video_plan(
             )
 
         # Configure Gemini
+        genai = _load_genai()
         genai.configure(api_key=api_key)
         model = genai.GenerativeModel('gemini-2.0-flash-exp')
 
@@ -294,6 +300,7 @@ async def generate_scene_images(
         supabase.table('ai_video_projects').update({'status': 'generating_images'}).eq('id', request.project_id).execute()
 
         # Configure Gemini
+        genai = _load_genai()
         genai.configure(api_key=api_key)
         model = genai.GenerativeModel('gemini-2.5-flash-image')
 
@@ -377,6 +384,7 @@ async def generate_video(
         }).eq('id', request.project_id).execute()
 
         # Configure Gemini
+        genai = _load_genai()
         genai.configure(api_key=api_key)
 
         # Choose model based on speed preference
@@ -556,6 +564,7 @@ async def autopilot_generate_video(
             }
 
         # Create video plan automatically
+        genai = _load_genai()
         genai.configure(api_key=api_key)
         model = genai.GenerativeModel('gemini-2.0-flash-exp')
 
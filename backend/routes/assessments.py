@@ -4,15 +4,19 @@ Implements high-converting assessment funnels (20-40% conversion rate)
 Based on The Online Assessment Lead Generation Method
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from typing import Dict, Any, List, Optional
 from pydantic import BaseModel, EmailStr, Field, validator
 import uuid
 from datetime import datetime, date, timedelta
 import logging
 
-from database import get_supabase_client
+from database import get_supabase, get_supabase_client
 from auth import verify_token, get_current_user
+from services.idempotency import (
+    IdempotencyStore, DuplicateSubmissionInProgress, IDEMPOTENCY_HEADER, get_idempotency_store
+)
+from services.assessment_templates import get_assessment_template_cache, get_assessment_view_counter
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/assessments", tags=["assessments"])
@@ -68,64 +72,6 @@ class AssessmentUpdateRequest(BaseModel):
 # HELPER FUNCTIONS
 # ============================================================================
 
-def calculate_score(answers: Dict[str, Any], scoring_logic: Dict[str, Any]) -> int:
-    """
-    Calculate assessment score from answers
-
-    Args:
-        answers: Question ID -> Answer value mapping
-        scoring_logic: Question ID -> Answer -> Points mapping
-
-    Returns:
-        Total score (0-100)
-    """
-    total_score = 0
-
-    for question_id, answer_value in answers.items():
-        if question_id in scoring_logic:
-            # Get point value for this answer
-            if isinstance(answer_value, str):
-                points = scoring_logic[question_id].get(answer_value, 0)
-            elif isinstance(answer_value, list):
-                # Multiple selection - sum all selected options
-                points = sum(
-                    scoring_logic[question_id].get(val, 0)
-                    for val in answer_value
-                )
-            else:
-                points = 0
-
-            total_score += points
-
-    # Ensure score is within 0-100 range
-    return max(0, min(100, total_score))
-
-
-def get_result_category(score: int, result_categories: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """
-    Get result category based on score
-
-    Args:
-        score: Assessment score (0-100)
-        result_categories: List of category definitions
-
-    Returns:
-        Matching category dict
-    """
-    for category in result_categories:
-        if category['min_score'] <= score <= category['max_score']:
-            return category
-
-    # Fallback to first category if no match
-    return result_categories[0] if result_categories else {
-        "name": "unknown",
-        "label": "Unknown",
-        "message": "Your results",
-        "cta_text": "Next Steps",
-        "cta_action": "contact"
-    }
-
-
 async def create_or_update_lead(
     email: str,
     name: Optional[str],
@@ -135,58 +81,88 @@ async def create_or_update_lead(
     score: int,
     result_category: str,
     answers: Dict[str, Any],
-    supabase: Any
+    supabase: Any,
+    user_id: Optional[str] = None
 ) -> str:
     """
     Create new lead or update existing lead with assessment data
 
+    Leads are unique per (created_by, lower(email)). The upsert_assessment_lead
+    function merges tags and source details in a single round trip; the
+    select-then-write path below is only used where that function has not been
+    deployed. Phone, campaign and assessment results go in source_details.
+
     Returns:
         Lead ID
     """
-    # Check if lead exists
-    existing_lead = supabase.table('leads').select('id, tags, custom_fields').eq('email', email).execute()
-
-    lead_data = {
-        'email': email,
-        'name': name,
-        'phone': phone,
-        'source': 'assessment',
-        'campaign_id': campaign_id,
-        'status': 'new',
-        'score': score,
-        'tags': [f'assessment-{result_category}', 'assessment-completed'],
-        'custom_fields': {
-            'assessment_id': assessment_id,
-            'assessment_score': score,
-            'assessment_category': result_category,
-            'assessment_completed_at': datetime.now().isoformat()
-        }
+    email = email.strip().lower()
+    name_parts = (name or '').split(None, 1)
+    first_name = name_parts[0] if name_parts else None
+    last_name = name_parts[1] if len(name_parts) > 1 else None
+    tags = [f'assessment-{result_category}', 'assessment-completed']
+    source_details = {
+        'assessment_id': assessment_id,
+        'assessment_score': score,
+        'assessment_category': result_category,
+        'assessment_completed_at': datetime.now().isoformat()
     }
+    if phone:
+        source_details['phone'] = phone
+    if campaign_id:
+        source_details['campaign_id'] = campaign_id
+
+    try:
+        result = supabase.rpc('upsert_assessment_lead', {
+            'p_user_id': user_id,
+            'p_email': email,
+            'p_first_name': first_name,
+            'p_last_name': last_name,
+            'p_score': score,
+            'p_tags': tags,
+            'p_source_details': source_details
+        }).execute()
+        lead_id = result.data
+        logger.info(f"Upserted lead {lead_id} from assessment")
+        return lead_id
+    except Exception as e:
+        logger.warning(f"upsert_assessment_lead unavailable, falling back to select-then-write: {e}")
+
+    # Check if lead exists
+    query = supabase.table('leads').select('id, first_name, last_name, tags, source_details').eq('email', email)
+    query = query.eq('created_by', user_id) if user_id else query.is_('created_by', 'null')
+    existing_lead = query.execute()
 
     if existing_lead.data and len(existing_lead.data) > 0:
         # Update existing lead
         lead_id = existing_lead.data[0]['id']
-        existing_tags = existing_lead.data[0].get('tags', [])
-        existing_custom = existing_lead.data[0].get('custom_fields', {})
-
-        # Merge tags (avoid duplicates)
-        new_tags = list(set(existing_tags + lead_data['tags']))
-
-        # Merge custom fields
-        merged_custom = {**existing_custom, **lead_data['custom_fields']}
+        existing_tags = existing_lead.data[0].get('tags') or []
+        existing_details = existing_lead.data[0].get('source_details') or {}
 
         supabase.table('leads').update({
-            'score': score,
-            'tags': new_tags,
-            'custom_fields': merged_custom,
+            'first_name': existing_lead.data[0].get('first_name') or first_name,
+            'last_name': existing_lead.data[0].get('last_name') or last_name,
+            'lead_score': score,
+            # Merge tags (avoid duplicates) and source details
+            'tags': list(set(existing_tags + tags)),
+            'source_details': {**existing_details, **source_details},
             'updated_at': datetime.now().isoformat()
         }).eq('id', lead_id).execute()
 
         logger.info(f"Updated existing lead {lead_id} with assessment data")
     else:
         # Create new lead
-        lead_data['id'] = str(uuid.uuid4())
-        result = supabase.table('leads').insert(lead_data).execute()
+        result = supabase.table('leads').insert({
+            'id': str(uuid.uuid4()),
+            'created_by': user_id,
+            'email': email,
+            'first_name': first_name,
+            'last_name': last_name,
+            'source': 'assessment',
+            'status': 'new',
+            'lead_score': score,
+            'tags': tags,
+            'source_details': source_details
+        }).execute()
         lead_id = result.data[0]['id']
         logger.info(f"Created new lead {lead_id} from assessment")
 
@@ -198,54 +174,29 @@ async def create_or_update_lead(
 # ============================================================================
 
 @router.get("/public/{assessment_id}")
-async def get_public_assessment(assessment_id: str):
+async def get_public_assessment(assessment_id: str, request: Request):
     """
     Get published assessment for public access
     No authentication required
 
     Returns landing page content and questions
     Tracks view in analytics
-    """
-    supabase = get_supabase_client()
 
+    Served from the template cache with an ETag and Last-Modified date; a
+    matching If-None-Match or If-Modified-Since gets 304. Views (including
+    revalidations) are counted in memory and written in batches.
+    """
     try:
-        # Get assessment
-        result = supabase.table('assessment_templates') \
-            .select('*') \
-            .eq('id', assessment_id) \
-            .eq('status', 'published') \
-            .single() \
-            .execute()
+        cached = await get_assessment_template_cache(get_supabase).get(assessment_id)
 
-        if not result.data:
+        if cached is None:
             raise HTTPException(status_code=404, detail="Assessment not found or not published")
 
-        assessment = result.data
-
-        # Track view
-        try:
-            supabase.rpc('track_assessment_view', {
-                'p_assessment_id': assessment_id,
-                'p_user_id': assessment['user_id']
-            }).execute()
-        except Exception as e:
-            logger.warning(f"Failed to track assessment view: {e}")
+        get_assessment_view_counter(get_supabase).record(assessment_id, cached.template['user_id'])
 
-        # Return public-safe data (hide user_id, internal fields)
-        return {
-            "success": True,
-            "assessment": {
-                "id": assessment['id'],
-                "name": assessment['name'],
-                "description": assessment.get('description'),
-                "headline": assessment['headline'],
-                "subheadline": assessment['subheadline'],
-                "questions": assessment['questions'],
-                "total_questions": len(assessment['questions']),
-                "estimated_time": "3-5 minutes",
-                "created_at": assessment['created_at']
-            }
-        }
+        if cached.not_modified(request.headers):
+            return Response(status_code=304, headers=cached.headers)
+        return Response(content=cached.public_body, media_type="application/json", headers=cached.headers)
 
     except HTTPException:
         raise
@@ -258,7 +209,8 @@ async def get_public_assessment(assessment_id: str):
 async def submit_assessment_response(
     assessment_id: str,
     submission: AssessmentSubmissionRequest,
-    request: Request
+    request: Request,
+    response: Response
 ):
     """
     Submit assessment response (public endpoint)
@@ -270,29 +222,47 @@ async def submit_assessment_response(
     5. Track analytics
     6. Return personalized results
 
+    Repeats of a submission (same Idempotency-Key header, or same content when
+    no key is sent) within the idempotency window replay the first result
+    without touching the database.
+
     No authentication required (public form submission)
     """
-    supabase = get_supabase_client()
+    key = IdempotencyStore.make_key(
+        f"assessment:{assessment_id}", request.headers.get(IDEMPOTENCY_HEADER), submission.dict()
+    )
+    try:
+        result, replayed = await get_idempotency_store(get_supabase).run(
+            key, lambda: process_assessment_submission(assessment_id, submission, request)
+        )
+    except DuplicateSubmissionInProgress:
+        raise HTTPException(status_code=409, detail="This submission is already being processed")
+
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+async def process_assessment_submission(
+    assessment_id: str,
+    submission: AssessmentSubmissionRequest,
+    request: Request
+) -> Dict[str, Any]:
+    """Score a submission, upsert its lead and save the response"""
+    supabase = await get_supabase_client()
 
     try:
-        # Get assessment (with scoring logic)
-        assessment_result = supabase.table('assessment_templates') \
-            .select('*') \
-            .eq('id', assessment_id) \
-            .eq('status', 'published') \
-            .single() \
-            .execute()
+        # Published template and its compiled scoring plan, cached in memory
+        cached = await get_assessment_template_cache(get_supabase).get(assessment_id)
 
-        if not assessment_result.data:
+        if cached is None:
             raise HTTPException(status_code=404, detail="Assessment not found")
 
-        assessment = assessment_result.data
-
-        # Calculate score
-        score = calculate_score(submission.answers, assessment['scoring_logic'])
+        assessment = cached.template
 
-        # Get result category
-        result_category_data = get_result_category(score, assessment['result_categories'])
+        # Calculate score and result category
+        score = cached.plan.score(submission.answers)
+        result_category_data = cached.plan.category(score)
         result_category_name = result_category_data['name']
 
         # Create or update lead
@@ -305,7 +275,8 @@ async def submit_assessment_response(
             score=score,
             result_category=result_category_name,
             answers=submission.answers,
-            supabase=supabase
+            supabase=supabase,
+            user_id=assessment['user_id']
         )
 
         # Calculate completion time
@@ -409,7 +380,7 @@ async def generate_assessment(
     Calls assessment-generator Edge Function
     Saves as draft for user review/approval
     """
-    supabase = get_supabase_client()
+    supabase = await get_supabase_client()
     user_data = get_current_user(token)
 
     try:
@@ -470,7 +441,7 @@ async def get_assessment(
     token: str = Depends(verify_token)
 ):
     """Get assessment by ID (owner only)"""
-    supabase = get_supabase_client()
+    supabase = await get_supabase_client()
     user_data = get_current_user(token)
 
     try:
@@ -503,7 +474,7 @@ async def update_assessment(
     token: str = Depends(verify_token)
 ):
     """Update assessment (owner only)"""
-    supabase = get_supabase_client()
+    supabase = await get_supabase_client()
     user_data = get_current_user(token)
 
     try:
@@ -538,6 +509,7 @@ async def update_assessment(
             .eq('id', assessment_id) \
             .execute()
 
+        get_assessment_template_cache(get_supabase).invalidate(assessment_id)
         logger.info(f"Updated assessment {assessment_id}")
 
         return {
@@ -567,7 +539,7 @@ async def get_assessment_analytics(
     - Score distribution
     - Recent responses
     """
-    supabase = get_supabase_client()
+    supabase = await get_supabase_client()
     user_data = get_current_user(token)
 
     try:
@@ -644,7 +616,7 @@ async def list_assessments(
     token: str = Depends(verify_token)
 ):
     """List user's assessments with optional filters"""
-    supabase = get_supabase_client()
+    supabase = await get_supabase_client()
     user_data = get_current_user(token)
 
     try:
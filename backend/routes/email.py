@@ -1,8 +1,12 @@
-from fastapi import APIRouter, HTTPException
-from typing import Dict, Any
+from fastapi import APIRouter, HTTPException, Request
+from typing import Dict, Any, List
+import hmac
 import logging
+import os
 import uuid
 
+from backend.agents.email.enhanced_email_service import get_enhanced_email_service
+
 router = APIRouter(prefix="/api/email", tags=["email"])
 logger = logging.getLogger(__name__)
 
@@ -29,4 +33,63 @@ async def get_email_templates():
             {"id": "welcome", "name": "Welcome Email"},
             {"id": "newsletter", "name": "Newsletter Template"}
         ]
-    }
\ No newline at end of file
+    }
+
+@router.get("/providers/metrics")
+async def get_provider_metrics():
+    """Get per-provider ESP health, latency and circuit breaker state"""
+    try:
+        return {
+            "status": "success",
+            "data": get_enhanced_email_service().get_provider_metrics()
+        }
+    except Exception as e:
+        logger.error(f"Error getting provider metrics: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/events")
+async def ingest_email_events(events: List[Dict[str, Any]], request: Request):
+    """Ingest ESP delivery events (opened, clicked, bounced, unsubscribed, ...)
+
+    Each event has email_id, event_type, email (the recipient), an optional
+    timestamp and optional metadata such as bounce_type. Events are tracked,
+    bounces and unsubscribes feed the suppression list, and opens and clicks
+    update the email agent's send-time histograms when the agent is loaded.
+    Requires the X-Webhook-Secret header to match EMAIL_EVENTS_WEBHOOK_SECRET.
+    """
+    secret = os.getenv("EMAIL_EVENTS_WEBHOOK_SECRET")
+    if not secret:
+        raise HTTPException(status_code=503, detail="Email event ingestion is not configured")
+    if not hmac.compare_digest(request.headers.get("x-webhook-secret", ""), secret):
+        raise HTTPException(status_code=401, detail="Invalid webhook secret")
+
+    try:
+        service = get_enhanced_email_service()
+        tracked = 0
+        for event in events:
+            metadata = {**(event.get("metadata") or {})}
+            if event.get("bounce_type"):
+                metadata.setdefault("bounce_type", event["bounce_type"])
+            if event.get("timestamp"):
+                metadata.setdefault("occurred_at", event["timestamp"])
+            if await service.record_delivery_event(
+                event.get("email_id", ""), event.get("event_type", ""), event.get("email", ""), metadata
+            ):
+                tracked += 1
+
+        # The scheduler's email agent is the one whose histograms were seeded at startup
+        from services.task_scheduler import get_task_scheduler
+        email_agent = getattr(get_task_scheduler(), "email_agent", None)
+        engagement = 0
+        if hasattr(email_agent, "ingest_email_events"):
+            engagement = email_agent.ingest_email_events(events)
+
+        return {
+            "status": "success",
+            "received": len(events),
+            "tracked": tracked,
+            "engagement_applied": engagement
+        }
+    except Exception as e:
+        logger.error(f"Error ingesting email events: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
@@ -5,15 +5,19 @@ Handles form submissions, webhook receivers, and form configuration
 for capturing leads from embedded forms on landing pages.
 """
 
-from fastapi import APIRouter, Depends, Request, HTTPException
+from fastapi import APIRouter, Depends, Request, Response, HTTPException
 from typing import Dict, Any, List, Optional
+import os
 import uuid
 from datetime import datetime
+from functools import lru_cache
 import logging
 
 from models import APIResponse
 from auth import verify_token, get_current_user
 from database import get_supabase
+from services.lead_ingestion import get_form_config_cache, get_lead_ingestion_queue, build_lead_from_submission
+from services.idempotency import IdempotencyStore, IDEMPOTENCY_HEADER
 
 logger = logging.getLogger(__name__)
 
@@ -21,13 +25,19 @@ router = APIRouter(prefix="/api/lead-capture", tags=["lead-capture"])
 
 # ==================== Webhook Receiver (Public - No Auth) ====================
 
+# The webhook is the landing-page hot path, so its duplicate window is kept in
+# memory only; a database claim would add back a round trip per submission
+webhook_idempotency = IdempotencyStore()
+
 @router.post("/webhook/{form_id}")
-async def receive_form_submission(form_id: str, request: Request):
+async def receive_form_submission(form_id: str, request: Request, response: Response):
     """
     Public webhook endpoint for form submissions
 
     This endpoint receives form submissions from embedded forms.
     No authentication required since it's called from external websites.
+    Double-clicks and retries (same Idempotency-Key header, or same body when
+    no key is sent) replay the first response instead of creating a new lead.
 
     Args:
         form_id: Unique form identifier
@@ -40,80 +50,46 @@ async def receive_form_submission(form_id: str, request: Request):
         # Get form data from request body
         form_data = await request.json()
 
-        logger.info(f"📥 Received form submission for form {form_id}")
-        logger.debug(f"Form data: {form_data}")
+        logger.debug(f"📥 Received form submission for form {form_id}: {form_data}")
 
-        # Get form configuration to validate and get campaign info
-        supabase = get_supabase()
-        form_result = supabase.table('lead_capture_forms') \
-            .select('*') \
-            .eq('id', form_id) \
-            .eq('active', True) \
-            .single() \
-            .execute()
+        key = IdempotencyStore.make_key(f"lead-capture:{form_id}", request.headers.get(IDEMPOTENCY_HEADER), form_data)
+        result, replayed = await webhook_idempotency.run(key, lambda: ingest_form_submission(form_id, form_data))
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+        return result
 
-        if not form_result.data:
-            logger.error(f"❌ Form {form_id} not found or inactive")
-            raise HTTPException(status_code=404, detail="Form not found or inactive")
-
-        form_config = form_result.data
-
-        # Extract lead data from submission
-        lead_data = {
-            'id': str(uuid.uuid4()),
-            'form_id': form_id,
-            'campaign_id': form_config.get('campaign_id'),
-            'user_id': form_config.get('created_by'),
-            'email': form_data.get('email'),
-            'name': form_data.get('name'),
-            'phone': form_data.get('phone'),
-            'company': form_data.get('company'),
-            'custom_fields': form_data.get('custom_fields', {}),
-            'source': 'embedded_form',
-            'status': 'new',
-            'score': 0,
-            'tags': [form_config.get('name', 'Form Lead')],
-            'created_at': datetime.now().isoformat(),
-            'metadata': {
-                'form_name': form_config.get('name'),
-                'campaign_name': form_config.get('campaign_name'),
-                'referrer': form_data.get('referrer'),
-                'utm_source': form_data.get('utm_source'),
-                'utm_medium': form_data.get('utm_medium'),
-                'utm_campaign': form_data.get('utm_campaign')
-            }
-        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error processing form submission: {e}")
+        raise HTTPException(status_code=500, detail=f"Error processing submission: {str(e)}")
 
-        # Validate required fields
-        if not lead_data['email']:
-            raise HTTPException(status_code=400, detail="Email is required")
+async def ingest_form_submission(form_id: str, form_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate a submission against its form and queue the lead"""
+    # Get form configuration (cached) to validate and get campaign info
+    form_config = await get_form_config_cache(get_supabase).get(form_id)
 
-        # Insert lead into database
-        lead_result = supabase.table('leads').insert(lead_data).execute()
+    if not form_config:
+        logger.error(f"❌ Form {form_id} not found or inactive")
+        raise HTTPException(status_code=404, detail="Form not found or inactive")
 
-        if lead_result.data:
-            lead_id = lead_result.data[0]['id']
-            logger.info(f"✅ Lead captured: {lead_id} from form {form_id}")
+    # Validate required fields
+    if not form_data.get('email'):
+        raise HTTPException(status_code=400, detail="Email is required")
 
-            # Update form submission count
-            supabase.table('lead_capture_forms').update({
-                'submissions_count': form_config.get('submissions_count', 0) + 1,
-                'last_submission_at': datetime.now().isoformat()
-            }).eq('id', form_id).execute()
+    # Extract lead data from submission; the id is assigned here so it can be
+    # returned before the queued insert is flushed
+    lead_id = str(uuid.uuid4())
+    lead_data = build_lead_from_submission(form_id, form_config, form_data, lead_id)
 
-            return {
-                "success": True,
-                "lead_id": lead_id,
-                "message": "Thank you! We'll be in touch soon."
-            }
-        else:
-            raise HTTPException(status_code=500, detail="Failed to save lead")
+    # Queue for bulk insert; the submission counter is incremented atomically on flush
+    await get_lead_ingestion_queue(get_supabase).submit(lead_data)
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"❌ Error processing form submission: {e}")
-        raise HTTPException(status_code=500, detail=f"Error processing submission: {str(e)}")
+    return {
+        "success": True,
+        "lead_id": lead_id,
+        "message": "Thank you! We'll be in touch soon."
+    }
 
 # ==================== Form Configuration (Authenticated) ====================
 
@@ -245,6 +221,8 @@ async def update_form(form_id: str, updates: Dict[str, Any], token: str = Depend
             .eq('created_by', user_id) \
             .execute()
 
+        get_form_config_cache(get_supabase).invalidate(form_id)
+
         if result.data:
             return APIResponse(success=True, data=result.data[0])
         else:
@@ -270,41 +248,19 @@ async def delete_form(form_id: str, token: str = Depends(verify_token)):
             .eq('created_by', user_id) \
             .execute()
 
+        get_form_config_cache(get_supabase).invalidate(form_id)
+
         return APIResponse(success=True, data={"deleted": True})
 
     except Exception as e:
         logger.error(f"❌ Error deleting form: {e}")
         return APIResponse(success=False, error=str(e))
 
-@router.get("/forms/{form_id}/embed-code", response_model=APIResponse)
-async def get_embed_code(form_id: str, token: str = Depends(verify_token)):
-    """
-    Generate embeddable HTML/JS code for the form
-
-    Returns HTML snippet that can be pasted into any website
-    """
-    try:
-        user_data = get_current_user(token)
-        user_id = user_data["id"]
-
-        # Verify form ownership
-        supabase = get_supabase()
-        result = supabase.table('lead_capture_forms') \
-            .select('id, name') \
-            .eq('id', form_id) \
-            .eq('created_by', user_id) \
-            .single() \
-            .execute()
-
-        if not result.data:
-            return APIResponse(success=False, error="Form not found")
-
-        # Get backend URL from environment or use default
-        import os
-        backend_url = os.getenv('BACKEND_URL', 'https://wheels-wins-orchestrator.onrender.com')
-
-        # Generate embed code
-        embed_code = f'''<!-- AI Marketing Hub Lead Capture Form -->
+@lru_cache(maxsize=4096)
+def render_embed_code(form_id: str, backend_url: str) -> Dict[str, str]:
+    """Embed snippets for a form; they only depend on the form id and backend URL"""
+    # Generate embed code
+    embed_code = f'''<!-- AI Marketing Hub Lead Capture Form -->
 <div id="lead-form-{form_id}"></div>
 <script src="{backend_url}/static/form-widget.js"></script>
 <script>
@@ -315,8 +271,8 @@ async def get_embed_code(form_id: str, token: str = Depends(verify_token)):
   }});
 </script>'''
 
-        # Also generate iframe option
-        iframe_code = f'''<!-- AI Marketing Hub Lead Capture Form (iframe) -->
+    # Also generate iframe option
+    iframe_code = f'''<!-- AI Marketing Hub Lead Capture Form (iframe) -->
 <iframe
   src="{backend_url}/form/{form_id}"
   width="100%"
@@ -325,14 +281,44 @@ async def get_embed_code(form_id: str, token: str = Depends(verify_token)):
   style="border: none; max-width: 600px;"
 ></iframe>'''
 
+    return {
+        "embed_code": embed_code,
+        "iframe_code": iframe_code,
+        "direct_url": f"{backend_url}/form/{form_id}"
+    }
+
+@router.get("/forms/{form_id}/embed-code", response_model=APIResponse)
+async def get_embed_code(form_id: str, token: str = Depends(verify_token)):
+    """
+    Generate embeddable HTML/JS code for the form
+
+    Returns HTML snippet that can be pasted into any website
+    """
+    try:
+        user_data = get_current_user(token)
+        user_id = user_data["id"]
+
+        # Verify form ownership (active forms come from the config cache)
+        form_config = await get_form_config_cache(get_supabase).get(form_id)
+        if form_config is None:
+            supabase = get_supabase()
+            result = supabase.table('lead_capture_forms') \
+                .select('id, name, created_by') \
+                .eq('id', form_id) \
+                .eq('created_by', user_id) \
+                .limit(1) \
+                .execute()
+            form_config = result.data[0] if result.data else None
+
+        if not form_config or form_config.get('created_by') != user_id:
+            return APIResponse(success=False, error="Form not found")
+
+        # Get backend URL from environment or use default
+        backend_url = os.getenv('BACKEND_URL', 'https://wheels-wins-orchestrator.onrender.com')
+
         return APIResponse(
             success=True,
-            data={
-                "form_id": form_id,
-                "embed_code": embed_code,
-                "iframe_code": iframe_code,
-                "direct_url": f"{backend_url}/form/{form_id}"
-            }
+            data={"form_id": form_id, **render_embed_code(form_id, backend_url)}
         )
 
     except Exception as e:
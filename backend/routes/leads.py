@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
 from typing import Dict, Any, Optional
 import uuid
@@ -9,8 +9,11 @@ import io
 from datetime import datetime
 
 from backend.models import APIResponse
-from backend.auth import verify_token
+from backend.auth import verify_token, extract_user_id
 from backend.config import agent_manager
+from backend.database import get_supabase
+from backend.services.lead_search import get_lead_search_service
+from backend.services.lead_import import get_lead_import_registry, IMPORT_FORMATS
 
 logger = logging.getLogger(__name__)
 
@@ -30,15 +33,21 @@ async def get_leads(token: str = Depends(verify_token)):
         return APIResponse(success=False, error=str(e))
 
 @router.get("/search", response_model=APIResponse)
-async def search_leads(q: str, token: str = Depends(verify_token)):
-    """Search for leads"""
+async def search_leads(
+    q: str,
+    limit: int = Query(25, ge=1, le=100),
+    cursor: Optional[str] = None,
+    token: str = Depends(verify_token)
+):
+    """Search leads by name, email, company or tags.
+
+    Results are ranked by relevance; pass ``next_cursor`` from a response as
+    ``cursor`` to get the next page.
+    """
     try:
-        if agent_manager.agents_available:
-            search_criteria = {"query": q}
-            result = await agent_manager.lead_generation_agent.find_leads(search_criteria)
-            return APIResponse(success=result["success"], data=result.get("data"), error=result.get("error"))
-        else:
-            raise HTTPException(status_code=503, detail="AI agents not available")
+        user_id = extract_user_id(token)
+        result = await get_lead_search_service(get_supabase).search(user_id, q, limit, cursor)
+        return APIResponse(success=True, data=result)
     except Exception as e:
         logger.error(f"Error searching leads: {e}")
         return APIResponse(success=False, error=str(e))
@@ -69,6 +78,53 @@ async def create_lead(lead_data: Dict[str, Any], token: str = Depends(verify_tok
         logger.error(f"Error creating lead: {e}")
         return APIResponse(success=False, error=str(e))
 
+@router.post("/import", response_model=APIResponse)
+async def import_leads(
+    request: Request,
+    format: Optional[str] = None,
+    import_id: Optional[str] = None,
+    token: str = Depends(verify_token)
+):
+    """Bulk import leads from a CSV or NDJSON request body.
+
+    The body is streamed and imported in chunks; leads are matched to existing
+    ones by email. Pass your own ``import_id`` to poll
+    ``GET /api/leads/import/{import_id}`` for progress while uploading.
+    """
+    content_type = request.headers.get("content-type", "")
+    fmt = (format or ("ndjson" if "ndjson" in content_type or "jsonlines" in content_type else "csv")).lower()
+    if fmt not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Unsupported format. Use 'csv' or 'ndjson'.")
+
+    try:
+        user_id = extract_user_id(token)
+        lead_import = get_lead_import_registry().start(get_supabase, user_id, fmt, import_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        async for data in request.stream():
+            await lead_import.feed(data)
+        report = await lead_import.finish()
+        get_lead_search_service(get_supabase).invalidate(user_id)
+        return APIResponse(success=True, data=report)
+    except Exception as e:
+        logger.error(f"Error importing leads: {e}")
+        await lead_import.abort(e)
+        get_lead_search_service(get_supabase).invalidate(user_id)
+        return APIResponse(success=False, data=lead_import.report(), error=str(e))
+
+@router.get("/import/{import_id}", response_model=APIResponse)
+async def get_import_progress(import_id: str, errors: bool = False, token: str = Depends(verify_token)):
+    """Progress of a running or recent lead import"""
+    try:
+        lead_import = get_lead_import_registry().get(import_id, extract_user_id(token))
+    except ValueError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    if lead_import is None:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return APIResponse(success=True, data=lead_import.report() if errors else lead_import.progress())
+
 @router.get("/export")
 async def export_leads(format: str = "csv", token: str = Depends(verify_token)):
     """Export leads in CSV or JSON format"""
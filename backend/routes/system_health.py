@@ -1,9 +1,16 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Request
 from datetime import datetime
+import asyncio
 import os
 
+from backend.auth import verify_token, get_current_user, is_admin_user
+
 router = APIRouter(prefix="/api/health", tags=["health"])
 
+# Each profile spawns a fresh interpreter that imports the whole app, so only
+# one may run at a time
+_profile_lock = asyncio.Lock()
+
 @router.get("/")
 async def health_check():
     """System health check endpoint"""
@@ -24,4 +31,28 @@ async def system_status():
             "database": "healthy"
         },
         "timestamp": datetime.now().isoformat()
-    }
\ No newline at end of file
+    }
+
+@router.get("/startup")
+async def startup_diagnostics(request: Request, profile: bool = False, token: str = Depends(verify_token)):
+    """Deferred router load state; ``profile=true`` (admins only) adds a cold -X importtime report"""
+    # Router stats include import errors and module paths, so the token is verified, not just present
+    try:
+        get_current_user(token)
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    if profile and not is_admin_user(token):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if profile and _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A startup profile is already running")
+
+    mounter = getattr(request.app.state, "router_mounter", None)
+    result = {
+        "routers": mounter.get_stats() if mounter else None,
+        "timestamp": datetime.now().isoformat()
+    }
+    if profile:
+        from backend.services.startup_diagnostics import import_time_report
+        async with _profile_lock:
+            result["import_time"] = await asyncio.to_thread(import_time_report, ["backend.main"])
+    return result
@@ -0,0 +1,349 @@
+"""
+Assessment Template Cache
+
+Published assessment templates are kept in memory together with a compiled
+scoring plan, so public submissions are scored without reading
+``assessment_templates`` again. The plan flattens ``scoring_logic`` into one
+answer -> points table per scored question and resolves the (possibly overlapping)
+``result_categories`` ranges into sorted boundaries searched with ``bisect``.
+
+The public view of each template is serialized once with an ETag and
+Last-Modified date for conditional GETs, and page views are counted in
+memory and written per assessment on a short interval.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from numbers import Real
+from typing import Dict, Any, List, Optional, Callable, Tuple, Mapping
+
+from backend.singleflight import SingleFlight
+from .static_assets import etag_matches
+
+logger = logging.getLogger(__name__)
+
+# Revalidated on every view, so updates show at once and every view is counted
+PUBLIC_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+UNKNOWN_RESULT_CATEGORY = {
+    "name": "unknown",
+    "label": "Unknown",
+    "message": "Your results",
+    "cta_text": "Next Steps",
+    "cta_action": "contact"
+}
+
+class ScoringPlan:
+    """Answer-to-points table and category lookup compiled from one template.
+
+    Scores and categories match a walk over ``scoring_logic`` and a first-match
+    scan of ``result_categories``: overlapping ranges resolve to the category
+    listed first, and scores outside every range fall back to the first
+    category. Categories without numeric ``min_score``/``max_score`` never match.
+    """
+
+    def __init__(self, scoring_logic: Dict[str, Any], result_categories: List[Dict[str, Any]]):
+        self.points: Dict[str, Dict[str, Any]] = {
+            question_id: dict(answer_points)
+            for question_id, answer_points in (scoring_logic or {}).items()
+            if isinstance(answer_points, dict)
+        }
+
+        self.categories = list(result_categories or [])
+        self.fallback = self.categories[0] if self.categories else UNKNOWN_RESULT_CATEGORY
+
+        ranges = [
+            (category['min_score'], category['max_score'], category)
+            for category in self.categories
+            if isinstance(category.get('min_score'), Real) and isinstance(category.get('max_score'), Real)
+        ]
+
+        def first_match(score) -> Optional[Dict[str, Any]]:
+            return next((category for low, high, category in ranges if low <= score <= high), None)
+
+        # Every range starts and ends on a boundary, so the winning category is
+        # constant on each boundary and on each open gap between two boundaries
+        self.boundaries = sorted({bound for low, high, _ in ranges for bound in (low, high)})
+        self.at_boundary = [first_match(bound) for bound in self.boundaries]
+        self.between = [None] + [
+            first_match((low + high) / 2) for low, high in zip(self.boundaries, self.boundaries[1:])
+        ] + [None]
+
+    def score(self, answers: Dict[str, Any]) -> Any:
+        """Total points for a question ID -> answer mapping, clamped to 0-100"""
+        tables = self.points
+        total = 0
+        for question_id, answer_value in answers.items():
+            points = tables.get(question_id)
+            if points is None:
+                continue
+            if isinstance(answer_value, str):
+                total += points.get(answer_value, 0)
+            elif isinstance(answer_value, list):
+                # Multiple selection - sum all selected options
+                for value in answer_value:
+                    total += points.get(value, 0)
+        return max(0, min(100, total))
+
+    def category(self, score) -> Dict[str, Any]:
+        """Result category for a score"""
+        index = bisect_left(self.boundaries, score)
+        if index < len(self.boundaries) and self.boundaries[index] == score:
+            match = self.at_boundary[index]
+        else:
+            match = self.between[index]
+        return match if match is not None else self.fallback
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+class CachedAssessment:
+    """A published template row, its scoring plan and its serialized public view"""
+
+    __slots__ = ("template", "plan", "public_body", "last_modified", "headers")
+
+    def __init__(self, template: Dict[str, Any]):
+        self.template = template
+        self.plan = ScoringPlan(template.get('scoring_logic'), template.get('result_categories'))
+
+        # Public-safe data only (no user_id or scoring internals)
+        questions = template.get('questions') or []
+        public = {
+            "success": True,
+            "assessment": {
+                "id": template['id'],
+                "name": template.get('name'),
+                "description": template.get('description'),
+                "headline": template.get('headline'),
+                "subheadline": template.get('subheadline'),
+                "questions": questions,
+                "total_questions": len(questions),
+                "estimated_time": "3-5 minutes",
+                "created_at": template.get('created_at')
+            }
+        }
+        self.public_body = json.dumps(public, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+        changed = template.get('updated_at') or template.get('published_at') or template.get('created_at')
+        parsed = _parse_timestamp(changed) if changed else None
+        # HTTP dates have whole-second precision
+        self.last_modified = parsed.astimezone(timezone.utc).replace(microsecond=0) if parsed else None
+        self.headers = {
+            "ETag": '"' + hashlib.sha256(self.public_body).hexdigest()[:32] + '"',
+            "Cache-Control": PUBLIC_CACHE_CONTROL
+        }
+        if self.last_modified is not None:
+            self.headers["Last-Modified"] = format_datetime(self.last_modified, usegmt=True)
+
+    def not_modified(self, request_headers: Mapping[str, str]) -> bool:
+        """Whether a conditional GET can be answered with 304.
+
+        If-None-Match wins over If-Modified-Since when both are sent.
+        """
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match:
+            return etag_matches(if_none_match, self.headers["ETag"])
+
+        if_modified_since = request_headers.get("if-modified-since")
+        if not if_modified_since or self.last_modified is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return self.last_modified <= since
+
+class AssessmentTemplateCache:
+    """TTL cache of published assessment templates (misses are cached briefly too).
+
+    ``invalidate`` only clears this process; other workers pick up changes
+    when their entry expires.
+    """
+
+    def __init__(self,
+                 get_client: Callable[[], Any],
+                 ttl_seconds: float = 300,
+                 missing_ttl_seconds: float = 10):
+        self.get_client = get_client
+        self.ttl_seconds = ttl_seconds
+        self.missing_ttl_seconds = missing_ttl_seconds
+        self._entries: Dict[str, Tuple[float, Optional[CachedAssessment]]] = {}
+        self._loading = SingleFlight()
+        # Bumped by invalidate, so a load that raced an update is not kept
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, assessment_id: str) -> Optional[CachedAssessment]:
+        result = self.get_client().table('assessment_templates') \
+            .select('*') \
+            .eq('id', assessment_id) \
+            .eq('status', 'published') \
+            .limit(1) \
+            .execute()
+        return CachedAssessment(result.data[0]) if result.data else None
+
+    async def get(self, assessment_id: str) -> Optional[CachedAssessment]:
+        """Published template with its scoring plan, or None if not found or not published"""
+        entry = self._entries.get(assessment_id)
+        if entry is not None and time.monotonic() < entry[0]:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        # Concurrent requests for a cold assessment share one lookup
+        cached, _ = await self._loading.run(assessment_id, lambda: self._load_and_store(assessment_id))
+        return cached
+
+    async def _load_and_store(self, assessment_id: str) -> Optional[CachedAssessment]:
+        generation = self._generation
+        cached = await asyncio.to_thread(self._load, assessment_id)
+        # An invalidation while loading means this copy may already be stale
+        if generation == self._generation:
+            ttl = self.ttl_seconds if cached is not None else self.missing_ttl_seconds
+            self._entries[assessment_id] = (time.monotonic() + ttl, cached)
+        return cached
+
+    def invalidate(self, assessment_id: str = None) -> None:
+        """Drop one assessment (after an update) or the whole cache"""
+        self._generation += 1
+        if assessment_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(assessment_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+class AssessmentViewCounter:
+    """Counts public assessment views in memory and writes them in batches.
+
+    Every ``flush_interval`` seconds (sooner once ``max_pending`` views are
+    waiting) each assessment's views are added with one
+    ``track_assessment_view`` call. Views whose write fails are kept for the
+    next flush. ``close()`` writes what is left on shutdown, so only a crash
+    loses views, at most ``flush_interval`` seconds of them.
+    """
+
+    def __init__(self,
+                 get_client: Callable[[], Any],
+                 flush_interval: float = 5.0,
+                 max_pending: int = 1000):
+        self.get_client = get_client
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[Tuple[str, str], int] = {}
+        self._pending_views = 0
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._worker: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.written = 0
+        self.flushes = 0
+        self.failed_writes = 0
+
+    def record(self, assessment_id: str, user_id: str) -> None:
+        """Count one view of an assessment owned by user_id"""
+        key = (assessment_id, user_id)
+        self._pending[key] = self._pending.get(key, 0) + 1
+        self._pending_views += 1
+        self.recorded += 1
+        self._ensure_worker()
+        if self._pending_views >= self.max_pending:
+            self._wakeup.set()
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ Assessment view flush failed: {e}")
+
+    async def flush(self) -> None:
+        """Write every pending view count"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            self._pending_views = 0
+            failed = await asyncio.to_thread(self._write, pending)
+            for key, views in failed.items():
+                self._pending[key] = self._pending.get(key, 0) + views
+                self._pending_views += views
+            self.flushes += 1
+
+    def _write(self, pending: Dict[Tuple[str, str], int]) -> Dict[Tuple[str, str], int]:
+        supabase = self.get_client()
+        failed = {}
+        for (assessment_id, user_id), views in pending.items():
+            try:
+                supabase.rpc('track_assessment_view', {
+                    'p_assessment_id': assessment_id,
+                    'p_user_id': user_id,
+                    'p_views': views
+                }).execute()
+                self.written += views
+            except Exception as e:
+                self.failed_writes += 1
+                failed[(assessment_id, user_id)] = views
+                logger.warning(f"Failed to track {views} view(s) of assessment {assessment_id}: {e}")
+        return failed
+
+    async def close(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self._pending_views,
+            "recorded": self.recorded,
+            "written": self.written,
+            "flushes": self.flushes,
+            "failed_writes": self.failed_writes
+        }
+
+# Global instances
+assessment_template_cache: Optional[AssessmentTemplateCache] = None
+assessment_view_counter: Optional[AssessmentViewCounter] = None
+
+def get_assessment_template_cache(get_client: Callable[[], Any]) -> AssessmentTemplateCache:
+    """Get or create the global assessment template cache"""
+    global assessment_template_cache
+    if assessment_template_cache is None:
+        assessment_template_cache = AssessmentTemplateCache(get_client)
+    return assessment_template_cache
+
+def get_assessment_view_counter(get_client: Callable[[], Any]) -> AssessmentViewCounter:
+    """Get or create the global assessment view counter"""
+    global assessment_view_counter
+    if assessment_view_counter is None:
+        assessment_view_counter = AssessmentViewCounter(get_client)
+    return assessment_view_counter
+
+async def shutdown_assessment_views() -> None:
+    """Write buffered view counts before the process exits"""
+    if assessment_view_counter is not None:
+        await assessment_view_counter.close()
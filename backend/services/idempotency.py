@@ -0,0 +1,179 @@
+"""
+Idempotency Service
+
+Suppresses duplicate submissions to public endpoints (double-clicks, client
+retries). A request is identified by a client-supplied ``Idempotency-Key`` or,
+failing that, a hash of its content. The first request runs; repeats inside
+the TTL window replay its response. Repeats are caught in memory before any
+database work; when a database client is available, keys are also claimed in
+the ``idempotency_keys`` table so duplicates landing on another worker or
+after a restart are suppressed too.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple
+
+from backend.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+class DuplicateSubmissionInProgress(Exception):
+    """The same submission is still being processed by another worker"""
+
+class IdempotencyStore:
+    """TTL window of recent request keys and their responses"""
+
+    def __init__(self,
+                 get_client: Callable[[], Any] = None,
+                 ttl_seconds: float = 600,
+                 max_entries: int = 50000,
+                 table: str = 'idempotency_keys'):
+        self.get_client = get_client
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.table = table
+        self._responses: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight = SingleFlight()
+        self.db_enabled = get_client is not None
+        self._db_retry_at = 0.0
+        self.executed = 0
+        self.replayed = 0
+
+    @staticmethod
+    def make_key(scope: str, client_key: Optional[str] = None, payload: Any = None) -> str:
+        """Key from the client's idempotency key, or a hash of the request content"""
+        if client_key:
+            return f"{scope}:key:{client_key.strip()[:200]}"
+        digest = hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        return f"{scope}:sha256:{digest}"
+
+    async def run(self,
+                  key: str,
+                  handler: Callable[[], Awaitable[Dict[str, Any]]]) -> Tuple[Dict[str, Any], bool]:
+        """Run ``handler`` once per key; returns (response, replayed).
+
+        Failed handlers (including HTTP errors) are not remembered, so the
+        client can retry them.
+        """
+        cached = self._get_cached(key)
+        if cached is not None:
+            self.replayed += 1
+            return cached, True
+
+        (response, replayed), shared = await self._inflight.run(key, lambda: self._run_once(key, handler))
+        if shared:
+            self.replayed += 1
+        return response, replayed or shared
+
+    async def _run_once(self,
+                        key: str,
+                        handler: Callable[[], Awaitable[Dict[str, Any]]]) -> Tuple[Dict[str, Any], bool]:
+        claimed = False
+        try:
+            if self.db_enabled and time.monotonic() >= self._db_retry_at:
+                stored, claimed = await asyncio.to_thread(self._claim, key)
+                if stored is not None:
+                    self._remember(key, stored)
+                    self.replayed += 1
+                    return stored, True
+
+            response = await handler()
+            self.executed += 1
+            self._remember(key, response)
+            if claimed:
+                await asyncio.to_thread(self._store, key, response)
+            return response, False
+        except BaseException:
+            if claimed:
+                await asyncio.to_thread(self._release, key)
+            raise
+
+    def _get_cached(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._responses.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() > entry[0]:
+            del self._responses[key]
+            return None
+        return entry[1]
+
+    def _remember(self, key: str, response: Dict[str, Any]) -> None:
+        self._responses[key] = (time.monotonic() + self.ttl_seconds, response)
+        self._responses.move_to_end(key)
+        while len(self._responses) > self.max_entries:
+            self._responses.popitem(last=False)
+
+    # ---- database fallback ----
+
+    def _claim(self, key: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """Claim the key in the database: (stored response, claimed by us)"""
+        now = datetime.now(timezone.utc)
+        try:
+            supabase = self.get_client()
+            result = supabase.table(self.table).upsert({
+                'key': key,
+                'response': None,
+                'expires_at': (now + timedelta(seconds=self.ttl_seconds)).isoformat()
+            }, on_conflict='key', ignore_duplicates=True).execute()
+            if result.data:
+                return None, True
+
+            existing = supabase.table(self.table).select('response, expires_at').eq('key', key).limit(1).execute()
+            row = existing.data[0] if existing.data else None
+            if row is None or datetime.fromisoformat(row['expires_at']) < now:
+                # Expired (or just deleted) claim: take it over
+                supabase.table(self.table).upsert({
+                    'key': key,
+                    'response': None,
+                    'expires_at': (now + timedelta(seconds=self.ttl_seconds)).isoformat()
+                }, on_conflict='key').execute()
+                return None, True
+            if row['response'] is None:
+                raise DuplicateSubmissionInProgress(key)
+            return row['response'], False
+        except DuplicateSubmissionInProgress:
+            raise
+        except Exception as e:
+            # Without the table (or database) the in-memory window still applies
+            logger.warning(f"⚠️ Idempotency table unavailable, using in-memory window for 60s: {e}")
+            self._db_retry_at = time.monotonic() + 60
+            return None, False
+
+    def _store(self, key: str, response: Dict[str, Any]) -> None:
+        try:
+            self.get_client().table(self.table).update({'response': response}).eq('key', key).execute()
+        except Exception as e:
+            logger.warning(f"Failed to store idempotent response for {key}: {e}")
+
+    def _release(self, key: str) -> None:
+        try:
+            self.get_client().table(self.table).delete().eq('key', key).execute()
+        except Exception as e:
+            logger.warning(f"Failed to release idempotency key {key}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._responses),
+            "in_flight": len(self._inflight),
+            "executed": self.executed,
+            "replayed": self.replayed,
+            "db_enabled": self.db_enabled
+        }
+
+# Global idempotency store
+idempotency_store: Optional[IdempotencyStore] = None
+
+def get_idempotency_store(get_client: Callable[[], Any] = None) -> IdempotencyStore:
+    """Get or create the global idempotency store"""
+    global idempotency_store
+    if idempotency_store is None:
+        idempotency_store = IdempotencyStore(get_client)
+    return idempotency_store
@@ -0,0 +1,123 @@
+"""
+Lazy Router Mounting
+
+Routers are registered by URL prefix and only imported (and included in the
+app) when the first request for that prefix arrives, so application startup
+does not pay for every route module's dependencies before /health responds.
+"""
+
+import asyncio
+import importlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Callable, Optional
+
+from fastapi import FastAPI, Request
+
+logger = logging.getLogger(__name__)
+
+class LazyRouterMounter:
+    """Imports and includes routers on first request to their prefix"""
+
+    def __init__(self,
+                 app: FastAPI,
+                 on_failure: Callable[[str, Exception], None] = None):
+        self.app = app
+        self.on_failure = on_failure
+        self._pending: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.loaded: List[str] = []
+        self.failed: Dict[str, str] = {}
+        self.load_times_ms: Dict[str, float] = {}
+
+    def register(self, module_path: str, prefix: str) -> None:
+        """Defer a router module until a request under ``prefix`` arrives"""
+        self._pending.setdefault(prefix.rstrip("/"), []).append(module_path)
+
+    def pending_modules(self) -> List[str]:
+        return [module_path for modules in self._pending.values() for module_path in modules]
+
+    def _prefix_for(self, path: str) -> Optional[str]:
+        for prefix in self._pending:
+            if path == prefix or path.startswith(prefix + "/"):
+                return prefix
+        return None
+
+    def _include(self, module_path: str, module: Any) -> bool:
+        router = getattr(module, "router", None)
+        if router is None:
+            logger.warning(f"⚠️ Router {module_path} exists but has no 'router' attribute")
+            return False
+        self.app.include_router(router)
+        # Routes changed, so the cached OpenAPI schema is stale
+        self.app.openapi_schema = None
+        self.loaded.append(module_path)
+        return True
+
+    def _record_failure(self, module_path: str, error: Exception) -> None:
+        self.failed[module_path] = str(error)
+        if isinstance(error, ImportError):
+            logger.warning(f"⚠️ Could not import router {module_path} (missing dependency): {str(error)}")
+        else:
+            logger.error(f"❌ Failed to load optional router {module_path}: {str(error)}")
+        if self.on_failure:
+            self.on_failure(module_path, error)
+
+    def mount_now(self, module_path: str) -> bool:
+        """Import and include a router synchronously (eager mode)"""
+        started = time.perf_counter()
+        try:
+            module = importlib.import_module(module_path)
+            included = self._include(module_path, module)
+            if included:
+                logger.info(f"✅ Loaded optional router: {module_path}")
+            return included
+        except Exception as e:
+            self._record_failure(module_path, e)
+            return False
+        finally:
+            self.load_times_ms[module_path] = round((time.perf_counter() - started) * 1000, 1)
+
+    async def mount_prefix(self, prefix: str) -> None:
+        """Load every router registered under a prefix, importing off the event loop"""
+        lock = self._locks.setdefault(prefix, asyncio.Lock())
+        async with lock:
+            modules = self._pending.pop(prefix, None)
+            if not modules:
+                return
+            for module_path in modules:
+                started = time.perf_counter()
+                try:
+                    module = await asyncio.to_thread(importlib.import_module, module_path)
+                    if self._include(module_path, module):
+                        logger.info(f"✅ Lazily loaded router {module_path} for {prefix}")
+                except Exception as e:
+                    self._record_failure(module_path, e)
+                finally:
+                    self.load_times_ms[module_path] = round((time.perf_counter() - started) * 1000, 1)
+
+    async def mount_all(self) -> None:
+        """Load every pending router (used for OpenAPI docs and background warm-up)"""
+        for prefix in list(self._pending):
+            await self.mount_prefix(prefix)
+
+    async def dispatch(self, request: Request, call_next):
+        """HTTP middleware: load the router for this path before routing the request"""
+        if self._pending:
+            path = request.url.path
+            if path in (self.app.openapi_url, self.app.docs_url, self.app.redoc_url):
+                await self.mount_all()
+            else:
+                prefix = self._prefix_for(path)
+                if prefix is not None:
+                    await self.mount_prefix(prefix)
+        return await call_next(request)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": list(self.loaded),
+            "pending": self.pending_modules(),
+            "failed": dict(self.failed),
+            "load_times_ms": dict(self.load_times_ms)
+        }
@@ -0,0 +1,405 @@
+"""
+Lead Import Service
+
+Bulk lead import from CSV or NDJSON uploads. The upload is parsed as it
+arrives, rows are validated with ``validation.validate_email`` and
+deduplicated by email, and valid rows are merged into the user's leads in
+chunks through the ``import_leads`` database function (existing emails are
+updated, new ones inserted). Memory stays bounded by one chunk, an 8-byte
+digest per distinct email, and a capped error report, so uploads of millions
+of rows can be imported. Progress is available while the import runs.
+"""
+
+import asyncio
+import codecs
+import csv
+import hashlib
+import json
+import logging
+import re
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Callable, Tuple, Set
+
+from backend.validation import validate_email, sanitize_text_input
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+IMPORT_FIELDS = ("email", "first_name", "last_name", "company", "job_title", "industry", "country", "source", "tags")
+
+# Normalized header -> lead field
+COLUMN_ALIASES = {
+    "email": "email",
+    "emailaddress": "email",
+    "mail": "email",
+    "firstname": "first_name",
+    "givenname": "first_name",
+    "lastname": "last_name",
+    "surname": "last_name",
+    "familyname": "last_name",
+    "name": "name",
+    "fullname": "name",
+    "company": "company",
+    "companyname": "company",
+    "organization": "company",
+    "organisation": "company",
+    "jobtitle": "job_title",
+    "title": "job_title",
+    "position": "job_title",
+    "industry": "industry",
+    "country": "country",
+    "source": "source",
+    "tags": "tags",
+    "labels": "tags"
+}
+
+_HEADER_NOISE = re.compile(r"[^a-z]")
+_TAG_SEPARATORS = re.compile(r"[,;|]")
+
+@lru_cache(maxsize=1024)
+def normalize_column(name: str) -> Optional[str]:
+    """Lead field for an upload column, or None to ignore it"""
+    return COLUMN_ALIASES.get(_HEADER_NOISE.sub("", str(name).lower()))
+
+def normalize_import_row(record: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Lead fields for one upload row: (lead, None) or (None, error)"""
+    values: Dict[str, Any] = {}
+    for column, value in record.items():
+        field = normalize_column(str(column))
+        if field is not None and value not in (None, "") and field not in values:
+            values[field] = value
+
+    email = str(values.get("email") or "").strip().lower()
+    is_valid, error = validate_email(email)
+    if not is_valid:
+        return None, error
+
+    if "name" in values and not (values.get("first_name") or values.get("last_name")):
+        first, _, last = sanitize_text_input(str(values["name"]), 200).partition(" ")
+        values["first_name"], values["last_name"] = first, last.strip()
+
+    lead = {"email": email}
+    for field in IMPORT_FIELDS[1:-1]:
+        lead[field] = sanitize_text_input(str(values.get(field) or ""), 200) or None
+
+    tags = values.get("tags") or []
+    if isinstance(tags, str):
+        tags = _TAG_SEPARATORS.split(tags)
+    lead["tags"] = [tag for tag in (sanitize_text_input(str(tag), 50) for tag in tags) if tag]
+    return lead, None
+
+class UploadParser:
+    """Incremental CSV/NDJSON parser: feed bytes, get (row number, record) pairs.
+
+    CSV records may contain quoted newlines; lines are held back until their
+    quotes balance, so a record split across network chunks is parsed whole.
+    """
+
+    def __init__(self, fmt: str):
+        if fmt not in IMPORT_FORMATS:
+            raise ValueError(f"Unsupported import format '{fmt}'. Use 'csv' or 'ndjson'.")
+        self.fmt = fmt
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+        self._remainder = ""
+        self._pending: List[str] = []
+        self._pending_quotes = 0
+        self._header: Optional[List[Optional[str]]] = None
+        self.rows = 0
+
+    def feed(self, data: bytes) -> List[Tuple[int, Any]]:
+        return self._parse_lines(self._decoder.decode(data), final=False)
+
+    def close(self) -> List[Tuple[int, Any]]:
+        rows = self._parse_lines(self._decoder.decode(b"", final=True), final=True)
+        if self._pending:
+            self.rows += 1
+            rows.append((self.rows, ValueError("Unterminated quoted field at end of file")))
+            self._pending = []
+        return rows
+
+    def _parse_lines(self, text: str, final: bool) -> List[Tuple[int, Any]]:
+        lines = (self._remainder + text).split("\n")
+        self._remainder = "" if final else lines.pop()
+        if self.fmt == "ndjson":
+            return self._parse_ndjson(lines)
+
+        records = []
+        for line in lines:
+            self._pending.append(line)
+            self._pending_quotes += line.count('"')
+            if self._pending_quotes % 2 == 0:
+                records.append("\n".join(self._pending))
+                self._pending = []
+                self._pending_quotes = 0
+        return self._parse_csv(records)
+
+    def _parse_csv(self, records: List[str]) -> List[Tuple[int, Any]]:
+        rows = []
+        for fields in csv.reader(records):
+            if not fields or not any(field.strip() for field in fields):
+                continue
+            if self._header is None:
+                # Columns are mapped to lead fields once, not per row
+                self._header = [normalize_column(field) for field in fields]
+                if "email" not in self._header:
+                    raise ValueError("CSV header has no email column")
+                continue
+            self.rows += 1
+            rows.append((self.rows, {
+                column: value for column, value in zip(self._header, fields) if column is not None
+            }))
+        return rows
+
+    def _parse_ndjson(self, lines: List[str]) -> List[Tuple[int, Any]]:
+        rows = []
+        for line in lines:
+            if not line.strip():
+                continue
+            self.rows += 1
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("Expected a JSON object")
+                rows.append((self.rows, record))
+            except ValueError as e:
+                rows.append((self.rows, ValueError(f"Invalid JSON: {e}")))
+        return rows
+
+def _email_digest(email: str) -> int:
+    # 8 bytes per email instead of the whole string; collisions are negligible at import sizes
+    return int.from_bytes(hashlib.blake2b(email.encode("utf-8"), digest_size=8).digest(), "big")
+
+class LeadImport:
+    """One streaming import: feed upload chunks, then finish"""
+
+    def __init__(self,
+                 get_client: Callable[[], Any],
+                 user_id: str,
+                 fmt: str,
+                 import_id: Optional[str] = None,
+                 chunk_size: int = 1000,
+                 max_errors: int = 1000,
+                 default_source: str = "import"):
+        self.get_client = get_client
+        self.user_id = user_id
+        self.import_id = import_id or str(uuid.uuid4())
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+        self.default_source = default_source
+        self.parser = UploadParser(fmt)
+        self.status = "running"
+        self.started_at = datetime.now().isoformat()
+        self._started = time.monotonic()
+        self._finished: Optional[float] = None
+        self._seen: Set[int] = set()
+        self._chunk: List[Dict[str, Any]] = []
+        self._chunk_rows: List[int] = []
+        self._writing: Optional[asyncio.Task] = None
+        self._use_rpc = True
+        self.errors: List[Dict[str, Any]] = []
+        self.counts = {
+            "bytes_received": 0,
+            "rows_processed": 0,
+            "valid": 0,
+            "invalid": 0,
+            "duplicates": 0,
+            "inserted": 0,
+            "updated": 0,
+            "skipped_existing": 0,
+            "failed": 0,
+            "error_count": 0
+        }
+
+    async def feed(self, data: bytes) -> None:
+        self.counts["bytes_received"] += len(data)
+        await self._process(self.parser.feed(data))
+
+    async def finish(self) -> Dict[str, Any]:
+        """Write the remaining rows and return the final report"""
+        try:
+            await self._process(self.parser.close())
+            await self._flush()
+            await self._wait_for_write()
+            self.status = "completed"
+        except BaseException:
+            self.status = "failed"
+            raise
+        finally:
+            self._finished = time.monotonic()
+        logger.info(f"✅ Lead import {self.import_id}: {self.counts['inserted']} inserted, "
+                    f"{self.counts['updated']} updated, {self.counts['invalid']} invalid, "
+                    f"{self.counts['duplicates']} duplicates in {self._elapsed():.1f}s")
+        return self.report()
+
+    async def abort(self, error: Exception) -> None:
+        """Stop after a fatal error; rows already written stay written"""
+        if self._writing is not None:
+            await asyncio.gather(self._writing, return_exceptions=True)
+        self.status = "failed"
+        self._finished = time.monotonic()
+        self._add_error(None, str(error))
+
+    async def _process(self, rows: List[Tuple[int, Any]]) -> None:
+        for row_number, record in rows:
+            self.counts["rows_processed"] += 1
+            if isinstance(record, Exception):
+                self.counts["invalid"] += 1
+                self._add_error(row_number, str(record))
+                continue
+            lead, error = normalize_import_row(record)
+            if lead is None:
+                self.counts["invalid"] += 1
+                self._add_error(row_number, error, record.get("email") if isinstance(record, dict) else None)
+                continue
+            digest = _email_digest(lead["email"])
+            if digest in self._seen:
+                self.counts["duplicates"] += 1
+                continue
+            self._seen.add(digest)
+            self.counts["valid"] += 1
+            lead["source"] = lead["source"] or self.default_source
+            self._chunk.append(lead)
+            self._chunk_rows.append(row_number)
+            if len(self._chunk) >= self.chunk_size:
+                await self._flush()
+
+    async def _flush(self) -> None:
+        if not self._chunk:
+            return
+        chunk, row_numbers = self._chunk, self._chunk_rows
+        self._chunk, self._chunk_rows = [], []
+        # One chunk is written while the next one is parsed
+        await self._wait_for_write()
+        self._writing = asyncio.create_task(self._write(chunk, row_numbers))
+
+    async def _wait_for_write(self) -> None:
+        if self._writing is not None:
+            writing, self._writing = self._writing, None
+            await writing
+
+    async def _write(self, chunk: List[Dict[str, Any]], row_numbers: List[int]) -> None:
+        if self._use_rpc:
+            try:
+                result = await asyncio.to_thread(self._merge_chunk, chunk)
+                self.counts["inserted"] += result.get("inserted") or 0
+                self.counts["updated"] += result.get("updated") or 0
+                return
+            except Exception as e:
+                logger.warning(f"⚠️ import_leads function unavailable, inserting new leads directly: {e}")
+                self._use_rpc = False
+
+        inserted, skipped, failures = await asyncio.to_thread(self._insert_new_leads, chunk, row_numbers)
+        self.counts["inserted"] += inserted
+        self.counts["skipped_existing"] += skipped
+        self.counts["failed"] += len(failures)
+        for row_number, email, error in failures:
+            self._add_error(row_number, error, email)
+
+    def _merge_chunk(self, chunk: List[Dict[str, Any]]) -> Dict[str, Any]:
+        result = self.get_client().rpc("import_leads", {"p_user_id": self.user_id, "p_leads": chunk}).execute()
+        return result.data[0] if isinstance(result.data, list) and result.data else (result.data or {})
+
+    def _insert_new_leads(self,
+                          chunk: List[Dict[str, Any]],
+                          row_numbers: List[int]) -> Tuple[int, int, List[Tuple[int, str, str]]]:
+        """Fallback without the database function: insert leads whose email is new"""
+        supabase = self.get_client()
+        existing = supabase.table("leads").select("email").eq("created_by", self.user_id) \
+            .in_("email", [lead["email"] for lead in chunk]).execute()
+        existing_emails = {str(row.get("email") or "").lower() for row in existing.data or []}
+
+        rows, numbers = [], []
+        for lead, row_number in zip(chunk, row_numbers):
+            if lead["email"] in existing_emails:
+                continue
+            rows.append({**lead, "id": str(uuid.uuid4()), "created_by": self.user_id, "status": "new"})
+            numbers.append(row_number)
+        skipped = len(chunk) - len(rows)
+        if not rows:
+            return 0, skipped, []
+
+        try:
+            supabase.table("leads").insert(rows).execute()
+            return len(rows), skipped, []
+        except Exception as e:
+            logger.warning(f"Bulk insert of {len(rows)} imported leads failed, retrying row by row: {e}")
+
+        inserted, failures = 0, []
+        for row, row_number in zip(rows, numbers):
+            try:
+                supabase.table("leads").insert(row).execute()
+                inserted += 1
+            except Exception as e:
+                failures.append((row_number, row["email"], str(e)))
+        return inserted, skipped, failures
+
+    def _add_error(self, row_number: Optional[int], error: str, email: Optional[str] = None) -> None:
+        self.counts["error_count"] += 1
+        if len(self.errors) < self.max_errors:
+            entry = {"row": row_number, "error": error}
+            if email:
+                entry["email"] = str(email)[:320]
+            self.errors.append(entry)
+
+    def _elapsed(self) -> float:
+        return (self._finished or time.monotonic()) - self._started
+
+    def progress(self) -> Dict[str, Any]:
+        elapsed = self._elapsed()
+        return {
+            "import_id": self.import_id,
+            "status": self.status,
+            "started_at": self.started_at,
+            "elapsed_seconds": round(elapsed, 2),
+            "rows_per_second": round(self.counts["rows_processed"] / elapsed) if elapsed > 0 else 0,
+            **self.counts
+        }
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            **self.progress(),
+            "errors": self.errors,
+            "errors_truncated": self.counts["error_count"] > len(self.errors)
+        }
+
+class LeadImportRegistry:
+    """Recent imports by (user id, import id), for progress polling.
+
+    Ids are scoped per user, so one user can neither see nor take another
+    user's import id.
+    """
+
+    def __init__(self, max_imports: int = 100):
+        self.max_imports = max_imports
+        self._imports: "OrderedDict[Tuple[str, str], LeadImport]" = OrderedDict()
+
+    def start(self, get_client: Callable[[], Any], user_id: str, fmt: str, import_id: Optional[str] = None,
+              **options) -> LeadImport:
+        if import_id and (user_id, import_id) in self._imports:
+            raise ValueError(f"Import {import_id} already exists")
+        lead_import = LeadImport(get_client, user_id, fmt, import_id, **options)
+        self._imports[(user_id, lead_import.import_id)] = lead_import
+        while len(self._imports) > self.max_imports:
+            oldest = next(iter(self._imports))
+            if self._imports[oldest].status == "running":
+                break
+            del self._imports[oldest]
+        return lead_import
+
+    def get(self, import_id: str, user_id: str) -> Optional[LeadImport]:
+        return self._imports.get((user_id, import_id))
+
+# Global lead import registry
+lead_import_registry: Optional[LeadImportRegistry] = None
+
+def get_lead_import_registry() -> LeadImportRegistry:
+    """Get or create the global lead import registry"""
+    global lead_import_registry
+    if lead_import_registry is None:
+        lead_import_registry = LeadImportRegistry()
+    return lead_import_registry
@@ -0,0 +1,306 @@
+"""
+Lead Ingestion Service
+
+Fast path for public form-submission webhooks. Active form configs are cached
+in memory, validated submissions are queued and written by a background worker
+with bulk inserts, and each form's submission counter is advanced once per
+flush through an atomic database increment. Leads that cannot be inserted are
+kept in the ``lead_ingestion_dead_letters`` table, or in a local JSON-lines
+file when the database cannot take them either.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+from backend.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEAD_LETTER_PATH = os.getenv(
+    "LEAD_DEAD_LETTER_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "lead_ingestion_dead_letters.jsonl")
+)
+
+class FormConfigCache:
+    """TTL cache of active lead capture form configs (misses are cached briefly too)"""
+
+    def __init__(self,
+                 get_client: Callable[[], Any],
+                 ttl_seconds: float = 60,
+                 missing_ttl_seconds: float = 10):
+        self.get_client = get_client
+        self.ttl_seconds = ttl_seconds
+        self.missing_ttl_seconds = missing_ttl_seconds
+        self._entries: Dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+        self._loading = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, form_id: str) -> Optional[Dict[str, Any]]:
+        result = self.get_client().table('lead_capture_forms') \
+            .select('*') \
+            .eq('id', form_id) \
+            .eq('active', True) \
+            .limit(1) \
+            .execute()
+        return result.data[0] if result.data else None
+
+    async def get(self, form_id: str) -> Optional[Dict[str, Any]]:
+        """Active form config, or None if the form does not exist or is inactive"""
+        entry = self._entries.get(form_id)
+        if entry is not None and time.monotonic() < entry[0]:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        # Concurrent submissions for a cold form share one lookup
+        config, _ = await self._loading.run(form_id, lambda: self._load_and_store(form_id))
+        return config
+
+    async def _load_and_store(self, form_id: str) -> Optional[Dict[str, Any]]:
+        config = await asyncio.to_thread(self._load, form_id)
+        ttl = self.ttl_seconds if config is not None else self.missing_ttl_seconds
+        self._entries[form_id] = (time.monotonic() + ttl, config)
+        return config
+
+    def invalidate(self, form_id: str = None) -> None:
+        """Drop one form (after an update or delete) or the whole cache"""
+        if form_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(form_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+class LeadIngestionQueue:
+    """Buffers captured leads and writes them in batches from a background worker.
+
+    Submissions are acknowledged once queued, so a crash loses at most the
+    last ``flush_interval`` seconds of leads; ``close()`` drains the queue on
+    shutdown. If the queue is full the lead is written inline instead of
+    being dropped. Since the caller has already been told the lead was
+    captured, leads whose insert fails are dead-lettered for replay rather
+    than only logged.
+    """
+
+    def __init__(self,
+                 get_client: Callable[[], Any],
+                 max_batch: int = 500,
+                 flush_interval: float = 0.25,
+                 max_queue: int = 10000,
+                 dead_letter_path: str = DEFAULT_DEAD_LETTER_PATH):
+        self.get_client = get_client
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.dead_letter_path = dead_letter_path
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._worker: Optional[asyncio.Task] = None
+        self.enqueued = 0
+        self.inserted = 0
+        self.failed = 0
+        self.dead_lettered = 0
+        self.batches = 0
+        self.inline_writes = 0
+
+    async def submit(self, lead: Dict[str, Any]) -> None:
+        """Queue a validated lead row for insertion"""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(lead)
+            self.enqueued += 1
+        except asyncio.QueueFull:
+            self.inline_writes += 1
+            await asyncio.to_thread(self._write_batch, [lead])
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except Exception as e:
+                logger.error(f"❌ Lead ingestion batch failed: {e}")
+                self.failed += len(batch)
+                await asyncio.to_thread(self._dead_letter, None, [(lead, str(e)) for lead in batch])
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, leads: List[Dict[str, Any]]) -> None:
+        supabase = self.get_client()
+        try:
+            supabase.table('leads').insert(leads).execute()
+            saved = leads
+        except Exception as e:
+            # One bad row (e.g. a duplicate email) fails the whole insert; isolate it
+            logger.warning(f"⚠️ Bulk insert of {len(leads)} leads failed, retrying individually: {e}")
+            saved = []
+            failures = []
+            for lead in leads:
+                try:
+                    supabase.table('leads').insert(lead).execute()
+                    saved.append(lead)
+                except Exception as row_error:
+                    self.failed += 1
+                    failures.append((lead, str(row_error)))
+                    logger.error(f"❌ Failed to save lead from form {_form_id(lead)}: {row_error}")
+            if failures:
+                self._dead_letter(supabase, failures)
+
+        self.inserted += len(saved)
+        self.batches += 1
+        if saved:
+            logger.info(f"✅ Captured {len(saved)} lead(s) in one batch")
+            self._increment_form_counts(supabase, saved)
+
+    def _dead_letter(self, supabase, failures: List[Tuple[Dict[str, Any], str]]) -> None:
+        """Keep leads that could not be inserted, in the dead-letter table or else a local file"""
+        self.dead_lettered += len(failures)
+        rows = [
+            {'form_id': _form_id(lead), 'lead': lead, 'error': error[:2000]}
+            for lead, error in failures
+        ]
+        if supabase is not None:
+            try:
+                supabase.table('lead_ingestion_dead_letters').insert(rows).execute()
+                logger.warning(f"⚠️ Dead-lettered {len(rows)} lead(s) for replay")
+                return
+            except Exception as e:
+                logger.error(f"❌ Failed to dead-letter {len(rows)} lead(s) in the database: {e}")
+
+        failed_at = datetime.now().isoformat()
+        try:
+            os.makedirs(os.path.dirname(self.dead_letter_path) or ".", exist_ok=True)
+            with open(self.dead_letter_path, "a", encoding="utf-8") as dead_letters:
+                for row in rows:
+                    dead_letters.write(json.dumps({**row, 'failed_at': failed_at}, default=str) + "\n")
+            logger.warning(f"⚠️ Dead-lettered {len(rows)} lead(s) to {self.dead_letter_path}")
+        except Exception as e:
+            # Last resort: the lead itself goes to the log
+            for row in rows:
+                logger.critical(f"❌ Lost lead, could not dead-letter ({e}): {json.dumps(row, default=str)}")
+
+    def _increment_form_counts(self, supabase, leads: List[Dict[str, Any]]) -> None:
+        counts: Dict[str, Tuple[int, str]] = {}
+        for lead in leads:
+            form_id = _form_id(lead)
+            if form_id is None:
+                continue
+            count, last_at = counts.get(form_id, (0, lead['created_at']))
+            counts[form_id] = (count + 1, max(last_at, lead['created_at']))
+
+        for form_id, (count, last_at) in counts.items():
+            try:
+                supabase.rpc('increment_form_submissions', {
+                    'p_form_id': form_id,
+                    'p_count': count,
+                    'p_last_submission_at': last_at
+                }).execute()
+            except Exception as e:
+                logger.warning(f"Failed to update submission count for form {form_id}: {e}")
+
+    async def flush(self) -> None:
+        """Wait until every queued lead has been written"""
+        if self._worker is not None and not self._worker.done():
+            await self._queue.join()
+
+    async def close(self) -> None:
+        await self.flush()
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "dead_lettered": self.dead_lettered,
+            "batches": self.batches,
+            "inline_writes": self.inline_writes
+        }
+
+def build_lead_from_submission(form_id: str, form_config: Dict[str, Any], form_data: Dict[str, Any], lead_id: str) -> Dict[str, Any]:
+    """Lead row for a webhook submission.
+
+    Only columns of ``leads`` are set; phone, campaign, form, custom fields and
+    UTM data go in ``source_details``.
+    """
+    first_name = form_data.get('first_name')
+    last_name = form_data.get('last_name')
+    if not first_name and form_data.get('name'):
+        name_parts = form_data['name'].split(None, 1)
+        first_name = name_parts[0] if name_parts else None
+        last_name = last_name or (name_parts[1] if len(name_parts) > 1 else None)
+
+    source_details = {
+        'form_id': form_id,
+        'form_name': form_config.get('name'),
+        'campaign_id': form_config.get('campaign_id'),
+        'campaign_name': form_config.get('campaign_name'),
+        'phone': form_data.get('phone'),
+        'custom_fields': form_data.get('custom_fields'),
+        'referrer': form_data.get('referrer'),
+        'utm_source': form_data.get('utm_source'),
+        'utm_medium': form_data.get('utm_medium'),
+        'utm_campaign': form_data.get('utm_campaign')
+    }
+    return {
+        'id': lead_id,
+        'created_by': form_config.get('created_by'),
+        'email': (form_data.get('email') or '').strip().lower(),
+        'first_name': first_name,
+        'last_name': last_name,
+        'company': form_data.get('company'),
+        'source': 'embedded_form',
+        'status': 'new',
+        'lead_score': 0,
+        'tags': [form_config.get('name', 'Form Lead')],
+        'source_details': {key: value for key, value in source_details.items() if value not in (None, '', {})},
+        'created_at': datetime.now().isoformat()
+    }
+
+def _form_id(lead: Dict[str, Any]) -> Optional[str]:
+    return (lead.get('source_details') or {}).get('form_id')
+
+# Global instances
+form_config_cache: Optional[FormConfigCache] = None
+lead_ingestion_queue: Optional[LeadIngestionQueue] = None
+
+def get_form_config_cache(get_client: Callable[[], Any]) -> FormConfigCache:
+    """Get or create the global form config cache"""
+    global form_config_cache
+    if form_config_cache is None:
+        form_config_cache = FormConfigCache(get_client)
+    return form_config_cache
+
+def get_lead_ingestion_queue(get_client: Callable[[], Any]) -> LeadIngestionQueue:
+    """Get or create the global lead ingestion queue"""
+    global lead_ingestion_queue
+    if lead_ingestion_queue is None:
+        lead_ingestion_queue = LeadIngestionQueue(get_client)
+    return lead_ingestion_queue
+
+async def shutdown_lead_ingestion() -> None:
+    """Drain queued leads before the process exits"""
+    if lead_ingestion_queue is not None:
+        await lead_ingestion_queue.close()
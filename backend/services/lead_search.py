@@ -0,0 +1,310 @@
+"""
+Lead Search Service
+
+Ranked, paginated search over lead name, email, company and tags. Searches
+run through the ``search_leads`` database function (Postgres full-text and
+trigram indexes). If the function is not deployed, an in-process inverted
+index of the user's leads stands in for it, with the same semantics: every
+query term must match a word or word prefix, misspelled terms match
+approximately, and pages are addressed with an opaque keyset cursor over
+(rank, id) instead of an offset.
+"""
+
+import asyncio
+import base64
+import heapq
+import json
+import logging
+import re
+import time
+from bisect import bisect_left
+from typing import Dict, Any, List, Optional, Callable, Tuple, Set
+
+from backend.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Field weights mirror the tsvector weights in the migration (A, A, B, C)
+FIELD_WEIGHTS = {
+    "name": 1.0,
+    "email": 1.0,
+    "company": 0.6,
+    "tags": 0.3
+}
+
+PREFIX_FACTOR = 0.7
+FUZZY_FACTOR = 0.4
+FUZZY_MIN_SIMILARITY = 0.45
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase alphanumeric words; emails split at punctuation"""
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+def _trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def lead_fields(lead: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Searchable words of a lead, by field"""
+    name = lead.get("name") or " ".join(filter(None, [lead.get("first_name"), lead.get("last_name")]))
+    tags = lead.get("tags") or []
+    return {
+        "name": tokenize(name),
+        "email": tokenize(lead.get("email")),
+        "company": tokenize(lead.get("company")),
+        "tags": tokenize(" ".join(tags) if isinstance(tags, list) else str(tags))
+    }
+
+def encode_cursor(rank: float, lead_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([rank, lead_id]).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    """(rank, id) of the last lead on the previous page"""
+    try:
+        rank, lead_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return float(rank), str(lead_id)
+    except Exception:
+        raise ValueError("Invalid search cursor")
+
+class LeadSearchIndex:
+    """Inverted index of lead words with prefix and trigram lookups"""
+
+    def __init__(self, max_expansions: int = 50):
+        self.max_expansions = max_expansions
+        # word -> {lead id: best field weight of that word in the lead}
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._doc_words: Dict[str, Set[str]] = {}
+        self._trigram_words: Dict[str, Set[str]] = {}
+        self._vocabulary: List[str] = []
+        self._vocabulary_dirty = False
+
+    def __len__(self) -> int:
+        return len(self._doc_words)
+
+    def add(self, lead: Dict[str, Any]) -> None:
+        lead_id = str(lead["id"])
+        if lead_id in self._doc_words:
+            self.remove(lead_id)
+        weights: Dict[str, float] = {}
+        for field, words in lead_fields(lead).items():
+            for word in words:
+                weights[word] = max(weights.get(word, 0.0), FIELD_WEIGHTS[field])
+        for word, weight in weights.items():
+            postings = self._postings.get(word)
+            if postings is None:
+                postings = self._postings[word] = {}
+                self._vocabulary_dirty = True
+                for trigram in _trigrams(word):
+                    self._trigram_words.setdefault(trigram, set()).add(word)
+            postings[lead_id] = weight
+        self._doc_words[lead_id] = set(weights)
+
+    def remove(self, lead_id: str) -> None:
+        for word in self._doc_words.pop(str(lead_id), ()):
+            postings = self._postings[word]
+            postings.pop(str(lead_id), None)
+            if not postings:
+                del self._postings[word]
+                self._vocabulary_dirty = True
+                for trigram in _trigrams(word):
+                    self._trigram_words[trigram].discard(word)
+
+    def _sorted_vocabulary(self) -> List[str]:
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+        return self._vocabulary
+
+    def _expand(self, term: str) -> Dict[str, float]:
+        """Matching words for one query term and their match factor"""
+        matches = {term: 1.0} if term in self._postings else {}
+
+        vocabulary = self._sorted_vocabulary()
+        position = bisect_left(vocabulary, term)
+        while position < len(vocabulary) and len(matches) < self.max_expansions:
+            word = vocabulary[position]
+            if not word.startswith(term):
+                break
+            matches.setdefault(word, PREFIX_FACTOR)
+            position += 1
+
+        if not matches and len(term) >= 3:
+            # No word starts with the term: look for misspellings of it
+            term_trigrams = _trigrams(term)
+            shared: Dict[str, int] = {}
+            for trigram in term_trigrams:
+                for word in self._trigram_words.get(trigram, ()):
+                    shared[word] = shared.get(word, 0) + 1
+            for word, count in shared.items():
+                similarity = count / (len(term_trigrams) + len(_trigrams(word)) - count)
+                if similarity >= FUZZY_MIN_SIMILARITY:
+                    matches[word] = FUZZY_FACTOR * similarity
+            if len(matches) > self.max_expansions:
+                matches = dict(heapq.nlargest(self.max_expansions, matches.items(), key=lambda item: item[1]))
+        return matches
+
+    def search(self,
+               query: str,
+               limit: int = 25,
+               after: Optional[Tuple[float, str]] = None) -> List[Tuple[str, float]]:
+        """Page of (lead id, rank), ordered by rank descending then id"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        scores: Optional[Dict[str, float]] = None
+        # Rarest terms first so the candidate set shrinks fastest
+        expansions = sorted((self._expand(term) for term in terms),
+                            key=lambda words: sum(len(self._postings[word]) for word in words))
+        for words in expansions:
+            term_scores: Dict[str, float] = {}
+            for word, factor in words.items():
+                for lead_id, weight in self._postings[word].items():
+                    if scores is not None and lead_id not in scores:
+                        continue
+                    score = weight * factor
+                    if score > term_scores.get(lead_id, 0.0):
+                        term_scores[lead_id] = score
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {lead_id: scores[lead_id] + score for lead_id, score in term_scores.items()}
+            if not scores:
+                return []
+
+        ranked = ((round(score / len(terms), 6), lead_id) for lead_id, score in scores.items())
+        if after is not None:
+            after_rank, after_id = after
+            ranked = (
+                (rank, lead_id) for rank, lead_id in ranked
+                if rank < after_rank or (rank == after_rank and lead_id > after_id)
+            )
+        page = heapq.nsmallest(limit, ranked, key=lambda item: (-item[0], item[1]))
+        return [(lead_id, rank) for rank, lead_id in page]
+
+class LeadSearchService:
+    """Lead search through the database function, or a local index per user"""
+
+    SEARCH_COLUMNS = "id, first_name, last_name, email, company, tags"
+
+    def __init__(self,
+                 get_client: Callable[[], Any],
+                 index_ttl: float = 300,
+                 page_size: int = 1000,
+                 rpc_retry_seconds: float = 300):
+        self.get_client = get_client
+        self.index_ttl = index_ttl
+        self.page_size = page_size
+        self.rpc_retry_seconds = rpc_retry_seconds
+        self._indexes: Dict[str, Tuple[float, LeadSearchIndex]] = {}
+        self._building = SingleFlight()
+        self._rpc_retry_at = 0.0
+
+    async def search(self,
+                     user_id: str,
+                     query: str,
+                     limit: int = 25,
+                     cursor: Optional[str] = None) -> Dict[str, Any]:
+        """One page of matching leads and the cursor of the next page"""
+        after = decode_cursor(cursor) if cursor else None
+
+        if time.monotonic() >= self._rpc_retry_at:
+            try:
+                rows = await asyncio.to_thread(self._search_rpc, user_id, query, limit + 1, after)
+                leads = [dict(row["lead"], search_rank=float(row["rank"])) for row in rows]
+                return self._page(leads, limit, "postgres")
+            except Exception as e:
+                logger.warning(f"⚠️ search_leads function unavailable, using local index: {e}")
+                self._rpc_retry_at = time.monotonic() + self.rpc_retry_seconds
+
+        index = await self._index_for(user_id)
+        ranked = index.search(query, limit + 1, after)
+        leads = await asyncio.to_thread(self._fetch_leads, [lead_id for lead_id, _ in ranked])
+        by_id = {str(lead["id"]): lead for lead in leads}
+        leads = [dict(by_id[lead_id], search_rank=rank) for lead_id, rank in ranked if lead_id in by_id]
+        return self._page(leads, limit, "local_index")
+
+    @staticmethod
+    def _page(leads: List[Dict[str, Any]], limit: int, backend: str) -> Dict[str, Any]:
+        # One extra row was fetched to tell whether another page exists
+        has_more = len(leads) > limit
+        leads = leads[:limit]
+        next_cursor = encode_cursor(leads[-1]["search_rank"], str(leads[-1]["id"])) if has_more else None
+        return {"leads": leads, "next_cursor": next_cursor, "has_more": has_more, "backend": backend}
+
+    def _search_rpc(self,
+                    user_id: str,
+                    query: str,
+                    limit: int,
+                    after: Optional[Tuple[float, str]]) -> List[Dict[str, Any]]:
+        result = self.get_client().rpc("search_leads", {
+            "p_user_id": user_id,
+            "p_query": query,
+            "p_limit": limit,
+            "p_cursor_rank": after[0] if after else None,
+            "p_cursor_id": after[1] if after else None
+        }).execute()
+        return result.data or []
+
+    def _fetch_leads(self, lead_ids: List[str]) -> List[Dict[str, Any]]:
+        if not lead_ids:
+            return []
+        result = self.get_client().table("leads").select("*").in_("id", lead_ids).execute()
+        return result.data or []
+
+    # ---- local index ----
+
+    async def _index_for(self, user_id: str) -> LeadSearchIndex:
+        entry = self._indexes.get(user_id)
+        if entry is not None and time.monotonic() < entry[0]:
+            return entry[1]
+
+        # Concurrent searches for the same user share one build
+        index, _ = await self._building.run(user_id, lambda: self._build_and_store(user_id))
+        return index
+
+    async def _build_and_store(self, user_id: str) -> LeadSearchIndex:
+        index = await asyncio.to_thread(self._build_index, user_id)
+        self._indexes[user_id] = (time.monotonic() + self.index_ttl, index)
+        return index
+
+    def _build_index(self, user_id: str) -> LeadSearchIndex:
+        started = time.perf_counter()
+        index = LeadSearchIndex()
+        supabase = self.get_client()
+        offset = 0
+        while True:
+            result = supabase.table("leads").select(self.SEARCH_COLUMNS).eq("created_by", user_id) \
+                .order("id").range(offset, offset + self.page_size - 1).execute()
+            rows = result.data or []
+            for row in rows:
+                index.add(row)
+            if len(rows) < self.page_size:
+                break
+            offset += self.page_size
+        logger.info(f"🔎 Indexed {len(index)} leads for search in {(time.perf_counter() - started) * 1000:.0f}ms")
+        return index
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        if user_id is None:
+            self._indexes.clear()
+        else:
+            self._indexes.pop(user_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "local_indexes": {user_id: len(index) for user_id, (_, index) in self._indexes.items()},
+            "rpc_available": time.monotonic() >= self._rpc_retry_at
+        }
+
+# Global lead search service
+lead_search_service: Optional[LeadSearchService] = None
+
+def get_lead_search_service(get_client: Callable[[], Any] = None) -> LeadSearchService:
+    """Get or create the global lead search service"""
+    global lead_search_service
+    if lead_search_service is None:
+        lead_search_service = LeadSearchService(get_client)
+    return lead_search_service
@@ -0,0 +1,99 @@
+"""
+Startup Diagnostics
+
+Aggregates ``python -X importtime`` output into a report of where import time
+goes: cumulative cost per requested module, the slowest individual imports by
+self time, and self time grouped by top-level package. Each module is profiled
+in a fresh interpreter so the numbers reflect a cold start.
+
+Usage:
+    python -m backend.services.startup_diagnostics backend.main backend.routes.ai_video
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+from dataclasses import dataclass
+from typing import Dict, Any, List
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+@dataclass
+class ImportRecord:
+    """One line of -X importtime output (times in microseconds)"""
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+def parse_importtime(output: str) -> List[ImportRecord]:
+    """Parse -X importtime stderr into records, skipping the header and other lines"""
+    records = []
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            records.append(ImportRecord(module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return records
+
+def profile_module(module: str, python: str = sys.executable, timeout: float = 120) -> List[ImportRecord]:
+    """Import ``module`` in a fresh interpreter with -X importtime and return its records"""
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        timeout=timeout
+    )
+    return parse_importtime(result.stderr)
+
+def summarize(records: List[ImportRecord], top: int = 15) -> Dict[str, Any]:
+    """Slowest imports by self time and self time per top-level package"""
+    by_package: Dict[str, int] = {}
+    for record in records:
+        package = record.module.split(".", 1)[0]
+        by_package[package] = by_package.get(package, 0) + record.self_us
+
+    slowest = sorted(records, key=lambda r: r.self_us, reverse=True)[:top]
+    return {
+        "total_ms": round(sum(r.self_us for r in records) / 1000, 1),
+        "modules_imported": len(records),
+        "slowest_imports": [
+            {"module": r.module, "self_ms": round(r.self_us / 1000, 1), "cumulative_ms": round(r.cumulative_us / 1000, 1)}
+            for r in slowest
+        ],
+        "by_package_ms": {
+            package: round(us / 1000, 1)
+            for package, us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+        }
+    }
+
+def import_time_report(modules: List[str], top: int = 15) -> Dict[str, Any]:
+    """Cold import cost of each module plus an aggregate breakdown"""
+    report: Dict[str, Any] = {"modules": {}}
+    for module in modules:
+        records = profile_module(module)
+        own = next((r for r in records if r.module == module), None)
+        report["modules"][module] = {
+            "cumulative_ms": round(own.cumulative_us / 1000, 1) if own else None,
+            **summarize(records, top)
+        }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate -X importtime output per module")
+    parser.add_argument("modules", nargs="+")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    report = import_time_report(args.modules, args.top)
+    for module, summary in report["modules"].items():
+        print(f"{module}: {summary['cumulative_ms']} ms cumulative, {summary['modules_imported']} modules")
+        for entry in summary["slowest_imports"]:
+            print(f"    {entry['self_ms']:8.1f} ms self  {entry['cumulative_ms']:8.1f} ms cumulative  {entry['module']}")
+        print("  by package:")
+        for package, ms in summary["by_package_ms"].items():
+            print(f"    {ms:8.1f} ms  {package}")
+
+if __name__ == "__main__":
+    main()
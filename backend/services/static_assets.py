@@ -0,0 +1,142 @@
+"""
+Static Asset Cache
+
+Serves the embeddable form page and widget from memory. Each file is read
+once, given a strong ETag (content hash) and precompressed with gzip and,
+when the ``brotli`` package is installed, brotli. Requests get the best
+encoding they accept, and a matching If-None-Match is answered with 304.
+"""
+
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # optional: gzip and identity are still served
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# HTML must be revalidated so form changes show up; the widget script URL is
+# not versioned, so it gets a short shared lifetime instead of immutable
+HTML_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+ASSET_CACHE_CONTROL = "public, max-age=3600, stale-while-revalidate=86400"
+
+# Compressing tiny files costs more in headers than it saves
+MIN_COMPRESS_BYTES = 256
+
+@dataclass
+class StaticAsset:
+    """One file with its precomputed encodings"""
+    media_type: str
+    etag: str
+    cache_control: str
+    variants: Dict[str, bytes] = field(default_factory=dict)
+
+    def etag_for(self, coding: str) -> str:
+        # A strong validator must differ between content-codings of the same file
+        return self.etag if coding == "identity" else f'{self.etag[:-1]}-{coding}"'
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return etag in candidates
+
+class StaticAssetCache:
+    """In-memory, precompressed copies of the files in a directory"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._assets: Dict[str, StaticAsset] = {}
+        self.loaded = False
+        self.not_modified = 0
+        self.served = 0
+
+    def load(self) -> None:
+        """Read and precompress every file under the directory"""
+        assets = {}
+        if os.path.isdir(self.directory):
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    path = os.path.join(root, name)
+                    relative = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                    with open(path, "rb") as f:
+                        assets[relative] = self._build(relative, f.read())
+        self._assets = assets
+        self.loaded = True
+        logger.info(f"✅ Cached {len(assets)} static asset(s) from {self.directory}")
+
+    @staticmethod
+    def _build(name: str, content: bytes) -> StaticAsset:
+        media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        if media_type.startswith("text/") or media_type in ("application/javascript", "application/json"):
+            media_type += "; charset=utf-8"
+        asset = StaticAsset(
+            media_type=media_type,
+            etag='"' + hashlib.sha256(content).hexdigest()[:32] + '"',
+            cache_control=HTML_CACHE_CONTROL if name.endswith(".html") else ASSET_CACHE_CONTROL,
+            variants={"identity": content}
+        )
+        if len(content) >= MIN_COMPRESS_BYTES:
+            asset.variants["gzip"] = gzip.compress(content, compresslevel=9, mtime=0)
+            if brotli is not None:
+                asset.variants["br"] = brotli.compress(content, quality=11)
+        return asset
+
+    def get(self, name: str) -> Optional[StaticAsset]:
+        if not self.loaded:
+            self.load()
+        return self._assets.get(name)
+
+    def response(self, request: Request, name: str) -> Optional[Response]:
+        """Response for a cached asset, or None if there is no such file"""
+        asset = self.get(name)
+        if asset is None:
+            return None
+
+        accept_encoding = request.headers.get("accept-encoding", "")
+        coding = next(
+            (coding for coding in ("br", "gzip") if coding in asset.variants and _accepts(accept_encoding, coding)),
+            "identity"
+        )
+        headers = {
+            "ETag": asset.etag_for(coding),
+            "Cache-Control": asset.cache_control,
+            "Vary": "Accept-Encoding"
+        }
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, headers["ETag"]):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+
+        if coding != "identity":
+            headers["Content-Encoding"] = coding
+        self.served += 1
+        return Response(content=asset.variants[coding], media_type=asset.media_type, headers=headers)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "assets": {
+                name: {coding: len(body) for coding, body in asset.variants.items()}
+                for name, asset in self._assets.items()
+            },
+            "served": self.served,
+            "not_modified": self.not_modified,
+            "brotli_available": brotli is not None
+        }
@@ -0,0 +1,49 @@
+"""
+Single Flight
+
+Collapses concurrent calls for the same key into one: the first caller starts
+the call as its own task and everyone who asks for the key while it is running
+awaits that task. A caller that is cancelled (a client disconnecting) stops
+waiting without cancelling the call, so the others still get its result.
+Failures are passed on to every caller and nothing is remembered, so the next
+caller runs the call again. Caching the result is left to the caller.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """In-flight calls keyed by what they load"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Run ``call`` unless one is already running for ``key``; returns (result, shared).
+
+        ``shared`` is True when the result came from another caller's run.
+        Cancelling any caller, the one that started the call included, leaves
+        the running call alone.
+        """
+        task = self._inflight.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task), shared
+
+    def _finished(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark retrieved so a failure every caller stopped waiting for is not logged as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    def __len__(self) -> int:
+        return len(self._inflight)
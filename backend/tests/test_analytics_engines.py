@@ -0,0 +1,585 @@
+"""
+Tests for analytics agent engines
+"""
+import pytest
+from datetime import datetime, date, timedelta
+from types import SimpleNamespace
+import asyncio
+import json
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+import backend.agents.analytics_agent as analytics_module
+from backend.agents.analytics_agent import AnalyticsAgent, MetricData, Insight, InsightLevel, MetricType, ReportType
+from backend.agents.analytics.metric_history import MetricRingBuffer
+from backend.agents.analytics.ranked_store import RankedStore
+from backend.agents.analytics.forecasting import fit_linear, fit_holt
+from backend.agents.analytics.metric_store import ParquetMetricStore
+from backend.agents.analytics.period_aggregates import PeriodAggregator
+from backend.agents.analytics.anomaly_detector import StreamingAnomalyDetector, seasonal_residual_zscores
+from backend.agents.campaign_agent import CampaignAgent
+
+def make_agent(**kwargs) -> AnalyticsAgent:
+    with patch.object(analytics_module, "AsyncOpenAI"):
+        return AnalyticsAgent("test-key", **kwargs)
+
+class TestMetricHistory:
+    """Test ring-buffer metric history"""
+
+    def test_ring_buffer_keeps_latest_points_in_order(self):
+        """Test the buffer overwrites the oldest points once full"""
+        buffer = MetricRingBuffer(capacity=3)
+        start = datetime(2024, 1, 1)
+        for i in range(5):
+            buffer.append(float(i), start + timedelta(days=i))
+
+        assert len(buffer) == 3
+        assert buffer.values().tolist() == [2.0, 3.0, 4.0]
+        assert buffer.values(2).tolist() == [3.0, 4.0]
+        assert buffer.latest() == (4.0, start + timedelta(days=4))
+
+    @pytest.mark.asyncio
+    async def test_collect_fills_change_from_history(self):
+        """Test previous_value and change_percent come from the prior collection"""
+        agent = make_agent(history_capacity=4)
+        lead_agent = SimpleNamespace(leads_store={
+            "l1": SimpleNamespace(status=SimpleNamespace(value="qualified"), score=50)
+        })
+
+        first = await agent.collect_all_metrics(lead_agent=lead_agent)
+        assert first["total_leads"].change_percent == 0
+
+        lead_agent.leads_store["l2"] = SimpleNamespace(status=SimpleNamespace(value="new"), score=0)
+        second = await agent.collect_all_metrics(lead_agent=lead_agent)
+
+        assert second["total_leads"].previous_value == 1
+        assert second["total_leads"].change_percent == pytest.approx(100.0)
+        assert len(agent.metric_history.get("total_leads")) == 2
+
+    @pytest.mark.asyncio
+    async def test_failing_collector_does_not_block_others(self):
+        """Test collectors run independently"""
+        agent = make_agent()
+        broken_campaign_agent = SimpleNamespace()
+        lead_agent = SimpleNamespace(leads_store={
+            "l1": SimpleNamespace(status=SimpleNamespace(value="new"), score=10)
+        })
+
+        metrics = await agent.collect_all_metrics(campaign_agent=broken_campaign_agent, lead_agent=lead_agent)
+        assert "total_leads" in metrics
+
+
+class FakeQuery:
+    """Chainable stand-in for a supabase table query"""
+
+    def __init__(self, client, rows):
+        self.client = client
+        self.rows = list(rows)
+        self.bounds = None
+
+    def select(self, *args):
+        return self
+
+    def eq(self, column, value):
+        self.rows = [row for row in self.rows if row.get(column) == value]
+        return self
+
+    def in_(self, column, values):
+        self.rows = [row for row in self.rows if row.get(column) in values]
+        return self
+
+    def gte(self, column, value):
+        self.rows = [row for row in self.rows if (row.get(column) or "") >= value]
+        return self
+
+    def order(self, column):
+        self.rows.sort(key=lambda row: row.get(column) or "")
+        return self
+
+    def range(self, start, end):
+        self.bounds = (start, end)
+        return self
+
+    def execute(self):
+        self.client.executed += 1
+        rows = self.rows if self.bounds is None else self.rows[self.bounds[0]:self.bounds[1] + 1]
+        return SimpleNamespace(data=rows)
+
+class FakeSupabase:
+    """Minimal supabase client over in-memory tables"""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.executed = 0
+
+    def table(self, name):
+        return FakeQuery(self, self.tables.get(name, []))
+
+def llm_response(payload) -> SimpleNamespace:
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(payload)))])
+
+class TestInsightGeneration:
+    """Test concurrent, cached insight generation"""
+
+    def seeded_agent(self, metric_names, **kwargs):
+        agent = make_agent(**kwargs)
+        start = datetime(2024, 1, 1)
+        metrics = {}
+        for name in metric_names:
+            agent.metric_history.record(name, 100.0, start)
+            agent.metric_history.record(name, 150.0, start + timedelta(days=1))
+            metrics[name] = MetricData(name, 150.0, 100.0, 50.0, start + timedelta(days=1))
+        return agent, metrics
+
+    @pytest.mark.asyncio
+    async def test_llm_calls_are_bounded_and_cached(self):
+        """Test calls run concurrently up to the limit and repeats hit the cache"""
+        agent, metrics = self.seeded_agent(["a", "b", "c", "d"], max_concurrent_llm_calls=2)
+        in_flight = 0
+        peak = 0
+
+        async def create(**kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            if kwargs["max_tokens"] == 1000:
+                return llm_response([])
+            return llm_response({
+                "level": "high",
+                "title": "Spike",
+                "description": "Up 50%",
+                "impact_score": 0.7,
+                "recommendations": ["scale"]
+            })
+
+        agent.openai_client.chat.completions.create = create
+
+        insights = await agent.generate_insights(metrics)
+        assert len(insights) == 4
+        assert peak == 2
+        assert agent.last_insight_stats["cache_misses"] == 5
+
+        await agent.generate_insights(metrics)
+        assert agent.last_insight_stats["cache_hits"] == 5
+        assert agent.last_insight_stats["cache_hit_rate"] == 1.0
+        assert agent.last_insight_stats["wall_time_ms"] >= 0
+
+class TestAnomalyDetection:
+    """Test the streaming anomaly engine"""
+
+    def test_online_stats_match_batch_statistics(self):
+        """Test Welford statistics equal NumPy's over the same values"""
+        detector = StreamingAnomalyDetector(initial_capacity=1)
+        rng = np.random.default_rng(7)
+        data = rng.normal(50, 5, size=(200, 3))
+        for row in data:
+            detector.update_many(["a", "b", "c"], row)
+
+        stats = detector.stats("b")
+        assert stats["count"] == 200
+        assert stats["mean"] == pytest.approx(data[:, 1].mean())
+        assert stats["std"] == pytest.approx(data[:, 1].std())
+
+    def test_scan_flags_only_deviating_series(self):
+        """Test a spike is flagged once the series has enough history"""
+        detector = StreamingAnomalyDetector(min_samples=10)
+        for i in range(12):
+            detector.update_many(["steady", "spiky"], [100 + i % 3, 10 + i % 2])
+        assert detector.scan() == []
+
+        detector.update("spiky", 60)
+        anomalies = detector.scan()
+        assert [a["key"] for a in anomalies] == ["spiky"]
+        assert anomalies[0]["z_score"] > 2
+
+    def test_seasonal_residuals_ignore_weekly_pattern(self):
+        """Test a value matching its weekday is normal while a break is not"""
+        week = np.array([10, 12, 11, 13, 30, 35, 9], dtype=float)
+        normal = np.tile(week, 4) + np.tile([0.0, 0.5, -0.5, 0.2], 7)
+        broken = normal.copy()
+        broken[-1] = 40
+
+        scores = seasonal_residual_zscores(np.vstack([normal, broken]), period=7)
+        assert abs(scores[0]) < 2
+        assert scores[1] > 2
+
+    @pytest.mark.asyncio
+    async def test_performance_alerts_use_running_baseline(self):
+        """Test dashboard alerts come from the detector fed by metric collection"""
+        agent = make_agent()
+        start = datetime(2024, 1, 1)
+        for i in range(11):
+            agent._apply_history({"leads": MetricData("leads", 100.0 + i % 2, 0, 0, start + timedelta(days=i))})
+        assert await agent._get_performance_alerts() == []
+
+        agent._apply_history({"leads": MetricData("leads", 400.0, 0, 0, start + timedelta(days=11))})
+        alerts = await agent._get_performance_alerts()
+        assert alerts[0]["type"] == "anomaly"
+        assert "leads" in alerts[0]["title"]
+
+    @pytest.mark.asyncio
+    async def test_campaign_health_feeds_completed_days_once(self):
+        """Test health checks update online stats only with unseen, completed days"""
+        today = datetime.utcnow().date()
+        rows = [
+            {
+                "id": f"m{d}", "campaign_id": "c1", "metric_type": "clicks",
+                "metric_value": 100 + d % 2, "metric_date": (today - timedelta(days=d)).isoformat()
+            }
+            for d in range(7, -1, -1)
+        ]
+        agent = CampaignAgent(1, FakeSupabase({"campaign_metrics": rows}))
+
+        first = await agent._check_campaign_health({"id": "c1"})
+        await agent._check_campaign_health({"id": "c1"})
+
+        assert agent.anomaly_detector.stats(("c1", "clicks"))["count"] == 7
+        assert first["status"] == "healthy"
+        assert first["metrics"]["average_performance"] == pytest.approx(np.mean([r["metric_value"] for r in rows]))
+
+def make_insight(insight_id: str, level: InsightLevel, impact: float, timestamp: datetime) -> Insight:
+    return Insight(
+        id=insight_id,
+        level=level,
+        title=insight_id,
+        description="",
+        metric_type=MetricType.CAMPAIGN_PERFORMANCE,
+        impact_score=impact,
+        recommendations=[],
+        timestamp=timestamp,
+        data_points=[]
+    )
+
+class TestRankedStores:
+    """Test indexed insight/report stores and the dashboard cache"""
+
+    def test_top_k_matches_full_sort(self):
+        """Test index reads equal sorting all values, overall and per level"""
+        agent = make_agent()
+        rng = np.random.default_rng(3)
+        now = datetime.now()
+        levels = list(InsightLevel)
+        for n in range(200):
+            insight = make_insight(
+                f"i{n}", levels[n % 4], float(rng.random()), now - timedelta(minutes=int(rng.integers(0, 10000)))
+            )
+            agent.insights_store[insight.id] = insight
+
+        everything = list(agent.insights_store.values())
+        by_impact = sorted(everything, key=lambda i: (i.impact_score, i.timestamp), reverse=True)
+        assert agent.list_insights(limit=20) == by_impact[:20]
+        assert agent.list_insights(level=InsightLevel.HIGH, limit=5) == [
+            i for i in by_impact if i.level == InsightLevel.HIGH
+        ][:5]
+
+        del agent.insights_store[by_impact[0].id]
+        assert agent.list_insights(limit=1) == [by_impact[1]]
+
+    def test_retention_evicts_oldest(self):
+        """Test count and age limits evict the oldest items first"""
+        store = RankedStore(
+            indexes={"timestamp": lambda i: i.timestamp},
+            retention_index="timestamp",
+            partition=lambda i: i.level,
+            max_items=3,
+            max_age=timedelta(days=1)
+        )
+        now = datetime.now()
+        store["stale"] = make_insight("stale", InsightLevel.LOW, 0.1, now - timedelta(days=2))
+        assert "stale" not in store
+
+        for n in range(5):
+            store[f"i{n}"] = make_insight(f"i{n}", InsightLevel.LOW, 0.1, now - timedelta(minutes=10 - n))
+        assert sorted(store) == ["i2", "i3", "i4"]
+        assert [i.id for i in store.top("timestamp", 10, partition=InsightLevel.LOW)] == ["i4", "i3", "i2"]
+        assert store.get_stats()["evictions"] == 3
+
+    @pytest.mark.asyncio
+    async def test_dashboard_payload_cached_until_new_insight(self):
+        """Test the dashboard is reused until an insight is added"""
+        agent = make_agent()
+        first = await agent.create_dashboard_data()
+        assert await agent.create_dashboard_data() is first
+
+        insight = make_insight("fresh", InsightLevel.CRITICAL, 0.9, datetime.now())
+        agent.insights_store[insight.id] = insight
+        refreshed = await agent.create_dashboard_data()
+
+        assert refreshed is not first
+        assert refreshed["recent_insights"][0]["id"] == "fresh"
+        assert refreshed["alerts"][0]["type"] == "critical_insight"
+
+class TestForecasting:
+    """Test the batch forecasting engine"""
+
+    def test_linear_batch_matches_polyfit(self):
+        """Test one masked batch fit equals per-series polyfit for mixed lengths"""
+        rng = np.random.default_rng(11)
+        series = [rng.normal(10, 2, size=n) + np.arange(n) * slope for n, slope in [(7, 0.5), (20, -1.0), (12, 0.0)]]
+
+        levels, slopes, residual_stds = fit_linear(series)
+        for values, level, slope, residual_std in zip(series, levels, slopes, residual_stds):
+            coefficients = np.polyfit(np.arange(len(values)), values, 1)
+            trend_line = np.poly1d(coefficients)
+            assert slope == pytest.approx(coefficients[0])
+            assert level == pytest.approx(trend_line(len(values) - 1))
+            assert residual_std == pytest.approx(np.std(values - trend_line(np.arange(len(values)))))
+
+    def test_holt_batch_matches_scalar_recursion(self):
+        """Test vectorized Holt smoothing equals the scalar recursion per series"""
+        series = [np.array([1.0, 3.0, 4.0, 8.0, 9.0]), np.array([5.0, 4.0, 4.5])]
+        levels, trends, _ = fit_holt(series, alpha=0.5, beta=0.3)
+
+        for values, level, trend in zip(series, levels, trends):
+            expected_level, expected_trend = values[1], values[1] - values[0]
+            for value in values[2:]:
+                previous = expected_level
+                expected_level = 0.5 * value + 0.5 * (expected_level + expected_trend)
+                expected_trend = 0.3 * (expected_level - previous) + 0.7 * expected_trend
+            assert level == pytest.approx(expected_level)
+            assert trend == pytest.approx(expected_trend)
+
+    @pytest.mark.asyncio
+    async def test_fits_cached_until_new_data(self):
+        """Test only metrics with new points are refitted"""
+        agent = make_agent()
+        start = datetime(2024, 1, 1)
+        for day in range(10):
+            agent.metric_history.record("leads", 10.0 + 2 * day, start + timedelta(days=day))
+            agent.metric_history.record("visits", 100.0 - day, start + timedelta(days=day))
+
+        forecasts = await agent.predict_all_metrics(days_ahead=3)
+        assert forecasts["leads"]["predictions"] == pytest.approx([30.0, 32.0, 34.0])
+        assert forecasts["visits"]["trend_slope"] == pytest.approx(-1.0)
+        assert agent.forecast_engine.fits == 2
+
+        await agent.predict_all_metrics()
+        assert agent.forecast_engine.fits == 2
+
+        agent.metric_history.record("leads", 30.0, start + timedelta(days=10))
+        await agent.predict_all_metrics()
+        assert agent.forecast_engine.fits == 3
+
+    @pytest.mark.asyncio
+    async def test_prediction_commentary_is_optional_and_async(self):
+        """Test forecasts return without the LLM and commentary arrives separately"""
+        agent = make_agent()
+        start = datetime(2024, 1, 1)
+        for day in range(8):
+            agent.metric_history.record("leads", float(day), start + timedelta(days=day))
+
+        async def create(**kwargs):
+            return llm_response({"confidence": "high", "key_factors": [], "recommendations": []})
+
+        agent.openai_client.chat.completions.create = create
+
+        plain = await agent.predict_performance("leads", days_ahead=5)
+        assert "analysis_status" not in plain
+        assert len(plain["predictions"]) == 5
+
+        pending = await agent.predict_performance("leads", include_analysis=True)
+        assert pending["analysis_status"] == "pending"
+        assert (await agent.get_prediction_analysis("leads"))["confidence"] == "high"
+
+        assert await agent.predict_performance("unknown") == {"error": "Insufficient historical data for prediction"}
+
+class TestParquetMetricStore:
+    """Test the columnar metric store"""
+
+    def populated_store(self, root) -> ParquetMetricStore:
+        store = ParquetMetricStore(str(root), flush_rows=100)
+        start = datetime(2024, 1, 1, 12)
+        for day in range(120):
+            for metric_name in ("leads", "visits"):
+                store.append(metric_name, float(day), start + timedelta(days=day), campaign_id=f"c{day % 2}")
+        store.flush()
+        return store
+
+    def test_partition_pruning_limits_files(self, tmp_path):
+        """Test a weekly query for one metric opens only that week's partitions"""
+        store = self.populated_store(tmp_path)
+        files = store.files_for(["leads"], datetime(2024, 1, 1), datetime(2024, 1, 7))
+
+        assert len(files) == 7
+        assert all("metric_name=leads" in path for path in files)
+
+    def test_query_applies_all_predicates(self, tmp_path):
+        """Test metric, campaign and date-range predicates"""
+        store = self.populated_store(tmp_path)
+        frame = store.query(["visits"], ["c1"], datetime(2024, 2, 1), datetime(2024, 2, 29, 23))
+
+        assert set(frame["metric_name"]) == {"visits"}
+        assert set(frame["campaign_id"]) == {"c1"}
+        assert frame["timestamp"].min() >= datetime(2024, 2, 1)
+        assert frame["timestamp"].max() <= datetime(2024, 2, 29, 23)
+        assert frame["timestamp"].is_monotonic_increasing
+        assert len(frame) == 15
+
+    @pytest.mark.asyncio
+    async def test_agent_builds_report_metrics_from_store(self, tmp_path):
+        """Test collected points persist and feed period report metrics"""
+        agent = make_agent(metric_store=ParquetMetricStore(str(tmp_path)))
+        end = datetime(2024, 3, 31, 12)
+        for day in range(100):
+            timestamp = end - timedelta(days=99 - day)
+            agent._apply_history({"leads": MetricData("leads", float(day), 0, 0, timestamp, {"campaign_id": "c1"})})
+
+        metrics = await agent.metrics_for_period(ReportType.WEEKLY, period_end=end)
+
+        assert metrics["leads"].value == 99.0
+        assert metrics["leads"].previous_value == 92.0
+        assert metrics["leads"].metadata["data_points"] == 8
+
+    @pytest.mark.asyncio
+    async def test_collection_flushes_off_the_event_loop(self, tmp_path):
+        """Test Parquet writes triggered by collection run in a worker thread"""
+        import threading
+        store = ParquetMetricStore(str(tmp_path), flush_rows=1)
+        flush_threads = []
+        original_flush = store.flush
+
+        def flush():
+            flush_threads.append(threading.get_ident())
+            return original_flush()
+
+        store.flush = flush
+        agent = make_agent(metric_store=store)
+        lead_agent = SimpleNamespace(leads_store={
+            "l1": SimpleNamespace(status=SimpleNamespace(value="new"), score=10)
+        })
+        await agent.collect_all_metrics(lead_agent=lead_agent)
+
+        assert flush_threads and threading.get_ident() not in flush_threads
+        assert store.pending() == 0 and store.rows_written > 0
+
+class TestIncrementalReports:
+    """Test incremental period aggregation and section reuse"""
+
+    def make_points(self, start: datetime, days: int):
+        import pandas as pd
+        timestamps = [start + timedelta(hours=6 * i) for i in range(days * 4)]
+        return pd.DataFrame({
+            "metric_name": "leads",
+            "timestamp": pd.to_datetime(timestamps),
+            "value": np.arange(len(timestamps), dtype=float)
+        })
+
+    def test_periods_match_raw_aggregation_and_reuse_weeks(self):
+        """Test combined aggregates equal raw ones and closed days are read once"""
+        points = self.make_points(datetime(2024, 1, 1), 60)
+        loads = []
+
+        def load(start, end):
+            loads.append((start, end))
+            return points[(points["timestamp"] >= start) & (points["timestamp"] <= end)]
+
+        aggregator = PeriodAggregator(load)
+        today = date(2024, 3, 1)
+        month = aggregator.period_aggregates(date(2024, 1, 3), date(2024, 2, 1), today=today)["leads"]
+
+        raw = points[(points["timestamp"] >= datetime(2024, 1, 3)) & (points["timestamp"] < datetime(2024, 2, 2))]
+        assert month.count == len(raw)
+        assert month.total == pytest.approx(raw["value"].sum())
+        assert (month.first_value, month.last_value) == (raw["value"].iloc[0], raw["value"].iloc[-1])
+        assert aggregator.get_stats()["weekly_aggregates"] == 3
+
+        rows = aggregator.rows_aggregated
+        aggregator.period_aggregates(date(2024, 1, 10), date(2024, 2, 1), today=today)
+        assert aggregator.rows_aggregated == rows
+        assert len(loads) == 1
+
+        aggregator.period_aggregates(date(2024, 1, 10), date(2024, 2, 5), today=today)
+        assert loads[-1][0] == datetime(2024, 2, 2)
+
+    @pytest.mark.asyncio
+    async def test_regenerated_report_only_sends_changed_sections(self):
+        """Test an unchanged period reuses every LLM section"""
+        agent = make_agent()
+        calls = []
+
+        async def create(**kwargs):
+            calls.append(kwargs["messages"][0]["content"])
+            if kwargs["max_tokens"] == 1000:
+                return llm_response([])
+            if kwargs["max_tokens"] == 800:
+                return llm_response(["Scale what works"])
+            if "executive" in kwargs["messages"][0]["content"]:
+                return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=" Summary "))])
+            return llm_response({
+                "level": "high", "title": "Up", "description": "", "impact_score": 0.5, "recommendations": []
+            })
+
+        agent.openai_client.chat.completions.create = create
+        end = datetime(2024, 3, 31, 12)
+        for day in range(10):
+            agent.metric_history.record("leads", 10.0 * (day + 1), end - timedelta(days=9 - day))
+
+        first = await agent.create_period_report(ReportType.WEEKLY, period_end=end)
+        assert first.executive_summary == "Summary"
+        assert first.metrics["leads"].metadata["data_points"] == 8
+        assert first.generation_stats["llm_sections_generated"] == 4
+
+        calls.clear()
+        second = await agent.create_period_report(ReportType.WEEKLY, period_end=end)
+        assert calls == []
+        assert second.recommendations == ["Scale what works"]
+        assert second.generation_stats["llm_sections_reused"] == 4
+
+class TestCampaignHealthSweep:
+    """Test the vectorized campaign health sweep"""
+
+    def metric_rows(self):
+        today = datetime.utcnow().date()
+        rows = []
+        for campaign_id, values in {"c1": [12, 10, 8, 6], "c2": [60, 70, 90, 100]}.items():
+            for day, value in enumerate(values):
+                rows.append({
+                    "id": f"{campaign_id}-{day}",
+                    "campaign_id": campaign_id,
+                    "metric_type": "ctr",
+                    "metric_value": value,
+                    "metric_date": (today - timedelta(days=4 - day)).isoformat()
+                })
+        return rows
+
+    @pytest.mark.asyncio
+    async def test_monitor_uses_one_fetch_for_all_campaigns(self):
+        """Test statuses and trends for every campaign come from a single metrics query"""
+        campaigns = [{"id": campaign_id, "name": campaign_id, "status": "active"} for campaign_id in ("c1", "c2", "c3")]
+        client = FakeSupabase({"campaigns": campaigns, "campaign_metrics": self.metric_rows()})
+        agent = CampaignAgent(1, client)
+
+        result = await agent._monitor_campaigns({})
+        by_id = {r["campaign_id"]: r for r in result["monitoring_results"]}
+
+        assert client.executed == 2
+        assert by_id["c1"]["health_status"] == "critical"
+        assert by_id["c1"]["metrics"]["trend"] == "declining"
+        assert by_id["c2"]["health_status"] == "healthy"
+        assert by_id["c2"]["metrics"]["average_performance"] == pytest.approx(80.0)
+        assert by_id["c2"]["metrics"]["change_percentage"] == pytest.approx((95 - 65) / 65 * 100)
+        assert by_id["c3"]["health_status"] == "warning"
+        assert result["campaigns_with_issues"] == 2
+
+    @pytest.mark.asyncio
+    async def test_fetch_pages_through_all_rows(self):
+        """Test paging and id chunking return every matching row exactly once"""
+        rows = self.metric_rows()
+        client = FakeSupabase({"campaign_metrics": rows})
+        agent = CampaignAgent(1, client)
+
+        fetched = await agent._fetch_campaign_metrics(["c1", "c2"], "", page_size=3, ids_per_request=1)
+
+        assert sorted(r["id"] for r in fetched) == sorted(r["id"] for r in rows)
+        assert client.executed == 4
+
+    def test_trend_analysis_matches_half_split(self):
+        """Test the single-campaign trend helper uses the same vectorized rules"""
+        agent = CampaignAgent(1, MagicMock())
+        metrics = [{"metric_value": v, "metric_date": f"2024-01-0{i + 1}"} for i, v in enumerate([10, 10, 20, 20])]
+
+        assert agent._analyze_performance_trends(metrics) == {"trend": "improving", "change_percentage": 100.0}
+        assert agent._analyze_performance_trends(metrics[:1]) == {"trend": "insufficient_data"}
@@ -0,0 +1,529 @@
+"""
+Tests for email service infrastructure
+"""
+import pytest
+import asyncio
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.agents.email.enhanced_email_service import EnhancedEmailService
+from backend.agents.email.provider_router import ESPProviderRouter, CircuitState
+from backend.agents.email.send_time_optimizer import SendTimeOptimizer, format_slot
+from backend.agents.email.message_store import CompactMessageStore
+from backend.agents.email.template_cache import TemplateCache
+from backend.agents.email.template_versioning_service import TemplateVersioningService
+from backend.agents.email.personalization_service import PersonalizationService
+from backend.agents.email.suppression_service import SendGuard, SuppressionList, FrequencyCap, BloomFilter
+from backend.agents.email.supabase_database_service import SupabaseDatabaseService
+from backend.agents.email import enhanced_email_service, suppression_service
+from backend.agents.email.domain_throttle import DomainSendScheduler
+from backend.agents import email_automation_agent
+from backend.agents.email_automation_agent import EmailAutomationAgent, Contact, EmailStatus
+
+client = TestClient(app)
+
+class TestESPProviderRouter:
+    """Test health-weighted provider routing and circuit breakers"""
+
+    def test_initial_ranking_keeps_configured_order(self):
+        """Test providers without samples keep their configured order"""
+        router = ESPProviderRouter(["sendgrid", "mailchimp", "amazonses"])
+        assert router.ranked_providers() == ["sendgrid", "mailchimp", "amazonses"]
+        assert router.health_score("sendgrid") == router.health_score("unconfigured") == 1.0
+
+    def test_healthier_provider_ranked_first(self):
+        """Test lower error rate and latency move a provider up"""
+        router = ESPProviderRouter(["sendgrid", "mailchimp"], consecutive_failure_limit=100)
+        for _ in range(4):
+            router.record_success("sendgrid", 0.8)
+            router.record_success("mailchimp", 0.05)
+        router.record_failure("sendgrid", 0.8)
+
+        assert router.ranked_providers()[0] == "mailchimp"
+
+    def test_circuit_opens_and_recovers_through_probe(self):
+        """Test open -> half-open -> closed transitions"""
+        router = ESPProviderRouter(["sendgrid", "mailchimp"], consecutive_failure_limit=3, cooldown_seconds=0)
+        for _ in range(3):
+            router.record_failure("sendgrid", 0.1, "timeout")
+        assert router.providers["sendgrid"].state == CircuitState.OPEN
+
+        # Cooldown of zero lets the probe through immediately, ranked after healthy providers
+        assert router.ranked_providers() == ["mailchimp", "sendgrid"]
+        assert router.allow_request("sendgrid") is True
+        assert router.allow_request("sendgrid") is False
+
+        router.record_success("sendgrid", 0.1)
+        assert router.providers["sendgrid"].state == CircuitState.CLOSED
+
+    def test_unreported_probe_expires(self, monkeypatch):
+        """Test a probe that never records a result stops blocking the provider"""
+        router = ESPProviderRouter(["sendgrid"], consecutive_failure_limit=1, cooldown_seconds=0, probe_timeout_seconds=30)
+        router.record_failure("sendgrid", 0.1)
+        router.ranked_providers()
+        assert router.allow_request("sendgrid") is True
+        assert router.ranked_providers() == []
+
+        now = time.monotonic()
+        monkeypatch.setattr(time, "monotonic", lambda: now + 31)
+        assert router.ranked_providers() == ["sendgrid"]
+        assert router.allow_request("sendgrid") is True
+
+    @pytest.mark.asyncio
+    async def test_cancelled_probe_is_released(self):
+        """Test cancelling a half-open probe send lets the next send probe again"""
+        service = EnhancedEmailService()
+        service.provider_router = ESPProviderRouter(["sendgrid"], consecutive_failure_limit=1, cooldown_seconds=0)
+        service.provider_router.record_failure("sendgrid", 0.1)
+
+        async def hanging_send(email_data, provider):
+            await asyncio.sleep(10)
+
+        service.send_via_provider = hanging_send
+        probe = asyncio.create_task(service.send_with_fallback({"to": "a@example.com"}))
+        await asyncio.sleep(0)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        assert service.provider_router.ranked_providers() == ["sendgrid"]
+
+    def test_open_circuit_is_skipped(self):
+        """Test providers with an open circuit take no traffic during cooldown"""
+        router = ESPProviderRouter(["sendgrid", "mailchimp"], consecutive_failure_limit=1, cooldown_seconds=60)
+        router.record_failure("sendgrid", 0.1)
+        assert router.ranked_providers() == ["mailchimp"]
+        assert router.get_stats()["providers"]["sendgrid"]["state"] == "open"
+
+    @pytest.mark.asyncio
+    async def test_send_with_fallback_avoids_failing_provider(self):
+        """Test a degraded provider stops receiving first attempts"""
+        service = EnhancedEmailService()
+        service.provider_router = ESPProviderRouter(service.esp_providers, consecutive_failure_limit=2, cooldown_seconds=60)
+        calls = []
+
+        async def fake_send(email_data, provider):
+            calls.append(provider)
+            if provider == "sendgrid":
+                raise Exception("sendgrid degraded")
+            return {"success": True, "email_id": "id", "provider": provider}
+
+        service.send_via_provider = fake_send
+        for _ in range(4):
+            result = await service.send_with_fallback({"to": "a@example.com"})
+            assert result["success"] is True
+
+        assert calls.count("sendgrid") == 1
+        assert calls[-1] != "sendgrid"
+
+    def test_provider_metrics_endpoint(self):
+        """Test provider metrics are published"""
+        response = client.get("/api/email/providers/metrics")
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert set(data["providers"]) == {"sendgrid", "mailchimp", "amazonses"}
+
+class TestSendTimeOptimizer:
+    """Test histogram-based send-time optimization"""
+
+    def test_best_slot_follows_contact_history(self):
+        """Test a contact's own engagement decides their best slot"""
+        optimizer = SendTimeOptimizer()
+        wednesday_9am = datetime(2024, 1, 3, 9, 15)
+        for _ in range(3):
+            optimizer.record_event("c1", wednesday_9am, "opened")
+        optimizer.record_event("c2", datetime(2024, 1, 5, 16, 0), "clicked")
+
+        slots = optimizer.best_slots(["c1", "c2"])
+        assert format_slot(slots[0])["day"] == "Wednesday"
+        assert format_slot(slots[0])["hour"] == 9
+        assert format_slot(slots[1])["day"] == "Friday"
+
+    def test_unknown_contact_inherits_segment(self):
+        """Test contacts without history use their segment's histogram"""
+        optimizer = SendTimeOptimizer()
+        optimizer.record_event("c1", datetime(2024, 1, 2, 14, 0), "opened", segment="b2b")
+        optimizer.set_contact_segment("new", "b2b")
+
+        assert format_slot(optimizer.best_slots(["new"])[0])["hour"] == 14
+
+    def test_next_send_times_are_upcoming(self):
+        """Test scheduled times fall at or after the requested time"""
+        optimizer = SendTimeOptimizer()
+        optimizer.record_event("c1", datetime(2024, 1, 1, 8, 0), "opened")
+        after = datetime(2024, 1, 1, 12, 30)
+
+        send_time = optimizer.next_send_times(["c1"], after=after)["c1"]
+        assert send_time >= after
+        assert send_time.weekday() == 0 and send_time.hour == 8
+
+class TestCompactMessageStore:
+    """Test compact message records"""
+
+    def test_records_render_on_demand(self):
+        """Test bodies are rendered from template and contact, not stored"""
+        renders = []
+
+        def renderer(template_id, contact_id):
+            renders.append((template_id, contact_id))
+            return {"subject": f"Hi {contact_id}", "html": f"<p>{template_id}</p>"}
+
+        store = CompactMessageStore(renderer)
+        message = store.add("campaign_1", "c1", "template_1", datetime(2024, 1, 1), "scheduled")
+
+        assert store["msg_campaign_1_c1"] is message
+        assert not hasattr(message, "__dict__")
+        assert message.tracking_data is None
+        assert message.subject_line == "Hi c1"
+        assert message.content == "<p>template_1</p>"
+        assert renders == [("template_1", "c1"), ("template_1", "c1")]
+
+    def test_campaign_and_template_ids_are_shared(self):
+        """Test interned references are shared across records"""
+        store = CompactMessageStore(lambda t, c: {"subject": "", "html": ""})
+        first = store.add("campaign_" + "x", "c1", "template_" + "y", datetime(2024, 1, 1), "scheduled")
+        second = store.add("campaign_" + "x", "c2", "template_" + "y", datetime(2024, 1, 1), "scheduled")
+
+        assert first.campaign_id is second.campaign_id
+        assert first.template_id is second.template_id
+        assert len(store) == 2
+
+class TestTemplateCache:
+    """Test version-aware template caching"""
+
+    @pytest.mark.asyncio
+    async def test_template_fetched_once_until_invalidated(self):
+        """Test repeated lookups hit the cache and new versions invalidate it"""
+        service = TemplateVersioningService()
+        fetches = []
+        original_fetch = service._fetch_template
+
+        async def counting_fetch(template_id):
+            fetches.append(template_id)
+            return await original_fetch(template_id)
+
+        service._fetch_template = counting_fetch
+        for _ in range(5):
+            await service.get_template("welcome")
+        assert fetches == ["welcome"]
+
+        await service.create_template_version("welcome", {"subject_line": "Hello again"})
+        await service.get_template("welcome")
+        assert fetches == ["welcome", "welcome"]
+
+        await service.update_version_status("welcome", 2, "active")
+        await service.get_template("welcome")
+        assert len(fetches) == 3
+
+    def test_lru_eviction(self):
+        """Test least recently used versions are evicted first"""
+        cache = TemplateCache(max_entries=2)
+        cache.put({"id": "a", "version": 1})
+        cache.put({"id": "b", "version": 1})
+        cache.get("a")
+        cache.put({"id": "c", "version": 1})
+
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get_stats()["evictions"] == 1
+
+    def test_render_plan_matches_personalize_content(self):
+        """Test compiled plans render like the merge-tag replacement"""
+        personalization = PersonalizationService()
+        content = "Hi {{first_name}} from {{company}}, {{unknown}}!"
+        data = {"first_name": "Ada"}
+
+        plan = personalization.compile_content(content)
+        assert personalization.render_plan(plan, data) == personalization.personalize_content(content, data)
+
+class TestSendGuard:
+    """Test suppression list and frequency cap checks"""
+
+    def test_suppressed_addresses_blocked(self):
+        """Test unsubscribes and hard bounces block sends, soft bounces do not"""
+        guard = SendGuard(SuppressionList(use_bloom_filter=True, expected_items=1000))
+        guard.suppression_list.apply_events([
+            {"event_type": "unsubscribed", "email": "Gone@Example.com", "timestamp": "2024-01-01T00:00:00"},
+            {"event_type": "bounced", "metadata": {"recipient": "hard@example.com"}, "timestamp": "2024-01-02T00:00:00"},
+            {"event_type": "bounced", "metadata": {"recipient": "soft@example.com", "bounce_type": "soft"}}
+        ])
+
+        assert guard.check("gone@example.com") == "unsubscribed"
+        assert guard.check("hard@example.com") == "bounced"
+        assert guard.check("soft@example.com") is None
+        assert guard.suppression_list.last_event_at == "2024-01-02T00:00:00"
+
+        guard.apply_event("resubscribed", "gone@example.com")
+        assert guard.check("gone@example.com") is None
+
+    def test_frequency_cap_sliding_window(self):
+        """Test the cap blocks inside the window and frees up as sends age out"""
+        guard = SendGuard(frequency_cap=FrequencyCap(max_sends=2, window_seconds=100))
+        guard.record_send("a@example.com", now=0)
+        guard.record_send("a@example.com", now=50)
+
+        assert guard.check("a@example.com", now=60) == "frequency_cap"
+        assert guard.check("a@example.com", now=101) is None
+
+    def test_filter_recipients_reports_blocked(self):
+        """Test bulk filtering splits sendable recipients from blocked ones"""
+        guard = SendGuard()
+        guard.suppression_list.add("x@example.com", "unsubscribed")
+        allowed, blocked = guard.filter_recipients(
+            [{"email": "x@example.com"}, {"email": "y@example.com"}], lambda r: r["email"]
+        )
+
+        assert allowed == [{"email": "y@example.com"}]
+        assert blocked == {"unsubscribed": 1}
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        """Test every added item is reported present"""
+        bloom = BloomFilter(expected_items=500, false_positive_rate=0.01)
+        items = [f"user{i}@example.com" for i in range(500)]
+        for item in items:
+            bloom.add(item)
+        assert all(item in bloom for item in items)
+
+class TestDomainSendScheduler:
+    """Test per-provider send pacing"""
+
+    def test_domains_grouped_by_provider(self):
+        """Test provider domains share a queue and report depth"""
+        scheduler = DomainSendScheduler()
+        for email in ["a@gmail.com", "b@googlemail.com", "c@hotmail.com", "d@acme.io"]:
+            scheduler.enqueue(email, email)
+
+        assert scheduler.get_queue_depths() == {"gmail": 2, "microsoft": 1, "acme.io": 1}
+
+    @pytest.mark.asyncio
+    async def test_drain_interleaves_domains(self):
+        """Test a throttled provider does not hold back the others"""
+        scheduler = DomainSendScheduler(default_rate=1000.0, domain_rates={"gmail": 1000.0})
+        scheduler.set_rate("gmail", 1.0)
+        sent = []
+
+        async def send(email):
+            sent.append(email)
+
+        scheduler.enqueue_many(["g1@gmail.com", "g2@gmail.com", "x1@acme.io", "x2@acme.io"], lambda e: e)
+        dispatched = await scheduler.drain(send)
+
+        assert dispatched == 4
+        assert sent[:2] == ["g1@gmail.com", "x1@acme.io"]
+        assert sent[-1] == "g2@gmail.com"
+        assert scheduler.throttle_waits >= 1
+        assert scheduler.get_queue_depths() == {}
+
+    @pytest.mark.asyncio
+    async def test_drained_groups_are_forgotten(self):
+        """Test queues and idle buckets do not accumulate across campaigns"""
+        scheduler = DomainSendScheduler(default_rate=1000.0)
+
+        async def send(email):
+            pass
+
+        scheduler.enqueue_many([f"user@domain{i}.com" for i in range(20)], lambda e: e)
+        assert await scheduler.drain(send) == 20
+        assert scheduler._queues == {}
+
+        await asyncio.sleep(0.01)
+        await scheduler.drain(send)
+        assert scheduler._buckets == {}
+        assert scheduler.get_stats()["dispatched"]["domain0.com"] == 1
+
+class EmailEventsTable:
+    """Supabase stand-in storing email_events rows and serving them page by page (filters are ignored)"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def table(self, name):
+        query = SimpleNamespace()
+        bounds = {}
+        query.select = query.in_ = query.gt = query.order = lambda *args: query
+        query.range = lambda start, end: bounds.update(start=start, end=end) or query
+        query.insert = lambda row: self.rows.append(row) or bounds.update(start=len(self.rows) - 1, end=len(self.rows) - 1) or query
+        query.execute = lambda: SimpleNamespace(data=self.rows[bounds["start"]:bounds["end"] + 1])
+        return query
+
+@pytest.fixture
+def email_agent(monkeypatch):
+    # The OpenAI client is only used for AI commentary, never in these tests
+    monkeypatch.setattr(email_automation_agent, "AsyncOpenAI", lambda api_key: None)
+    agent = EmailAutomationAgent("test-key", {"default_domain_rate": 1000.0})
+    agent.send_guard = SendGuard()
+    return agent
+
+class TestEmailAutomationAgent:
+    """Test engagement ingestion and send-time history for the email agent"""
+
+    @pytest.mark.asyncio
+    async def test_stored_history_seeds_send_times_and_analysis(self, email_agent):
+        """Test stored opens/clicks decide send times for contacts added afterwards"""
+        thursday_3pm = "2024-01-04T15:05:00"
+        rows = [
+            {"id": i, "email_id": "", "event_type": "opened", "timestamp": thursday_3pm,
+             "metadata": {"recipient": "Reader@Example.com"}}
+            for i in range(3)
+        ]
+        assert email_agent.load_engagement_history(EmailEventsTable(rows), page_size=2) == 3
+        assert email_agent.load_engagement_history(EmailEventsTable(rows)) == 0
+
+        email_agent.contacts_store["c1"] = Contact(id="c1", email="reader@example.com", tags=[])
+        send_time = email_agent.get_optimal_send_times(["c1"], after=datetime(2024, 1, 8, 9, 0))["c1"]
+        assert (send_time.weekday(), send_time.hour) == (3, 15)
+
+        analysis = await email_agent._analyze_engagement_patterns([email_agent.contacts_store["c1"]])
+        assert analysis["engagement_by_day"] == {"Thursday": 3.0}
+
+    def test_ingested_events_update_message_and_histograms(self, email_agent):
+        """Test webhook events reach the message, campaign-less contacts and the histograms"""
+        email_agent.contacts_store["c1"] = Contact(id="c1", email="a@example.com", tags=["b2b"])
+        message = email_agent.messages_store.add("camp", "c1", "tmpl", datetime(2024, 1, 1), EmailStatus.SENT)
+
+        applied = email_agent.ingest_email_events([
+            {"email_id": message.id, "event_type": "clicked", "timestamp": "2024-01-02T10:00:00"},
+            {"email_id": "unknown", "event_type": "opened", "email": "B@example.com", "timestamp": 1704189600},
+            {"email_id": "unknown", "event_type": "delivered", "email": "b@example.com"}
+        ])
+
+        assert applied == 2
+        assert message.status == EmailStatus.CLICKED
+        assert email_agent.send_time_optimizer.aggregate_histogram(["a@example.com"]).sum() == 2.0
+        assert email_agent.send_time_optimizer.aggregate_histogram(["b@example.com"]).sum() == 1.0
+
+    def test_bounces_suppress_recipients_of_unknown_messages(self, email_agent):
+        """Test suppression follows the recipient address even for mail this agent did not send"""
+        email_agent.contacts_store["c1"] = Contact(id="c1", email="leaver@example.com", tags=[])
+
+        applied = email_agent.ingest_email_events([
+            {"email_id": "esp-1", "event_type": "bounced", "email": "Hard@Example.com"},
+            {"email_id": "esp-2", "event_type": "bounced", "email": "soft@example.com", "bounce_type": "soft"},
+            {"email_id": "esp-3", "event_type": "unsubscribed", "metadata": {"recipient": "leaver@example.com"}}
+        ])
+
+        assert applied == 2
+        assert email_agent.send_guard.check("hard@example.com") == "bounced"
+        assert email_agent.send_guard.check("soft@example.com") is None
+        assert email_agent.send_guard.check("leaver@example.com") == "unsubscribed"
+        assert email_agent.contacts_store["c1"].subscribed is False
+
+        email_agent.ingest_email_events([{"email_id": "esp-4", "event_type": "resubscribed", "email": "leaver@example.com"}])
+        assert email_agent.send_guard.check("leaver@example.com") is None
+        assert email_agent.contacts_store["c1"].subscribed is True
+
+    def test_agent_and_email_service_share_one_send_guard(self):
+        """Test the agent resolves the same send guard singleton as the email routes"""
+        assert email_automation_agent.get_send_guard is suppression_service.get_send_guard
+
+    @pytest.mark.asyncio
+    async def test_persisted_events_reload_the_suppression_list(self):
+        """Test bounces recorded by one service are loaded by a fresh one, as at startup"""
+        table = EmailEventsTable([])
+        recorder = EnhancedEmailService(send_guard=SendGuard(), events_database=SupabaseDatabaseService(table))
+        assert await recorder.record_delivery_event("e1", "bounced", "gone@example.com")
+        assert await recorder.record_delivery_event("e2", "bounced", "soft@example.com", {"bounce_type": "soft"})
+        assert await recorder.record_delivery_event("e3", "opened", "reader@example.com")
+        assert [row["metadata"]["recipient"] for row in table.rows] == [
+            "gone@example.com", "soft@example.com", "reader@example.com"
+        ]
+
+        restarted = EnhancedEmailService(send_guard=SendGuard(), events_database=SupabaseDatabaseService(table, page_size=2))
+        assert await restarted.refresh_suppression_list() == 1
+        assert restarted.send_guard.check("gone@example.com") == "bounced"
+        assert restarted.send_guard.check("soft@example.com") is None
+
+    @pytest.mark.asyncio
+    async def test_soft_bounces_and_frequency_cap_at_send_time(self, email_agent):
+        """Test soft bounces never suppress and delayed sends respect the frequency cap"""
+        email_agent.credentials["email_service"] = "mailchimp"
+        email_agent.send_guard = SendGuard(frequency_cap=FrequencyCap(max_sends=1))
+        email_agent.contacts_store["c1"] = Contact(id="c1", email="soft@example.com", tags=[])
+        email_agent.contacts_store["c2"] = Contact(id="c2", email="capped@example.com", tags=[])
+        soft = email_agent.messages_store.add("camp", "c1", "tmpl", datetime(2024, 1, 1), EmailStatus.SENT)
+        capped = email_agent.messages_store.add("camp", "c2", "tmpl", datetime(2024, 1, 1), EmailStatus.SCHEDULED)
+
+        email_agent.record_engagement_event(soft.id, "bounced", bounce_type="soft")
+        assert soft.status == EmailStatus.BOUNCED
+        assert email_agent.send_guard.check("soft@example.com") is None
+
+        email_agent.send_guard.record_send("capped@example.com")
+        await email_agent._send_email_message(capped)
+        assert capped.status == EmailStatus.SCHEDULED
+        assert email_agent.send_guard.blocked_counts == {"frequency_cap": 1}
+
+    @pytest.mark.asyncio
+    async def test_bulk_send_checks_each_recipient_once(self):
+        """Test the bulk path checks at send time, so duplicates hit the frequency cap"""
+        service = EnhancedEmailService(send_guard=SendGuard(frequency_cap=FrequencyCap(max_sends=1)))
+        service.send_guard.suppression_list.add("gone@example.com", "unsubscribed")
+        plans = {field: service.personalization_service.compile_content("Hi") for field in
+                 ("subject_line", "html_content", "text_content")}
+
+        async def compiled_template(template_id):
+            return SimpleNamespace(plans=plans)
+
+        async def send_with_fallback(email_data):
+            return {"success": True, "email_id": email_data["to"]}
+
+        async def no_webhooks(event_type):
+            return []
+
+        service.template_service.get_compiled_template = compiled_template
+        service.webhook_service.get_active_webhooks = no_webhooks
+        service.send_with_fallback = send_with_fallback
+        result = await service.send_bulk_personalized_emails("tmpl", [
+            {"email": "a@example.com"}, {"email": "a@example.com"}, {"email": "gone@example.com"}
+        ])
+
+        assert result["sent"] == 1 and result["failed"] == 0
+        assert result["blocked"] == {"frequency_cap": 1, "unsubscribed": 1}
+        assert service.send_guard.blocked_counts == {"frequency_cap": 1, "unsubscribed": 1}
+
+    @pytest.mark.asyncio
+    async def test_scheduled_sends_are_paced_per_slot(self, email_agent):
+        """Test optimized future sends wake once per slot and go through the domain scheduler"""
+        contacts = [Contact(id=f"c{i}", email=f"user{i}@gmail.com", tags=[]) for i in range(4)]
+        for contact in contacts:
+            email_agent.contacts_store[contact.id] = contact
+        campaign = SimpleNamespace(id="camp", metrics={})
+        template = SimpleNamespace(id="tmpl")
+        slot = datetime.now() + timedelta(milliseconds=50)
+        sent = []
+
+        async def send(message):
+            sent.append(message.contact_id)
+
+        email_agent._send_email_message = send
+        await email_agent._send_campaign_emails(
+            campaign, contacts, template, datetime.now(), {contact.id: slot for contact in contacts}
+        )
+        assert len(email_agent._scheduled_sends) == 1 and sent == []
+
+        await asyncio.gather(*email_agent._scheduled_sends)
+        assert sorted(sent) == ["c0", "c1", "c2", "c3"]
+        assert email_agent.domain_scheduler.dispatched == {"gmail": 4}
+
+    def test_events_endpoint_requires_secret_and_applies_bounces(self, monkeypatch):
+        """Test the ESP event webhook checks its secret and suppresses hard bounces only"""
+        events = [
+            {"email_id": "e1", "event_type": "bounced", "email": "hard-webhook@example.com"},
+            {"email_id": "e2", "event_type": "bounced", "email": "soft-webhook@example.com",
+             "metadata": {"bounce_type": "soft"}}
+        ]
+        table = EmailEventsTable([])
+        monkeypatch.setattr(enhanced_email_service, "_enhanced_email_service",
+                            EnhancedEmailService(events_database=SupabaseDatabaseService(table)))
+        monkeypatch.setenv("EMAIL_EVENTS_WEBHOOK_SECRET", "s3cret")
+        assert client.post("/api/email/events", json=events).status_code == 401
+
+        response = client.post("/api/email/events", json=events, headers={"X-Webhook-Secret": "s3cret"})
+        assert response.status_code == 200
+        assert response.json()["tracked"] == 2
+        assert [row["email_id"] for row in table.rows] == ["e1", "e2"]
+        guard = EnhancedEmailService().send_guard
+        assert guard.check("hard-webhook@example.com") == "bounced"
+        assert guard.check("soft-webhook@example.com") is None
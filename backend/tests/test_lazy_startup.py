@@ -0,0 +1,165 @@
+import sys
+import types
+
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from backend.config import AgentManager, AGENT_CONFIGS
+from backend.services.lazy_routers import LazyRouterMounter
+from backend.services.startup_diagnostics import parse_importtime, summarize
+
+
+def make_router_module(monkeypatch, name: str, prefix: str):
+    router = APIRouter(prefix=prefix)
+
+    @router.get("/ping")
+    async def ping():
+        return {"module": name}
+
+    module = types.ModuleType(name)
+    module.router = router
+    monkeypatch.setitem(sys.modules, name, module)
+    return module
+
+
+def make_app():
+    app = FastAPI()
+    failures = []
+    mounter = LazyRouterMounter(app, on_failure=lambda module_path, error: failures.append(module_path))
+    app.middleware("http")(mounter.dispatch)
+    return app, mounter, failures
+
+
+class TestLazyRouters:
+    def test_router_is_mounted_on_first_request_to_its_prefix(self, monkeypatch):
+        make_router_module(monkeypatch, "lazy_test_widgets", "/api/widgets")
+        make_router_module(monkeypatch, "lazy_test_gadgets", "/api/gadgets")
+        app, mounter, _ = make_app()
+        mounter.register("lazy_test_widgets", "/api/widgets")
+        mounter.register("lazy_test_gadgets", "/api/gadgets")
+        client = TestClient(app)
+
+        assert mounter.loaded == []
+        response = client.get("/api/widgets/ping")
+
+        assert response.status_code == 200
+        assert response.json() == {"module": "lazy_test_widgets"}
+        assert mounter.loaded == ["lazy_test_widgets"]
+        assert mounter.pending_modules() == ["lazy_test_gadgets"]
+
+    def test_prefix_match_respects_path_boundaries(self, monkeypatch):
+        make_router_module(monkeypatch, "lazy_test_widgets", "/api/widgets")
+        app, mounter, _ = make_app()
+        mounter.register("lazy_test_widgets", "/api/widgets")
+
+        response = TestClient(app).get("/api/widgets-archive/ping")
+
+        assert response.status_code == 404
+        assert mounter.loaded == []
+
+    def test_openapi_request_mounts_every_router(self, monkeypatch):
+        make_router_module(monkeypatch, "lazy_test_widgets", "/api/widgets")
+        make_router_module(monkeypatch, "lazy_test_gadgets", "/api/gadgets")
+        app, mounter, _ = make_app()
+        mounter.register("lazy_test_widgets", "/api/widgets")
+        mounter.register("lazy_test_gadgets", "/api/gadgets")
+
+        paths = TestClient(app).get("/openapi.json").json()["paths"]
+
+        assert "/api/widgets/ping" in paths and "/api/gadgets/ping" in paths
+        assert mounter.pending_modules() == []
+
+    def test_import_failure_is_recorded_and_reported_once(self):
+        app, mounter, failures = make_app()
+        mounter.register("lazy_test_missing_module", "/api/missing")
+        client = TestClient(app)
+
+        assert client.get("/api/missing/ping").status_code == 404
+        assert client.get("/api/missing/ping").status_code == 404
+
+        assert failures == ["lazy_test_missing_module"]
+        assert "lazy_test_missing_module" in mounter.get_stats()["failed"]
+
+
+class TestLazyAgentManager:
+    def test_agents_are_constructed_on_first_access(self, monkeypatch):
+        monkeypatch.setenv("ENVIRONMENT", "development")
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+        manager = AgentManager()
+
+        assert manager.initialized_agents == {}
+        assert manager.is_agent_available("campaign_agent")
+        assert manager.get_system_status()["total_agents_available"] == len(AGENT_CONFIGS)
+
+        agent = manager.campaign_agent
+
+        assert manager.initialized_agents == {"campaign_agent": agent}
+        assert manager.get_agent("campaign_agent") is agent
+        assert "campaign_agent" not in manager.get_system_status()["pending_agents"]
+
+    def test_unknown_attribute_still_raises(self, monkeypatch):
+        monkeypatch.setenv("ENVIRONMENT", "development")
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+        manager = AgentManager()
+
+        assert getattr(manager, "mcp_agent", None) is None
+        assert manager.initialized_agents == {}
+
+
+class TestStartupDiagnostics:
+    def test_parse_and_summarize_importtime_output(self):
+        output = "\n".join([
+            "import time: self [us] | cumulative | imported package",
+            "import time:       100 |        100 |   pandas.core",
+            "import time:       400 |        500 | pandas",
+            "import time:       200 |        200 | json",
+            "unrelated line"
+        ])
+
+        records = parse_importtime(output)
+        summary = summarize(records, top=2)
+
+        assert [(r.module, r.depth) for r in records] == [("pandas.core", 1), ("pandas", 0), ("json", 0)]
+        assert summary["slowest_imports"][0] == {"module": "pandas", "self_ms": 0.4, "cumulative_ms": 0.5}
+        assert summary["by_package_ms"] == {"pandas": 0.5, "json": 0.2}
+
+
+class TestStartupEndpoint:
+    def make_client(self):
+        from backend.routes import system_health
+        app = FastAPI()
+        app.include_router(system_health.router)
+        return TestClient(app), system_health
+
+    def test_requires_authorization(self):
+        client, _ = self.make_client()
+        assert client.get("/api/health/startup").status_code == 401
+        assert client.get("/api/health/startup", params={"profile": "true"}).status_code == 401
+
+    def test_requires_a_valid_token(self, monkeypatch):
+        client, system_health = self.make_client()
+
+        def reject(token):
+            raise ValueError("Invalid token")
+
+        monkeypatch.setattr(system_health, "get_current_user", reject)
+        response = client.get("/api/health/startup", headers={"Authorization": "Bearer anything"})
+        assert response.status_code == 401
+
+    def test_profile_requires_admin(self, monkeypatch):
+        client, system_health = self.make_client()
+        monkeypatch.setattr(system_health, "get_current_user", lambda token: {"id": "user-1"})
+        monkeypatch.setattr(system_health, "is_admin_user", lambda token: False)
+        headers = {"Authorization": "Bearer user"}
+        assert client.get("/api/health/startup", headers=headers).status_code == 200
+        response = client.get("/api/health/startup", params={"profile": "true"}, headers=headers)
+        assert response.status_code == 403
+
+    def test_only_one_profile_runs_at_a_time(self, monkeypatch):
+        client, system_health = self.make_client()
+        monkeypatch.setattr(system_health, "get_current_user", lambda token: {"id": "admin-1"})
+        monkeypatch.setattr(system_health, "is_admin_user", lambda token: True)
+        monkeypatch.setattr(system_health._profile_lock, "locked", lambda: True)
+        response = client.get("/api/health/startup", params={"profile": "true"},
+                              headers={"Authorization": "Bearer admin"})
+        assert response.status_code == 409
@@ -0,0 +1,988 @@
+"""
+Tests for lead services
+"""
+import pytest
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+from backend.agents.leads.lead_enrichment_service import LeadEnrichmentService, company_cache_key
+from backend.agents.leads.lead_scoring_service import LeadScoringService
+from backend.agents.leads.lead_analytics_service import LeadAnalyticsService
+from backend.agents.leads.lead_score_model import LeadScoreModel, train_lead_score_model, latest_model_path
+from backend.services.lead_ingestion import FormConfigCache, LeadIngestionQueue, build_lead_from_submission
+from backend.services.idempotency import IdempotencyStore, DuplicateSubmissionInProgress
+from backend.services.lead_search import LeadSearchIndex, LeadSearchService
+from backend.services.lead_import import UploadParser, LeadImport, LeadImportRegistry
+from backend.singleflight import SingleFlight
+from backend.services.assessment_templates import ScoringPlan, AssessmentTemplateCache, CachedAssessment, AssessmentViewCounter
+
+class FakeQuery:
+    """Chainable stand-in for a supabase table query"""
+
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        # Same dict objects as the table, so update/delete can find their matches
+        self.rows = list(client.tables.setdefault(name, []))
+        self.write = None
+
+    def select(self, *args):
+        return self
+
+    def eq(self, column, value):
+        self.rows = [row for row in self.rows if row.get(column) == value]
+        return self
+
+    def in_(self, column, values):
+        self.rows = [row for row in self.rows if row.get(column) in values]
+        return self
+
+    def limit(self, count):
+        self.rows = self.rows[:count]
+        return self
+
+    def order(self, column):
+        self.rows = sorted(self.rows, key=lambda row: row.get(column))
+        return self
+
+    def range(self, start, end):
+        self.rows = self.rows[start:end + 1]
+        return self
+
+    def insert(self, rows):
+        self.write = ("insert", rows if isinstance(rows, list) else [rows], "id")
+        return self
+
+    def upsert(self, rows, on_conflict="id", ignore_duplicates=False):
+        action = "upsert_ignore" if ignore_duplicates else "upsert"
+        self.write = (action, rows if isinstance(rows, list) else [rows], on_conflict)
+        return self
+
+    def update(self, values):
+        self.write = ("update", values, None)
+        return self
+
+    def delete(self):
+        self.write = ("delete", None, None)
+        return self
+
+    def execute(self):
+        self.client.executed.append((self.name, self.write[0] if self.write else "select"))
+        if self.write is None:
+            return SimpleNamespace(data=self.rows)
+
+        action, rows, on_conflict = self.write
+        table = self.client.tables[self.name]
+        if action == "insert":
+            unique = self.client.unique.get(self.name)
+            if unique:
+                existing = {row.get(unique) for row in table}
+                values = [row.get(unique) for row in rows]
+                if len(set(values)) < len(values) or existing & set(values):
+                    raise RuntimeError(f"duplicate key value violates unique constraint on {unique}")
+            table.extend(dict(row) for row in rows)
+            return SimpleNamespace(data=rows)
+        if action in ("update", "delete"):
+            matched = [row for row in table if any(row is match for match in self.rows)]
+            for row in matched:
+                if action == "update":
+                    row.update(rows)
+                else:
+                    table.remove(row)
+            return SimpleNamespace(data=matched)
+        by_key = {row[on_conflict]: index for index, row in enumerate(table)}
+        written = []
+        for row in rows:
+            if row[on_conflict] in by_key:
+                if action == "upsert_ignore":
+                    continue
+                table[by_key[row[on_conflict]]] = dict(row)
+            else:
+                table.append(dict(row))
+            written.append(row)
+        return SimpleNamespace(data=written)
+
+class FakeSupabase:
+    """Minimal supabase client over in-memory tables"""
+
+    def __init__(self, tables, unique=None):
+        self.tables = tables
+        self.unique = unique or {}
+        self.executed = []
+        self.rpc_calls = []
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params):
+        self.rpc_calls.append((name, params))
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=None))
+
+class CountingLeadAI:
+    """generate_lead_enrichment_insights stand-in that records concurrency"""
+
+    def __init__(self, latency: float = 0.01):
+        self.latency = latency
+        self.calls = []
+        self.prompts = []
+        self.active = 0
+        self.peak = 0
+
+    async def generate_company_insights(self, company_data):
+        self.calls.append(company_data["company"])
+        self.prompts.append(company_data)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(self.latency)
+        self.active -= 1
+        return {"insights": [f"{company_data['company']} insight"], "talking_points": [], "recommended_approach": "email"}
+
+    async def generate_lead_enrichment_insights(self, lead):
+        return await self.generate_company_insights(lead)
+
+class EnrichmentSupabase(FakeSupabase):
+    """FakeSupabase with the update_lead_enrichment database function"""
+
+    def rpc(self, name, params):
+        if name != "update_lead_enrichment":
+            return super().rpc(name, params)
+        self.rpc_calls.append((name, params))
+        by_id = {row["id"]: row for row in self.tables["leads"]}
+        updated = 0
+        for row in params["p_rows"]:
+            lead = by_id.get(row["id"])
+            if lead is not None:
+                lead["enriched_data"] = {**(lead.get("enriched_data") or {}), **row["enriched_data"]}
+                updated += 1
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=updated))
+
+def make_leads(count: int, companies: int):
+    return [
+        {
+            "id": f"lead-{i}",
+            "first_name": f"Person{i}",
+            "email": f"person{i}@company{i % companies}.com",
+            "company": f"Company {i % companies}",
+            "industry": "SaaS",
+            "status": "new",
+            "enriched_data": {"source_note": "imported"}
+        }
+        for i in range(count)
+    ]
+
+class TestLeadEnrichment:
+    """Test concurrent, company-cached lead enrichment"""
+
+    def test_company_key_normalizes_domain_and_ignores_free_mail(self):
+        assert company_cache_key({"email": "a@Acme.com", "industry": "SaaS"}) == \
+            company_cache_key({"website": "https://www.acme.com/about", "industry": " saas "})
+        assert company_cache_key({"email": "a@gmail.com", "company": "Acme, Inc."}) == \
+            company_cache_key({"email": "b@yahoo.com", "company": "acme"})
+        assert company_cache_key({"email": "a@gmail.com"}) is None
+
+    @pytest.mark.asyncio
+    async def test_batch_makes_one_llm_call_per_company(self):
+        leads = make_leads(1000, 200)
+        supabase = EnrichmentSupabase({"leads": [dict(lead) for lead in leads]})
+        ai = CountingLeadAI()
+        service = LeadEnrichmentService(supabase, 1, ai, max_concurrency=8)
+
+        result = await service.enrich_leads({"lead_ids": [lead["id"] for lead in leads]})
+
+        assert result["enriched_count"] == 1000
+        assert result["failed_count"] == 0
+        assert result["llm_calls"] == 200
+        assert len(ai.calls) == 200
+        assert ai.peak <= 8
+
+        stored = {row["id"]: row for row in supabase.tables["leads"]}
+        assert stored["lead-205"]["enriched_data"]["ai_insights"] == ["Company 5 insight"]
+        assert stored["lead-205"]["enriched_data"]["source_note"] == "imported"
+        assert stored["lead-205"]["status"] == "new"
+        # 5 chunked id lookups, 2 batched updates of 500 leads, no whole-row writes
+        assert supabase.executed.count(("leads", "select")) == 5
+        assert [name for name, _ in supabase.rpc_calls] == ["update_lead_enrichment"] * 2
+        assert set(supabase.rpc_calls[0][1]["p_rows"][0]) == {"id", "enriched_data"}
+        assert ("leads", "upsert") not in supabase.executed
+
+    @pytest.mark.asyncio
+    async def test_company_prompt_has_no_contact_fields(self):
+        leads = make_leads(2, 1)
+        leads[0]["job_title"] = "CTO"
+        leads[1]["job_title"] = "Head of Sales"
+        supabase = EnrichmentSupabase({"leads": leads})
+        ai = CountingLeadAI()
+        service = LeadEnrichmentService(supabase, 1, ai)
+
+        await service.enrich_leads({"lead_ids": ["lead-0", "lead-1"]})
+
+        assert ai.prompts == [{"company": "Company 0", "domain": "company0.com", "industry": "SaaS"}]
+        stored = {row["id"]: row for row in supabase.tables["leads"]}
+        assert "CTO" in stored["lead-0"]["enriched_data"]["talking_points"][0]
+        assert "Head of Sales" in stored["lead-1"]["enriched_data"]["talking_points"][0]
+
+    @pytest.mark.asyncio
+    async def test_fallback_updates_only_enrichment_of_existing_leads(self):
+        leads = make_leads(3, 3)
+        supabase = FakeSupabase({"leads": leads})
+        service = LeadEnrichmentService(supabase, 1, CountingLeadAI())
+
+        fetch = service.get_leads_by_ids
+
+        async def fetch_then_change(lead_ids):
+            rows = [dict(row) for row in await fetch(lead_ids)]
+            # Another request edits one lead and deletes another mid-enrichment
+            supabase.tables["leads"][0]["status"] = "contacted"
+            del supabase.tables["leads"][2]
+            return rows
+
+        service.get_leads_by_ids = fetch_then_change
+        result = await service.enrich_leads({"lead_ids": ["lead-0", "lead-1", "lead-2"]})
+
+        assert result["enriched_count"] == 2
+        assert [row["id"] for row in supabase.tables["leads"]] == ["lead-0", "lead-1"]
+        assert supabase.tables["leads"][0]["status"] == "contacted"
+        assert supabase.tables["leads"][0]["enriched_data"]["ai_insights"] == ["Company 0 insight"]
+        assert supabase.executed.count(("leads", "update")) == 3
+        assert ("leads", "upsert") not in supabase.executed
+
+    @pytest.mark.asyncio
+    async def test_cache_is_reused_across_batches(self):
+        leads = make_leads(20, 4)
+        supabase = FakeSupabase({"leads": leads})
+        ai = CountingLeadAI()
+        service = LeadEnrichmentService(supabase, 1, ai)
+
+        await service.enrich_leads({"lead_ids": [lead["id"] for lead in leads[:10]]})
+        result = await service.enrich_leads({"lead_ids": [lead["id"] for lead in leads[10:]]})
+
+        assert result["llm_calls"] == 0
+        assert result["cache_hits"] == 10
+        assert len(ai.calls) == 4
+
+    @pytest.mark.asyncio
+    async def test_failed_generation_counts_only_affected_leads(self):
+        leads = make_leads(6, 2)
+        supabase = FakeSupabase({"leads": leads})
+
+        class FailingForCompanyZero(CountingLeadAI):
+            async def generate_company_insights(self, company_data):
+                if company_data["company"] == "Company 0":
+                    raise RuntimeError("LLM unavailable")
+                return await super().generate_company_insights(company_data)
+
+        service = LeadEnrichmentService(supabase, 1, FailingForCompanyZero())
+        result = await service.enrich_leads({"lead_ids": [lead["id"] for lead in leads] + ["missing"]})
+
+        assert result["enriched_count"] == 3
+        assert result["failed_count"] == 4
+
+def make_submission(form_config, index):
+    return build_lead_from_submission(
+        form_config["id"], form_config, {"email": f"visitor{index}@example.com", "name": f"Visitor {index}"}, f"lead-{index}"
+    )
+
+class TestSingleFlight:
+    """Test the shared in-flight call helper used by the lead caches"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def load():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "value"
+
+        results = await asyncio.gather(*(flight.run("key", load) for _ in range(5)))
+
+        assert len(calls) == 1
+        assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+        assert all(value == "value" for value, _ in results)
+        assert len(flight) == 0
+
+    @pytest.mark.asyncio
+    async def test_failure_reaches_waiters_and_is_not_remembered(self):
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("database unavailable")
+
+        results = await asyncio.gather(flight.run("key", fail), flight.run("key", fail), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+        async def load():
+            return "value"
+
+        assert await flight.run("key", load) == ("value", False)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_leader_leaves_the_call_running_for_waiters(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def load():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "value"
+
+        leader = asyncio.create_task(flight.run("key", load))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.run("key", load))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert await asyncio.wait_for(waiter, timeout=1) == ("value", True)
+        assert leader.cancelled()
+        assert len(calls) == 1
+        assert "key" not in flight
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_the_call_running(self):
+        flight = SingleFlight()
+
+        async def load():
+            await asyncio.sleep(0.05)
+            return "value"
+
+        leader = asyncio.create_task(flight.run("key", load))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.run("key", load))
+        await asyncio.sleep(0)
+        waiter.cancel()
+
+        assert await leader == ("value", False)
+        assert waiter.cancelled()
+
+class TestLeadIngestion:
+    """Test cached form configs and batched webhook ingestion"""
+
+    @pytest.mark.asyncio
+    async def test_form_config_is_loaded_once_and_invalidated(self):
+        supabase = FakeSupabase({"lead_capture_forms": [{"id": "form-1", "active": True, "name": "Demo"}]})
+        cache = FormConfigCache(lambda: supabase)
+
+        configs = await asyncio.gather(*(cache.get("form-1") for _ in range(20)))
+        assert all(config["name"] == "Demo" for config in configs)
+        assert supabase.executed.count(("lead_capture_forms", "select")) == 1
+
+        supabase.tables["lead_capture_forms"][0]["active"] = False
+        assert (await cache.get("form-1"))["name"] == "Demo"
+        cache.invalidate("form-1")
+        assert await cache.get("form-1") is None
+
+    @pytest.mark.asyncio
+    async def test_cancelled_lookup_does_not_strand_waiters(self, monkeypatch):
+        supabase = FakeSupabase({"lead_capture_forms": [{"id": "form-1", "active": True, "name": "Demo"}]})
+        cache = FormConfigCache(lambda: supabase)
+        load = cache._load
+        monkeypatch.setattr(cache, "_load", lambda form_id: time.sleep(0.1) or load(form_id))
+
+        leader = asyncio.create_task(cache.get("form-1"))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.get("form-1"))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        assert (await asyncio.wait_for(waiter, timeout=1))["name"] == "Demo"
+        assert leader.cancelled()
+        assert supabase.executed.count(("lead_capture_forms", "select")) == 1
+
+    @pytest.mark.asyncio
+    async def test_queued_leads_are_bulk_inserted_with_one_counter_increment(self):
+        form = {"id": "form-1", "name": "Demo", "created_by": "user-1"}
+        supabase = FakeSupabase({"leads": []})
+        queue = LeadIngestionQueue(lambda: supabase, max_batch=100, flush_interval=0.05)
+
+        for index in range(250):
+            await queue.submit(make_submission(form, index))
+        await queue.close()
+
+        assert len(supabase.tables["leads"]) == 250
+        assert supabase.executed.count(("leads", "insert")) == 3
+        assert sum(params["p_count"] for _, params in supabase.rpc_calls) == 250
+        assert {name for name, _ in supabase.rpc_calls} == {"increment_form_submissions"}
+
+    @pytest.mark.asyncio
+    async def test_bad_row_does_not_drop_the_rest_of_its_batch(self):
+        form = {"id": "form-1", "name": "Demo", "created_by": "user-1"}
+        supabase = FakeSupabase({"leads": []}, unique={"leads": "email"})
+        queue = LeadIngestionQueue(lambda: supabase, flush_interval=0.05)
+
+        for index in [0, 1, 1, 2]:
+            await queue.submit(make_submission(form, index))
+        await queue.close()
+
+        assert sorted(row["email"] for row in supabase.tables["leads"]) == [
+            "visitor0@example.com", "visitor1@example.com", "visitor2@example.com"
+        ]
+        assert queue.get_stats()["failed"] == 1
+        assert sum(params["p_count"] for _, params in supabase.rpc_calls) == 3
+        dead_letters = supabase.tables["lead_ingestion_dead_letters"]
+        assert [row["lead"]["email"] for row in dead_letters] == ["visitor1@example.com"]
+        assert dead_letters[0]["form_id"] == "form-1"
+        assert "duplicate key" in dead_letters[0]["error"]
+
+    def test_submission_maps_onto_lead_columns(self):
+        form = {"id": "form-1", "name": "Demo", "created_by": "user-1", "campaign_id": "campaign-1"}
+        lead = build_lead_from_submission("form-1", form, {
+            "email": "Jane@Acme.com", "name": "Jane van Dyke", "phone": "555-0100", "utm_source": "ads"
+        }, "lead-1")
+
+        assert lead["created_by"] == "user-1"
+        assert (lead["email"], lead["first_name"], lead["last_name"]) == ("jane@acme.com", "Jane", "van Dyke")
+        assert lead["lead_score"] == 0
+        assert lead["source_details"] == {
+            "form_id": "form-1", "form_name": "Demo", "campaign_id": "campaign-1", "phone": "555-0100", "utm_source": "ads"
+        }
+        assert not {"form_id", "campaign_id", "user_id", "name", "phone", "custom_fields", "score", "metadata"} & set(lead)
+
+    @pytest.mark.asyncio
+    async def test_leads_are_dead_lettered_to_a_file_when_the_database_is_down(self, tmp_path):
+        form = {"id": "form-1", "name": "Demo", "created_by": "user-1"}
+
+        class DownSupabase(FakeSupabase):
+            def table(self, name):
+                raise ConnectionError("database unavailable")
+
+        path = tmp_path / "dead_letters.jsonl"
+        queue = LeadIngestionQueue(lambda: DownSupabase({}), flush_interval=0.05, dead_letter_path=str(path))
+        for index in range(3):
+            await queue.submit(make_submission(form, index))
+        await queue.close()
+
+        rows = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [row["lead"]["email"] for row in rows] == [f"visitor{i}@example.com" for i in range(3)]
+        assert queue.get_stats()["dead_lettered"] == 3
+
+class TestIdempotency:
+    """Test duplicate-submission suppression"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_and_repeated_submissions_run_once(self):
+        store = IdempotencyStore()
+        calls = []
+
+        async def handler():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"lead_id": f"lead-{len(calls)}"}
+
+        key = IdempotencyStore.make_key("form", payload={"email": "a@example.com"})
+        results = await asyncio.gather(*(store.run(key, handler) for _ in range(5)))
+        again, replayed = await store.run(key, handler)
+
+        assert len(calls) == 1
+        assert {response["lead_id"] for response, _ in results} == {"lead-1"}
+        assert [was_replayed for _, was_replayed in results].count(False) == 1
+        assert again == {"lead_id": "lead-1"} and replayed
+
+    @pytest.mark.asyncio
+    async def test_client_key_overrides_content_hash_and_failures_are_retryable(self):
+        assert IdempotencyStore.make_key("form", "abc", {"x": 1}) == IdempotencyStore.make_key("form", "abc", {"x": 2})
+        assert IdempotencyStore.make_key("form", payload={"x": 1}) != IdempotencyStore.make_key("form", payload={"x": 2})
+
+        store = IdempotencyStore()
+        attempts = []
+
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("database unavailable")
+            return {"ok": True}
+
+        with pytest.raises(RuntimeError):
+            await store.run("k", flaky)
+        assert await store.run("k", flaky) == ({"ok": True}, False)
+
+    @pytest.mark.asyncio
+    async def test_database_claim_suppresses_duplicates_across_workers(self):
+        supabase = FakeSupabase({"idempotency_keys": []})
+        worker_a = IdempotencyStore(lambda: supabase)
+        worker_b = IdempotencyStore(lambda: supabase)
+
+        async def handler():
+            return {"lead_id": "lead-1"}
+
+        assert await worker_a.run("k", handler) == ({"lead_id": "lead-1"}, False)
+        assert await worker_b.run("k", handler) == ({"lead_id": "lead-1"}, True)
+
+        # A claim without a response is still being processed elsewhere
+        supabase.tables["idempotency_keys"][0]["response"] = None
+        with pytest.raises(DuplicateSubmissionInProgress):
+            await IdempotencyStore(lambda: supabase).run("k", handler)
+
+def make_search_leads(count: int):
+    companies = ["Acme Corp", "Globex", "Initech", "Umbrella"]
+    return [
+        {
+            "id": f"lead-{i:04d}",
+            "first_name": ["Jane", "John", "Janet", "Marcus"][i % 4],
+            "last_name": f"Doe{i}",
+            "email": f"contact{i}@{companies[i % 4].split()[0].lower()}.com",
+            "company": companies[i % 4],
+            "tags": ["enterprise"] if i % 3 == 0 else ["smb"],
+            "created_by": "user-1"
+        }
+        for i in range(count)
+    ]
+
+class TestLeadSearch:
+    """Test ranked, cursor-paginated lead search"""
+
+    def test_index_matches_prefixes_and_misspellings_with_field_ranking(self):
+        index = LeadSearchIndex()
+        index.add({"id": "a", "first_name": "Acme", "company": "Other"})
+        index.add({"id": "b", "first_name": "Zed", "company": "Acme Corp"})
+        index.add({"id": "c", "first_name": "Zed", "tags": ["acme"]})
+        index.add({"id": "d", "first_name": "Jane", "email": "jane@initech.com", "company": "Initech"})
+
+        assert [lead_id for lead_id, _ in index.search("acme")] == ["a", "b", "c"]
+        assert [lead_id for lead_id, _ in index.search("acm")] == ["a", "b", "c"]
+        assert [lead_id for lead_id, _ in index.search("jane initech")] == ["d"]
+        assert index.search("jane acme") == []
+        # "initec" is a prefix; "initeck" is a misspelling
+        assert [lead_id for lead_id, _ in index.search("initec")] == ["d"]
+        assert [lead_id for lead_id, _ in index.search("initeck")] == ["d"]
+
+        index.add({"id": "d", "first_name": "Jane", "company": "Globex"})
+        assert index.search("initech") == []
+
+    @pytest.mark.asyncio
+    async def test_cursor_pages_cover_results_once_using_local_index(self):
+        class NoSearchFunction(FakeSupabase):
+            def rpc(self, name, params):
+                self.rpc_calls.append((name, params))
+                raise RuntimeError("function search_leads does not exist")
+
+        leads = make_search_leads(300)
+        supabase = NoSearchFunction({"leads": leads + [dict(leads[0], id="other-user", created_by="user-2")]})
+        service = LeadSearchService(lambda: supabase, page_size=100)
+
+        reference = LeadSearchIndex()
+        for lead in leads:
+            reference.add(lead)
+        expected = [lead_id for lead_id, _ in reference.search("ja", 1000)]
+        seen, cursor = [], None
+        while True:
+            page = await service.search("user-1", "ja", limit=40, cursor=cursor)
+            assert page["backend"] == "local_index"
+            seen.extend(lead["id"] for lead in page["leads"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+        assert len(expected) == 150
+        assert seen == expected
+        # The function is tried once; the index is loaded once (4 range reads),
+        # then each of the 4 pages fetches its rows in one query
+        assert len(supabase.rpc_calls) == 1
+        assert supabase.executed.count(("leads", "select")) == 4 + 4
+
+    @pytest.mark.asyncio
+    async def test_database_function_receives_keyset_cursor(self):
+        class SearchFunction(FakeSupabase):
+            def rpc(self, name, params):
+                self.rpc_calls.append((name, params))
+                rows = [{"lead": {"id": f"lead-{i}"}, "rank": 1.5 - i / 100} for i in range(params["p_limit"])]
+                return SimpleNamespace(execute=lambda: SimpleNamespace(data=rows))
+
+        supabase = SearchFunction({})
+        service = LeadSearchService(lambda: supabase)
+
+        first = await service.search("user-1", "acme", limit=10)
+        second = await service.search("user-1", "acme", limit=10, cursor=first["next_cursor"])
+
+        assert first["backend"] == "postgres"
+        assert [lead["id"] for lead in first["leads"]] == [f"lead-{i}" for i in range(10)]
+        assert first["has_more"]
+        assert supabase.rpc_calls[0][1]["p_limit"] == 11
+        assert supabase.rpc_calls[1][1]["p_cursor_rank"] == pytest.approx(1.41)
+        assert supabase.rpc_calls[1][1]["p_cursor_id"] == "lead-9"
+        assert second["leads"]
+
+        with pytest.raises(ValueError):
+            await service.search("user-1", "acme", cursor="not-a-cursor")
+
+class MergeFunction(FakeSupabase):
+    """Supabase stand-in whose import_leads function reports every row as inserted"""
+
+    def rpc(self, name, params):
+        self.rpc_calls.append((name, params))
+        data = [{"inserted": len(params["p_leads"]), "updated": 0}]
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=data))
+
+class TestLeadImport:
+    """Test streaming bulk lead import"""
+
+    def test_import_ids_are_scoped_per_user(self):
+        registry = LeadImportRegistry()
+        supabase = FakeSupabase({"leads": []})
+        mine = registry.start(lambda: supabase, "user-1", "csv", "nightly")
+        theirs = registry.start(lambda: supabase, "user-2", "csv", "nightly")
+
+        assert registry.get("nightly", "user-1") is mine
+        assert registry.get("nightly", "user-2") is theirs
+        assert registry.get("nightly", "user-3") is None
+        with pytest.raises(ValueError):
+            registry.start(lambda: supabase, "user-1", "csv", "nightly")
+
+    def test_csv_records_split_across_chunks_are_parsed_whole(self):
+        upload = (
+            "\ufeffE-mail Address,First Name,Notes,Company\r\n"
+            "jane@acme.com,Jane,\"line one\r\nline \"\"two\"\"\",Acme\r\n"
+            "\r\n"
+            "john@globex.com,John,,\"Globex, Inc\"\r\n"
+        ).encode("utf-8")
+        parser = UploadParser("csv")
+        rows = []
+        for offset in range(len(upload)):
+            rows.extend(parser.feed(upload[offset:offset + 1]))
+        rows.extend(parser.close())
+
+        assert rows == [
+            (1, {"email": "jane@acme.com", "first_name": "Jane", "company": "Acme"}),
+            (2, {"email": "john@globex.com", "first_name": "John", "company": "Globex, Inc"})
+        ]
+        with pytest.raises(ValueError):
+            UploadParser("csv").feed(b"name,company\nJane,Acme\n")
+
+    @pytest.mark.asyncio
+    async def test_rows_are_validated_deduplicated_and_merged_in_chunks(self):
+        supabase = MergeFunction({"leads": []})
+        lead_import = LeadImport(lambda: supabase, "user-1", "ndjson", chunk_size=1000, max_errors=5)
+        lines = []
+        for i in range(2500):
+            lines.append(json.dumps({"email": f"Person{i}@Example.com", "name": f"Person {i} Smith", "tags": "a;b"}))
+        lines += [json.dumps({"email": "PERSON7@example.com"}), json.dumps({"email": "not-an-email"}), "{broken"]
+        for i in range(10):
+            lines.append(json.dumps({"email": f"bad{i}@"}))
+        upload = "\n".join(lines).encode("utf-8")
+
+        for offset in range(0, len(upload), 4096):
+            await lead_import.feed(upload[offset:offset + 4096])
+        report = await lead_import.finish()
+
+        assert report["status"] == "completed"
+        assert report["rows_processed"] == 2513
+        assert report["valid"] == 2500 and report["inserted"] == 2500
+        assert report["duplicates"] == 1
+        assert report["invalid"] == 12 and report["error_count"] == 12
+        assert len(report["errors"]) == 5 and report["errors_truncated"]
+        assert report["errors"][0] == {"row": 2502, "error": "Invalid email format", "email": "not-an-email"}
+        assert report["errors"][1]["row"] == 2503
+
+        assert [len(params["p_leads"]) for _, params in supabase.rpc_calls] == [1000, 1000, 500]
+        first = supabase.rpc_calls[0][1]["p_leads"][0]
+        assert first["email"] == "person0@example.com"
+        assert (first["first_name"], first["last_name"]) == ("Person", "0 Smith")
+        assert first["tags"] == ["a", "b"] and first["source"] == "import"
+
+    @pytest.mark.asyncio
+    async def test_without_merge_function_existing_emails_are_skipped(self):
+        class NoImportFunction(FakeSupabase):
+            def rpc(self, name, params):
+                raise RuntimeError("function import_leads does not exist")
+
+        supabase = NoImportFunction(
+            {"leads": [{"id": "old", "email": "jane@acme.com", "created_by": "user-1"}]},
+            unique={"leads": "email"}
+        )
+        lead_import = LeadImport(lambda: supabase, "user-1", "csv", chunk_size=2)
+        await lead_import.feed(b"email,company\njane@acme.com,Acme\njohn@acme.com,Acme\nmary@acme.com,Acme\n")
+        report = await lead_import.finish()
+
+        assert report["inserted"] == 2 and report["skipped_existing"] == 1
+        assert sorted(row["email"] for row in supabase.tables["leads"]) == ["jane@acme.com", "john@acme.com", "mary@acme.com"]
+        assert all(row["created_by"] == "user-1" for row in supabase.tables["leads"])
+
+class ScoreSupabase(FakeSupabase):
+    """FakeSupabase with the update_lead_scores database function"""
+
+    def rpc(self, name, params):
+        if name != "update_lead_scores":
+            return super().rpc(name, params)
+        self.rpc_calls.append((name, params))
+        by_id = {row["id"]: row for row in self.tables["leads"]}
+        updated = 0
+        for lead_id, score in zip(params["p_ids"], params["p_scores"]):
+            if lead_id in by_id:
+                by_id[lead_id]["lead_score"] = score
+                updated += 1
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=updated))
+
+def make_outcome_leads(count: int, seed: int = 0):
+    """Leads whose outcome depends on seniority, company size and source"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    sizes = ["1-10", "11-50", "51-200", "201-1000", "1000+"]
+    titles = ["CEO", "VP Sales", "Marketing Manager", "Analyst", "Intern"]
+    sources = ["website", "webinar", "import", "referral"]
+    leads = []
+    for i in range(count):
+        size, title, source = rng.integers(5), rng.integers(5), rng.integers(4)
+        logit = -1.5 + 0.6 * size + (1.4 if title < 2 else 0.0) + (1.2 if source == 3 else 0.0) - (0.8 if source == 2 else 0.0)
+        won = rng.random() < 1 / (1 + np.exp(-logit))
+        leads.append({
+            "id": f"lead-{i}",
+            "email": f"person{i}@company{i % 50}.com",
+            "company": f"Company {i % 50}",
+            "company_size": sizes[size],
+            "job_title": titles[title],
+            "industry": "Technology" if i % 2 else "Retail",
+            "source": sources[source],
+            "status": ("customer" if won else "lost") if i % 10 else "new"
+        })
+    return leads
+
+class TestLeadScoreModel:
+    """Test the trained lead scoring model and its use in LeadScoringService"""
+
+    def test_trained_model_ranks_outcomes_and_round_trips_through_artifact(self, tmp_path):
+        leads = make_outcome_leads(3000)
+        model = train_lead_score_model(leads)
+
+        assert model.metrics["training_rows"] == 2160
+        assert model.metrics["validation_auc"] > 0.75
+        assert model.explain(1)[0][0] in ("title:executive", "title:vp_director", "source:referral", "size:enterprise")
+
+        older = LeadScoreModel(model.featurizer, model.weights * 0, 0.0, "20200101T000000000000Z", "2020-01-01")
+        older.save(str(tmp_path))
+        path = model.save(str(tmp_path))
+        assert latest_model_path(str(tmp_path)) == path
+
+        loaded = LeadScoreModel.load(path)
+        assert loaded.version == model.version
+        assert loaded.metrics == model.metrics
+        assert (loaded.score(leads[:100]) == model.score(leads[:100])).all()
+
+        with pytest.raises(ValueError):
+            train_lead_score_model(leads[:15])
+
+    @pytest.mark.asyncio
+    async def test_shadow_mode_writes_rule_scores_and_reports_comparison(self):
+        leads = make_outcome_leads(1200)
+        model = train_lead_score_model(leads)
+        supabase = ScoreSupabase({"leads": [dict(lead) for lead in leads]})
+        service = LeadScoringService(supabase, 1, None, model=model)
+        lead_ids = [lead["id"] for lead in leads[:600]]
+
+        shadow = await service.score_leads({"lead_ids": lead_ids, "scoring_mode": "shadow"})
+        stored = {row["id"]: row.get("lead_score") for row in supabase.tables["leads"]}
+        rule_score = await service._calculate_ai_lead_score(leads[0], {})
+
+        assert shadow["scored_count"] == 600
+        assert shadow["model_version"] == model.version
+        assert shadow["shadow_comparison"]["leads"] == 600
+        assert 0 <= shadow["shadow_comparison"]["threshold_agreement"] <= 1
+        assert stored["lead-0"] == rule_score
+        assert [name for name, _ in supabase.rpc_calls] == ["update_lead_scores"] * 2
+        assert ("leads", "upsert") not in supabase.executed
+
+        applied = await service.score_leads({"lead_ids": lead_ids, "scoring_mode": "model"})
+        stored = {row["id"]: row.get("lead_score") for row in supabase.tables["leads"]}
+        assert applied["scoring_mode"] == "model"
+        assert stored["lead-0"] == int(model.score([leads[0]])[0])
+        assert "shadow_comparison" not in applied
+
+    @pytest.mark.asyncio
+    async def test_fallback_updates_only_scores_of_existing_leads(self):
+        leads = make_outcome_leads(3)
+        supabase = FakeSupabase({"leads": leads})
+        service = LeadScoringService(supabase, 1, None)
+
+        fetch = service.get_leads_by_ids
+
+        async def fetch_then_change(lead_ids):
+            rows = [dict(row) for row in await fetch(lead_ids)]
+            # Another request edits one lead and deletes another mid-scoring
+            supabase.tables["leads"][0]["status"] = "contacted"
+            del supabase.tables["leads"][2]
+            return rows
+
+        service.get_leads_by_ids = fetch_then_change
+        result = await service.score_leads({"lead_ids": ["lead-0", "lead-1", "lead-2"]})
+
+        assert result["scored_count"] == 2
+        assert [row["id"] for row in supabase.tables["leads"]] == ["lead-0", "lead-1"]
+        assert supabase.tables["leads"][0]["status"] == "contacted"
+        assert supabase.tables["leads"][0]["lead_score"] == await service._calculate_ai_lead_score(leads[0], {})
+        assert ("leads", "upsert") not in supabase.executed
+
+class TestLeadPatterns:
+    """Test pattern analysis from the rollup function and its column-scan fallback"""
+
+    @staticmethod
+    def make_pattern_leads():
+        from datetime import datetime, timedelta
+
+        today = datetime.utcnow()
+        leads = []
+        # 6 referral leads this week, 2 a month ago; 3 website leads a month ago, 1 long ago
+        for i, (source, days_ago) in enumerate(
+            [("referral", 1)] * 6 + [("referral", 40)] * 2 + [("website", 35)] * 3 + [("website", 400)]
+        ):
+            leads.append({
+                "id": f"lead-{i}",
+                "status": "new",
+                "industry": "Technology" if i % 2 else None,
+                "company_size": "11-50",
+                "source": source,
+                "created_at": (today - timedelta(days=days_ago)).isoformat()
+            })
+        leads.append(dict(leads[0], id="won", status="customer"))
+        return leads
+
+    @pytest.mark.asyncio
+    async def test_fallback_groups_columns_with_window_trends(self):
+        class NoRollup(FakeSupabase):
+            def rpc(self, name, params):
+                raise RuntimeError("function lead_pattern_summary does not exist")
+
+        supabase = NoRollup({"leads": self.make_pattern_leads()})
+        result = await LeadAnalyticsService(supabase, 1, None).analyze_lead_patterns({"window_days": 30})
+        patterns = result["patterns"]
+
+        assert result["aggregation"] == "scan"
+        assert patterns["total_analyzed"] == 12
+        assert patterns["lead_sources"] == {"referral": 8, "website": 4}
+        assert dict(patterns["top_industries"]) == {"Technology": 6, "unknown": 6}
+        assert patterns["trends"]["source"] == [
+            {"value": "referral", "current": 6, "previous": 2, "change_percent": 200.0},
+            {"value": "website", "current": 0, "previous": 3, "change_percent": -100.0}
+        ]
+        assert "Fastest growing source: referral (+200%)" in result["insights"]
+
+    @pytest.mark.asyncio
+    async def test_rollup_rows_are_used_without_reading_leads(self):
+        class Rollup(FakeSupabase):
+            def rpc(self, name, params):
+                self.rpc_calls.append((name, params))
+                rows = [
+                    {"dimension": "source", "value": "webinar", "total": 900, "current_window": 50, "previous_window": 40},
+                    {"dimension": "source", "value": "import", "total": 100, "current_window": 0, "previous_window": 0},
+                    {"dimension": "industry", "value": "Finance", "total": 1000, "current_window": 50, "previous_window": 40},
+                    {"dimension": "company_size", "value": "1000+", "total": 1000, "current_window": 50, "previous_window": 40}
+                ]
+                return SimpleNamespace(execute=lambda: SimpleNamespace(data=rows))
+
+        supabase = Rollup({})
+        result = await LeadAnalyticsService(supabase, 1, None).analyze_lead_patterns({"status": "qualified", "window_days": 7})
+
+        assert result["aggregation"] == "rollup"
+        assert supabase.rpc_calls == [("lead_pattern_summary", {"p_status": "qualified", "p_window_days": 7, "p_user_id": None})]
+        assert supabase.executed == []
+        assert result["patterns"]["total_analyzed"] == 1000
+        assert result["patterns"]["trends"]["source"][0] == {"value": "webinar", "current": 50, "previous": 40, "change_percent": 25.0}
+        assert result["insights"][:2] == ["Most common industry: Finance", "Primary lead source: webinar"]
+
+def scan_category(score, categories):
+    """First-match category scan the compiled plan must agree with"""
+    for category in categories:
+        if category["min_score"] <= score <= category["max_score"]:
+            return category
+    return categories[0]
+
+class TestAssessmentTemplates:
+    """Test compiled assessment scoring and the published template cache"""
+
+    def test_scoring_plan_matches_first_match_scan(self):
+        categories = [
+            {"name": "cold", "min_score": 0, "max_score": 40},
+            {"name": "warm", "min_score": 35, "max_score": 70},
+            {"name": "hot", "min_score": 71, "max_score": 90},
+            {"name": "unranged"}
+        ]
+        plan = ScoringPlan({
+            "q1": {"a": 10, "b": 30},
+            "q2": {"x": 25, "y": 40, "z": 45},
+            "q3": ["not", "a", "mapping"]
+        }, categories)
+
+        assert plan.score({"q1": "b", "q2": ["y", "z", "missing"]}) == 100
+        assert plan.score({"q1": "a", "q2": ["x"], "q3": "a", "q4": "a", "q5": 7}) == 35
+        assert plan.score({"q1": "c"}) == 0
+        for score in [0, 12.5, 35, 40, 40.5, 70, 70.5, 71, 90, 95, 100]:
+            assert plan.category(score) is scan_category(score, categories[:3])
+        assert ScoringPlan({}, []).category(50)["name"] == "unknown"
+
+    @pytest.mark.asyncio
+    async def test_published_template_is_loaded_once_and_invalidated(self):
+        template = {
+            "id": "assessment-1",
+            "status": "published",
+            "scoring_logic": {"q1": {"yes": 60}},
+            "result_categories": [{"name": "low", "min_score": 0, "max_score": 50},
+                                  {"name": "high", "min_score": 51, "max_score": 100}]
+        }
+        supabase = FakeSupabase({"assessment_templates": [template]})
+        cache = AssessmentTemplateCache(lambda: supabase)
+
+        cached = await asyncio.gather(*(cache.get("assessment-1") for _ in range(20)))
+        assert all(entry.plan.category(entry.plan.score({"q1": "yes"}))["name"] == "high" for entry in cached)
+        assert supabase.executed.count(("assessment_templates", "select")) == 1
+
+        template["status"] = "archived"
+        assert await cache.get("assessment-1") is cached[0]
+        cache.invalidate("assessment-1")
+        assert await cache.get("assessment-1") is None
+        assert await cache.get("missing") is None
+
+    def test_public_view_answers_conditional_requests(self):
+        cached = CachedAssessment({
+            "id": "assessment-1",
+            "user_id": "user-1",
+            "name": "Readiness",
+            "headline": "How ready are you?",
+            "subheadline": "Find out",
+            "questions": [{"id": "q1"}],
+            "scoring_logic": {"q1": {"yes": 60}},
+            "result_categories": [],
+            "created_at": "2026-10-01T09:00:00+00:00",
+            "updated_at": "2026-10-18T12:30:45.123456+00:00"
+        })
+        body = json.loads(cached.public_body)
+        assert body["assessment"]["total_questions"] == 1
+        assert "user_id" not in body["assessment"] and "scoring_logic" not in body["assessment"]
+        assert cached.headers["Last-Modified"] == "Sun, 18 Oct 2026 12:30:45 GMT"
+
+        etag = cached.headers["ETag"]
+        assert cached.not_modified({"if-none-match": f'"other", W/{etag}'})
+        assert not cached.not_modified({"if-none-match": '"other"', "if-modified-since": "Mon, 19 Oct 2026 00:00:00 GMT"})
+        assert cached.not_modified({"if-modified-since": "Sun, 18 Oct 2026 12:30:45 GMT"})
+        assert not cached.not_modified({"if-modified-since": "Sun, 18 Oct 2026 12:30:44 GMT"})
+        assert not cached.not_modified({"if-modified-since": "not a date"})
+
+    @pytest.mark.asyncio
+    async def test_views_are_written_per_assessment_in_batches(self):
+        class FlakyViews(FakeSupabase):
+            failures = 1
+
+            def rpc(self, name, params):
+                if params["p_assessment_id"] == "assessment-2" and self.failures:
+                    self.failures -= 1
+                    raise RuntimeError("connection reset")
+                return super().rpc(name, params)
+
+        supabase = FlakyViews({})
+        counter = AssessmentViewCounter(lambda: supabase, flush_interval=60)
+        for _ in range(300):
+            counter.record("assessment-1", "user-1")
+        for _ in range(5):
+            counter.record("assessment-2", "user-2")
+
+        await counter.flush()
+        assert supabase.rpc_calls == [
+            ("track_assessment_view", {"p_assessment_id": "assessment-1", "p_user_id": "user-1", "p_views": 300})
+        ]
+        assert counter.get_stats()["pending"] == 5
+
+        counter.record("assessment-2", "user-2")
+        await counter.close()
+        assert supabase.rpc_calls[-1][1] == {"p_assessment_id": "assessment-2", "p_user_id": "user-2", "p_views": 6}
+        assert counter.get_stats()["written"] == 306
@@ -45,3 +45,26 @@ def test_search_leads():
     headers = {"Authorization": "Bearer mock_token"}
     response = client.get("/api/leads/search?q=test", headers=headers)
     assert response.status_code in [200, 404, 401, 403]  # Allow various responses for now
+
+# ---------- STATIC FORM ASSETS ----------
+
+def test_form_page_has_strong_etag_and_revalidates():
+    response = client.get("/form/test-form", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.headers["etag"].startswith('"')
+    assert "must-revalidate" in response.headers["cache-control"]
+
+    cached = client.get("/form/test-form", headers={"Accept-Encoding": "identity", "If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+
+def test_widget_is_served_precompressed():
+    response = client.get("/static/form-widget.js", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"].endswith('-gzip"')
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert "LeadForm" in response.text
+
+def test_unknown_static_asset_is_404():
+    response = client.get("/static/missing.js")
+    assert response.status_code == 404
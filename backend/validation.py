@@ -6,6 +6,35 @@ Provides consistent validation across all backend services.
 import re
 from typing import Dict, List, Optional, Tuple
 
+# Patterns are compiled once at import; validators run per row in bulk imports
+EMAIL_PATTERN = re.compile(
+    r'^[a-zA-Z0-9.!#$%&\'*+/=?^_`{|}~-]+'
+    r'@[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?'
+    r'(?:\.[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?)*$'
+)
+
+UUID_PATTERN = re.compile(
+    r'^[0-9a-f]{8}-[0-9a-f]{4}-[1-5][0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}$',
+    re.IGNORECASE
+)
+
+URL_PATTERN = re.compile(
+    r'^https?://'
+    r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'
+    r'localhost|'
+    r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'
+    r'(?::\d+)?'
+    r'(?:/?|[/?]\S+)$',
+    re.IGNORECASE
+)
+
+CONTROL_CHARS_PATTERN = re.compile(r'[\x00-\x1F\x7F]')
+
+SQL_DANGEROUS_PATTERNS = [
+    re.compile(r"['\";\\]"),
+    re.compile(r'\b(DROP|DELETE|INSERT|UPDATE|SELECT|UNION|ALTER|CREATE|EXEC|EXECUTE)\b', re.IGNORECASE)
+]
+
 
 def validate_email(email: str) -> Tuple[bool, Optional[str]]:
     """
@@ -25,13 +54,7 @@ def validate_email(email: str) -> Tuple[bool, Optional[str]]:
     if len(email) > 320:
         return False, "Email address is too long (maximum 320 characters)"
 
-    email_pattern = re.compile(
-        r'^[a-zA-Z0-9.!#$%&\'*+/=?^_`{|}~-]+'
-        r'@[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?'
-        r'(?:\.[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?)*$'
-    )
-
-    if not email_pattern.match(email):
+    if not EMAIL_PATTERN.match(email):
         return False, "Invalid email format"
 
     return True, None
@@ -123,7 +146,7 @@ def sanitize_text_input(text: str, max_length: int = 500) -> str:
         return ""
 
     sanitized = text.strip()
-    sanitized = re.sub(r'[\x00-\x1F\x7F]', '', sanitized)
+    sanitized = CONTROL_CHARS_PATTERN.sub('', sanitized)
 
     return sanitized[:max_length]
 
@@ -141,12 +164,7 @@ def validate_uuid(uuid_string: str) -> bool:
     if not uuid_string or not isinstance(uuid_string, str):
         return False
 
-    uuid_pattern = re.compile(
-        r'^[0-9a-f]{8}-[0-9a-f]{4}-[1-5][0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}$',
-        re.IGNORECASE
-    )
-
-    return bool(uuid_pattern.match(uuid_string))
+    return bool(UUID_PATTERN.match(uuid_string))
 
 
 def validate_url(url: str) -> bool:
@@ -162,17 +180,7 @@ def validate_url(url: str) -> bool:
     if not url or not isinstance(url, str):
         return False
 
-    url_pattern = re.compile(
-        r'^https?://'
-        r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'
-        r'localhost|'
-        r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'
-        r'(?::\d+)?'
-        r'(?:/?|[/?]\S+)$',
-        re.IGNORECASE
-    )
-
-    return bool(url_pattern.match(url))
+    return bool(URL_PATTERN.match(url))
 
 
 def sanitize_sql_input(input_string: str) -> str:
@@ -189,14 +197,9 @@ def sanitize_sql_input(input_string: str) -> str:
     if not input_string or not isinstance(input_string, str):
         return ""
 
-    dangerous_patterns = [
-        r"['\";\\]",
-        r'\b(DROP|DELETE|INSERT|UPDATE|SELECT|UNION|ALTER|CREATE|EXEC|EXECUTE)\b'
-    ]
-
     sanitized = input_string
-    for pattern in dangerous_patterns:
-        sanitized = re.sub(pattern, '', sanitized, flags=re.IGNORECASE)
+    for pattern in SQL_DANGEROUS_PATTERNS:
+        sanitized = pattern.sub('', sanitized)
 
     return sanitized.strip()[:1000]
 
@@ -0,0 +1,20 @@
+-- Atomic submission counter for lead capture forms
+-- The webhook ingestion queue flushes leads in batches and adds each form's
+-- batch count in a single statement, so concurrent workers never lose increments.
+
+CREATE OR REPLACE FUNCTION increment_form_submissions(
+  p_form_id UUID,
+  p_count INTEGER,
+  p_last_submission_at TIMESTAMPTZ DEFAULT NOW()
+)
+RETURNS VOID AS $$
+BEGIN
+  UPDATE lead_capture_forms
+  SET
+    submissions_count = COALESCE(submissions_count, 0) + p_count,
+    last_submission_at = GREATEST(COALESCE(last_submission_at, p_last_submission_at), p_last_submission_at)
+  WHERE id = p_form_id;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION increment_form_submissions IS 'Adds a batch of webhook submissions to a lead capture form counter';
@@ -0,0 +1,73 @@
+-- Duplicate-submission suppression for public lead endpoints
+
+-- Claimed request keys and the response returned for them. A row with a NULL
+-- response is a submission still being processed; expired rows may be reclaimed.
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+  key TEXT PRIMARY KEY,
+  response JSONB,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  expires_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys(expires_at);
+
+ALTER TABLE idempotency_keys ENABLE ROW LEVEL SECURITY;
+
+CREATE INDEX IF NOT EXISTS idx_leads_created_by_email_lower ON public.leads(created_by, lower(email));
+
+-- An earlier revision of this function targeted columns leads does not have
+DROP FUNCTION IF EXISTS upsert_assessment_lead(UUID, TEXT, TEXT, TEXT, UUID, INTEGER, TEXT[], JSONB);
+
+-- Function: Create or update an assessment lead in one round trip.
+-- Leads are matched on (created_by, lower(email)) and serialized on that key
+-- with a transaction-scoped advisory lock, so concurrent submissions for the
+-- same email merge into one lead instead of racing a select-then-insert.
+-- Tags are merged, p_source_details is merged into source_details, and names
+-- already on the lead are kept.
+CREATE OR REPLACE FUNCTION upsert_assessment_lead(
+  p_user_id UUID,
+  p_email TEXT,
+  p_first_name TEXT,
+  p_last_name TEXT,
+  p_score INTEGER,
+  p_tags TEXT[],
+  p_source_details JSONB
+)
+RETURNS UUID AS $$
+DECLARE
+  v_lead_id UUID;
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtextextended(
+    'assessment_lead:' || COALESCE(p_user_id::TEXT, '') || ':' || lower(p_email), 0
+  ));
+
+  UPDATE leads
+  SET
+    first_name = COALESCE(first_name, p_first_name),
+    last_name = COALESCE(last_name, p_last_name),
+    lead_score = p_score,
+    tags = ARRAY(SELECT DISTINCT unnest(COALESCE(tags, '{}') || p_tags)),
+    source_details = COALESCE(source_details, '{}'::JSONB) || p_source_details,
+    updated_at = NOW()
+  WHERE id = (
+    -- Oldest match, in case duplicates predate this function
+    SELECT id FROM leads
+    WHERE created_by IS NOT DISTINCT FROM p_user_id
+      AND lower(email) = lower(p_email)
+    ORDER BY created_at
+    LIMIT 1
+  )
+  RETURNING id INTO v_lead_id;
+
+  IF v_lead_id IS NULL THEN
+    INSERT INTO leads (id, created_by, email, first_name, last_name, source, status, lead_score, tags, source_details)
+    VALUES (gen_random_uuid(), p_user_id, lower(p_email), p_first_name, p_last_name, 'assessment', 'new', p_score, p_tags, p_source_details)
+    RETURNING id INTO v_lead_id;
+  END IF;
+
+  RETURN v_lead_id;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON TABLE idempotency_keys IS 'Request keys of recent public submissions and their responses, for duplicate suppression';
+COMMENT ON FUNCTION upsert_assessment_lead IS 'Creates or merges an assessment lead for (created_by, lower(email)) in a single call';
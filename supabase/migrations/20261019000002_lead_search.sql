@@ -0,0 +1,94 @@
+-- Indexed lead search for /api/leads/search
+-- Full-text search over name, email, company and tags with prefix matching,
+-- a trigram fallback for misspellings, relevance ranking and keyset pagination.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Wrappers declared IMMUTABLE so they can back generated columns
+-- (array_to_string is only STABLE, but is deterministic for TEXT[])
+CREATE OR REPLACE FUNCTION lead_search_document(
+  p_first_name TEXT,
+  p_last_name TEXT,
+  p_email TEXT,
+  p_company TEXT,
+  p_tags TEXT[]
+)
+RETURNS TSVECTOR AS $$
+  SELECT
+    setweight(to_tsvector('simple', COALESCE(p_first_name, '') || ' ' || COALESCE(p_last_name, '')), 'A') ||
+    setweight(to_tsvector('simple', regexp_replace(COALESCE(p_email, ''), '[^[:alnum:]]+', ' ', 'g')), 'A') ||
+    setweight(to_tsvector('simple', COALESCE(p_company, '')), 'B') ||
+    setweight(to_tsvector('simple', COALESCE(array_to_string(p_tags, ' '), '')), 'C')
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION lead_search_text(
+  p_first_name TEXT,
+  p_last_name TEXT,
+  p_email TEXT,
+  p_company TEXT,
+  p_tags TEXT[]
+)
+RETURNS TEXT AS $$
+  SELECT lower(concat_ws(' ', p_first_name, p_last_name, p_email, p_company, array_to_string(p_tags, ' ')))
+$$ LANGUAGE sql IMMUTABLE;
+
+ALTER TABLE public.leads ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+  GENERATED ALWAYS AS (lead_search_document(first_name, last_name, email, company, tags)) STORED;
+
+ALTER TABLE public.leads ADD COLUMN IF NOT EXISTS search_text TEXT
+  GENERATED ALWAYS AS (lead_search_text(first_name, last_name, email, company, tags)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_leads_search_vector ON public.leads USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_leads_search_text_trgm ON public.leads USING GIN (search_text gin_trgm_ops);
+
+-- Function: Ranked lead search with keyset pagination.
+-- Every query term must match a word or word prefix ("acm" finds "acme").
+-- Leads that only match approximately (trigram word similarity) rank below
+-- every full-text match. Results are ordered by (rank DESC, id ASC); pass the
+-- last row's rank and id to get the next page.
+CREATE OR REPLACE FUNCTION search_leads(
+  p_user_id UUID,
+  p_query TEXT,
+  p_limit INTEGER DEFAULT 25,
+  p_cursor_rank NUMERIC DEFAULT NULL,
+  p_cursor_id UUID DEFAULT NULL
+)
+RETURNS TABLE (lead JSONB, rank NUMERIC) AS $$
+DECLARE
+  v_query TEXT := lower(trim(p_query));
+  v_tsquery TSQUERY;
+BEGIN
+  SELECT to_tsquery('simple', string_agg(quote_literal(term) || ':*', ' & '))
+  INTO v_tsquery
+  FROM regexp_split_to_table(v_query, '[^[:alnum:]]+') AS term
+  WHERE term <> '';
+
+  IF v_tsquery IS NULL THEN
+    RETURN;
+  END IF;
+
+  RETURN QUERY
+  WITH matches AS (
+    SELECT l.id, round((1 + ts_rank(l.search_vector, v_tsquery))::NUMERIC, 6) AS match_rank
+    FROM leads l
+    WHERE l.created_by = p_user_id
+      AND l.search_vector @@ v_tsquery
+    UNION ALL
+    SELECT l.id, round(word_similarity(v_query, l.search_text)::NUMERIC, 6)
+    FROM leads l
+    WHERE l.created_by = p_user_id
+      AND v_query <% l.search_text
+      AND NOT l.search_vector @@ v_tsquery
+  )
+  SELECT to_jsonb(l) - 'search_vector' - 'search_text', m.match_rank
+  FROM matches m
+  JOIN leads l ON l.id = m.id
+  WHERE p_cursor_rank IS NULL
+     OR m.match_rank < p_cursor_rank
+     OR (m.match_rank = p_cursor_rank AND m.id > p_cursor_id)
+  ORDER BY m.match_rank DESC, m.id
+  LIMIT p_limit;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+COMMENT ON FUNCTION search_leads IS 'Ranked full-text and fuzzy lead search with (rank, id) keyset pagination';
@@ -0,0 +1,68 @@
+-- Bulk lead import
+-- The import endpoint streams an upload and sends validated, deduplicated
+-- rows here in chunks; each chunk is merged into the user's leads in one call.
+
+CREATE INDEX IF NOT EXISTS idx_leads_created_by_email_lower ON public.leads(created_by, lower(email));
+
+-- Function: Merge a chunk of imported leads for one user.
+-- Leads whose email (case-insensitive) already exists for the user are
+-- updated (non-empty imported values win, tags are merged); the rest are
+-- inserted. Serialized per user with a transaction-scoped advisory lock so
+-- concurrent imports cannot insert the same email twice.
+CREATE OR REPLACE FUNCTION import_leads(
+  p_user_id UUID,
+  p_leads JSONB
+)
+RETURNS TABLE (inserted INTEGER, updated INTEGER) AS $$
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtextextended('import_leads:' || p_user_id::TEXT, 0));
+
+  RETURN QUERY
+  WITH incoming AS (
+    SELECT *
+    FROM jsonb_to_recordset(p_leads) AS x(
+      email TEXT,
+      first_name TEXT,
+      last_name TEXT,
+      company TEXT,
+      job_title TEXT,
+      industry TEXT,
+      country TEXT,
+      source TEXT,
+      tags TEXT[]
+    )
+  ),
+  updated_rows AS (
+    UPDATE leads l
+    SET
+      first_name = COALESCE(i.first_name, l.first_name),
+      last_name = COALESCE(i.last_name, l.last_name),
+      company = COALESCE(i.company, l.company),
+      job_title = COALESCE(i.job_title, l.job_title),
+      industry = COALESCE(i.industry, l.industry),
+      country = COALESCE(i.country, l.country),
+      tags = ARRAY(SELECT DISTINCT unnest(COALESCE(l.tags, '{}') || COALESCE(i.tags, '{}'))),
+      updated_at = NOW()
+    FROM incoming i
+    WHERE l.created_by = p_user_id
+      AND lower(l.email) = i.email
+    RETURNING l.id
+  ),
+  inserted_rows AS (
+    -- Both statements see the same snapshot, so updated leads are not re-inserted
+    INSERT INTO leads (id, created_by, email, first_name, last_name, company, job_title, industry, country, source, tags, status)
+    SELECT gen_random_uuid(), p_user_id, i.email, i.first_name, i.last_name, i.company, i.job_title, i.industry, i.country,
+           COALESCE(i.source, 'import'), COALESCE(i.tags, '{}'), 'new'
+    FROM incoming i
+    WHERE NOT EXISTS (
+      SELECT 1 FROM leads l
+      WHERE l.created_by = p_user_id
+        AND lower(l.email) = i.email
+    )
+    RETURNING id
+  )
+  SELECT (SELECT count(*) FROM inserted_rows)::INTEGER, (SELECT count(*) FROM updated_rows)::INTEGER;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION import_leads IS 'Merges a chunk of imported leads into a user''s leads by case-insensitive email';
@@ -0,0 +1,107 @@
+-- Daily lead pattern rollup for LeadAnalyticsService.analyze_lead_patterns
+-- Lead counts per (status, owner, creation day, dimension, value) are kept up
+-- to date by a trigger, so pattern and trend queries read a table whose size
+-- depends on days and distinct values, not on the number of leads.
+
+-- Block lead writes while the rollup is backfilled and the trigger installed
+LOCK TABLE public.leads IN SHARE ROW EXCLUSIVE MODE;
+
+CREATE TABLE IF NOT EXISTS lead_pattern_daily (
+  status TEXT NOT NULL,
+  -- created_by, or the nil UUID for leads without an owner
+  owner UUID NOT NULL,
+  day DATE NOT NULL,
+  dimension TEXT NOT NULL,
+  value TEXT NOT NULL,
+  lead_count INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (status, owner, day, dimension, value)
+);
+
+ALTER TABLE lead_pattern_daily ENABLE ROW LEVEL SECURITY;
+
+-- Function: Add p_delta to the rollup rows of one lead (one per dimension)
+CREATE OR REPLACE FUNCTION lead_pattern_apply(p_lead public.leads, p_delta INTEGER)
+RETURNS VOID AS $$
+BEGIN
+  INSERT INTO lead_pattern_daily (status, owner, day, dimension, value, lead_count)
+  SELECT
+    COALESCE(p_lead.status::TEXT, 'unknown'),
+    COALESCE(p_lead.created_by, '00000000-0000-0000-0000-000000000000'::UUID),
+    COALESCE(p_lead.created_at, NOW())::DATE,
+    d.dimension,
+    d.value,
+    p_delta
+  FROM (VALUES
+    ('industry', COALESCE(NULLIF(p_lead.industry, ''), 'unknown')),
+    ('company_size', COALESCE(p_lead.company_size::TEXT, 'unknown')),
+    ('source', COALESCE(NULLIF(p_lead.source, ''), 'unknown'))
+  ) AS d(dimension, value)
+  ON CONFLICT (status, owner, day, dimension, value)
+  DO UPDATE SET lead_count = lead_pattern_daily.lead_count + EXCLUDED.lead_count;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION leads_pattern_rollup_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM lead_pattern_apply(OLD, -1);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM lead_pattern_apply(NEW, 1);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill from existing leads
+INSERT INTO lead_pattern_daily (status, owner, day, dimension, value, lead_count)
+SELECT
+  COALESCE(l.status::TEXT, 'unknown'),
+  COALESCE(l.created_by, '00000000-0000-0000-0000-000000000000'::UUID),
+  COALESCE(l.created_at, NOW())::DATE,
+  d.dimension,
+  d.value,
+  COUNT(*)
+FROM leads l
+CROSS JOIN LATERAL (VALUES
+  ('industry', COALESCE(NULLIF(l.industry, ''), 'unknown')),
+  ('company_size', COALESCE(l.company_size::TEXT, 'unknown')),
+  ('source', COALESCE(NULLIF(l.source, ''), 'unknown'))
+) AS d(dimension, value)
+GROUP BY 1, 2, 3, 4, 5
+ON CONFLICT (status, owner, day, dimension, value)
+DO UPDATE SET lead_count = EXCLUDED.lead_count;
+
+DROP TRIGGER IF EXISTS leads_pattern_rollup ON public.leads;
+CREATE TRIGGER leads_pattern_rollup
+  AFTER INSERT OR DELETE OR UPDATE OF status, created_by, created_at, industry, company_size, source
+  ON public.leads
+  FOR EACH ROW EXECUTE FUNCTION leads_pattern_rollup_trigger();
+
+-- Function: Lead counts per dimension value for one status: all time, the
+-- last p_window_days days and the window before that.
+CREATE OR REPLACE FUNCTION lead_pattern_summary(
+  p_status TEXT DEFAULT 'new',
+  p_window_days INTEGER DEFAULT 30,
+  p_user_id UUID DEFAULT NULL
+)
+RETURNS TABLE (dimension TEXT, value TEXT, total BIGINT, current_window BIGINT, previous_window BIGINT) AS $$
+  SELECT
+    r.dimension,
+    r.value,
+    SUM(r.lead_count)::BIGINT,
+    COALESCE(SUM(r.lead_count) FILTER (WHERE r.day > CURRENT_DATE - p_window_days), 0)::BIGINT,
+    COALESCE(SUM(r.lead_count) FILTER (
+      WHERE r.day <= CURRENT_DATE - p_window_days
+        AND r.day > CURRENT_DATE - 2 * p_window_days
+    ), 0)::BIGINT
+  FROM lead_pattern_daily r
+  WHERE r.status = p_status
+    AND (p_user_id IS NULL OR r.owner = p_user_id)
+  GROUP BY r.dimension, r.value
+  HAVING SUM(r.lead_count) > 0
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON TABLE lead_pattern_daily IS 'Daily lead counts per status, owner and industry/company_size/source value, maintained by trigger';
+COMMENT ON FUNCTION lead_pattern_summary IS 'Lead pattern counts with current/previous window trends, read from the daily rollup';
@@ -0,0 +1,30 @@
+-- Batched assessment view tracking
+-- Public assessment views are counted in the API process and written every
+-- few seconds, so track_assessment_view takes the number of views to add.
+-- The new parameter defaults to 1, so existing callers are unaffected; the
+-- old two-argument version is dropped to keep calls unambiguous.
+
+DROP FUNCTION IF EXISTS track_assessment_view(UUID, UUID);
+
+-- Function: Add p_views to today's view count for an assessment
+CREATE OR REPLACE FUNCTION track_assessment_view(
+  p_assessment_id UUID,
+  p_user_id UUID,
+  p_views INTEGER DEFAULT 1
+)
+RETURNS VOID AS $$
+BEGIN
+  IF p_views IS NULL OR p_views <= 0 THEN
+    RETURN;
+  END IF;
+
+  INSERT INTO assessment_analytics (assessment_id, user_id, date, views)
+  VALUES (p_assessment_id, p_user_id, CURRENT_DATE, p_views)
+  ON CONFLICT (assessment_id, date)
+  DO UPDATE SET
+    views = assessment_analytics.views + EXCLUDED.views,
+    updated_at = NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION track_assessment_view IS 'Adds p_views (default 1) to the view count for assessment analytics';
@@ -0,0 +1,29 @@
+-- Targeted lead enrichment writes
+-- Enrichment writes back only enriched_data and updated_at for leads that
+-- still exist, so concurrent edits to other columns are kept and deleted
+-- leads are not recreated.
+
+-- Function: Merge enrichment data into a batch of leads.
+-- p_rows is a JSON array of {"id": ..., "enriched_data": {...}}; keys added
+-- to a lead's enriched_data since it was read are kept. Returns the number
+-- of leads updated.
+CREATE OR REPLACE FUNCTION update_lead_enrichment(
+  p_rows JSONB
+)
+RETURNS INTEGER AS $$
+DECLARE
+  v_updated INTEGER;
+BEGIN
+  UPDATE leads l
+  SET
+    enriched_data = COALESCE(l.enriched_data, '{}'::JSONB) || r.enriched_data,
+    updated_at = NOW()
+  FROM jsonb_to_recordset(p_rows) AS r(id UUID, enriched_data JSONB)
+  WHERE l.id = r.id;
+
+  GET DIAGNOSTICS v_updated = ROW_COUNT;
+  RETURN v_updated;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION update_lead_enrichment IS 'Merges enriched_data into existing leads by id and returns the number updated';
@@ -0,0 +1,28 @@
+-- Targeted lead score writes
+-- Scoring writes back only lead_score and updated_at for leads that still
+-- exist, so concurrent edits to other columns are kept and deleted leads are
+-- not recreated.
+
+-- Function: Set lead_score for a batch of leads (p_ids[i] gets p_scores[i]).
+-- Returns the number of leads updated.
+CREATE OR REPLACE FUNCTION update_lead_scores(
+  p_ids UUID[],
+  p_scores INTEGER[]
+)
+RETURNS INTEGER AS $$
+DECLARE
+  v_updated INTEGER;
+BEGIN
+  UPDATE leads
+  SET
+    lead_score = s.score,
+    updated_at = NOW()
+  FROM unnest(p_ids, p_scores) AS s(id, score)
+  WHERE leads.id = s.id;
+
+  GET DIAGNOSTICS v_updated = ROW_COUNT;
+  RETURN v_updated;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION update_lead_scores IS 'Sets lead_score for existing leads by id and returns the number updated';
@@ -0,0 +1,80 @@
+-- Statement-level lead pattern rollup
+-- The row-level trigger from 20261019000004 upserted three rollup rows per
+-- lead written, so bulk inserts and import chunks for one owner serialized
+-- on the same hot (status, owner, day, dimension, value) rows once per lead.
+-- These triggers read each statement's transition tables and apply one
+-- aggregated delta per rollup row instead.
+
+-- Block lead writes while the triggers are swapped, so none is missed
+LOCK TABLE public.leads IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS leads_pattern_rollup ON public.leads;
+DROP FUNCTION IF EXISTS leads_pattern_rollup_trigger();
+DROP FUNCTION IF EXISTS lead_pattern_apply(public.leads, INTEGER);
+
+-- Function: Subtract p_removed and add p_added leads to the rollup, one upsert
+-- per changed rollup row. Updates that leave a lead's rollup key unchanged
+-- cancel out and write nothing. Rows are upserted in key order so concurrent
+-- statements lock them in the same order.
+CREATE OR REPLACE FUNCTION lead_pattern_apply_rows(
+  p_removed public.leads[],
+  p_added public.leads[]
+)
+RETURNS VOID AS $$
+  INSERT INTO lead_pattern_daily (status, owner, day, dimension, value, lead_count)
+  SELECT
+    COALESCE(c.status::TEXT, 'unknown'),
+    COALESCE(c.created_by, '00000000-0000-0000-0000-000000000000'::UUID),
+    COALESCE(c.created_at, NOW())::DATE,
+    d.dimension,
+    d.value,
+    SUM(c.delta)
+  FROM (
+    SELECT r.status, r.created_by, r.created_at, r.industry, r.company_size, r.source, -1 AS delta
+    FROM unnest(p_removed) AS r
+    UNION ALL
+    SELECT a.status, a.created_by, a.created_at, a.industry, a.company_size, a.source, 1
+    FROM unnest(p_added) AS a
+  ) c
+  CROSS JOIN LATERAL (VALUES
+    ('industry', COALESCE(NULLIF(c.industry, ''), 'unknown')),
+    ('company_size', COALESCE(c.company_size::TEXT, 'unknown')),
+    ('source', COALESCE(NULLIF(c.source, ''), 'unknown'))
+  ) AS d(dimension, value)
+  GROUP BY 1, 2, 3, 4, 5
+  HAVING SUM(c.delta) <> 0
+  ORDER BY 1, 2, 3, 4, 5
+  ON CONFLICT (status, owner, day, dimension, value)
+  DO UPDATE SET lead_count = lead_pattern_daily.lead_count + EXCLUDED.lead_count;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION leads_pattern_rollup_statement()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    PERFORM lead_pattern_apply_rows('{}', ARRAY(SELECT n FROM new_leads n));
+  ELSIF TG_OP = 'UPDATE' THEN
+    PERFORM lead_pattern_apply_rows(ARRAY(SELECT o FROM old_leads o), ARRAY(SELECT n FROM new_leads n));
+  ELSIF TG_OP = 'DELETE' THEN
+    PERFORM lead_pattern_apply_rows(ARRAY(SELECT o FROM old_leads o), '{}');
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables need one trigger per event, and UPDATE triggers using
+-- them cannot list columns; unrelated updates net to zero in the function.
+CREATE TRIGGER leads_pattern_rollup_insert
+  AFTER INSERT ON public.leads
+  REFERENCING NEW TABLE AS new_leads
+  FOR EACH STATEMENT EXECUTE FUNCTION leads_pattern_rollup_statement();
+
+CREATE TRIGGER leads_pattern_rollup_update
+  AFTER UPDATE ON public.leads
+  REFERENCING OLD TABLE AS old_leads NEW TABLE AS new_leads
+  FOR EACH STATEMENT EXECUTE FUNCTION leads_pattern_rollup_statement();
+
+CREATE TRIGGER leads_pattern_rollup_delete
+  AFTER DELETE ON public.leads
+  REFERENCING OLD TABLE AS old_leads
+  FOR EACH STATEMENT EXECUTE FUNCTION leads_pattern_rollup_statement();
@@ -0,0 +1,21 @@
+-- Dead letters for queued webhook leads
+-- Form submissions are acknowledged before their lead is inserted, so a lead
+-- whose insert fails is kept here with the error for inspection and replay
+-- instead of being lost.
+
+CREATE TABLE IF NOT EXISTS lead_ingestion_dead_letters (
+  id BIGSERIAL PRIMARY KEY,
+  form_id TEXT,
+  lead JSONB NOT NULL,
+  error TEXT,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  replayed_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_lead_ingestion_dead_letters_pending
+  ON lead_ingestion_dead_letters(created_at)
+  WHERE replayed_at IS NULL;
+
+ALTER TABLE lead_ingestion_dead_letters ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE lead_ingestion_dead_letters IS 'Webhook leads whose queued insert failed, with the error, kept for replay';
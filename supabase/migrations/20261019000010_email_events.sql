@@ -0,0 +1,27 @@
+-- Stored email delivery events
+-- The ESP event webhook tracked bounces, unsubscribes, opens and clicks in
+-- memory only, so the suppression list and send-time histograms started empty
+-- after every restart. Events are now written here and replayed at startup.
+
+CREATE TABLE IF NOT EXISTS email_events (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  email_id TEXT,
+  campaign_id TEXT,
+  event_type TEXT NOT NULL,
+  timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  metadata JSONB NOT NULL DEFAULT '{}'::JSONB,
+  user_agent TEXT,
+  ip_address TEXT,
+  location TEXT
+);
+
+-- Startup replays page through one set of event types at a time
+CREATE INDEX IF NOT EXISTS idx_email_events_type_id ON email_events(event_type, id);
+CREATE INDEX IF NOT EXISTS idx_email_events_type_timestamp ON email_events(event_type, timestamp);
+CREATE INDEX IF NOT EXISTS idx_email_events_campaign_timestamp
+  ON email_events(campaign_id, timestamp)
+  WHERE campaign_id IS NOT NULL;
+
+ALTER TABLE email_events ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE email_events IS 'ESP delivery events (sent, opened, clicked, bounced, unsubscribed, ...) with the recipient in metadata';